@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.schemas.audit_log import AuditLogListResponse
 from app.crud import audit_log as audit_crud
+from app.services.audit_service import flush_audit_log
+from datetime import datetime
 from typing import Optional
+import asyncio
 
 router = APIRouter()
 
@@ -14,14 +18,63 @@ async def get_audit_logs(
     limit: int = 50,
     page: Optional[str] = None,
     action: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    logs = audit_crud.get_audit_logs(db, skip=skip, limit=limit, page_filter=page, action_filter=action)
+    await flush_audit_log()
+    try:
+        logs, next_cursor = audit_crud.get_audit_logs(db, skip=skip, limit=limit, page_filter=page,
+                                                      action_filter=action, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     total = audit_crud.get_audit_log_count(db, page_filter=page, action_filter=action)
-    return AuditLogListResponse(logs=logs, total=total)
+    return AuditLogListResponse(logs=logs, total=total, next_cursor=next_cursor)
 
 
 @router.delete("/logs")
 async def clear_audit_logs(db: Session = Depends(get_db)):
+    await flush_audit_log()
     count = audit_crud.clear_audit_logs(db)
     return {"message": f"Cleared {count} audit log entries"}
+
+
+@router.get("/export")
+async def export_audit_logs(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page: Optional[str] = None,
+    action: Optional[str] = None,
+):
+    """Stream archived and live entries, oldest first, as JSON lines."""
+    from app.services.audit_archive import export_lines
+    await flush_audit_log()
+    return StreamingResponse(
+        export_lines(start=start, end=end, page=page, action=action),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="audit-log.jsonl"'},
+    )
+
+
+@router.get("/archives")
+async def list_audit_archives():
+    from app.services.audit_archive import audit_retention
+    return await asyncio.to_thread(audit_retention.status)
+
+
+@router.get("/archives/{month}")
+async def download_audit_archive(month: str):
+    from app.services.audit_archive import archive_file
+    try:
+        path = archive_file(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Archive not found")
+    return FileResponse(path, media_type="application/gzip", filename=path.name)
+
+
+@router.post("/archives/run")
+async def run_audit_archival():
+    from app.services.audit_archive import audit_retention
+    archived = await audit_retention.run_once()
+    return {"archived": archived, "retention_days": audit_retention.retention_days}
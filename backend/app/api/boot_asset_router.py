@@ -0,0 +1,247 @@
+"""HTTP serving of Talos kernels and initramfs for iPXE.
+
+TFTP moves data in lockstep 512 B–1.4 KB blocks, which makes a mass reboot
+crawl.  iPXE speaks HTTP natively, so boot.ipxe fetches
+``/pxe/talos/<file>`` from here instead.  Responses support single-range
+requests, ETag/Last-Modified revalidation and are streamed in
+``os.pread`` chunks read off the event loop (uvicorn has no zero-copy
+send, so every byte passes through Python once).  Each client IP
+is limited to a few concurrent transfers so one misbehaving NIC cannot
+starve the rest of the fleet.
+"""
+import asyncio
+import logging
+import os
+import re
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Only versioned Talos boot files are served — never arbitrary paths
+_ASSET_NAME_RE = re.compile(r"^(vmlinuz-amd64|initramfs-amd64)-v[0-9A-Za-z.+\-]+(\.xz)?$")
+
+_CHUNK_SIZE = 256 * 1024
+MAX_PER_CLIENT = int(os.getenv("BOOT_ASSET_MAX_PER_CLIENT", "2"))
+# How long a client's extra request waits for a free slot before a 503
+_SLOT_WAIT_SECONDS = 30
+
+_client_slots: Dict[str, asyncio.Semaphore] = {}
+# Transfers holding or waiting for each client's slots; its semaphore is
+# dropped at zero so the dict doesn't grow with every DHCP lease
+_client_users: Dict[str, int] = {}
+
+
+@asynccontextmanager
+async def _client_slot(client_ip: str):
+    """Hold one of ``client_ip``'s transfer slots for the block.
+
+    Yields False if none freed up within ``_SLOT_WAIT_SECONDS``.
+    """
+    sem = _client_slots.get(client_ip)
+    if sem is None:
+        sem = _client_slots[client_ip] = asyncio.Semaphore(MAX_PER_CLIENT)
+    _client_users[client_ip] = _client_users.get(client_ip, 0) + 1
+    try:
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=_SLOT_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            sem.release()
+    finally:
+        _client_users[client_ip] -= 1
+        if not _client_users[client_ip]:
+            del _client_users[client_ip]
+            _client_slots.pop(client_ip, None)
+
+
+def _asset_dirs():
+    """Directories boot files may live in, most likely first."""
+    from app.services.talos_downloader import talos_downloader
+    yield talos_downloader.output_dir
+
+    from app.db.database import SessionLocal
+    from app.crud import network as network_crud
+    db = SessionLocal()
+    try:
+        ns = network_crud.get_network_settings(db)
+        if ns and ns.tftp_root:
+            yield Path(ns.tftp_root) / "pxe" / "talos"
+    finally:
+        db.close()
+
+
+def _find_asset(filename: str) -> Optional[Path]:
+    for d in _asset_dirs():
+        p = d / filename
+        if p.is_file():
+            return p
+    return None
+
+
+def _etag_for(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range. Returns (start, end) inclusive, or None
+    if the header is not satisfiable. Multi-range requests are not supported
+    and are served as the first range."""
+    if not header.startswith("bytes="):
+        return None
+    spec = header[6:].split(",")[0].strip()
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class BootAssetResponse(Response):
+    """Streams a byte range of a file in ``_CHUNK_SIZE`` reads.
+
+    With a ``client_ip`` the transfer holds one of that client's slots
+    while it is sent, and a 503 is sent instead if none frees up in time.
+    """
+
+    def __init__(self, path: Path, start: int, length: int, status_code: int, headers: Dict[str, str],
+                 send_body: bool = True, client_ip: Optional[str] = None):
+        self.background = None
+        self.path = path
+        self.start = start
+        self.length = length
+        self.status_code = status_code
+        self.init_headers(headers)
+        self.send_body = send_body
+        self.client_ip = client_ip
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.client_ip is None:
+            return await self._send(send)
+        async with _client_slot(self.client_ip) as acquired:
+            if not acquired:
+                busy = JSONResponse({"detail": "Too many concurrent downloads from this client"},
+                                    status_code=503, headers={"Retry-After": "5"})
+                return await busy(scope, receive, send)
+            await self._send(send)
+
+    async def _send(self, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            offset = self.start
+            remaining = self.length
+            while remaining > 0:
+                n = min(_CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(os.pread, fd, n, offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                # File shrank underneath us — terminate the body cleanly
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+
+async def _serve_asset(filename: str, request: Request, send_body: bool):
+    if not _ASSET_NAME_RE.match(filename):
+        raise HTTPException(status_code=404, detail="Not a boot asset")
+
+    path = await asyncio.to_thread(_find_asset, filename)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"{filename} not found")
+
+    st = path.stat()
+    size = st.st_size
+    etag = _etag_for(st)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": "public, max-age=86400",
+        "Content-Type": "application/octet-stream",
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        return BootAssetResponse(path, 0, 0, 304, headers, send_body=False)
+
+    start, length, status = 0, size, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        parsed = _parse_range(range_header, size)
+        if parsed is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            return BootAssetResponse(path, 0, 0, 416, headers, send_body=False)
+        start, end = parsed
+        length = end - start + 1
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if not send_body:
+        return BootAssetResponse(path, start, length, status, headers, send_body=False)
+
+    client_ip = request.client.host if request.client else "unknown"
+    return BootAssetResponse(path, start, length, status, headers, client_ip=client_ip)
+
+
+@router.get("/pxe/talos/{filename}")
+async def get_boot_asset(filename: str, request: Request):
+    """Serve a Talos kernel or initramfs (supports Range and conditional GET)."""
+    return await _serve_asset(filename, request, send_body=True)
+
+
+@router.head("/pxe/talos/{filename}")
+async def head_boot_asset(filename: str, request: Request):
+    return await _serve_asset(filename, request, send_body=False)
@@ -12,6 +12,7 @@ from app.schemas.cluster import (
 from app.crud import cluster as cluster_crud
 from app.core.config import ensure_v_prefix, strip_v_prefix
 from app.services.audit_service import log_action
+from app.services import instrumentation
 import subprocess
 import json as json_module
 import tempfile
@@ -51,7 +52,7 @@ def _deploy_cni(cni_name: str, api_server_ip: str = "", upgrade: bool = False) -
 
     def _run(args, timeout=120):
         logger.info(f"CNI deploy: helm {' '.join(args)}")
-        r = subprocess.run([helm_bin] + args, capture_output=True, text=True, timeout=timeout, env=env)
+        r = instrumentation.run([helm_bin] + args, capture_output=True, text=True, timeout=timeout, env=env)
         if r.returncode != 0:
             logger.warning(f"helm {args[0]} failed: {r.stderr}")
         return r.returncode == 0, r.stderr or r.stdout
@@ -162,7 +163,7 @@ def update_talosconfig_endpoint_and_node(control_plane_ip: str) -> bool:
         talosctl = find_talosctl()
         
         # Update endpoint
-        result = subprocess.run(
+        result = instrumentation.run(
             [talosctl, "config", "endpoint", control_plane_ip, "--talosconfig", str(talosconfig_path)],
             capture_output=True,
             text=True,
@@ -174,7 +175,7 @@ def update_talosconfig_endpoint_and_node(control_plane_ip: str) -> bool:
         logger.info(f"Updated talosconfig endpoint to {control_plane_ip}")
         
         # Update node
-        result = subprocess.run(
+        result = instrumentation.run(
             [talosctl, "config", "node", control_plane_ip, "--talosconfig", str(talosconfig_path)],
             capture_output=True,
             text=True,
@@ -251,6 +252,18 @@ async def update_cluster_settings(settings_id: int, settings: ClusterSettingsUpd
         except Exception as e:
             logger.warning(f"Error setting talosctl version: {e}")
 
+    # Warm boot files/binaries/installer for the new versions in the background
+    if any(getattr(settings, f) is not None for f in
+           ("talos_version", "kubernetes_version", "kubectl_version", "factory_schematic_id")):
+        try:
+            from app.services.prefetch_service import schedule_for_settings
+            schedule_for_settings(db)
+        except Exception as e:
+            logger.warning(f"Prefetch scheduling: {e}")
+
+    from app.services.credentials_service import credentials_service
+    credentials_service.invalidate()
+
     # Automatically regenerate base Talos configs after settings update
     try:
         await generate_cluster_config(db)
@@ -259,9 +272,11 @@ async def update_cluster_settings(settings_id: int, settings: ClusterSettingsUpd
         config_generator = ConfigGenerator()
         approved_devices = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, skip=0, limit=1000)
         regenerated_count = 0
-        for device in approved_devices:
-            if config_generator.generate_device_config(device):
-                regenerated_count += 1
+        snapshot = config_generator.settings_snapshot()
+        with config_generator.manifest.batch():
+            for device in approved_devices:
+                if config_generator.generate_device_config(device, snapshot):
+                    regenerated_count += 1
 
         print(f"Regenerated {regenerated_count} device configs after cluster settings update")
     except HTTPException as e:
@@ -327,7 +342,7 @@ async def generate_cluster_config(db: Session = Depends(get_db)):
                 cni_patch["cluster"]["proxy"] = {"disabled": True}
             cmd.extend(["--config-patch", json.dumps(cni_patch)])
 
-        result = subprocess.run(
+        result = instrumentation.run(
             cmd,
             capture_output=True,
             text=True,
@@ -441,7 +456,7 @@ async def generate_secrets(request: GenerateSecretsRequest, db: Session = Depend
 
         # Run talosctl gen secrets (with --force to overwrite existing)
         talosctl = find_talosctl()
-        result = subprocess.run(
+        result = instrumentation.run(
             [talosctl, "gen", "secrets", "-o", str(secrets_file), "--force"],
             capture_output=True,
             text=True,
@@ -571,7 +586,7 @@ async def bootstrap_cluster(db: Session = Depends(get_db)):
         talosctl = find_talosctl()
 
         logger.info(f"Running bootstrap on node {bootstrap_ip}")
-        result = subprocess.run(
+        result = instrumentation.run(
             [
                 talosctl, "bootstrap",
                 "--talosconfig", str(talosconfig_path),
@@ -691,7 +706,7 @@ async def download_kubeconfig(db: Session = Depends(get_db)):
                 cp_ip = cp_ip.split('/')[0]
 
             talosctl = find_talosctl()
-            result = subprocess.run(
+            result = instrumentation.run(
                 [
                     talosctl, "kubeconfig",
                     "--talosconfig", str(talosconfig_path),
@@ -20,7 +20,6 @@ from app.utils.network import get_next_available_ip, get_first_usable_ip, is_fqd
 from app.services.audit_service import log_action
 from typing import List, Optional
 from pathlib import Path
-import yaml
 import json
 import logging
 
@@ -394,6 +393,8 @@ async def download_config(request: ConfigDownloadRequest, db: Session = Depends(
 
     Returns the appropriate Talos config (controlplane or worker) if the device is approved.
     """
+    import yaml
+
     # Register or get device
     device, is_new = device_crud.register_or_get_device(db, request.mac_address)
 
@@ -667,30 +668,31 @@ async def get_recent_events(since: Optional[int] = None, db: Session = Depends(g
 async def start_rolling_refresh(
     mode: str = "sequential",
     parallelism: int = 2,
+    max_unavailable: Optional[int] = None,
+    max_unavailable_percent: Optional[int] = None,
     db: Session = Depends(get_db),
 ):
     """Start a rolling refresh of all approved worker nodes.
 
     Modes: sequential (one at a time), parallel (N at a time), all_at_once (no drain).
     """
-    from app.api.ws_handler import (
-        _rolling_refresh_active,
-        _do_sequential_refresh,
-        _do_concurrent_refresh,
-    )
-    import asyncio as _asyncio
+    from app.services.rolling_refresh import rolling_refresh
 
-    if _rolling_refresh_active:
+    if rolling_refresh.active:
         raise HTTPException(status_code=409, detail="A rolling refresh is already in progress")
     if mode not in ("sequential", "parallel", "all_at_once"):
         raise HTTPException(status_code=400, detail=f"Invalid mode: {mode}")
+    if max_unavailable is not None and max_unavailable < 1:
+        raise HTTPException(status_code=400, detail="max_unavailable must be a positive integer")
+    if max_unavailable_percent is not None and not 1 <= max_unavailable_percent <= 100:
+        raise HTTPException(status_code=400, detail="max_unavailable_percent must be between 1 and 100")
 
-    workers = [
+    fleet = [
         d for d in device_crud.get_devices(db, skip=0, limit=1000)
         if d.status == DeviceStatus.APPROVED
         and d.role == DeviceRole.WORKER
-        and d.ip_address
     ]
+    workers = [d for d in fleet if d.ip_address]
     if not workers:
         raise HTTPException(status_code=400, detail="No approved worker nodes with IP addresses found")
 
@@ -704,52 +706,42 @@ async def start_rolling_refresh(
             "ip_address": ip,
         })
 
-    import app.api.ws_handler as wsh
-    wsh._rolling_refresh_active = True
-    wsh._rolling_refresh_cancel = False
-    wsh._rolling_refresh_state = {
-        "total": len(device_list),
-        "mode": mode,
-        "parallelism": parallelism if mode == "parallel" else (len(device_list) if mode == "all_at_once" else 1),
-        "node_states": {i: {"device": d, "step": "pending", "message": "Waiting..."} for i, d in enumerate(device_list)},
-        "succeeded": 0,
-        "failed": 0,
-    }
+    try:
+        state = await rolling_refresh.start(
+            device_list, mode, parallelism,
+            max_unavailable=max_unavailable,
+            max_unavailable_percent=max_unavailable_percent,
+            fleet_size=len(fleet),
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     await log_action(db, "rolling_refresh_started", "Device Management",
-        json.dumps({"count": len(device_list), "mode": mode, "devices": [d["hostname"] for d in device_list]}),
+        json.dumps({"count": len(device_list), "mode": mode, "max_unavailable": state["max_unavailable"],
+                    "devices": [d["hostname"] for d in device_list]}),
         "device", "rolling_refresh")
 
-    if mode == "sequential":
-        _asyncio.create_task(_do_sequential_refresh(device_list))
-    elif mode == "parallel":
-        _asyncio.create_task(_do_concurrent_refresh(device_list, parallelism))
-    elif mode == "all_at_once":
-        _asyncio.create_task(_do_concurrent_refresh(device_list, len(device_list), skip_drain=True))
-
     return {
         "message": f"Rolling refresh started for {len(device_list)} worker node(s) — {mode}",
         "devices": device_list,
         "mode": mode,
+        "id": state["id"],
+        "max_unavailable": state["max_unavailable"],
     }
 
 
 @router.get("/devices/rolling-refresh/status")
 async def rolling_refresh_status():
     """Get current rolling refresh status."""
-    import app.api.ws_handler as wsh
-    return {
-        "active": wsh._rolling_refresh_active,
-        **wsh._rolling_refresh_state,
-    }
+    from app.services.rolling_refresh import rolling_refresh
+    return rolling_refresh.status()
 
 
 @router.post("/devices/rolling-refresh/cancel")
 async def cancel_rolling_refresh():
     """Cancel a rolling refresh after the current node(s) complete."""
-    import app.api.ws_handler as wsh
-    if not wsh._rolling_refresh_active:
+    from app.services.rolling_refresh import rolling_refresh
+    if not rolling_refresh.cancel():
         raise HTTPException(status_code=400, detail="No rolling refresh in progress")
-    wsh._rolling_refresh_cancel = True
     return {"message": "Cancellation requested — will stop after current node(s)"}
 
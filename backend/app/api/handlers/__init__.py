@@ -1,31 +1,81 @@
-"""Handler package — assembles the WebSocket ACTION_MAP from all sub-modules."""
-
-from app.api.handlers.devices import DEVICE_ACTIONS
-from app.api.handlers.network import NETWORK_ACTIONS
-from app.api.handlers.cluster import CLUSTER_ACTIONS
-from app.api.handlers.volumes import VOLUME_ACTIONS
-from app.api.handlers.audit import AUDIT_ACTIONS
-from app.api.handlers.talos import TALOS_ACTIONS
-from app.api.handlers.modules import MODULE_ACTIONS
-from app.api.handlers.longhorn import LONGHORN_ACTIONS
-from app.api.handlers.troubleshoot import TROUBLESHOOT_ACTIONS
-from app.api.handlers.workloads import WORKLOAD_ACTIONS
-
-
-def build_action_map() -> dict:
-    """Merge all per-domain action dicts into one map."""
-    action_map: dict = {}
-    for actions in [
-        DEVICE_ACTIONS,
-        NETWORK_ACTIONS,
-        CLUSTER_ACTIONS,
-        VOLUME_ACTIONS,
-        AUDIT_ACTIONS,
-        TALOS_ACTIONS,
-        MODULE_ACTIONS,
-        LONGHORN_ACTIONS,
-        TROUBLESHOOT_ACTIONS,
-        WORKLOAD_ACTIONS,
-    ]:
-        action_map.update(actions)
-    return action_map
+"""Handler package — assembles the WebSocket ACTION_MAP from all sub-modules.
+
+Sub-modules are imported lazily: the action map only knows which module
+serves which action prefix, and imports that module the first time one
+of its actions is looked up.  A deployment that never opens the RBAC or
+CI/CD pages never pays for importing them (or the kubernetes client).
+"""
+import importlib
+from typing import Dict, Iterator, Tuple
+
+# action prefix -> (module path, name of its *_ACTIONS dict)
+HANDLER_MODULES: Dict[str, Tuple[str, str]] = {
+    "devices": ("app.api.handlers.devices", "DEVICE_ACTIONS"),
+    "network": ("app.api.handlers.network", "NETWORK_ACTIONS"),
+    "cluster": ("app.api.handlers.cluster", "CLUSTER_ACTIONS"),
+    "volumes": ("app.api.handlers.volumes", "VOLUME_ACTIONS"),
+    "audit": ("app.api.handlers.audit", "AUDIT_ACTIONS"),
+    "talos": ("app.api.handlers.talos", "TALOS_ACTIONS"),
+    "versions": ("app.api.handlers.talos", "TALOS_ACTIONS"),
+    "modules": ("app.api.handlers.modules", "MODULE_ACTIONS"),
+    "longhorn": ("app.api.handlers.longhorn", "LONGHORN_ACTIONS"),
+    "troubleshoot": ("app.api.handlers.troubleshoot", "TROUBLESHOOT_ACTIONS"),
+    "cicd": ("app.api.handlers.cicd", "CICD_ACTIONS"),
+    "metrics": ("app.api.handlers.metrics", "METRICS_ACTIONS"),
+    "rbac": ("app.api.handlers.rbac", "RBAC_ACTIONS"),
+    "workloads": ("app.api.handlers.workloads", "WORKLOAD_ACTIONS"),
+    "artifacts": ("app.api.handlers.artifacts", "ARTIFACT_ACTIONS"),
+    "system": ("app.api.handlers.system", "SYSTEM_ACTIONS"),
+    "configs": ("app.api.handlers.configs", "CONFIGS_ACTIONS"),
+}
+
+
+def handler_module_paths() -> Iterator[str]:
+    """Distinct handler module paths, in registry order."""
+    return iter(dict.fromkeys(path for path, _ in HANDLER_MODULES.values()))
+
+
+class LazyActionMap(dict):
+    """Action name -> handler, filled in one module at a time on lookup.
+
+    ``in``, ``[]`` and ``get`` import the owning module on a miss.  Entries
+    set explicitly (e.g. ``patch.dict`` in tests) always win over the
+    module's own handlers.
+    """
+
+    def _load(self, action) -> bool:
+        if not isinstance(action, str):
+            return False
+        entry = HANDLER_MODULES.get(action.split(".", 1)[0])
+        if entry is None:
+            return False
+        module_path, attr = entry
+        actions = getattr(importlib.import_module(module_path), attr)
+        for name, handler in actions.items():
+            if not dict.__contains__(self, name):
+                dict.__setitem__(self, name, handler)
+        return True
+
+    def __missing__(self, action):
+        if self._load(action) and dict.__contains__(self, action):
+            return dict.__getitem__(self, action)
+        raise KeyError(action)
+
+    def __contains__(self, action) -> bool:
+        if dict.__contains__(self, action):
+            return True
+        return self._load(action) and dict.__contains__(self, action)
+
+    def get(self, action, default=None):
+        return self[action] if action in self else default
+
+    def load_all(self) -> "LazyActionMap":
+        """Import every handler module (for listings and tests)."""
+        for prefix in HANDLER_MODULES:
+            self._load(prefix)
+        return self
+
+
+def build_action_map() -> LazyActionMap:
+    """Create the (initially empty) lazy map of all per-domain actions."""
+    return LazyActionMap()
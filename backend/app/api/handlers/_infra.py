@@ -12,6 +12,7 @@ from pathlib import Path
 from typing import Optional
 
 from app.api.handlers._base import _db, logger
+from app.services import instrumentation
 
 # Re-export _find_kubectl so handler modules can import it from here.
 __all__ = [
@@ -69,9 +70,11 @@ def _regenerate_all_device_configs(db):
 
     config_generator = ConfigGenerator()
     devices = device_crud.get_devices(db, skip=0, limit=1000)
-    for device in devices:
-        if device.status == DeviceStatus.APPROVED:
-            config_generator.generate_device_config(device)
+    snapshot = config_generator.settings_snapshot()
+    with config_generator.manifest.batch():
+        for device in devices:
+            if device.status == DeviceStatus.APPROVED:
+                config_generator.generate_device_config(device, snapshot)
     logger.info(f"Regenerated configs for {sum(1 for d in devices if d.status == DeviceStatus.APPROVED)} approved devices")
 
 
@@ -100,14 +103,14 @@ async def _label_namespace_privileged(namespace: str):
     kubeconfig = str(Path.home() / ".kube" / "config")
 
     # Create namespace first
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "create", "namespace", namespace,
         "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
     )
     await proc.communicate()  # ignore error if already exists
 
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "label", "namespace", namespace,
         "pod-security.kubernetes.io/enforce=privileged",
         "pod-security.kubernetes.io/audit=privileged",
@@ -180,7 +183,7 @@ spec:
 
     # Wait for MetalLB CRDs to be available
     for attempt in range(15):
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             kubectl, "get", "crd", "ipaddresspools.metallb.io",
             "--kubeconfig", kubeconfig,
             stdout=asyncio.subprocess.PIPE,
@@ -199,7 +202,7 @@ spec:
         tmp_path = f.name
 
     try:
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             kubectl, "apply", "-f", tmp_path,
             "--kubeconfig", kubeconfig,
             stdout=asyncio.subprocess.PIPE,
@@ -227,7 +230,7 @@ async def _delete_namespace_resources(namespace: str):
     kubeconfig = str(Path.home() / ".kube" / "config")
 
     # Delete all resources in the namespace
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "delete", "all", "--all", "--namespace", namespace,
         "--kubeconfig", kubeconfig, "--timeout=60s",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -240,7 +243,7 @@ async def _delete_namespace_resources(namespace: str):
 
     # Also clean up PVCs, configmaps, secrets, serviceaccounts (not covered by "all")
     for resource_type in ["pvc", "configmap", "secret", "serviceaccount"]:
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             kubectl, "delete", resource_type, "--all", "--namespace", namespace,
             "--kubeconfig", kubeconfig, "--timeout=30s",
             stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -248,7 +251,7 @@ async def _delete_namespace_resources(namespace: str):
         await asyncio.wait_for(proc.communicate(), timeout=45)
 
     # Delete the namespace itself
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "delete", "namespace", namespace,
         "--kubeconfig", kubeconfig, "--timeout=60s",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
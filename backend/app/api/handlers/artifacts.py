@@ -0,0 +1,86 @@
+"""Artifact store WebSocket handlers (disk usage, GC, integrity checks)."""
+import asyncio
+import json
+import logging
+from fastapi import WebSocket
+
+import app.api.ws_handler as _ws
+
+logger = logging.getLogger(__name__)
+
+
+def _adopt_existing():
+    """Pull pre-store downloads under management so they show up in usage/GC."""
+    from app.services.artifact_store import (
+        artifact_store, KIND_TALOS, KIND_KUBECTL, TALOS_PATTERNS, KUBECTL_PATTERNS,
+    )
+    from app.services.talos_downloader import talos_downloader
+    from app.services.kubectl_downloader import KubectlDownloader
+
+    adopted = artifact_store.adopt(talos_downloader.output_dir, KIND_TALOS, TALOS_PATTERNS)
+    adopted += artifact_store.adopt(KubectlDownloader().versions_dir, KIND_KUBECTL, KUBECTL_PATTERNS)
+    return adopted
+
+
+async def _artifacts_list(params: dict, ws: WebSocket, req_id: str):
+    db = _ws._db()
+    try:
+        from app.services.artifact_store import artifact_store, get_referenced_versions
+
+        await asyncio.to_thread(_adopt_existing)
+        usage = await asyncio.to_thread(artifact_store.usage)
+        referenced = get_referenced_versions(db)
+        for v in usage["versions"]:
+            v["referenced"] = v["version"] in referenced.get(v["kind"], set())
+        await _ws._respond(ws, req_id, usage)
+    finally:
+        db.close()
+
+
+async def _artifacts_gc(params: dict, ws: WebSocket, req_id: str):
+    db = _ws._db()
+    try:
+        from app.services.artifact_store import artifact_store, get_referenced_versions, DEFAULT_RETAIN
+
+        retain = int(params.get("retain", DEFAULT_RETAIN))
+        max_age_days = params.get("max_age_days")
+        dry_run = bool(params.get("dry_run", False))
+        if retain < 0:
+            return await _ws._respond(ws, req_id, error="retain must be >= 0")
+
+        referenced = get_referenced_versions(db)
+        await asyncio.to_thread(_adopt_existing)
+        result = await asyncio.to_thread(
+            artifact_store.gc, referenced, retain,
+            float(max_age_days) if max_age_days is not None else None, dry_run,
+        )
+
+        if not dry_run:
+            await _ws.log_action(db, "artifacts_gc", "Troubleshooting",
+                json.dumps({
+                    "removed_versions": result["removed_versions"],
+                    "freed_bytes": result["freed_bytes"],
+                }),
+                "artifacts", None)
+            await _ws._broadcast("artifacts_changed", {"freed_bytes": result["freed_bytes"]})
+
+        await _ws._respond(ws, req_id, result)
+    finally:
+        db.close()
+
+
+async def _artifacts_verify(params: dict, ws: WebSocket, req_id: str):
+    from app.services.artifact_store import artifact_store
+
+    repair = bool(params.get("repair", True))
+    result = await asyncio.to_thread(artifact_store.verify, repair)
+    if repair and (result["corrupt"] or result["relinked"]):
+        await _ws._broadcast("artifacts_changed", {"corrupt": result["corrupt"]})
+    await _ws._respond(ws, req_id, result)
+
+
+ARTIFACT_ACTIONS = {
+    "artifacts.list": _artifacts_list,
+    "artifacts.gc": _artifacts_gc,
+    "artifacts.verify": _artifacts_verify,
+}
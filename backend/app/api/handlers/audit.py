@@ -8,25 +8,51 @@ logger = logging.getLogger(__name__)
 
 
 async def _audit_list(params: dict, ws: WebSocket, req_id: str):
+    from app.services.audit_service import flush_audit_log
+    await flush_audit_log()
     db = _ws._db()
     try:
         from app.crud import audit_log as crud
-        logs = crud.get_audit_logs(db,
+        logs, next_cursor = crud.get_audit_logs(db,
             skip=params.get("skip", 0),
             limit=params.get("limit", 50),
             page_filter=params.get("page"),
             action_filter=params.get("action"),
+            cursor=params.get("cursor"),
         )
         total = crud.get_audit_log_count(db,
             page_filter=params.get("page"),
             action_filter=params.get("action"),
         )
-        await _ws._respond(ws, req_id, {"logs": logs, "total": total})
+        await _ws._respond(ws, req_id, {"logs": logs, "total": total, "next_cursor": next_cursor})
+    finally:
+        db.close()
+
+
+async def _audit_search(params: dict, ws: WebSocket, req_id: str):
+    """Full-text search over audit entries, best match first."""
+    from app.services.audit_service import flush_audit_log
+    await flush_audit_log()
+    db = _ws._db()
+    try:
+        from app.crud import audit_log as crud
+        try:
+            results, meta = crud.search_audit_logs(db, params.get("query", ""),
+                skip=params.get("skip", 0),
+                limit=params.get("limit", 50),
+                page_filter=params.get("page"),
+                action_filter=params.get("action"),
+            )
+        except ValueError as e:
+            return await _ws._respond(ws, req_id, error=str(e))
+        await _ws._respond(ws, req_id, {"results": results, **meta})
     finally:
         db.close()
 
 
 async def _audit_clear(params: dict, ws: WebSocket, req_id: str):
+    from app.services.audit_service import flush_audit_log
+    await flush_audit_log()
     db = _ws._db()
     try:
         from app.crud import audit_log as crud
@@ -37,7 +63,15 @@ async def _audit_clear(params: dict, ws: WebSocket, req_id: str):
         db.close()
 
 
+async def _audit_archives(params: dict, ws: WebSocket, req_id: str):
+    import asyncio
+    from app.services.audit_archive import audit_retention
+    await _ws._respond(ws, req_id, await asyncio.to_thread(audit_retention.status))
+
+
 AUDIT_ACTIONS = {
     "audit.list": _audit_list,
+    "audit.search": _audit_search,
     "audit.clear": _audit_clear,
+    "audit.archives": _audit_archives,
 }
@@ -15,6 +15,7 @@ from urllib.request import Request, urlopen
 from fastapi import WebSocket
 
 import app.api.ws_handler as _ws
+from app.services import instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +37,7 @@ _GITHUB_TOKEN_CACHE_TTL = 300  # 5 minutes
 async def _kubectl_json(kubectl: str, *args, timeout: int = 15):
     """Run a kubectl command and return parsed JSON or (None, error_str)."""
     kubeconfig = str(Path.home() / ".kube" / "config")
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, *args, "--kubeconfig", kubeconfig, "-o", "json",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
     )
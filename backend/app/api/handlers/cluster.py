@@ -69,14 +69,25 @@ async def _cluster_update(params: dict, ws: WebSocket, req_id: str):
             except Exception as e:
                 logger.warning(f"talosctl version: {e}")
 
+        # Warm boot files/binaries/installer for the new versions in the background
+        if any(getattr(update_schema, f) is not None for f in
+               ("talos_version", "kubernetes_version", "kubectl_version", "factory_schematic_id")):
+            try:
+                from app.services.prefetch_service import schedule_for_settings
+                schedule_for_settings(db)
+            except Exception as e:
+                logger.warning(f"Prefetch scheduling: {e}")
+
         # Auto-regen configs
         try:
             from app.api.cluster_router import generate_cluster_config
             await generate_cluster_config(db)
             from app.services.config_generator import ConfigGenerator
             cg = ConfigGenerator()
-            for d in device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, 0, 1000):
-                cg.generate_device_config(d)
+            snapshot = cg.settings_snapshot()
+            with cg.manifest.batch():
+                for d in device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, 0, 1000):
+                    cg.generate_device_config(d, snapshot)
         except Exception as e:
             logger.warning(f"Auto-regen after cluster update: {e}")
 
@@ -84,6 +95,9 @@ async def _cluster_update(params: dict, ws: WebSocket, req_id: str):
             json.dumps({"cluster_name": updated.cluster_name, "kubernetes_version": updated.kubernetes_version}),
             "cluster_settings", str(settings_id))
 
+        from app.services.credentials_service import credentials_service
+        credentials_service.invalidate()
+
         await _ws._respond(ws, req_id, updated)
         await _ws._broadcast("cluster_updated", updated)
     finally:
@@ -0,0 +1,132 @@
+"""Generated config status WebSocket handlers."""
+import asyncio
+import logging
+from collections import Counter
+from fastapi import WebSocket
+
+import app.api.ws_handler as _ws
+
+logger = logging.getLogger(__name__)
+
+
+def _config_status_sync(devices) -> dict:
+    from app.services.config_generator import ConfigGenerator
+    from app.services.ipxe_generator import IPXEGenerator
+
+    generator = ConfigGenerator()
+    states = generator.config_states(devices)
+    entries = generator.manifest.entries()
+    rows = [{
+        "id": d.id,
+        "mac_address": d.mac_address,
+        "hostname": d.hostname,
+        "state": states[d.mac_address],
+        "generated_at": (entries.get(d.mac_address) or {}).get("generated_at"),
+    } for d in devices]
+
+    ipxe = IPXEGenerator()
+    boot_ipxe = ipxe.manifest.state("boot.ipxe", ipxe.output_dir / "boot.ipxe")
+    return {
+        "devices": rows,
+        "summary": dict(Counter(states.values())),
+        "boot_ipxe": boot_ipxe,
+    }
+
+
+async def _configs_status(params: dict, ws: WebSocket, req_id: str):
+    """Report, per approved device, whether its generated config is current.
+
+    States come from the config manifest and are computed without
+    rendering: "stale" means settings or the device changed since the
+    config was written, "drifted" that the file was changed on disk.
+    """
+    db = _ws._db()
+    try:
+        from app.crud import device as device_crud
+        from app.db.models import DeviceStatus
+        devices = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, limit=1000)
+        result = await asyncio.to_thread(_config_status_sync, devices)
+        await _ws._respond(ws, req_id, result)
+    except Exception as e:
+        logger.error(f"Config status failed: {e}")
+        await _ws._respond(ws, req_id, error=str(e))
+    finally:
+        db.close()
+
+
+async def _proposed_install_image(db, params: dict):
+    """Install image for proposed system extensions / Talos version, as talos.update resolves it.
+
+    Returns (install_image or None if unaffected, warning or None).
+    """
+    if "system_extensions" not in params and "talos_version" not in params:
+        return None, None
+
+    import json
+    from app.crud import cluster as cluster_crud
+    from app.crud import network as network_crud
+    from app.services.factory_service import build_factory_installer_url, resolve_install_image
+
+    cs = cluster_crud.get_cluster_settings(db)
+    ns = network_crud.get_network_settings(db)
+    talos_version = (params.get("talos_version") or (cs.talos_version if cs else None)
+                     or (ns.talos_version if ns else None) or "1.12.2")
+    current = []
+    if cs and cs.system_extensions:
+        try:
+            current = json.loads(cs.system_extensions)
+        except ValueError:
+            pass
+    extensions = params.get("system_extensions", current) or []
+
+    if sorted(extensions) == sorted(current) and cs and cs.factory_schematic_id:
+        return build_factory_installer_url(cs.factory_schematic_id, talos_version), None
+    install_image, error = await resolve_install_image(extensions, talos_version)
+    return install_image, f"Factory API: {error} (previewing the fallback installer)" if error else None
+
+
+async def _configs_preview(params: dict, ws: WebSocket, req_id: str):
+    """Dry-run a settings change: which device configs would change, and how.
+
+    Params are the proposed settings (``kubernetes_version``, ``cni``,
+    ``install_image``, ``system_extensions``, ``talos_version``,
+    ``kernel_modules``, ``volumes``) plus optional ``device_ids``.
+    Nothing is written.
+    """
+    db = _ws._db()
+    try:
+        from app.crud import device as device_crud
+        from app.db.models import DeviceStatus
+        from app.services.config_generator import ConfigGenerator
+        from app.services.config_preview import preview_configs
+
+        params = dict(params)
+        device_ids = params.pop("device_ids", None)
+        overrides = {k: v for k, v in params.items() if k not in ("system_extensions", "talos_version")}
+        install_image, warning = await _proposed_install_image(db, params)
+        if install_image and "install_image" not in overrides:
+            overrides["install_image"] = install_image
+
+        devices = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, limit=1000)
+        if device_ids is not None:
+            wanted = set(device_ids)
+            devices = [d for d in devices if d.id in wanted]
+
+        try:
+            result = await asyncio.to_thread(preview_configs, ConfigGenerator(), devices, overrides)
+        except ValueError as e:
+            return await _ws._respond(ws, req_id, error=str(e))
+        result["settings"] = overrides
+        result["warnings"] = [warning] if warning else []
+        await _ws._respond(ws, req_id, result)
+    except Exception as e:
+        logger.error(f"Config preview failed: {e}")
+        await _ws._respond(ws, req_id, error=str(e))
+    finally:
+        db.close()
+
+
+CONFIGS_ACTIONS = {
+    "configs.status": _configs_status,
+    "configs.preview": _configs_preview,
+}
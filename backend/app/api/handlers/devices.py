@@ -3,15 +3,16 @@
 import asyncio
 import json
 import logging
+import os
 import socket
 import struct
-import traceback
 from pathlib import Path
 from typing import Optional
 
 from fastapi import WebSocket
 
 import app.api.ws_handler as _ws
+from app.services import instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +101,9 @@ async def _devices_update(params: dict, ws: WebSocket, req_id: str):
             json.dumps({"mac": updated.mac_address, "hostname": updated.hostname, "changes": params}),
             "device", str(device_id))
 
+        from app.services.credentials_service import credentials_service
+        credentials_service.invalidate()
+
         await _ws._respond(ws, req_id, updated)
         await _ws._broadcast("device_updated", updated)
     finally:
@@ -247,6 +251,8 @@ async def _devices_approve(params: dict, ws: WebSocket, req_id: str):
                 update_talosconfig_endpoint_and_node(cp_ip)
             except Exception as e:
                 logger.warning(f"Error updating talosconfig: {e}")
+            from app.services.credentials_service import credentials_service
+            credentials_service.invalidate()
 
         await _ws.log_action(db, "approved_device", "Device Management",
             json.dumps({"mac": device.mac_address, "hostname": device.hostname, "role": device.role.value, "ip": device.ip_address}),
@@ -298,6 +304,9 @@ async def _devices_delete(params: dict, ws: WebSocket, req_id: str):
         if not success:
             return await _ws._respond(ws, req_id, error="Device not found")
 
+        from app.services.credentials_service import credentials_service
+        credentials_service.invalidate()
+
         await _ws.log_action(db, "deleted_device", "Device Management",
             json.dumps({"mac": mac, "hostname": hostname}), "device", str(device_id))
 
@@ -363,19 +372,9 @@ async def _devices_shutdown(params: dict, ws: WebSocket, req_id: str):
         talosctl = find_talosctl()
         talosconfig = str(get_templates_base_dir() / "talosconfig")
 
-        proc = await asyncio.create_subprocess_exec(
-            talosctl, "shutdown",
-            "--talosconfig", talosconfig,
-            "--nodes", ip,
-            "--endpoints", ip,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
-
-        if proc.returncode != 0:
-            err_msg = stderr.decode().strip() or stdout.decode().strip()
-            return await _ws._respond(ws, req_id, error=f"Shutdown failed: {err_msg}")
+        returncode, stdout, stderr = await _talosctl_power(talosctl, talosconfig, ip, "shutdown")
+        if returncode != 0:
+            return await _ws._respond(ws, req_id, error=f"Shutdown failed: {stderr or stdout}")
 
         name = device.hostname or device.mac_address
         await _ws.log_action(db, "shutdown_device", "Device Management",
@@ -399,8 +398,6 @@ async def _devices_shutdown(params: dict, ws: WebSocket, req_id: str):
 
 async def _devices_wake(params: dict, ws: WebSocket, req_id: str):
     """Send a Wake-on-LAN magic packet to a device."""
-    import socket
-    import struct
     db = _ws._db()
     try:
         from app.crud import device as crud
@@ -412,18 +409,13 @@ async def _devices_wake(params: dict, ws: WebSocket, req_id: str):
         if not device.mac_address:
             return await _ws._respond(ws, req_id, error="Device has no MAC address")
 
-        # Parse MAC address
-        mac_str = device.mac_address.replace(":", "").replace("-", "")
-        if len(mac_str) != 12:
-            return await _ws._respond(ws, req_id, error=f"Invalid MAC address: {device.mac_address}")
-        mac_bytes = bytes.fromhex(mac_str)
-
-        # Build magic packet: 6 bytes of 0xFF + MAC repeated 16 times
-        magic = b'\xff' * 6 + mac_bytes * 16
+        try:
+            magic = _wol_packet(device.mac_address)
+        except ValueError as e:
+            return await _ws._respond(ws, req_id, error=str(e))
 
         # Send to broadcast on port 9
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock = _wol_socket()
         sock.sendto(magic, ('255.255.255.255', 9))
         sock.close()
 
@@ -467,21 +459,9 @@ async def _devices_reboot(params: dict, ws: WebSocket, req_id: str):
         talosctl = find_talosctl()
         talosconfig = str(get_templates_base_dir() / "talosconfig")
 
-        proc = await _asyncio.create_subprocess_exec(
-            talosctl, "reboot",
-            "--mode", "powercycle",
-            "--wait=false",
-            "--talosconfig", talosconfig,
-            "--nodes", ip,
-            "--endpoints", ip,
-            stdout=_asyncio.subprocess.PIPE,
-            stderr=_asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await _asyncio.wait_for(proc.communicate(), timeout=30)
-
-        if proc.returncode != 0:
-            err_msg = stderr.decode().strip() or stdout.decode().strip()
-            return await _ws._respond(ws, req_id, error=f"Reboot failed: {err_msg}")
+        returncode, stdout, stderr = await _talosctl_power(talosctl, talosconfig, ip, "reboot")
+        if returncode != 0:
+            return await _ws._respond(ws, req_id, error=f"Reboot failed: {stderr or stdout}")
 
         name = device.hostname or device.mac_address
         await _ws.log_action(db, "reboot_device", "Device Management",
@@ -503,20 +483,260 @@ async def _devices_reboot(params: dict, ws: WebSocket, req_id: str):
         db.close()
 
 
+# ---------------------------------------------------------------------------
+# Bulk power operations — reboot, shutdown or wake many nodes at once
+# ---------------------------------------------------------------------------
+
+POWER_ACTIONS = ("reboot", "shutdown", "wake")
+POWER_BULK_CONCURRENCY = 8
+POWER_BULK_STAGGER = 0.5  # seconds between node starts, so PSUs don't all inrush together
+_power_bulk_tasks = set()
+
+
+def _positive_int(value) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else None
+
+
+def _wol_packet(mac_address: str) -> bytes:
+    """Wake-on-LAN magic packet: 6 bytes of 0xFF + MAC repeated 16 times."""
+    mac_str = mac_address.replace(":", "").replace("-", "")
+    if len(mac_str) != 12:
+        raise ValueError(f"Invalid MAC address: {mac_address}")
+    return b'\xff' * 6 + bytes.fromhex(mac_str) * 16
+
+
+def _wol_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    return sock
+
+
+async def _talosctl_power(talosctl: str, talosconfig: str, ip: str, action: str) -> tuple:
+    """Run ``talosctl reboot|shutdown`` against one node. Returns (returncode, stdout, stderr)."""
+    mode_args = ["--mode", "powercycle", "--wait=false"] if action == "reboot" else []
+    proc = await instrumentation.create_subprocess_exec(
+        talosctl, action, *mode_args,
+        "--talosconfig", talosconfig,
+        "--nodes", ip,
+        "--endpoints", ip,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
+    return proc.returncode, stdout.decode().strip(), stderr.decode().strip()
+
+
+def _select_devices(devices: list, params: dict) -> list:
+    """Devices matching every selector given in ``params``.
+
+    Selectors: device_ids (list), role, status, hostname (glob pattern,
+    e.g. "worker-*", also matched against the MAC).
+    """
+    from fnmatch import fnmatch
+
+    device_ids = params.get("device_ids")
+    role = params.get("role")
+    status = params.get("status")
+    pattern = params.get("hostname")
+
+    selected = []
+    for d in devices:
+        if device_ids is not None and d.id not in device_ids:
+            continue
+        if role and d.role.value != role:
+            continue
+        if status and d.status.value != status:
+            continue
+        if pattern and not (fnmatch(d.hostname or "", pattern) or fnmatch(d.mac_address, pattern)):
+            continue
+        selected.append(d)
+    return selected
+
+
+async def _do_power_bulk(action: str, targets: list, concurrency: int, stagger: float, operation_id: str):
+    """Background: run ``action`` on every target, broadcasting each node's result."""
+    from app.api.cluster_router import find_talosctl, get_templates_base_dir
+
+    total = len(targets)
+    results = []
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    pacing = asyncio.Lock()
+    next_start = loop.time()
+
+    # Resolve the tool up front: if it is missing, every target fails the same way
+    sock = None
+    setup_error = None
+    try:
+        if action == "wake":
+            sock = _wol_socket()
+        else:
+            talosctl = find_talosctl()
+            talosconfig = str(get_templates_base_dir() / "talosconfig")
+    except FileNotFoundError:
+        setup_error = "talosctl not found on server"
+    except OSError as e:
+        setup_error = str(e)
+
+    async def _one(index: int, dev: dict):
+        nonlocal next_start
+        error = dev.get("skip") or setup_error
+        if error is None:
+            async with slots:
+                async with pacing:
+                    delay = next_start - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_start = loop.time() + stagger
+
+                try:
+                    if action == "wake":
+                        sock.sendto(_wol_packet(dev["mac_address"]), ('255.255.255.255', 9))
+                    else:
+                        returncode, stdout, stderr = await _talosctl_power(
+                            talosctl, talosconfig, dev["ip_address"], action)
+                        if returncode != 0:
+                            error = f"{action.capitalize()} failed: {stderr or stdout}"
+                except asyncio.TimeoutError:
+                    error = f"{action.capitalize()} command timed out"
+                except (OSError, ValueError) as e:
+                    error = str(e)
+
+        result = {
+            "device_id": dev["id"], "hostname": dev["hostname"], "mac_address": dev["mac_address"],
+            "ok": error is None, "skipped": "skip" in dev, "error": error,
+        }
+        results.append(result)
+        await _ws._broadcast("device_power_result", {
+            "operation_id": operation_id, "action": action,
+            "index": index, "total": total, **result,
+        })
+
+    try:
+        await asyncio.gather(*(_one(i, dev) for i, dev in enumerate(targets)))
+    finally:
+        if sock is not None:
+            sock.close()
+
+    summary = {
+        "operation_id": operation_id,
+        "action": action,
+        "total": total,
+        "succeeded": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"] and not r["skipped"]),
+        "skipped": sum(1 for r in results if r["skipped"]),
+    }
+    db = _ws._db()
+    try:
+        await _ws.log_action(db, f"power_bulk_{action}", "Device Management",
+            json.dumps({**summary, "devices": [
+                {k: r[k] for k in ("hostname", "mac_address", "ok", "error")} for r in results]}),
+            "device", "bulk")
+    finally:
+        db.close()
+    await _ws._broadcast("device_power_complete", summary)
+
+
+async def _devices_power_bulk(params: dict, ws: WebSocket, req_id: str):
+    """Reboot, shut down or wake many devices at once.
+
+    Params:
+      action: 'reboot', 'shutdown' or 'wake'
+      device_ids / role / status / hostname: selectors, combined with AND (at least one)
+      concurrency: nodes acted on at once (default 8)
+      stagger: minimum seconds between node starts (default 0.5)
+
+    Responds with the selected devices; each node's outcome is broadcast as
+    ``device_power_result`` and the totals as ``device_power_complete``.
+    """
+    action = params.get("action")
+    if action not in POWER_ACTIONS:
+        return await _ws._respond(ws, req_id, error=f"Invalid action: {action}")
+    if not any(params.get(k) is not None for k in ("device_ids", "role", "status", "hostname")):
+        return await _ws._respond(ws, req_id, error="At least one selector is required")
+
+    concurrency = params.get("concurrency", POWER_BULK_CONCURRENCY)
+    if _positive_int(concurrency) is None:
+        return await _ws._respond(ws, req_id, error="concurrency must be a positive integer")
+    stagger = params.get("stagger", POWER_BULK_STAGGER)
+    if not isinstance(stagger, (int, float)) or isinstance(stagger, bool) or not 0 <= stagger <= 60:
+        return await _ws._respond(ws, req_id, error="stagger must be between 0 and 60 seconds")
+
+    db = _ws._db()
+    try:
+        from app.crud import device as crud
+        from app.db.models import DeviceStatus
+
+        selected = _select_devices(crud.get_devices(db, 0, 1000), params)
+        if not selected:
+            return await _ws._respond(ws, req_id, error="No devices match the selection")
+
+        targets = []
+        for d in selected:
+            ip = d.ip_address.split('/')[0] if d.ip_address and '/' in d.ip_address else d.ip_address
+            target = {"id": d.id, "hostname": d.hostname or d.mac_address,
+                      "mac_address": d.mac_address, "ip_address": ip}
+            if action != "wake" and d.status != DeviceStatus.APPROVED:
+                target["skip"] = f"Can only {action} approved devices"
+            elif action != "wake" and not ip:
+                target["skip"] = "Device has no IP address"
+            targets.append(target)
+    finally:
+        db.close()
+
+    operation_id = req_id or f"power-{action}"
+    await _ws._respond(ws, req_id, {
+        "message": f"{action.capitalize()} started for {len(targets)} device(s)",
+        "operation_id": operation_id,
+        "devices": [{k: t[k] for k in ("id", "hostname", "mac_address")} for t in targets],
+    })
+
+    task = asyncio.create_task(_do_power_bulk(action, targets, concurrency, float(stagger), operation_id))
+    _power_bulk_tasks.add(task)
+    task.add_done_callback(_power_bulk_tasks.discard)
+
+
 # ---------------------------------------------------------------------------
 # Rolling refresh — Worker node wipe & reinstall
 # Supports: sequential (one at a time), parallel (N at a time), all_at_once (no drain)
+# The plan, disruption budget and per-node journal live in
+# app/services/rolling_refresh.py; this is the per-node pipeline it runs.
 # ---------------------------------------------------------------------------
 
-_rolling_refresh_active = False
-_rolling_refresh_cancel = False
-_rolling_refresh_state = {}  # varies by mode
+# Pipeline steps in order. A refresh resumed after a restart re-enters a node
+# at the last step it journaled, so every step must be safe to repeat.
+REFRESH_STEPS = (
+    "draining", "setting_wipe", "rebooting", "waiting_for_boot",
+    "waiting_for_kubernetes", "finalizing", "configuring_storage",
+)
+
+# How long a drain may keep retrying evictions refused by a PodDisruptionBudget
+DRAIN_TIMEOUT = int(os.getenv("ROLLING_REFRESH_DRAIN_TIMEOUT", "900"))
+DRAIN_RETRY_INTERVAL = 30
+# How long a rebooted node may keep answering before we wait for it to boot anyway
+REBOOT_DOWN_TIMEOUT = 60
+
+
+def _refresh_tools() -> tuple:
+    """(kubectl, kubeconfig, talosctl, talosconfig) for the refresh pipeline."""
+    from app.api.cluster_router import find_talosctl, get_templates_base_dir
+
+    return (
+        _ws._find_kubectl(),
+        str(Path.home() / ".kube" / "config"),
+        find_talosctl(),
+        str(get_templates_base_dir() / "talosconfig"),
+    )
 
 
 async def _kubectl_drain(kubectl: str, kubeconfig: str, hostname: str) -> tuple:
-    """Cordon and drain a Kubernetes node. Returns (success, message)."""
+    """Cordon and drain a Kubernetes node. Returns (success, message).
+
+    Pods are removed through the eviction API, so PodDisruptionBudgets are
+    honoured: a drain they block fails with "disruption budget" in the message.
+    """
     # Cordon
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "cordon", hostname, "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
     )
@@ -527,7 +747,7 @@ async def _kubectl_drain(kubectl: str, kubeconfig: str, hostname: str) -> tuple:
         return False, f"Cordon failed: {err}"
 
     # Drain
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "drain", hostname,
         "--ignore-daemonsets", "--delete-emptydir-data", "--force",
         "--timeout=120s", "--kubeconfig", kubeconfig,
@@ -542,64 +762,94 @@ async def _kubectl_drain(kubectl: str, kubeconfig: str, hostname: str) -> tuple:
     return True, "Drained successfully"
 
 
+def _blocked_by_pdb(message: str) -> bool:
+    """Whether a drain failed because an eviction would violate a PodDisruptionBudget."""
+    return "disruption budget" in (message or "").lower()
+
+
 async def _kubectl_uncordon(kubectl: str, kubeconfig: str, hostname: str):
     """Uncordon a Kubernetes node."""
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "uncordon", hostname, "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
     )
     await asyncio.wait_for(proc.communicate(), timeout=30)
 
 
+async def _count_unavailable_workers(kubectl: str, kubeconfig: str, exclude: set) -> int:
+    """Worker nodes that are NotReady or cordoned, ignoring ``exclude``.
+
+    Counted against the rolling refresh's disruption budget. Returns 0 when
+    the cluster can't be queried, so a missing kubectl doesn't stall a refresh.
+    """
+    if not kubectl:
+        return 0
+    try:
+        proc = await instrumentation.create_subprocess_exec(
+            kubectl, "get", "nodes", "-o", "json", "--kubeconfig", kubeconfig,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30)
+        if proc.returncode != 0:
+            return 0
+        nodes = json.loads(stdout.decode() or "{}").get("items", [])
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        logger.warning(f"Could not list nodes for the disruption budget: {e}")
+        return 0
+
+    unavailable = 0
+    for node in nodes:
+        name = node.get("metadata", {}).get("name")
+        labels = node.get("metadata", {}).get("labels", {})
+        if name in exclude or "node-role.kubernetes.io/control-plane" in labels:
+            continue
+        ready = any(c.get("type") == "Ready" and c.get("status") == "True"
+                    for c in node.get("status", {}).get("conditions", []))
+        if not ready or node.get("spec", {}).get("unschedulable"):
+            unavailable += 1
+    return unavailable
+
+
 async def _wait_for_node_boot(ip: str, timeout: int = 600) -> bool:
-    """Wait for a node to boot (ping + Talos API). Returns True if up within timeout."""
-    from app.services.health_checker import _check_ping, _check_talos_api
+    """Wait for a node to boot (Talos API reachable). Returns True if up within timeout."""
+    from app.services.health_checker import wait_for_talos_api
 
-    elapsed = 0
-    interval = 15
-    while elapsed < timeout:
-        ping_ok = await _check_ping(ip)
-        talos_ok = await _check_talos_api(ip)
-        if ping_ok and talos_ok:
-            return True
-        await asyncio.sleep(interval)
-        elapsed += interval
-    return False
+    return await wait_for_talos_api(ip, up=True, timeout=timeout)
 
 
 async def _wait_for_node_ready(kubectl: str, kubeconfig: str, hostname: str, timeout: int = 300) -> bool:
-    """Wait for a Kubernetes node to become Ready. Returns True if ready within timeout."""
-    elapsed = 0
-    interval = 15
-    while elapsed < timeout:
-        proc = await asyncio.create_subprocess_exec(
-            kubectl, "get", "node", hostname,
-            "-o", "jsonpath={.status.conditions[?(@.type==\"Ready\")].status}",
-            "--kubeconfig", kubeconfig,
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
-        if proc.returncode == 0 and stdout.decode().strip() == "True":
-            return True
-        await asyncio.sleep(interval)
-        elapsed += interval
-    return False
+    """Wait for a Kubernetes node to become Ready. Returns True if ready within timeout.
+
+    Watches the node, so this returns as soon as its Ready condition flips.
+    """
+    from app.services.kube_watch import watch_until
+
+    return await watch_until(
+        kubectl, kubeconfig,
+        ["nodes", "--field-selector", f"metadata.name={hostname}"],
+        '{.status.conditions[?(@.type=="Ready")].status}{"\\n"}',
+        lambda status: status == "True",
+        timeout,
+    )
 
 
 async def _refresh_single_node(
-    idx: int, dev: dict, total: int,
+    dev: dict,
     kubectl: str, kubeconfig: str, talosctl: str, talosconfig: str,
+    progress,
     skip_drain: bool = False,
+    start_step: str = "draining",
 ) -> bool:
-    """Refresh a single worker node through the full 7-step pipeline.
+    """Refresh a single worker node through the pipeline in REFRESH_STEPS.
 
-    Broadcasts per-node progress events with node_index.
+    ``progress(step, message)`` is awaited on every step (the orchestrator
+    journals and broadcasts it). ``start_step`` resumes an interrupted node.
     Returns True on success, False on failure.
     """
-    global _rolling_refresh_state
-
     from app.crud import device as device_crud
     from app.schemas.device import DeviceUpdate
+    from app.services.health_checker import wait_for_talos_api
+    from app.services.kube_watch import watch_until
 
     from app.api.handlers.longhorn import (
         _longhorn_reset_disks_after_wipe,
@@ -611,106 +861,111 @@ async def _refresh_single_node(
     device_id = dev["id"]
     hostname = dev["hostname"]
     ip = dev["ip_address"]
+    steps = REFRESH_STEPS[REFRESH_STEPS.index(start_step):]
 
-    def _update_node_state(step, message=""):
-        if "node_states" in _rolling_refresh_state:
-            _rolling_refresh_state["node_states"][idx] = {"device": dev, "step": step, "message": message}
-
-    async def _progress(step, message):
-        _update_node_state(step, message)
-        await _ws._broadcast("rolling_refresh_progress", {
-            "node_index": idx, "total": total, "device": dev,
-            "step": step, "message": message,
-        })
+    async def _fail(message, error):
+        await progress("failed", message)
+        await _ws._broadcast("rolling_refresh_error", {"device": dev, "error": error})
+        return False
 
-    # Step 1: Drain (skipped in all-at-once mode)
-    if not skip_drain:
-        await _progress("draining", f"Draining pods from {hostname}...")
+    async def _set_wipe_flag(wipe: bool):
+        # update_device re-renders this node's config and boot.ipxe (which
+        # carries the per-MAC wipe flag); no other node's config changes.
+        db = _ws._db()
+        try:
+            await asyncio.to_thread(device_crud.update_device, db, device_id,
+                                    DeviceUpdate(wipe_on_next_boot=wipe))
+        finally:
+            db.close()
+
+    # Step 1: Drain (skipped in all-at-once mode), waiting out PDBs
+    if "draining" in steps and not skip_drain:
+        await progress("draining", f"Draining pods from {hostname}...")
         if kubectl:
-            drain_ok, drain_msg = await _kubectl_drain(kubectl, kubeconfig, hostname)
+            deadline = asyncio.get_running_loop().time() + DRAIN_TIMEOUT
+            while True:
+                drain_ok, drain_msg = await _kubectl_drain(kubectl, kubeconfig, hostname)
+                if drain_ok or not _blocked_by_pdb(drain_msg):
+                    break
+                if asyncio.get_running_loop().time() >= deadline:
+                    await _kubectl_uncordon(kubectl, kubeconfig, hostname)
+                    return await _fail(
+                        f"Drain of {hostname} blocked by a PodDisruptionBudget",
+                        f"PodDisruptionBudget did not allow draining within {DRAIN_TIMEOUT}s")
+                await progress("draining", f"Waiting for a PodDisruptionBudget to allow evictions from {hostname}...")
+                await asyncio.sleep(DRAIN_RETRY_INTERVAL)
             if not drain_ok:
                 logger.warning(f"Drain warning for {hostname}: {drain_msg}")
         else:
             logger.warning("kubectl not found, skipping drain")
 
-    # Step 2: Set wipe flag and regenerate configs
-    await _progress("setting_wipe", f"Setting wipe flag on {hostname}...")
-    db = _ws._db()
-    try:
-        device_crud.update_device(db, device_id, DeviceUpdate(wipe_on_next_boot=True))
-        await asyncio.to_thread(_ws._regenerate_all_device_configs, db)
-    finally:
-        db.close()
+    # Step 2: Set wipe flag and regenerate this node's config
+    if "setting_wipe" in steps:
+        await progress("setting_wipe", f"Setting wipe flag on {hostname}...")
+        await _set_wipe_flag(True)
 
     # Step 3: Reboot
-    await _progress("rebooting", f"Rebooting {hostname}...")
-    proc = await asyncio.create_subprocess_exec(
-        talosctl, "reboot",
-        "--mode", "powercycle", "--wait=false",
-        "--talosconfig", talosconfig,
-        "--nodes", ip, "--endpoints", ip,
-        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
-    )
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
-    if proc.returncode != 0:
-        err = stderr.decode().strip()
-        logger.error(f"Reboot failed for {hostname}: {err}")
-        await _progress("failed", f"Reboot failed: {err}")
-        await _ws._broadcast("rolling_refresh_error", {"device": dev, "error": f"Reboot failed: {err}"})
-        return False
+    if "rebooting" in steps:
+        await progress("rebooting", f"Rebooting {hostname}...")
+        proc = await instrumentation.create_subprocess_exec(
+            talosctl, "reboot",
+            "--mode", "powercycle", "--wait=false",
+            "--talosconfig", talosconfig,
+            "--nodes", ip, "--endpoints", ip,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
+        if proc.returncode != 0:
+            err = stderr.decode().strip()
+            logger.error(f"Reboot failed for {hostname}: {err}")
+            return await _fail(f"Reboot failed: {err}", f"Reboot failed: {err}")
 
     # Step 4: Wait for boot
-    await _progress("waiting_for_boot", f"Waiting for {hostname} to boot...")
-    await asyncio.sleep(30)  # Give the node time to actually go down
-    booted = await _wait_for_node_boot(ip, timeout=600)
-    if not booted:
-        await _progress("failed", f"{hostname} did not come back within timeout")
-        await _ws._broadcast("rolling_refresh_error", {"device": dev, "error": "Node did not boot within 10 minutes"})
-        return False
+    if "waiting_for_boot" in steps:
+        await progress("waiting_for_boot", f"Waiting for {hostname} to boot...")
+        if "rebooting" in steps:
+            # Don't mistake the node for booted before it has gone down
+            if not await wait_for_talos_api(ip, up=False, timeout=REBOOT_DOWN_TIMEOUT):
+                logger.warning(f"{hostname} still answered {REBOOT_DOWN_TIMEOUT}s after reboot")
+        booted = await _wait_for_node_boot(ip, timeout=600)
+        if not booted:
+            return await _fail(f"{hostname} did not come back within timeout",
+                               "Node did not boot within 10 minutes")
 
     # Step 5: Wait for Kubernetes readiness
-    if kubectl:
-        await _progress("waiting_for_kubernetes", f"Waiting for {hostname} to join cluster...")
+    if "waiting_for_kubernetes" in steps and kubectl:
+        await progress("waiting_for_kubernetes", f"Waiting for {hostname} to join cluster...")
         ready = await _wait_for_node_ready(kubectl, kubeconfig, hostname, timeout=300)
         if not ready:
-            await _progress("failed", f"{hostname} did not become Ready within timeout")
-            await _ws._broadcast("rolling_refresh_error", {"device": dev, "error": "Node not Ready within 5 minutes"})
-            return False
+            return await _fail(f"{hostname} did not become Ready within timeout",
+                               "Node not Ready within 5 minutes")
 
-        # Step 6: Uncordon
-        await _kubectl_uncordon(kubectl, kubeconfig, hostname)
-
-    # Step 7: Clear wipe flag and regenerate configs
-    db = _ws._db()
-    try:
-        device_crud.update_device(db, device_id, DeviceUpdate(wipe_on_next_boot=False))
-        await asyncio.to_thread(_ws._regenerate_all_device_configs, db)
-    finally:
-        db.close()
+    # Step 6: Uncordon, clear wipe flag and regenerate this node's config
+    if "finalizing" in steps:
+        await progress("finalizing", f"Uncordoning {hostname} and clearing wipe flag...")
+        if kubectl:
+            await _kubectl_uncordon(kubectl, kubeconfig, hostname)
+        await _set_wipe_flag(False)
 
-    # Step 8: Post-provisioning Longhorn disk reset + auto-add
+    # Step 7: Post-provisioning Longhorn disk reset + auto-add
     # After a wipe, Longhorn disk entries have stale UUIDs — reset them
     _kubectl = _ws._find_kubectl()
     _kc = str(Path.home() / ".kube" / "config")
-    longhorn_node_ready = False
-
-    # Wait for Longhorn node CRD to appear (poll up to 2 min)
-    await _progress("configuring_storage", f"Waiting for Longhorn on {hostname}...")
-    for _attempt in range(24):
-        proc = await asyncio.create_subprocess_exec(
-            _kubectl, "get", "nodes.longhorn.io", hostname, "-n", _LONGHORN_NS,
-            "--kubeconfig", _kc,
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
-        )
-        await asyncio.wait_for(proc.communicate(), timeout=15)
-        if proc.returncode == 0:
-            longhorn_node_ready = True
-            break
-        await asyncio.sleep(5)
+
+    # Wait for the Longhorn node CRD to appear (up to 2 min; returns at once if
+    # Longhorn is not installed and the resource type does not exist)
+    await progress("configuring_storage", f"Waiting for Longhorn on {hostname}...")
+    longhorn_node_ready = await watch_until(
+        _kubectl, _kc,
+        ["nodes.longhorn.io", "-n", _LONGHORN_NS, "--field-selector", f"metadata.name={hostname}"],
+        '{.metadata.name}{"\\n"}',
+        lambda name: name == hostname,
+        120,
+    )
 
     if longhorn_node_ready:
         # Reset existing disks to avoid UUID mismatch after wipe
-        await _progress("configuring_storage", f"Resetting Longhorn disks on {hostname}...")
+        await progress("configuring_storage", f"Resetting Longhorn disks on {hostname}...")
         try:
             await _longhorn_reset_disks_after_wipe(hostname)
         except Exception as e:
@@ -719,147 +974,33 @@ async def _refresh_single_node(
         # Auto-add additional disks if configured
         auto_config = _load_longhorn_auto_config()
         if auto_config.get(hostname, {}).get("auto_add_disks"):
-            await _progress("configuring_storage", f"Auto-adding disks on {hostname}...")
+            await progress("configuring_storage", f"Auto-adding disks on {hostname}...")
             added, err = await _longhorn_use_all_disks_for_node(hostname)
             if err:
                 logger.warning(f"Longhorn auto-add failed for {hostname}: {err}")
             elif added > 0:
                 logger.info(f"Longhorn auto-added {added} disk(s) on {hostname}")
     else:
-        logger.warning(f"Longhorn node CRD not found for {hostname} after 2 min, skipping disk reset")
+        logger.warning(f"Longhorn node CRD not found for {hostname} (not installed, or not ready after 2 min), "
+                       f"skipping disk reset")
 
-    await _progress("completed", f"{hostname} refreshed successfully")
+    await progress("completed", f"{hostname} refreshed successfully")
     return True
 
 
-async def _do_sequential_refresh(devices: list):
-    """Background: sequentially wipe and reinstall worker nodes (one at a time)."""
-    global _rolling_refresh_active, _rolling_refresh_cancel, _rolling_refresh_state
-
-    from app.api.cluster_router import find_talosctl, get_templates_base_dir
-
-    total = len(devices)
-    succeeded = 0
-    failed = 0
-
-    kubectl = _ws._find_kubectl()
-    kubeconfig = str(Path.home() / ".kube" / "config")
-    talosctl = find_talosctl()
-    talosconfig = str(get_templates_base_dir() / "talosconfig")
-
-    try:
-        for idx, dev in enumerate(devices):
-            if _rolling_refresh_cancel:
-                _rolling_refresh_state["node_states"][idx] = {"device": dev, "step": "cancelled", "message": "Cancelled"}
-                await _ws._broadcast("rolling_refresh_complete", {
-                    "total": total, "succeeded": succeeded, "failed": failed, "cancelled": True,
-                })
-                return
-
-            success = await _refresh_single_node(idx, dev, total, kubectl, kubeconfig, talosctl, talosconfig)
-            if success:
-                succeeded += 1
-            else:
-                failed += 1
-                break  # Stop on failure in sequential mode
-
-            _rolling_refresh_state["succeeded"] = succeeded
-            _rolling_refresh_state["failed"] = failed
-
-        await _ws._broadcast("rolling_refresh_complete", {
-            "total": total, "succeeded": succeeded, "failed": failed, "cancelled": False,
-        })
-
-    except Exception as e:
-        logger.error(f"Sequential refresh error: {e}\n{traceback.format_exc()}")
-        await _ws._broadcast("rolling_refresh_error", {"device": dev if 'dev' in dir() else None, "error": str(e)})
-        await _ws._broadcast("rolling_refresh_complete", {
-            "total": total, "succeeded": succeeded, "failed": failed + 1, "cancelled": False,
-        })
-    finally:
-        _rolling_refresh_active = False
-        _rolling_refresh_cancel = False
-        _rolling_refresh_state = {}
-
-
-async def _do_concurrent_refresh(devices: list, parallelism: int, skip_drain: bool = False):
-    """Background: refresh worker nodes concurrently with a concurrency limit.
-
-    Used for both 'parallel' mode (with drain, limited concurrency) and
-    'all_at_once' mode (no drain, unlimited concurrency).
-    """
-    global _rolling_refresh_active, _rolling_refresh_cancel, _rolling_refresh_state
-
-    from app.api.cluster_router import find_talosctl, get_templates_base_dir
-
-    total = len(devices)
-    results = {}  # idx -> bool
-
-    kubectl = _ws._find_kubectl()
-    kubeconfig = str(Path.home() / ".kube" / "config")
-    talosctl = find_talosctl()
-    talosconfig = str(get_templates_base_dir() / "talosconfig")
-
-    sem = asyncio.Semaphore(parallelism)
-
-    async def _run_one(idx, dev):
-        if _rolling_refresh_cancel:
-            _rolling_refresh_state["node_states"][idx] = {"device": dev, "step": "cancelled", "message": "Cancelled"}
-            results[idx] = False
-            return
-        async with sem:
-            if _rolling_refresh_cancel:
-                _rolling_refresh_state["node_states"][idx] = {"device": dev, "step": "cancelled", "message": "Cancelled"}
-                results[idx] = False
-                return
-            try:
-                success = await _refresh_single_node(
-                    idx, dev, total, kubectl, kubeconfig, talosctl, talosconfig,
-                    skip_drain=skip_drain,
-                )
-                results[idx] = success
-            except Exception as e:
-                logger.error(f"Concurrent refresh error for {dev['hostname']}: {e}")
-                results[idx] = False
-                _rolling_refresh_state["node_states"][idx] = {"device": dev, "step": "failed", "message": str(e)}
-                await _ws._broadcast("rolling_refresh_error", {"device": dev, "error": str(e)})
-
-    try:
-        tasks = [asyncio.create_task(_run_one(i, d)) for i, d in enumerate(devices)]
-        await asyncio.gather(*tasks, return_exceptions=True)
-
-        succeeded = sum(1 for v in results.values() if v)
-        failed = sum(1 for v in results.values() if not v)
-
-        await _ws._broadcast("rolling_refresh_complete", {
-            "total": total, "succeeded": succeeded, "failed": failed,
-            "cancelled": _rolling_refresh_cancel,
-        })
-
-    except Exception as e:
-        logger.error(f"Concurrent refresh error: {e}\n{traceback.format_exc()}")
-        succeeded = sum(1 for v in results.values() if v)
-        failed = sum(1 for v in results.values() if not v)
-        await _ws._broadcast("rolling_refresh_complete", {
-            "total": total, "succeeded": succeeded, "failed": failed + 1, "cancelled": False,
-        })
-    finally:
-        _rolling_refresh_active = False
-        _rolling_refresh_cancel = False
-        _rolling_refresh_state = {}
-
-
 async def _devices_rolling_refresh(params: dict, ws: WebSocket, req_id: str):
     """Start a rolling refresh of worker nodes.
 
     Params:
       mode: 'sequential' (default), 'parallel', or 'all_at_once'
-      parallelism: int (batch size for parallel mode, default 2)
+      parallelism: int (initial batch size for parallel mode, default 2)
+      max_unavailable: optional int, workers that may be down at once
+      max_unavailable_percent: optional int (1-100), the same as a share of all workers
       device_ids: optional list of specific device IDs
     """
-    global _rolling_refresh_active, _rolling_refresh_cancel, _rolling_refresh_state
+    from app.services.rolling_refresh import rolling_refresh
 
-    if _rolling_refresh_active:
+    if rolling_refresh.active:
         return await _ws._respond(ws, req_id, error="A rolling refresh is already in progress")
 
     mode = params.get("mode", "sequential")
@@ -869,16 +1010,24 @@ async def _devices_rolling_refresh(params: dict, ws: WebSocket, req_id: str):
     if mode == "parallel" and (not isinstance(parallelism, int) or parallelism < 2):
         parallelism = 2
 
+    max_unavailable = params.get("max_unavailable")
+    max_unavailable_percent = params.get("max_unavailable_percent")
+    if max_unavailable is not None and _positive_int(max_unavailable) is None:
+        return await _ws._respond(ws, req_id, error="max_unavailable must be a positive integer")
+    if max_unavailable_percent is not None and not (
+            _positive_int(max_unavailable_percent) and max_unavailable_percent <= 100):
+        return await _ws._respond(ws, req_id, error="max_unavailable_percent must be between 1 and 100")
+
     db = _ws._db()
     try:
         from app.crud import device as device_crud
         from app.db.models import DeviceStatus, DeviceRole
 
         all_devices = device_crud.get_devices(db, skip=0, limit=1000)
-        workers = [d for d in all_devices
-                   if d.status == DeviceStatus.APPROVED
-                   and d.role == DeviceRole.WORKER
-                   and d.ip_address]
+        fleet = [d for d in all_devices
+                 if d.status == DeviceStatus.APPROVED
+                 and d.role == DeviceRole.WORKER]
+        workers = [d for d in fleet if d.ip_address]
 
         device_ids = params.get("device_ids")
         if device_ids:
@@ -897,55 +1046,49 @@ async def _devices_rolling_refresh(params: dict, ws: WebSocket, req_id: str):
                 "ip_address": ip,
             })
 
-        _rolling_refresh_active = True
-        _rolling_refresh_cancel = False
-        _rolling_refresh_state = {
-            "total": len(device_list),
-            "mode": mode,
-            "parallelism": parallelism if mode == "parallel" else (len(device_list) if mode == "all_at_once" else 1),
-            "node_states": {i: {"device": d, "step": "pending", "message": "Waiting..."} for i, d in enumerate(device_list)},
-            "succeeded": 0,
-            "failed": 0,
-        }
+        try:
+            state = await rolling_refresh.start(
+                device_list, mode, parallelism,
+                max_unavailable=max_unavailable,
+                max_unavailable_percent=max_unavailable_percent,
+                fleet_size=len(fleet),
+            )
+        except RuntimeError as e:
+            return await _ws._respond(ws, req_id, error=str(e))
 
         mode_label = {"sequential": "sequential", "parallel": f"parallel (batch {parallelism})", "all_at_once": "all at once"}[mode]
         await _ws._respond(ws, req_id, {
-            "message": f"Rolling refresh started for {len(device_list)} worker node(s) — {mode_label}",
+            "message": f"Rolling refresh started for {len(device_list)} worker node(s) — {mode_label}, "
+                       f"at most {state['max_unavailable']} unavailable",
             "devices": device_list,
             "mode": mode,
+            "id": state["id"],
+            "max_unavailable": state["max_unavailable"],
         })
 
         await _ws.log_action(db, "rolling_refresh_started", "Device Management",
-            json.dumps({"count": len(device_list), "mode": mode, "devices": [d["hostname"] for d in device_list]}),
+            json.dumps({"count": len(device_list), "mode": mode, "max_unavailable": state["max_unavailable"],
+                        "devices": [d["hostname"] for d in device_list]}),
             "device", "rolling_refresh")
-
-        if mode == "sequential":
-            asyncio.create_task(_do_sequential_refresh(device_list))
-        elif mode == "parallel":
-            asyncio.create_task(_do_concurrent_refresh(device_list, parallelism))
-        elif mode == "all_at_once":
-            asyncio.create_task(_do_concurrent_refresh(device_list, len(device_list), skip_drain=True))
     finally:
         db.close()
 
 
 async def _devices_rolling_refresh_cancel(params: dict, ws: WebSocket, req_id: str):
     """Cancel a rolling refresh after the current node(s) complete."""
-    global _rolling_refresh_cancel
+    from app.services.rolling_refresh import rolling_refresh
 
-    if not _rolling_refresh_active:
+    if not rolling_refresh.cancel():
         return await _ws._respond(ws, req_id, error="No rolling refresh in progress")
 
-    _rolling_refresh_cancel = True
     await _ws._respond(ws, req_id, {"message": "Cancellation requested — will stop after current node(s)"})
 
 
 async def _devices_rolling_refresh_status(params: dict, ws: WebSocket, req_id: str):
     """Return current rolling refresh state."""
-    await _ws._respond(ws, req_id, {
-        "active": _rolling_refresh_active,
-        **_rolling_refresh_state,
-    })
+    from app.services.rolling_refresh import rolling_refresh
+
+    await _ws._respond(ws, req_id, rolling_refresh.status())
 
 
 # ---------------------------------------------------------------------------
@@ -966,6 +1109,7 @@ DEVICE_ACTIONS = {
     "devices.shutdown": _devices_shutdown,
     "devices.reboot": _devices_reboot,
     "devices.wake": _devices_wake,
+    "devices.power_bulk": _devices_power_bulk,
     "devices.rolling_refresh": _devices_rolling_refresh,
     "devices.rolling_refresh_cancel": _devices_rolling_refresh_cancel,
     "devices.rolling_refresh_status": _devices_rolling_refresh_status,
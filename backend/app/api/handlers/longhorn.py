@@ -9,6 +9,7 @@ from typing import Optional
 from fastapi import WebSocket
 
 import app.api.ws_handler as _ws
+from app.services import instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +77,7 @@ async def _longhorn_reset_disks_after_wipe(node_name: str):
     kubeconfig = str(Path.home() / ".kube" / "config")
 
     # Get current Longhorn node spec
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "get", "nodes.longhorn.io", node_name, "-n", _LONGHORN_NS,
         "-o", "json", "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -108,7 +109,7 @@ async def _longhorn_reset_disks_after_wipe(node_name: str):
 
     # Remove all old disk entries (set to null in merge patch)
     remove_patch = {"spec": {"disks": {e["old_name"]: None for e in disk_entries}}}
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "patch", "nodes.longhorn.io", node_name,
         "-n", _LONGHORN_NS, "--type", "merge", "--patch", json.dumps(remove_patch),
         "--kubeconfig", kubeconfig,
@@ -137,7 +138,7 @@ async def _longhorn_reset_disks_after_wipe(node_name: str):
         }
 
     add_patch = {"spec": {"disks": new_disks}}
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "patch", "nodes.longhorn.io", node_name,
         "-n", _LONGHORN_NS, "--type", "merge", "--patch", json.dumps(add_patch),
         "--kubeconfig", kubeconfig,
@@ -158,7 +159,7 @@ async def _longhorn_nodes(params: dict, ws: WebSocket, req_id: str):
         return await _ws._respond(ws, req_id, error="kubectl not found")
     kubeconfig = str(Path.home() / ".kube" / "config")
 
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "get", "nodes.longhorn.io", "-n", _LONGHORN_NS, "-o", "json",
         "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -225,7 +226,7 @@ async def _longhorn_discover_disks(params: dict, ws: WebSocket, req_id: str):
     talosconfig = str(get_templates_base_dir() / "talosconfig")
 
     # Get all block devices
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         talosctl, "get", "disks", "--nodes", ip, "--endpoints", ip,
         "--talosconfig", talosconfig, "-o", "json",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -266,7 +267,7 @@ async def _longhorn_discover_disks(params: dict, ws: WebSocket, req_id: str):
             continue
 
     # Get discovered volumes to identify the system disk
-    proc2 = await asyncio.create_subprocess_exec(
+    proc2 = await instrumentation.create_subprocess_exec(
         talosctl, "get", "discoveredvolumes", "--nodes", ip, "--endpoints", ip,
         "--talosconfig", talosconfig, "-o", "json",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -297,7 +298,7 @@ async def _longhorn_discover_disks(params: dict, ws: WebSocket, req_id: str):
     kubeconfig = str(Path.home() / ".kube" / "config")
     longhorn_paths = set()
     if kubectl:
-        proc3 = await asyncio.create_subprocess_exec(
+        proc3 = await instrumentation.create_subprocess_exec(
             kubectl, "get", "nodes.longhorn.io", node_name, "-n", _LONGHORN_NS,
             "-o", "json", "--kubeconfig", kubeconfig,
             stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -354,7 +355,7 @@ async def _longhorn_add_disk(params: dict, ws: WebSocket, req_id: str):
         }
     })
 
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "patch", "nodes.longhorn.io", node_name,
         "-n", _LONGHORN_NS, "--type", "merge", "--patch", patch,
         "--kubeconfig", kubeconfig,
@@ -393,7 +394,7 @@ async def _longhorn_remove_disk(params: dict, ws: WebSocket, req_id: str):
                 }
             }
         })
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             kubectl, "patch", "nodes.longhorn.io", node_name,
             "-n", _LONGHORN_NS, "--type", "merge", "--patch", patch,
             "--kubeconfig", kubeconfig,
@@ -404,7 +405,7 @@ async def _longhorn_remove_disk(params: dict, ws: WebSocket, req_id: str):
             return await _ws._respond(ws, req_id, error=f"Failed to disable disk: {stderr.decode().strip()}")
 
         # Check if disk still has replicas
-        proc2 = await asyncio.create_subprocess_exec(
+        proc2 = await instrumentation.create_subprocess_exec(
             kubectl, "get", "nodes.longhorn.io", node_name, "-n", _LONGHORN_NS,
             "-o", "json", "--kubeconfig", kubeconfig,
             stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -426,7 +427,7 @@ async def _longhorn_remove_disk(params: dict, ws: WebSocket, req_id: str):
     # Step 2: Remove disk from spec using strategic merge patch with null
     # kubectl patch with --type=json to remove the key
     patch = json.dumps([{"op": "remove", "path": f"/spec/disks/{disk_name}"}])
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         kubectl, "patch", "nodes.longhorn.io", node_name,
         "-n", _LONGHORN_NS, "--type", "json", "--patch", patch,
         "--kubeconfig", kubeconfig,
@@ -456,7 +457,7 @@ async def _longhorn_use_all_disks_for_node(node_name: str) -> tuple:
     kubeconfig = str(Path.home() / ".kube" / "config")
 
     # Get all disks
-    proc = await asyncio.create_subprocess_exec(
+    proc = await instrumentation.create_subprocess_exec(
         talosctl, "get", "disks", "--nodes", ip, "--endpoints", ip,
         "--talosconfig", talosconfig, "-o", "json",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -483,7 +484,7 @@ async def _longhorn_use_all_disks_for_node(node_name: str) -> tuple:
             continue
 
     # Get discovered volumes to find system disk
-    proc2 = await asyncio.create_subprocess_exec(
+    proc2 = await instrumentation.create_subprocess_exec(
         talosctl, "get", "discoveredvolumes", "--nodes", ip, "--endpoints", ip,
         "--talosconfig", talosconfig, "-o", "json",
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -506,7 +507,7 @@ async def _longhorn_use_all_disks_for_node(node_name: str) -> tuple:
 
     # Get existing Longhorn disk paths
     longhorn_paths = set()
-    proc3 = await asyncio.create_subprocess_exec(
+    proc3 = await instrumentation.create_subprocess_exec(
         kubectl, "get", "nodes.longhorn.io", node_name, "-n", _LONGHORN_NS,
         "-o", "json", "--kubeconfig", kubeconfig,
         stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
@@ -547,7 +548,7 @@ async def _longhorn_use_all_disks_for_node(node_name: str) -> tuple:
                 }
             }
         })
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             kubectl, "patch", "nodes.longhorn.io", node_name,
             "-n", _LONGHORN_NS, "--type", "merge", "--patch", patch,
             "--kubeconfig", kubeconfig,
@@ -53,8 +53,7 @@ async def _modules_get(params: dict, ws: WebSocket, req_id: str):
 
 
 async def _modules_install(params: dict, ws: WebSocket, req_id: str):
-    """Install a helm chart. Creates DB record, responds immediately, runs helm in background."""
-    import asyncio as _asyncio
+    """Install a helm chart. Creates DB record, responds immediately, queues the helm job."""
     db = _ws._db()
     try:
         from app.crud import helm as crud
@@ -110,16 +109,15 @@ async def _modules_install(params: dict, ws: WebSocket, req_id: str):
                 "app_version": info.get("app_version", ""),
             })
 
+        from app.services.helm_jobs import helm_jobs
         release = crud.create_helm_release(db, HelmReleaseCreate(**params))
+        await helm_jobs.submit(db, "install", release, params, priority=params.get("priority", 0))
         await _ws._respond(ws, req_id, release)
         await _ws._broadcast("module_installing", {
             "id": release.id,
             "release_name": release.release_name,
             "chart_name": release.chart_name,
         })
-
-        # Launch background task
-        _asyncio.create_task(_do_helm_install(release.id, params))
     finally:
         db.close()
 
@@ -128,6 +126,7 @@ async def _do_helm_install(release_id: int, params: dict):
     """Background: repo add + helm install, update DB + broadcast with full log output."""
     from app.crud import helm as crud
     from app.services.helm_runner import helm_runner
+    from app.services.helm_repo_cache import helm_repo_cache
     from datetime import datetime, timezone
 
     log_lines = []
@@ -165,7 +164,7 @@ async def _do_helm_install(release_id: int, params: dict):
         if params.get("repo_url") and params.get("repo_name"):
             _log(f"\n--- Adding helm repo: {params['repo_name']} ({params['repo_url']})")
             await _broadcast_log()
-            ok, msg = await helm_runner.repo_add(params["repo_name"], params["repo_url"])
+            ok, msg = await helm_repo_cache.ensure(params["repo_name"], params["repo_url"])
             _log(msg)
             if not ok:
                 _log(f"\nFAILED: Repo add failed")
@@ -177,11 +176,6 @@ async def _do_helm_install(release_id: int, params: dict):
                 })
                 await _broadcast_log()
                 return
-
-            _log("\n--- Updating helm repos")
-            await _broadcast_log()
-            ok_update, msg_update = await helm_runner.repo_update()
-            _log(msg_update)
             await _broadcast_log()
 
         # Handle Talos disk partitions for modules that need them (e.g., Longhorn)
@@ -328,7 +322,6 @@ async def _do_helm_install(release_id: int, params: dict):
 
 async def _modules_upgrade(params: dict, ws: WebSocket, req_id: str):
     """Upgrade a helm release. Similar async pattern."""
-    import asyncio as _asyncio
     db = _ws._db()
     try:
         from app.crud import helm as crud
@@ -345,8 +338,9 @@ async def _modules_upgrade(params: dict, ws: WebSocket, req_id: str):
             release.chart_version = params["chart_version"]
         db.commit()
 
+        from app.services.helm_jobs import helm_jobs
+        await helm_jobs.submit(db, "upgrade", release, priority=params.get("priority", 0))
         await _ws._respond(ws, req_id, release)
-        _asyncio.create_task(_do_helm_upgrade(release.id))
     finally:
         db.close()
 
@@ -355,6 +349,7 @@ async def _do_helm_upgrade(release_id: int):
     """Background: helm upgrade, update DB + broadcast with full log output."""
     from app.crud import helm as crud
     from app.services.helm_runner import helm_runner
+    from app.services.helm_repo_cache import helm_repo_cache
     from datetime import datetime, timezone
 
     log_lines = []
@@ -392,16 +387,10 @@ async def _do_helm_upgrade(release_id: int):
         if release.repo_url and release.repo_name:
             _log(f"\n--- Adding helm repo: {release.repo_name} ({release.repo_url})")
             await _broadcast_log()
-            ok_repo, msg_repo = await helm_runner.repo_add(release.repo_name, release.repo_url)
+            ok_repo, msg_repo = await helm_repo_cache.ensure(release.repo_name, release.repo_url)
             _log(msg_repo)
             await _broadcast_log()
 
-            _log("\n--- Updating helm repos")
-            await _broadcast_log()
-            ok_update, msg_update = await helm_runner.repo_update()
-            _log(msg_update)
-            await _broadcast_log()
-
         _log(f"\n--- Running: helm upgrade {release_name} {release.chart_name}")
         _log(f"    This may take several minutes...")
         await _broadcast_log()
@@ -470,14 +459,17 @@ async def _do_helm_upgrade(release_id: int):
 
 
 async def _modules_cancel(params: dict, ws: WebSocket, req_id: str):
-    """Force-fail a stuck deployment."""
+    """Cancel the release's queued/running helm jobs (terminating helm) and mark it failed."""
     db = _ws._db()
     try:
         from app.crud import helm as crud
+        from app.services.helm_jobs import helm_jobs
         release = crud.get_helm_release(db, params["release_id"])
         if not release:
             return await _ws._respond(ws, req_id, error="Release not found")
 
+        await helm_jobs.cancel_release(db, release.id)
+
         crud.update_helm_release_status(db, release.id, "failed", "Cancelled by user")
         await _ws._respond(ws, req_id, release)
         await _ws._broadcast("module_status_changed", {
@@ -534,7 +526,6 @@ async def _modules_force_delete(params: dict, ws: WebSocket, req_id: str):
 
 async def _modules_uninstall(params: dict, ws: WebSocket, req_id: str):
     """Uninstall a helm release."""
-    import asyncio as _asyncio
     db = _ws._db()
     try:
         from app.crud import helm as crud
@@ -542,14 +533,14 @@ async def _modules_uninstall(params: dict, ws: WebSocket, req_id: str):
         if not release:
             return await _ws._respond(ws, req_id, error="Release not found")
 
+        from app.services.helm_jobs import helm_jobs
         crud.update_helm_release_status(db, release.id, "uninstalling", "Uninstalling...")
+        await helm_jobs.submit(db, "uninstall", release, priority=params.get("priority", 0))
         await _ws._respond(ws, req_id, release)
         await _ws._broadcast("module_status_changed", {
             "id": release.id, "release_name": release.release_name,
             "status": "uninstalling", "status_message": "Uninstalling...",
         })
-
-        _asyncio.create_task(_do_helm_uninstall(release.id))
     finally:
         db.close()
 
@@ -666,6 +657,43 @@ async def _do_helm_uninstall(release_id: int):
         db.close()
 
 
+async def _modules_jobs(params: dict, ws: WebSocket, req_id: str):
+    """List helm jobs, newest first; optionally for one release or status."""
+    db = _ws._db()
+    try:
+        from app.crud import helm as crud
+        from app.services.helm_jobs import helm_jobs, job_dict
+        jobs = crud.get_helm_jobs(db, release_id=params.get("release_id"),
+                                  status=params.get("status"), limit=params.get("limit", 100))
+        await _ws._respond(ws, req_id, {
+            "jobs": [job_dict(job) for job in jobs],
+            "queue": helm_jobs.status(),
+        })
+    finally:
+        db.close()
+
+
+async def _modules_job_cancel(params: dict, ws: WebSocket, req_id: str):
+    """Cancel a single helm job by id."""
+    db = _ws._db()
+    try:
+        from app.crud import helm as crud
+        from app.services.helm_jobs import helm_jobs, job_dict
+        job = await helm_jobs.cancel(db, params["job_id"])
+        if not job:
+            return await _ws._respond(ws, req_id, error="Job not found or already finished")
+        release = crud.get_helm_release(db, job.release_id)
+        if release and release.status in ("pending", "deploying", "uninstalling"):
+            crud.update_helm_release_status(db, release.id, "failed", "Cancelled by user")
+            await _ws._broadcast("module_status_changed", {
+                "id": release.id, "release_name": release.release_name,
+                "status": "failed", "status_message": "Cancelled by user",
+            })
+        await _ws._respond(ws, req_id, job_dict(job))
+    finally:
+        db.close()
+
+
 async def _modules_log(params: dict, ws: WebSocket, req_id: str):
     """Fetch stored log output for a helm release."""
     db = _ws._db()
@@ -679,6 +707,24 @@ async def _modules_log(params: dict, ws: WebSocket, req_id: str):
         db.close()
 
 
+async def _modules_log_search(params: dict, ws: WebSocket, req_id: str):
+    """Full-text search over helm release logs and status messages."""
+    db = _ws._db()
+    try:
+        from app.crud import helm as crud
+        try:
+            results, meta = crud.search_release_logs(db, params.get("query", ""),
+                skip=params.get("skip", 0),
+                limit=params.get("limit", 20),
+                namespace=params.get("namespace"),
+            )
+        except ValueError as e:
+            return await _ws._respond(ws, req_id, error=str(e))
+        await _ws._respond(ws, req_id, {"results": results, **meta})
+    finally:
+        db.close()
+
+
 async def _modules_repos_list(params: dict, ws: WebSocket, req_id: str):
     db = _ws._db()
     try:
@@ -712,6 +758,24 @@ async def _modules_repos_add(params: dict, ws: WebSocket, req_id: str):
         db.close()
 
 
+async def _modules_chart_versions(params: dict, ws: WebSocket, req_id: str):
+    """Available versions of a chart, from the cached repo indexes.
+
+    ``refresh`` updates the chart's repo (every repo for a bare chart name) first.
+    """
+    from app.services.helm_repo_cache import helm_repo_cache
+    chart = params.get("chart", "")
+    if not chart:
+        return await _ws._respond(ws, req_id, error="chart is required")
+    if params.get("refresh"):
+        repos = [chart.split("/", 1)[0]] if "/" in chart else list(helm_repo_cache.configured_repos())
+        results = await asyncio.gather(*(helm_repo_cache.ensure(r, max_age=0) for r in repos))
+        errors = [msg for ok, msg in results if not ok]
+        if errors:
+            return await _ws._respond(ws, req_id, error=f"Failed to update repo: {'; '.join(errors)}")
+    await _ws._respond(ws, req_id, await helm_repo_cache.search_versions(chart))
+
+
 async def _modules_repos_delete(params: dict, ws: WebSocket, req_id: str):
     db = _ws._db()
     try:
@@ -792,10 +856,14 @@ MODULE_ACTIONS = {
     "modules.import": _modules_import,
     "modules.upgrade": _modules_upgrade,
     "modules.cancel": _modules_cancel,
+    "modules.jobs": _modules_jobs,
+    "modules.job_cancel": _modules_job_cancel,
     "modules.force_delete": _modules_force_delete,
     "modules.uninstall": _modules_uninstall,
     "modules.log": _modules_log,
+    "modules.log_search": _modules_log_search,
     "modules.repos.list": _modules_repos_list,
     "modules.repos.add": _modules_repos_add,
     "modules.repos.delete": _modules_repos_delete,
+    "modules.chart_versions": _modules_chart_versions,
 }
@@ -186,7 +186,8 @@ async def _network_update(params: dict, ws: WebSocket, req_id: str):
                 "pxe_timeout", "enable_logging",
             ]}
             template_service.compile_dnsmasq_config(**config_dict)
-            if not template_service.deploy_dnsmasq_config():
+            device_crud.sync_dhcp_reservations(db)
+            if not await template_service.deploy_dnsmasq_config():
                 errors.append("Failed to deploy dnsmasq config")
         except Exception as e:
             errors.append(f"dnsmasq config: {e}")
@@ -238,7 +239,8 @@ async def _network_apply(params: dict, ws: WebSocket, req_id: str):
         ]}
         try:
             _, output_path = template_service.compile_dnsmasq_config(**config_dict)
-            if not template_service.deploy_dnsmasq_config():
+            device_crud.sync_dhcp_reservations(db)
+            if not await template_service.deploy_dnsmasq_config():
                 errors.append("Failed to deploy dnsmasq config")
         except Exception as e:
             errors.append(f"dnsmasq: {e}")
@@ -0,0 +1,17 @@
+"""System-level WebSocket handlers (startup progress)."""
+import logging
+from fastapi import WebSocket
+
+import app.api.ws_handler as _ws
+
+logger = logging.getLogger(__name__)
+
+
+async def _system_startup_status(params: dict, ws: WebSocket, req_id: str):
+    from app.services.startup_manager import startup_manager
+    await _ws._respond(ws, req_id, startup_manager.status())
+
+
+SYSTEM_ACTIONS = {
+    "system.startup_status": _system_startup_status,
+}
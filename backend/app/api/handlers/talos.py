@@ -58,7 +58,7 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
         from app.schemas.network import NetworkSettingsUpdate
         from app.schemas.cluster import ClusterSettingsUpdate
         from app.db.models import DeviceStatus
-        from app.services.talos_downloader import talos_downloader
+        from app.services.prefetch_service import prefetch_service, schedule_for_settings
         from app.services.template_service import template_service
         from app.services.ipxe_generator import IPXEGenerator
         from app.services.config_generator import ConfigGenerator
@@ -72,19 +72,15 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
 
         # Update NetworkSettings.talos_version
         ns = network_crud.get_network_settings(db)
+        old_version = None
         if ns:
             old_version = ns.talos_version
             network_crud.update_network_settings(db, ns.id, NetworkSettingsUpdate(talos_version=talos_version))
             ns = network_crud.get_network_settings(db)
 
-            # Download Talos files if version changed
+            # New version: hold boot.ipxe on the old one until its boot files are prefetched
             if talos_version and talos_version != old_version:
-                try:
-                    ok, dl_errs = talos_downloader.download_talos_files(talos_version)
-                    if not ok:
-                        errors.append(f"Talos download: {'; '.join(dl_errs)}")
-                except Exception as e:
-                    errors.append(f"Talos download: {e}")
+                prefetch_service.mark_pending(talos_version)
 
             # Regen dnsmasq + boot.ipxe
             try:
@@ -95,7 +91,8 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
                     "pxe_timeout", "enable_logging",
                 ]}
                 template_service.compile_dnsmasq_config(**config_dict)
-                template_service.deploy_dnsmasq_config()
+                device_crud.sync_dhcp_reservations(db)
+                await template_service.deploy_dnsmasq_config()
             except Exception as e:
                 errors.append(f"dnsmasq: {e}")
 
@@ -117,6 +114,7 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
         install_image = ""
         factory_schematic_id = ""
         cs = cluster_crud.get_cluster_settings(db)
+        old_schematic = cs.factory_schematic_id if cs else None
 
         # Resolve factory installer image
         old_extensions = []
@@ -160,6 +158,13 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
                 factory_schematic_id=factory_schematic_id,
             ))
 
+        # Prefetch boot files, talosctl/kubectl and the installer in the background
+        if talos_version and (talos_version != old_version or factory_schematic_id != old_schematic):
+            try:
+                schedule_for_settings(db, install_image=install_image)
+            except Exception as e:
+                errors.append(f"Prefetch: {e}")
+
         # Regenerate all device configs
         try:
             approved = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, 0, 1000)
@@ -185,6 +190,12 @@ async def _talos_update(params: dict, ws: WebSocket, req_id: str):
         db.close()
 
 
+async def _talos_prefetch_status(params: dict, ws: WebSocket, req_id: str):
+    """Readiness of prefetched artifacts, per Talos version."""
+    from app.services.prefetch_service import prefetch_service
+    await _ws._respond(ws, req_id, prefetch_service.get_status(params.get("talos_version")))
+
+
 async def _versions_talos(params: dict, ws: WebSocket, req_id: str):
     from app.services.version_service import fetch_talos_versions
     versions = await fetch_talos_versions()
@@ -200,6 +211,7 @@ async def _versions_kubernetes(params: dict, ws: WebSocket, req_id: str):
 TALOS_ACTIONS = {
     "talos.get": _talos_get,
     "talos.update": _talos_update,
+    "talos.prefetch_status": _talos_prefetch_status,
     "versions.talos": _versions_talos,
     "versions.kubernetes": _versions_kubernetes,
 }
@@ -76,7 +76,7 @@ async def _troubleshoot_regen_dnsmasq(params: dict, ws: WebSocket, req_id: str):
     """Recompile and deploy dnsmasq config."""
     db = _ws._db()
     try:
-        from app.crud import network as network_crud
+        from app.crud import network as network_crud, device as device_crud
         from app.services.template_service import template_service
 
         ns = network_crud.get_network_settings(db)
@@ -90,11 +90,13 @@ async def _troubleshoot_regen_dnsmasq(params: dict, ws: WebSocket, req_id: str):
             "pxe_timeout", "enable_logging",
         ]}
         template_service.compile_dnsmasq_config(**config_dict)
-        deployed = template_service.deploy_dnsmasq_config()
+        device_crud.sync_dhcp_reservations(db)
+        applied = await template_service.deploy_dnsmasq_config()
 
         await _ws._respond(ws, req_id, {
-            "message": "dnsmasq config regenerated" + (" and deployed" if deployed else " (deploy to /etc manually)"),
-            "deployed": deployed,
+            "message": "dnsmasq config regenerated" + (f" and deployed ({applied})" if applied else " (deploy to /etc manually)"),
+            "deployed": applied is not None,
+            "action": applied,
         })
     finally:
         db.close()
@@ -1,5 +1,4 @@
 """HTTP API routes for module (Helm) management."""
-import asyncio
 import json
 import logging
 from typing import List
@@ -10,7 +9,6 @@ from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.crud import helm as crud
 from app.schemas.helm import HelmReleaseCreate, HelmReleaseResponse
-from app.services.module_catalog import get_catalog, get_catalog_entry
 from app.services.audit_service import log_action
 
 logger = logging.getLogger(__name__)
@@ -21,6 +19,7 @@ router = APIRouter()
 @router.get("/modules/catalog")
 async def module_catalog():
     """Return the full module catalog."""
+    from app.services.module_catalog import get_catalog
     return get_catalog()
 
 
@@ -54,7 +53,7 @@ async def get_module_log(release_id: int, db: Session = Depends(get_db)):
 
 @router.post("/modules/install", response_model=HelmReleaseResponse)
 async def install_module(params: HelmReleaseCreate, db: Session = Depends(get_db)):
-    """Install a Helm chart. Creates DB record and launches background install."""
+    """Install a Helm chart. Creates DB record and queues the install job."""
     existing = crud.get_helm_release_by_name(db, params.release_name)
     if existing:
         raise HTTPException(status_code=409, detail=f"Release '{params.release_name}' already exists")
@@ -65,13 +64,14 @@ async def install_module(params: HelmReleaseCreate, db: Session = Depends(get_db
         json.dumps({"release_name": release.release_name, "chart": release.chart_name}),
         "module", str(release.id))
 
-    from app.api.ws_handler import _do_helm_install, _broadcast
+    from app.api.ws_handler import _broadcast
+    from app.services.helm_jobs import helm_jobs
     await _broadcast("module_installing", {
         "id": release.id,
         "release_name": release.release_name,
         "chart_name": release.chart_name,
     })
-    asyncio.create_task(_do_helm_install(release.id, params.model_dump()))
+    await helm_jobs.submit(db, "install", release, params.model_dump())
 
     return release
 
@@ -85,14 +85,15 @@ async def uninstall_module(release_id: int, db: Session = Depends(get_db)):
     if release.status in ("uninstalling",):
         raise HTTPException(status_code=409, detail="Already uninstalling")
 
-    from app.api.ws_handler import _do_helm_uninstall, _broadcast
+    from app.api.ws_handler import _broadcast
+    from app.services.helm_jobs import helm_jobs
     crud.update_helm_release_status(db, release_id, "uninstalling", "Uninstalling...")
     await _broadcast("module_status_changed", {
         "id": release.id,
         "release_name": release.release_name,
         "status": "uninstalling",
     })
-    asyncio.create_task(_do_helm_uninstall(release_id))
+    await helm_jobs.submit(db, "uninstall", release)
 
     return {"message": f"Uninstalling {release.release_name}..."}
 
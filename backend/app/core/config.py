@@ -19,9 +19,15 @@ class Settings(BaseSettings):
     # Logs directory - default to ~/.ktizo/logs
     LOGS_DIR: str = str(Path.home() / ".ktizo" / "logs")
 
+    # Content-addressed artifact store (Talos boot files, kubectl binaries)
+    ARTIFACTS_DIR: str = str(Path.home() / ".ktizo" / "artifacts")
+
     # TFTP/PXE Settings
     TFTP_ROOT: str = "/var/lib/tftpboot"
 
+    # /debug/profiler/* endpoints - off by default, there is no API auth
+    ENABLE_PROFILER: bool = False
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -1,6 +1,49 @@
+from sqlalchemy import String, or_, and_, type_coerce
 from sqlalchemy.orm import Session
 from app.db.models import AuditLog
-from typing import Optional, List
+from typing import Dict, Iterable, List, Optional, Tuple
+import base64
+import threading
+
+# Totals per (page_filter, action_filter). Inserts adjust cached totals in
+# place; deletes drop the cache. Page loads never re-count a large table
+# unless rows were removed since the last count.
+_count_cache: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+_count_lock = threading.Lock()
+
+
+def note_inserted(rows: Iterable[dict]):
+    """Account new rows (dicts with page/action) in the cached totals."""
+    with _count_lock:
+        for row in rows:
+            for (page, action) in _count_cache:
+                if (page is None or page == row["page"]) and (action is None or action == row["action"]):
+                    _count_cache[(page, action)] += 1
+
+
+def invalidate_count_cache():
+    with _count_lock:
+        _count_cache.clear()
+
+
+def encode_cursor(raw_timestamp: str, log_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{raw_timestamp}|{log_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw_timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return raw_timestamp, int(log_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _filtered(query, page_filter: Optional[str], action_filter: Optional[str]):
+    if page_filter:
+        query = query.filter(AuditLog.page == page_filter)
+    if action_filter:
+        query = query.filter(AuditLog.action == action_filter)
+    return query
 
 
 def create_audit_log(
@@ -21,6 +64,7 @@ def create_audit_log(
     db.add(log)
     db.commit()
     db.refresh(log)
+    note_inserted([{"page": page, "action": action}])
     return log
 
 
@@ -30,13 +74,32 @@ def get_audit_logs(
     limit: int = 50,
     page_filter: Optional[str] = None,
     action_filter: Optional[str] = None,
-) -> List[AuditLog]:
-    query = db.query(AuditLog)
-    if page_filter:
-        query = query.filter(AuditLog.page == page_filter)
-    if action_filter:
-        query = query.filter(AuditLog.action == action_filter)
-    return query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+    cursor: Optional[str] = None,
+) -> Tuple[List[AuditLog], Optional[str]]:
+    """Newest-first page of logs and the cursor for the next (older) page.
+
+    Pages are keyed on (timestamp, id), so deep pages cost the same as the
+    first one. ``skip`` is still honoured for offset-style clients.
+    The cursor carries the timestamp exactly as stored: rows written with
+    and without fractional seconds then still compare in order.
+    """
+    raw_timestamp = type_coerce(AuditLog.timestamp, String)
+    query = _filtered(db.query(AuditLog, raw_timestamp), page_filter, action_filter)
+    if cursor:
+        ts, log_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            raw_timestamp < ts,
+            and_(raw_timestamp == ts, AuditLog.id < log_id),
+        ))
+    rows = (query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+            .offset(skip).limit(limit + 1).all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_ts = rows[-1]
+        next_cursor = encode_cursor(last_ts, last.id)
+    return [log for log, _ in rows], next_cursor
 
 
 def get_audit_log_count(
@@ -44,16 +107,66 @@ def get_audit_log_count(
     page_filter: Optional[str] = None,
     action_filter: Optional[str] = None,
 ) -> int:
-    query = db.query(AuditLog)
-    if page_filter:
-        query = query.filter(AuditLog.page == page_filter)
-    if action_filter:
-        query = query.filter(AuditLog.action == action_filter)
-    return query.count()
+    key = (page_filter or None, action_filter or None)
+    with _count_lock:
+        if key in _count_cache:
+            return _count_cache[key]
+    count = _filtered(db.query(AuditLog), page_filter, action_filter).count()
+    with _count_lock:
+        _count_cache[key] = count
+    return count
 
 
 def clear_audit_logs(db: Session) -> int:
     count = db.query(AuditLog).count()
     db.query(AuditLog).delete()
     db.commit()
+    invalidate_count_cache()
     return count
+
+
+def search_audit_logs(
+    db: Session,
+    query: str,
+    skip: int = 0,
+    limit: int = 50,
+    page_filter: Optional[str] = None,
+    action_filter: Optional[str] = None,
+) -> Tuple[List[dict], dict]:
+    """Full-text search. Returns (results, meta); see ``app.db.fts.run_search``.
+
+    Results are best match first, or newest first when the query matches too
+    many rows to rank (``meta["ranked"]`` is False). Matches are wrapped in
+    ``<mark>`` in ``action_hl``/``details_hl``; other text there is HTML-escaped.
+    """
+    from app.db.fts import build_match_query, highlight_markers, render_highlight, run_search
+
+    start, end = highlight_markers()
+    where = "audit_logs_fts MATCH :q"
+    params = {"q": build_match_query(query), "hs": start, "he": end}
+    if page_filter:
+        where += " AND a.page = :page"
+        params["page"] = page_filter
+    if action_filter:
+        where += " AND a.action = :action"
+        params["action"] = action_filter
+
+    rows, meta = run_search(
+        db, "audit_logs_fts",
+        "a.id, a.timestamp, a.action, a.page, a.details, a.entity_type, a.entity_id, "
+        "highlight(audit_logs_fts, 0, :hs, :he) AS action_hl, "
+        "snippet(audit_logs_fts, 2, :hs, :he, '…', 24) AS details_hl",
+        "CROSS JOIN audit_logs a ON a.id = audit_logs_fts.rowid", where, params, skip, limit)
+
+    return [{
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "action": row["action"],
+        "page": row["page"],
+        "details": row["details"],
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "action_hl": render_highlight(row["action_hl"]),
+        "details_hl": render_highlight(row["details_hl"]),
+        "score": row["score"],
+    } for row in rows], meta
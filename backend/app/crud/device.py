@@ -6,6 +6,7 @@ from typing import List, Optional, Tuple
 from app.services.config_generator import ConfigGenerator
 from app.services.ipxe_generator import IPXEGenerator
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +14,67 @@ logger = logging.getLogger(__name__)
 config_generator = ConfigGenerator()
 # Note: ipxe_generator is now created per-request with TFTP root from database
 
+# boot.ipxe lists every device, and updates may run in worker threads (e.g.
+# rolling refresh nodes in parallel): read-render-write under one lock so a
+# slower writer cannot replace the file with an older device list.
+_boot_script_lock = threading.Lock()
+
+
+def _regenerate_boot_script(db: Session):
+    from app.crud import network as network_crud
+    with _boot_script_lock:
+        network_settings = network_crud.get_network_settings(db)
+        tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
+        ipxe_generator = IPXEGenerator(tftp_root=tftp_root)
+        all_devices = get_devices(db, skip=0, limit=1000)
+        server_ip = ipxe_generator.get_server_ip_from_settings(db)
+        strict_mode = ipxe_generator.get_strict_mode_from_settings(db)
+        ipxe_generator.generate_boot_script(all_devices, server_ip, strict_mode=strict_mode)
+
+
+def _dhcp_server_mode(db: Session) -> bool:
+    from app.crud import network as network_crud
+    network_settings = network_crud.get_network_settings(db)
+    return bool(network_settings and network_settings.dhcp_mode == "server")
+
+
+def _dhcp_reservation(db: Session, device: Device, server_mode: Optional[bool] = None) -> Optional[str]:
+    """dhcp-host line for ``device``; only approved devices in server DHCP mode get one.
+
+    Pass ``server_mode`` when building many lines to read the network settings once.
+    """
+    from app.services.template_service import dhcp_host_entry
+    if device.status != DeviceStatus.APPROVED:
+        return None
+    if server_mode is None:
+        server_mode = _dhcp_server_mode(db)
+    if not server_mode:
+        return None
+    return dhcp_host_entry(device.mac_address, device.ip_address, device.hostname)
+
+
+def _update_dhcp_reservation(mac_address: str, entry: Optional[str]):
+    from app.services.template_service import template_service
+    try:
+        template_service.update_dnsmasq_host(mac_address, entry)
+    except Exception as e:
+        logger.warning(f"Failed to update DHCP reservation for {mac_address}: {e}")
+
+
+def sync_dhcp_reservations(db: Session):
+    """Rebuild the dnsmasq hosts file from every approved device.
+
+    Device changes update their own line; this full rebuild is for network
+    settings changes (e.g. switching DHCP mode) and is installed by the next
+    dnsmasq deploy.
+    """
+    from app.services.template_service import template_service
+    entries = []
+    if _dhcp_server_mode(db):
+        approved = db.query(Device).filter(Device.status == DeviceStatus.APPROVED).order_by(Device.id).all()
+        entries = [_dhcp_reservation(db, d, server_mode=True) for d in approved]
+    template_service.write_dnsmasq_hosts([e for e in entries if e])
+
 def get_device(db: Session, device_id: int) -> Optional[Device]:
     """Get device by ID"""
     return db.query(Device).filter(Device.id == device_id).first()
@@ -70,6 +132,7 @@ def update_device(db: Session, device_id: int, device_update: DeviceUpdate) -> O
     if not db_device:
         return None
 
+    old_mac = db_device.mac_address
     update_data = device_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_device, field, value)
@@ -77,6 +140,10 @@ def update_device(db: Session, device_id: int, device_update: DeviceUpdate) -> O
     db.commit()
     db.refresh(db_device)
 
+    if old_mac.lower() != db_device.mac_address.lower():
+        _update_dhcp_reservation(old_mac, None)
+    _update_dhcp_reservation(db_device.mac_address, _dhcp_reservation(db, db_device))
+
     # If device is approved, regenerate its config (in case hostname/IP changed)
     if db_device.status == DeviceStatus.APPROVED:
         logger.info(f"Regenerating config for updated device {db_device.mac_address}")
@@ -84,14 +151,7 @@ def update_device(db: Session, device_id: int, device_update: DeviceUpdate) -> O
 
         # Regenerate boot.ipxe with updated info
         logger.info("Regenerating boot.ipxe with updated device info")
-        from app.crud import network as network_crud
-        network_settings = network_crud.get_network_settings(db)
-        tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-        ipxe_generator = IPXEGenerator(tftp_root=tftp_root)
-        all_devices = get_devices(db, skip=0, limit=1000)
-        server_ip = ipxe_generator.get_server_ip_from_settings(db)
-        strict_mode = ipxe_generator.get_strict_mode_from_settings(db)
-        ipxe_generator.generate_boot_script(all_devices, server_ip, strict_mode=strict_mode)
+        _regenerate_boot_script(db)
 
     return db_device
 
@@ -109,20 +169,15 @@ def approve_device(db: Session, device_id: int) -> Optional[Device]:
     db.commit()
     db.refresh(db_device)
 
+    _update_dhcp_reservation(db_device.mac_address, _dhcp_reservation(db, db_device))
+
     # Generate static configuration file for this device
     logger.info(f"Generating config for approved device {db_device.mac_address}")
     config_generator.generate_device_config(db_device)
 
     # Regenerate boot.ipxe with all approved devices
     logger.info("Regenerating boot.ipxe with updated device list")
-    from app.crud import network as network_crud
-    network_settings = network_crud.get_network_settings(db)
-    tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-    ipxe_generator = IPXEGenerator(tftp_root=tftp_root)
-    all_devices = get_devices(db, skip=0, limit=1000)
-    server_ip = ipxe_generator.get_server_ip_from_settings(db)
-    strict_mode = ipxe_generator.get_strict_mode_from_settings(db)
-    ipxe_generator.generate_boot_script(all_devices, server_ip, strict_mode=strict_mode)
+    _regenerate_boot_script(db)
 
     return db_device
 
@@ -139,16 +194,11 @@ def reject_device(db: Session, device_id: int) -> Optional[Device]:
     db.commit()
     db.refresh(db_device)
 
+    _update_dhcp_reservation(db_device.mac_address, None)
+
     # Regenerate boot.ipxe without this device
     logger.info("Regenerating boot.ipxe with updated device list")
-    from app.crud import network as network_crud
-    network_settings = network_crud.get_network_settings(db)
-    tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-    ipxe_generator = IPXEGenerator(tftp_root=tftp_root)
-    all_devices = get_devices(db, skip=0, limit=1000)
-    server_ip = ipxe_generator.get_server_ip_from_settings(db)
-    strict_mode = ipxe_generator.get_strict_mode_from_settings(db)
-    ipxe_generator.generate_boot_script(all_devices, server_ip, strict_mode=strict_mode)
+    _regenerate_boot_script(db)
 
     return db_device
 
@@ -170,18 +220,14 @@ def delete_device(db: Session, device_id: int) -> bool:
     # Delete config file
     config_generator.delete_device_config(db_device)
 
+    mac_address = db_device.mac_address
     db.delete(db_device)
     db.commit()
 
+    _update_dhcp_reservation(mac_address, None)
+
     # Regenerate boot.ipxe
     logger.info("Regenerating boot.ipxe with updated device list")
-    from app.crud import network as network_crud
-    network_settings = network_crud.get_network_settings(db)
-    tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-    ipxe_generator = IPXEGenerator(tftp_root=tftp_root)
-    all_devices = get_devices(db, skip=0, limit=1000)
-    server_ip = ipxe_generator.get_server_ip_from_settings(db)
-    strict_mode = ipxe_generator.get_strict_mode_from_settings(db)
-    ipxe_generator.generate_boot_script(all_devices, server_ip, strict_mode=strict_mode)
+    _regenerate_boot_script(db)
 
     return True
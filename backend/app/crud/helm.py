@@ -1,9 +1,9 @@
-"""CRUD operations for Helm releases and repositories"""
+"""CRUD operations for Helm releases, repositories and jobs"""
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from app.db.models import HelmRelease, HelmRepository
+from app.db.models import HelmJob, HelmRelease, HelmRepository
 from app.schemas.helm import HelmReleaseCreate, HelmReleaseUpdate
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 
 def get_helm_releases(db: Session, skip: int = 0, limit: int = 100) -> List[HelmRelease]:
@@ -112,3 +112,51 @@ def delete_helm_repository(db: Session, repo_id: int) -> bool:
     db.delete(db_repo)
     db.commit()
     return True
+
+
+def get_helm_jobs(db: Session, release_id: Optional[int] = None, status: Optional[str] = None,
+                  limit: int = 100) -> List[HelmJob]:
+    """Most recent jobs first."""
+    query = db.query(HelmJob)
+    if release_id is not None:
+        query = query.filter(HelmJob.release_id == release_id)
+    if status:
+        query = query.filter(HelmJob.status == status)
+    return query.order_by(HelmJob.id.desc()).limit(limit).all()
+
+
+def search_release_logs(db: Session, query: str, skip: int = 0, limit: int = 20,
+                        namespace: Optional[str] = None) -> Tuple[List[dict], dict]:
+    """Full-text search over release names, status messages and helm logs.
+
+    Returns (results, meta) like ``search_audit_logs``,
+    with ``<mark>``-highlighted ``release_hl``, ``status_hl`` and ``log_snippet``.
+    """
+    from app.db.fts import build_match_query, highlight_markers, render_highlight, run_search
+
+    start, end = highlight_markers()
+    where = "helm_releases_fts MATCH :q"
+    params = {"q": build_match_query(query), "hs": start, "he": end}
+    if namespace:
+        where += " AND r.namespace = :namespace"
+        params["namespace"] = namespace
+
+    rows, meta = run_search(
+        db, "helm_releases_fts",
+        "r.id, r.release_name, r.namespace, r.chart_name, r.status, "
+        "highlight(helm_releases_fts, 0, :hs, :he) AS release_hl, "
+        "snippet(helm_releases_fts, 3, :hs, :he, '…', 24) AS status_hl, "
+        "snippet(helm_releases_fts, 4, :hs, :he, '…', 32) AS log_snippet",
+        "CROSS JOIN helm_releases r ON r.id = helm_releases_fts.rowid", where, params, skip, limit)
+
+    return [{
+        "id": row["id"],
+        "release_name": row["release_name"],
+        "namespace": row["namespace"],
+        "chart_name": row["chart_name"],
+        "status": row["status"],
+        "release_hl": render_highlight(row["release_hl"]),
+        "status_hl": render_highlight(row["status_hl"]),
+        "log_snippet": render_highlight(row["log_snippet"]),
+        "score": row["score"],
+    } for row in rows], meta
@@ -23,6 +23,10 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Query timing / connection accounting for /metrics
+from app.services.instrumentation import instrument_engine  # noqa: E402
+instrument_engine(engine, SessionLocal)
+
 Base = declarative_base()
 
 def get_db():
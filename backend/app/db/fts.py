@@ -0,0 +1,137 @@
+"""SQLite FTS5 indexes over text columns.
+
+Each index is an external-content FTS5 table (the text lives only in the
+source table) kept in sync by insert/update/delete triggers, so every write
+path — ORM, bulk deletes, archival — updates it without extra code.
+
+The DDL is attached to the source table's ``after_create`` event, so
+``create_all`` builds it for new databases; :func:`ensure_fts_indexes`
+adds and backfills it for databases created before the index existed.
+"""
+import html
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import DDL, Table, event, inspect, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Sentinels that cannot occur in stored text; replaced by <mark> after the
+# surrounding text has been HTML-escaped.
+_HL_START = "\x02"
+_HL_END = "\x03"
+
+# bm25 must score every match before ORDER BY rank can return the top
+# rows; above this many matches, results are returned newest first instead
+# (FTS5 walks its doclist in rowid order, so that stays cheap).
+RANK_LIMIT = int(os.getenv("SEARCH_RANK_LIMIT", "5000"))
+# Matches are counted up to this many; past it the total is reported as a
+# lower bound rather than walking the whole doclist.
+COUNT_LIMIT = int(os.getenv("SEARCH_COUNT_LIMIT", "10000"))
+
+_INDEXES: Dict[str, dict] = {}
+
+
+def _statements(fts: str, table: str, columns: List[str], update_columns: List[str]) -> List[str]:
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {', '.join(update_columns)} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+    ]
+
+
+def register_fts(table: Table, fts: str, columns: List[str]):
+    """Index ``columns`` of ``table`` (integer ``id`` primary key) in ``fts``."""
+    statements = _statements(fts, table.name, columns, columns)
+    _INDEXES[fts] = {"table": table.name, "statements": statements}
+    for statement in statements:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def ensure_fts_indexes(engine):
+    """Create missing FTS indexes on an existing database and backfill them."""
+    if engine.dialect.name != "sqlite":
+        return
+    existing = set(inspect(engine).get_table_names())
+    for fts, spec in _INDEXES.items():
+        if spec["table"] not in existing:
+            continue
+        with engine.connect() as conn:
+            for statement in spec["statements"]:
+                conn.execute(text(statement))
+            if fts not in existing:
+                logger.info(f"Building full-text index {fts} from {spec['table']}")
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            conn.commit()
+
+
+_TERM_RE = re.compile(r'"[^"]+"|\S+')
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query.
+
+    Every term must match (quoted phrases are kept together); the last term
+    also matches as a prefix, for search-as-you-type.
+    """
+    terms = [t.strip('"') for t in _TERM_RE.findall(query or "")]
+    terms = [t.replace('"', '""') for t in terms if t.strip('"')]
+    if not terms:
+        raise ValueError("Search query is empty")
+    parts = [f'"{t}"' for t in terms]
+    if " " not in terms[-1]:
+        parts[-1] += "*"
+    return " ".join(parts)
+
+
+def highlight_markers():
+    return _HL_START, _HL_END
+
+
+def render_highlight(value):
+    """HTML-escape text from highlight()/snippet() and mark the matches."""
+    if value is None:
+        return None
+    return html.escape(value).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def run_search(db, fts: str, columns: str, join: str, where: str, params: dict,
+               skip: int, limit: int) -> Tuple[list, dict]:
+    """Run a MATCH query; returns (rows as mappings, meta).
+
+    ``meta`` holds ``total`` (exact up to COUNT_LIMIT, see ``total_exact``)
+    and ``ranked`` (False when results are newest first instead of by bm25).
+
+    ``join`` should be a ``CROSS JOIN`` to the content table: SQLite never
+    reorders a CROSS JOIN, so the MATCH drives the query even when a filter
+    column has an index (otherwise the planner may scan that index and
+    re-run the MATCH for every row).
+
+    Raises ValueError for queries FTS5 rejects.
+    """
+    params = {**params, "skip": skip, "limit": limit}
+    source = f"FROM {fts} {join} WHERE {where}"
+    try:
+        total = db.execute(text(f"SELECT count(*) FROM (SELECT 1 {source} LIMIT {COUNT_LIMIT + 1})"),
+                           params).scalar()
+        ranked = total <= RANK_LIMIT
+        # Order by the hidden rank column alone so FTS5 can rank internally
+        order = f"{fts}.rank" if ranked else f"{fts}.rowid DESC"
+        rows = db.execute(text(f"SELECT {columns}, {fts}.rank AS score {source} "
+                               f"ORDER BY {order} LIMIT :limit OFFSET :skip"), params).mappings().all()
+    except OperationalError as e:
+        raise ValueError(f"Invalid search query: {e.orig}") from e
+    return rows, {"total": min(total, COUNT_LIMIT), "total_exact": total <= COUNT_LIMIT, "ranked": ranked}
+
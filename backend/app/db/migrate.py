@@ -69,4 +69,19 @@ def migrate_database():
                 conn.execute(text('ALTER TABLE helm_releases ADD COLUMN log_output TEXT'))
                 conn.commit()
 
+    # Composite indexes for filtered, keyset-paginated audit log queries
+    if 'audit_logs' in inspector.get_table_names():
+        indexes = {ix['name'] for ix in inspector.get_indexes('audit_logs')}
+        for name, columns in (('ix_audit_logs_page_timestamp', 'page, timestamp'),
+                              ('ix_audit_logs_action_timestamp', 'action, timestamp')):
+            if name not in indexes:
+                logger.info(f"Adding {name} index to audit_logs table")
+                with engine.connect() as conn:
+                    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON audit_logs ({columns})'))
+                    conn.commit()
+
+    # Full-text indexes for audit.search / modules.log_search
+    from app.db.fts import ensure_fts_indexes
+    ensure_fts_indexes(engine)
+
     logger.info("Database migration completed successfully")
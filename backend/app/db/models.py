@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from app.db.database import Base
 import enum
@@ -152,6 +152,47 @@ class Device(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class RollingRefresh(Base):
+    """A rolling refresh plan (see app/services/rolling_refresh.py)."""
+    __tablename__ = "rolling_refreshes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String, nullable=False)  # sequential, parallel, all_at_once
+    status = Column(String, nullable=False, default="running")  # running, completed, failed, cancelled
+    skip_drain = Column(Boolean, nullable=False, default=False)
+
+    # Disruption budget: nodes that may be unavailable at once, counting
+    # workers that are NotReady/cordoned for other reasons
+    max_unavailable = Column(Integer, nullable=False)
+    # Nodes refreshed concurrently; adapted to node turnaround in parallel mode
+    batch_size = Column(Integer, nullable=False)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class RollingRefreshNode(Base):
+    """One node of a rolling refresh, with its step journal."""
+    __tablename__ = "rolling_refresh_nodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    refresh_id = Column(Integer, nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    device_id = Column(Integer, nullable=False)
+    hostname = Column(String, nullable=False)
+    mac_address = Column(String, nullable=False)
+    ip_address = Column(String, nullable=False)
+
+    # Last step entered; a resumed refresh restarts the node at this step
+    step = Column(String, nullable=False, default="pending")
+    message = Column(Text, nullable=True)
+    journal = Column(Text, nullable=True)  # JSON list of [timestamp, step, message]
+
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
 class HelmRelease(Base):
     __tablename__ = "helm_releases"
 
@@ -187,6 +228,33 @@ class HelmRelease(Base):
     deployed_at = Column(DateTime(timezone=True), nullable=True)
 
 
+class HelmJob(Base):
+    """A queued helm install/upgrade/uninstall (see app/services/helm_jobs.py)."""
+    __tablename__ = "helm_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Not a foreign key: uninstall deletes the release while its job is kept
+    release_id = Column(Integer, nullable=False, index=True)
+    release_name = Column(String, nullable=False)
+    namespace = Column(String, nullable=False)
+    operation = Column(String, nullable=False)  # install, upgrade, uninstall
+    params_json = Column(Text, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+
+    # queued, running, succeeded, failed, cancelled, interrupted
+    status = Column(String, nullable=False, default="queued")
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_helm_jobs_status_priority", "status", "priority"),
+    )
+
+
 class HelmRepository(Base):
     __tablename__ = "helm_repositories"
 
@@ -206,3 +274,19 @@ class AuditLog(Base):
     details = Column(Text, nullable=True)
     entity_type = Column(String, nullable=True)
     entity_id = Column(String, nullable=True)
+
+    # Keyset pages are ordered by (timestamp, id). id is the rowid, which
+    # SQLite appends to every index, so these serve filtered pages directly.
+    __table_args__ = (
+        Index("ix_audit_logs_page_timestamp", "page", "timestamp"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp"),
+    )
+
+
+# Full-text search (see app/db/fts.py)
+from app.db.fts import register_fts  # noqa: E402
+
+register_fts(AuditLog.__table__, "audit_logs_fts",
+             ["action", "page", "details", "entity_type", "entity_id"])
+register_fts(HelmRelease.__table__, "helm_releases_fts",
+             ["release_name", "namespace", "chart_name", "status_message", "log_output"])
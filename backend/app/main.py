@@ -1,12 +1,12 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.api import network_router, cluster_router, device_router, volume_router, terminal_router, audit_router, module_router
+from app.api import network_router, cluster_router, device_router, volume_router, terminal_router, audit_router, module_router, boot_asset_router
 from app.services.websocket_manager import websocket_manager
 from app.db.database import init_db, SessionLocal
 from app.services.talos_downloader import talos_downloader
 from app.services.ipxe_downloader import ipxe_downloader
+from app.services.startup_manager import startup_manager
 from app.crud import network as network_crud
 from pathlib import Path
 import asyncio
@@ -21,101 +21,113 @@ app = FastAPI(
     version="0.1.0"
 )
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    init_db()
+startup_manager.register("database", init_db, description="Create tables and run migrations")
 
-    # Download iPXE bootloader files if missing (one-time setup)
-    # Files are downloaded directly to TFTP root since we're running as root
-    try:
-        db = SessionLocal()
-        try:
-            # Get TFTP root from database settings or use default
-            network_settings = network_crud.get_network_settings(db)
-            tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-            logger.info(f"Using TFTP root: {tftp_root}")
-            
-            # Initialize downloader with TFTP root (downloads directly there)
-            from app.services.ipxe_downloader import IPXEDownloader
-            ipxe_downloader = IPXEDownloader(tftp_root=tftp_root)
-            
-            logger.info("Checking for iPXE bootloader files...")
-            if not ipxe_downloader.check_all_bootloaders_exist():
-                logger.info("iPXE bootloader files missing, downloading...")
-                success, errors = ipxe_downloader.download_all_bootloaders()
-                if success:
-                    logger.info("Successfully downloaded all iPXE bootloader files to TFTP root")
-                else:
-                    logger.error(f"Failed to download some iPXE bootloaders: {'; '.join(errors)}")
-            else:
-                logger.info("All iPXE bootloader files already present in TFTP root")
-            
-            # Build custom chainboot bootloaders with embedded scripts
-            # These auto-load boot.ipxe without showing menu prompts
-            # The builder will automatically attempt to install/build makebin if needed
-            try:
-                from app.services.ipxe_builder import IPXEBuilder
-                server_ip = network_settings.server_ip if network_settings else "10.0.42.2"
-                ipxe_builder = IPXEBuilder(tftp_root=tftp_root, server_ip=server_ip)
-                
-                logger.info("Building custom chainboot bootloaders (auto-installing tools if needed)...")
-                success, errors = ipxe_builder.build_all_custom_bootloaders()
-                if success:
-                    logger.info("Successfully built custom chainboot bootloaders")
-                    logger.info("Custom bootloaders will auto-chainload boot.ipxe without menu prompts")
-                else:
-                    if "makebin" in str(errors).lower() or "not available" in str(errors).lower():
-                        logger.warning("Could not build custom bootloaders - makebin unavailable")
-                        logger.warning("The builder attempted to install/build makebin automatically")
-                        logger.warning("You may need to install build tools manually:")
-                        logger.warning("  - git, make, gcc (for building from source)")
-                        logger.warning("  - Or install iPXE development packages")
-                        logger.warning("Falling back to standard bootloaders (may show menu prompts)")
-                        logger.info("Chainboot script created at TFTP root - can be used manually")
-                    else:
-                        logger.error(f"Failed to build some custom bootloaders: {'; '.join(errors)}")
-            except Exception as e:
-                logger.warning(f"Could not build custom bootloaders (non-fatal): {e}")
-                import traceback
-                logger.debug(traceback.format_exc())
-        finally:
-            db.close()
-    except Exception as e:
-        logger.error(f"Error checking iPXE bootloader files on startup: {e}")
+# ---------------------------------------------------------------------------
+# Startup stages — only the database is initialised before serving; the rest
+# runs in the background so PXE clients get answers right after a restart.
+# Progress is reported by /health/ready and the system.startup_status action.
+# ---------------------------------------------------------------------------
 
-    # Check if Talos boot files exist for the configured version
-    # Files are downloaded directly to TFTP root since we're running as root
+def _get_tftp_settings():
     db = SessionLocal()
     try:
         network_settings = network_crud.get_network_settings(db)
-        if network_settings and network_settings.talos_version:
-            version = network_settings.talos_version
-            tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
-            logger.info(f"Checking for Talos {version} boot files in TFTP root: {tftp_root}")
-            
-            # Initialize downloader with TFTP root (downloads directly there)
-            from app.services.talos_downloader import TalosDownloader
-            talos_downloader = TalosDownloader(tftp_root=tftp_root)
-            
-            # Check if files exist
-            vmlinuz_exists = talos_downloader.file_exists(version, "vmlinuz-amd64")
-            initramfs_exists = talos_downloader.file_exists(version, "initramfs-amd64.xz")
-
-            if not vmlinuz_exists or not initramfs_exists:
-                logger.info(f"Talos {version} files missing, downloading...")
-                success, errors = talos_downloader.download_talos_files(version)
-                if success:
-                    logger.info(f"Successfully downloaded Talos {version} boot files to TFTP root")
-                else:
-                    logger.error(f"Failed to download Talos files: {'; '.join(errors)}")
-            else:
-                logger.info(f"Talos {version} boot files already present in TFTP root")
-    except Exception as e:
-        logger.error(f"Error checking Talos files on startup: {e}")
+        tftp_root = network_settings.tftp_root if network_settings else "/var/lib/tftpboot"
+        server_ip = network_settings.server_ip if network_settings else "10.0.42.2"
+        talos_version = network_settings.talos_version if network_settings else None
+        return tftp_root, server_ip, talos_version
     finally:
         db.close()
-    
+
+
+@startup_manager.stage("ipxe_bootloaders", depends_on=["database"],
+                       description="Download iPXE bootloader files")
+def _stage_ipxe_bootloaders():
+    # Download iPXE bootloader files if missing (one-time setup)
+    # Files are downloaded directly to TFTP root since we're running as root
+    tftp_root, _, _ = _get_tftp_settings()
+    logger.info(f"Using TFTP root: {tftp_root}")
+
+    # Initialize downloader with TFTP root (downloads directly there)
+    from app.services.ipxe_downloader import IPXEDownloader
+    ipxe_downloader = IPXEDownloader(tftp_root=tftp_root)
+
+    logger.info("Checking for iPXE bootloader files...")
+    if ipxe_downloader.check_all_bootloaders_exist():
+        logger.info("All iPXE bootloader files already present in TFTP root")
+        return "already present"
+
+    logger.info("iPXE bootloader files missing, downloading...")
+    startup_manager.set_message("ipxe_bootloaders", "downloading")
+    success, errors = ipxe_downloader.download_all_bootloaders()
+    if not success:
+        raise RuntimeError(f"Failed to download some iPXE bootloaders: {'; '.join(errors)}")
+    logger.info("Successfully downloaded all iPXE bootloader files to TFTP root")
+    return "downloaded"
+
+
+@startup_manager.stage("ipxe_custom_build", depends_on=["ipxe_bootloaders"], required=False,
+                       description="Build chainboot bootloaders with embedded script")
+def _stage_ipxe_custom_build():
+    # Build custom chainboot bootloaders with embedded scripts
+    # These auto-load boot.ipxe without showing menu prompts
+    # The builder will automatically attempt to install/build makebin if needed
+    from app.services.ipxe_builder import IPXEBuilder
+    tftp_root, server_ip, _ = _get_tftp_settings()
+    ipxe_builder = IPXEBuilder(tftp_root=tftp_root, server_ip=server_ip)
+
+    logger.info("Building custom chainboot bootloaders (auto-installing tools if needed)...")
+    success, errors = ipxe_builder.build_all_custom_bootloaders()
+    if success:
+        logger.info("Successfully built custom chainboot bootloaders")
+        logger.info("Custom bootloaders will auto-chainload boot.ipxe without menu prompts")
+        return "built"
+    if "makebin" in str(errors).lower() or "not available" in str(errors).lower():
+        logger.warning("Could not build custom bootloaders - makebin unavailable")
+        logger.warning("The builder attempted to install/build makebin automatically")
+        logger.warning("You may need to install build tools manually:")
+        logger.warning("  - git, make, gcc (for building from source)")
+        logger.warning("  - Or install iPXE development packages")
+        logger.warning("Falling back to standard bootloaders (may show menu prompts)")
+        logger.info("Chainboot script created at TFTP root - can be used manually")
+        raise RuntimeError("makebin unavailable — using standard bootloaders")
+    raise RuntimeError(f"Failed to build some custom bootloaders: {'; '.join(errors)}")
+
+
+@startup_manager.stage("talos_boot_files", depends_on=["database"],
+                       description="Ensure Talos kernel/initramfs for the configured version")
+def _stage_talos_boot_files():
+    # Check if Talos boot files exist for the configured version
+    # Files are downloaded directly to TFTP root since we're running as root
+    tftp_root, _, version = _get_tftp_settings()
+    if not version:
+        return "no Talos version configured"
+    logger.info(f"Checking for Talos {version} boot files in TFTP root: {tftp_root}")
+
+    # Initialize downloader with TFTP root (downloads directly there)
+    from app.services.talos_downloader import TalosDownloader
+    talos_downloader = TalosDownloader(tftp_root=tftp_root)
+
+    # Check if files exist
+    vmlinuz_exists = talos_downloader.file_exists(version, "vmlinuz-amd64")
+    initramfs_exists = talos_downloader.file_exists(version, "initramfs-amd64.xz")
+    if vmlinuz_exists and initramfs_exists:
+        logger.info(f"Talos {version} boot files already present in TFTP root")
+        return f"Talos {version} present"
+
+    logger.info(f"Talos {version} files missing, downloading...")
+    startup_manager.set_message("talos_boot_files", f"downloading Talos {version}")
+    success, errors = talos_downloader.download_talos_files(version)
+    if not success:
+        raise RuntimeError(f"Failed to download Talos files: {'; '.join(errors)}")
+    logger.info(f"Successfully downloaded Talos {version} boot files to TFTP root")
+    return f"Talos {version} downloaded"
+
+
+@startup_manager.stage("background_loops", depends_on=["database"],
+                       description="Health checker and dashboard broadcasters")
+async def _stage_background_loops():
     # Start background health checker
     from app.services.health_checker import health_check_loop
     asyncio.create_task(health_check_loop())
@@ -128,46 +140,147 @@ async def startup_event():
     from app.api.handlers.metrics import start_metrics_broadcaster
     start_metrics_broadcaster()
 
+
+@startup_manager.stage("credentials", depends_on=["database"], required=False,
+                       description="Keep talosconfig, kubeconfig and the terminal env current")
+async def _stage_credentials():
+    from app.services.credentials_service import credentials_service
+    credentials_service.start()
+
+
+@startup_manager.stage("audit_writer", depends_on=["database"], required=False,
+                       description="Replay the audit journal and start batched audit writes")
+async def _stage_audit_writer():
+    from app.services.audit_service import audit_writer
+    await audit_writer.start()
+    if audit_writer.replayed:
+        return f"replayed {audit_writer.replayed} entries"
+
+
+@startup_manager.stage("audit_retention", depends_on=["audit_writer"], required=False,
+                       description="Archive audit entries past the retention period")
+async def _stage_audit_retention():
+    from app.services.audit_archive import audit_retention
+    if audit_retention.start() is None:
+        return "disabled"
+    return f"{audit_retention.retention_days} days"
+
+
+@startup_manager.stage("helm_jobs", depends_on=["database"], required=False,
+                       description="Reconcile interrupted helm jobs and start the job queue")
+async def _stage_helm_jobs():
+    from app.services.helm_jobs import helm_jobs
+    await helm_jobs.start()
+    if helm_jobs.reconciled:
+        return f"reconciled {helm_jobs.reconciled} interrupted jobs"
+
+
+@startup_manager.stage("rolling_refresh", depends_on=["database"], required=False,
+                       description="Resume a rolling refresh interrupted by a restart")
+async def _stage_rolling_refresh():
+    from app.services.rolling_refresh import rolling_refresh
+    refresh_id = await rolling_refresh.resume()
+    if refresh_id is not None:
+        return f"resumed refresh {refresh_id}"
+
+
+@startup_manager.stage("prefetch", depends_on=["database"], required=False,
+                       description="Resume an unfinished prefetch of the configured Talos version")
+async def _stage_prefetch():
+    from app.services.prefetch_service import resume_for_settings
+    db = SessionLocal()
+    try:
+        task = resume_for_settings(db)
+    finally:
+        db.close()
+    if task is not None:
+        return "resumed"
+
+
+@startup_manager.stage("kubectl", depends_on=["database"], required=False,
+                       description="Install the configured kubectl version")
+def _stage_kubectl():
     # Check and download kubectl if needed
+    from app.crud import cluster as cluster_crud
+    from app.services.kubectl_downloader import KubectlDownloader
+
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        try:
-            from app.crud import cluster as cluster_crud
-            from app.services.kubectl_downloader import KubectlDownloader
-            
-            cluster_settings = cluster_crud.get_cluster_settings(db)
-            if cluster_settings and cluster_settings.kubectl_version:
-                kubectl_version = cluster_settings.kubectl_version
-                logger.info(f"Checking for kubectl {kubectl_version}...")
-                
-                kubectl_downloader = KubectlDownloader()
-                
-                # Set kubectl version (downloads if needed)
-                success, error = kubectl_downloader.set_kubectl_version(kubectl_version)
-                if success:
-                    logger.info(f"kubectl {kubectl_version} is ready for terminal use")
-                else:
-                    logger.warning(f"Could not set kubectl version {kubectl_version}: {error}")
-            else:
-                # Default kubectl version if no cluster settings
-                logger.info("No cluster settings found, using default kubectl version 1.28.0")
-                kubectl_downloader = KubectlDownloader()
-                kubectl_downloader.set_kubectl_version("1.28.0")
-        finally:
-            db.close()
-    except Exception as e:
-        logger.warning(f"Error setting up kubectl on startup (non-fatal): {e}")
+        cluster_settings = cluster_crud.get_cluster_settings(db)
+        kubectl_version = cluster_settings.kubectl_version if cluster_settings else None
+    finally:
+        db.close()
+
+    if not kubectl_version:
+        # Default kubectl version if no cluster settings
+        logger.info("No cluster settings found, using default kubectl version 1.28.0")
+        kubectl_version = "1.28.0"
+    logger.info(f"Checking for kubectl {kubectl_version}...")
+
+    # Set kubectl version (downloads if needed)
+    success, error = KubectlDownloader().set_kubectl_version(kubectl_version)
+    if not success:
+        raise RuntimeError(f"Could not set kubectl version {kubectl_version}: {error}")
+    logger.info(f"kubectl {kubectl_version} is ready for terminal use")
+    return f"kubectl {kubectl_version}"
+
+
+@app.on_event("startup")
+async def startup_event():
+    init_db()
+    startup_manager.mark_done("database")
+
+    # Everything else runs in the background, in dependency order
+    startup_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.audit_archive import audit_retention
+    from app.services.audit_service import audit_writer
+    from app.services.credentials_service import credentials_service
+    from app.services.helm_jobs import helm_jobs
+    from app.services.prefetch_service import prefetch_service
+    from app.services.rolling_refresh import rolling_refresh
+    # Running helm jobs are terminated and resumed/reconciled on next start
+    await helm_jobs.stop()
+    # A rolling refresh keeps its plan and node journal and resumes on next start
+    await rolling_refresh.stop()
+    # Unfinished prefetches are resumed on next start
+    prefetch_service.stop()
+    # Credentials are re-checked on the first loop iteration after start
+    credentials_service.stop()
+    # Write out queued audit entries; the journal covers an unclean exit
+    audit_retention.stop()
+    await audit_writer.stop()
 
 # Additional middleware to ensure CORS headers are always present
-# This runs after CORSMiddleware to ensure headers are on all responses
-class CORSHeaderMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        # Add CORS headers to all responses (ensures they're present even on errors)
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        return response
+# This runs after CORSMiddleware to ensure headers are on all responses.
+# Implemented as plain ASGI (not BaseHTTPMiddleware) so streamed boot assets
+# pass through untouched.
+class CORSHeaderMiddleware:
+    _CORS_HEADERS = [
+        (b"access-control-allow-origin", b"*"),
+        (b"access-control-allow-methods", b"GET, POST, PUT, DELETE, OPTIONS, PATCH"),
+        (b"access-control-allow-headers", b"*"),
+    ]
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                # Add CORS headers to all responses (ensures they're present even on errors)
+                names = {name for name, _ in self._CORS_HEADERS}
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in names]
+                message = {**message, "headers": headers + self._CORS_HEADERS}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
 
 # CORS middleware for Vue frontend
 # Allow all origins for native installation (when accessing from remote IPs)
@@ -185,6 +298,10 @@ app.add_middleware(
 # Add CORS header middleware (runs last to ensure headers on all responses)
 app.add_middleware(CORSHeaderMiddleware)
 
+# Per-route latency histograms for /metrics (outermost, so it times everything)
+from app.services.instrumentation import MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+
 # Define routes before including routers to avoid conflicts
 @app.get("/")
 async def root():
@@ -198,6 +315,42 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+# Readiness: 200 once required startup stages finished, 503 with progress otherwise
+@app.get("/health/ready")
+async def health_ready():
+    from fastapi.responses import JSONResponse
+    status = startup_manager.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    from app.services.instrumentation import render_metrics
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Sampling profiler toggle — collapsed stacks for flamegraph.pl / speedscope.
+# Unauthenticated, so only routed when ENABLE_PROFILER is set.
+def require_profiler_enabled():
+    from app.core.config import settings
+    if not settings.ENABLE_PROFILER:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.post("/debug/profiler/start", dependencies=[Depends(require_profiler_enabled)])
+async def profiler_start(interval_ms: float = 5.0):
+    from app.services.instrumentation import profiler
+    started = profiler.start(interval_ms)
+    return {"started": started, **profiler.status()}
+
+@app.post("/debug/profiler/stop", dependencies=[Depends(require_profiler_enabled)])
+async def profiler_stop():
+    from app.services.instrumentation import profiler
+    return Response(content=profiler.stop(), media_type="text/plain")
+
+@app.get("/debug/profiler", dependencies=[Depends(require_profiler_enabled)])
+async def profiler_status():
+    from app.services.instrumentation import profiler
+    return profiler.status()
+
 # Serve boot.ipxe via HTTP - must be defined before device_router with empty prefix
 @app.get("/pxe/boot.ipxe")
 async def serve_boot_ipxe():
@@ -220,6 +373,9 @@ async def serve_boot_ipxe():
     finally:
         db.close()
 
+# Serve Talos kernel/initramfs over HTTP (much faster than TFTP for mass boots)
+app.include_router(boot_asset_router.router, tags=["pxe"])
+
 # Register a device by MAC address during PXE boot
 # Called by boot.ipxe to ensure all booting devices appear in the UI
 @app.get("/pxe/register/{mac_address}")
@@ -19,3 +19,4 @@ class AuditLogResponse(BaseModel):
 class AuditLogListResponse(BaseModel):
     logs: List[AuditLogResponse]
     total: int
+    next_cursor: Optional[str] = None
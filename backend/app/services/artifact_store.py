@@ -0,0 +1,416 @@
+"""Content-addressed store for downloaded boot files and binaries.
+
+Talos kernels/initramfs and kubectl binaries are large and accumulate with
+every version switch.  The store keeps one copy of each unique file as a
+sha256-named blob under ``ARTIFACTS_DIR/blobs`` and exposes it at its usual
+location (``tftp_root/pxe/talos/vmlinuz-amd64-v1.12.2``,
+``kubectl-versions/kubectl-1.28.0``) via a hardlink, falling back to a
+symlink when the two paths live on different filesystems.
+
+An index (``ARTIFACTS_DIR/index.json``) maps every ``kind/name/version`` to
+its blob and tracks when it was last used, which drives retention-based
+garbage collection of versions no longer referenced by the settings tables.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings, ensure_v_prefix, strip_v_prefix
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK = 1024 * 1024
+
+# Number of unreferenced versions (per kind) kept around for quick rollback
+DEFAULT_RETAIN = 1
+
+KIND_TALOS = "talos"
+KIND_KUBECTL = "kubectl"
+
+
+def _normalize_version(kind: str, version: str) -> str:
+    """Talos files are stored v-prefixed, kubectl binaries without the prefix."""
+    if kind == KIND_TALOS:
+        return ensure_v_prefix(version)
+    return strip_v_prefix(version)
+
+
+def sha256_file(path: Path) -> str:
+    """Stream a file through sha256 and return the hex digest."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactStore:
+    """sha256-addressed blob store with a JSON index of named versions."""
+
+    def __init__(self, root: str = None):
+        root_path = Path(root or os.getenv("ARTIFACTS_DIR", settings.ARTIFACTS_DIR))
+        self.root = root_path
+        self.blobs_dir = root_path / "blobs" / "sha256"
+        self.index_file = root_path / "index.json"
+        self._lock = threading.RLock()
+        try:
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Cannot create artifact store at {root_path}: {e}")
+
+    # ------------------------------------------------------------------
+    # Index persistence
+    # ------------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            if self.index_file.exists():
+                return json.loads(self.index_file.read_text())
+        except Exception as e:
+            logger.warning(f"Artifact index unreadable, starting empty: {e}")
+        return {}
+
+    def _save_index(self, index: Dict[str, dict]):
+        tmp = self.index_file.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(index, indent=2, sort_keys=True))
+        os.replace(tmp, self.index_file)
+
+    @staticmethod
+    def _key(kind: str, name: str, version: str) -> str:
+        return f"{kind}/{name}/{_normalize_version(kind, version)}"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    # ------------------------------------------------------------------
+    # Linking helpers
+    # ------------------------------------------------------------------
+
+    def _link_into_place(self, blob: Path, dest: Path) -> str:
+        """Atomically make ``dest`` refer to ``blob``. Returns the link type used."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        if tmp.exists() or tmp.is_symlink():
+            tmp.unlink()
+        try:
+            os.link(blob, tmp)
+            link_type = "hardlink"
+        except OSError:
+            # Different filesystem (or FS without hardlinks) — fall back to symlink
+            os.symlink(blob, tmp)
+            link_type = "symlink"
+        os.replace(tmp, dest)
+        return link_type
+
+    def _is_linked(self, blob: Path, dest: Path) -> bool:
+        """True if ``dest`` currently refers to ``blob`` (hardlink or symlink)."""
+        try:
+            if dest.is_symlink():
+                return Path(os.readlink(dest)) == blob
+            return dest.exists() and os.path.samefile(dest, blob)
+        except OSError:
+            return False
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def ingest(self, path: Path, kind: str, name: str, version: str) -> Optional[dict]:
+        """Move a freshly downloaded file into the store and link it back.
+
+        If a blob with the same content already exists the file is replaced
+        by a link to it, so identical artifacts only occupy disk once.
+
+        Returns the index entry, or None if ``path`` does not exist.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+
+        with self._lock:
+            digest = sha256_file(path)
+            size = path.stat().st_size
+            blob = self.blob_path(digest)
+
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(path, blob)
+                except OSError:
+                    shutil.copy2(path, blob)
+                logger.info(f"Stored new artifact blob {digest[:12]} ({size / 1024 / 1024:.1f} MB)")
+            else:
+                logger.info(f"Artifact {path.name} deduplicated against blob {digest[:12]}")
+
+            link_type = "hardlink"
+            if not self._is_linked(blob, path):
+                link_type = self._link_into_place(blob, path)
+            elif path.is_symlink():
+                link_type = "symlink"
+
+            now = time.time()
+            index = self._load_index()
+            key = self._key(kind, name, version)
+            entry = index.get(key, {})
+            entry.update({
+                "kind": kind,
+                "name": name,
+                "version": _normalize_version(kind, version),
+                "sha256": digest,
+                "size": size,
+                "path": str(path),
+                "link": link_type,
+                "added_at": entry.get("added_at", now),
+                "last_used": now,
+            })
+            index[key] = entry
+            self._save_index(index)
+            return entry
+
+    def touch(self, kind: str, name: str, version: str):
+        """Mark a version as recently used (drives LRU retention)."""
+        with self._lock:
+            index = self._load_index()
+            key = self._key(kind, name, version)
+            if key in index:
+                index[key]["last_used"] = time.time()
+                self._save_index(index)
+
+    def get(self, kind: str, name: str, version: str) -> Optional[dict]:
+        """Return the index entry for a named artifact, if managed."""
+        return self._load_index().get(self._key(kind, name, version))
+
+    def entries(self) -> List[dict]:
+        return list(self._load_index().values())
+
+    def adopt(self, directory: Path, kind: str, patterns: Dict[str, str]) -> int:
+        """Ingest pre-existing, unmanaged files from ``directory``.
+
+        ``patterns`` maps an artifact name to a filename prefix/suffix template
+        containing ``{version}``, e.g. ``{"vmlinuz-amd64": "vmlinuz-amd64-{version}"}``.
+        Returns the number of files adopted.
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return 0
+
+        managed = {e["path"] for e in self.entries()}
+        adopted = 0
+        for name, template in patterns.items():
+            prefix, _, suffix = template.partition("{version}")
+            for f in directory.iterdir():
+                if not f.is_file() or str(f) in managed:
+                    continue
+                fname = f.name
+                if not fname.startswith(prefix) or not fname.endswith(suffix):
+                    continue
+                version = fname[len(prefix):len(fname) - len(suffix) if suffix else None]
+                if not version:
+                    continue
+                try:
+                    self.ingest(f, kind, name, version)
+                    adopted += 1
+                except Exception as e:
+                    logger.warning(f"Could not adopt {f}: {e}")
+        return adopted
+
+    def usage(self) -> dict:
+        """Report logical vs physical disk usage, grouped by kind and version."""
+        index = self._load_index()
+
+        blob_bytes = 0
+        blob_count = 0
+        if self.blobs_dir.exists():
+            for blob in self.blobs_dir.glob("*/*"):
+                if blob.is_file():
+                    blob_bytes += blob.stat().st_size
+                    blob_count += 1
+
+        versions: Dict[str, dict] = {}
+        logical = 0
+        for entry in index.values():
+            vkey = f"{entry['kind']}/{entry['version']}"
+            v = versions.setdefault(vkey, {
+                "kind": entry["kind"],
+                "version": entry["version"],
+                "files": [],
+                "size": 0,
+                "last_used": 0,
+            })
+            v["files"].append({
+                "name": entry["name"],
+                "sha256": entry["sha256"],
+                "size": entry["size"],
+                "path": entry["path"],
+                "present": Path(entry["path"]).exists(),
+            })
+            v["size"] += entry["size"]
+            v["last_used"] = max(v["last_used"], entry.get("last_used", 0))
+            logical += entry["size"]
+
+        return {
+            "root": str(self.root),
+            "blob_count": blob_count,
+            "physical_bytes": blob_bytes,
+            "logical_bytes": logical,
+            "dedup_saved_bytes": max(0, logical - blob_bytes),
+            "versions": sorted(versions.values(), key=lambda v: v["last_used"], reverse=True),
+        }
+
+    def gc(self, referenced: Dict[str, Set[str]], retain: int = DEFAULT_RETAIN,
+           max_age_days: Optional[float] = None, dry_run: bool = False) -> dict:
+        """Remove versions not referenced by the current settings.
+
+        Per kind, referenced versions are always kept; of the rest the
+        ``retain`` most recently used survive, unless older than
+        ``max_age_days``.  Blobs left without any index entry are deleted.
+        """
+        with self._lock:
+            index = self._load_index()
+            now = time.time()
+
+            by_kind: Dict[str, Dict[str, float]] = {}
+            for entry in index.values():
+                kv = by_kind.setdefault(entry["kind"], {})
+                kv[entry["version"]] = max(kv.get(entry["version"], 0), entry.get("last_used", 0))
+
+            doomed: Set[tuple] = set()
+            for kind, versions in by_kind.items():
+                keep = {_normalize_version(kind, v) for v in referenced.get(kind, set()) if v}
+                candidates = sorted(
+                    (v for v in versions if v not in keep),
+                    key=lambda v: versions[v], reverse=True,
+                )
+                for i, v in enumerate(candidates):
+                    too_old = max_age_days is not None and now - versions[v] > max_age_days * 86400
+                    if i >= retain or too_old:
+                        doomed.add((kind, v))
+
+            removed_entries = []
+            for key, entry in list(index.items()):
+                if (entry["kind"], entry["version"]) not in doomed:
+                    continue
+                removed_entries.append(key)
+                if dry_run:
+                    continue
+                p = Path(entry["path"])
+                if self._is_linked(self.blob_path(entry["sha256"]), p):
+                    try:
+                        p.unlink()
+                    except OSError as e:
+                        logger.warning(f"Could not remove {p}: {e}")
+                del index[key]
+
+            removed = set(removed_entries)
+            live = {e["sha256"] for k, e in index.items() if k not in removed}
+            removed_blobs = []
+            freed = 0
+            if self.blobs_dir.exists():
+                for blob in self.blobs_dir.glob("*/*"):
+                    if blob.name in live:
+                        continue
+                    freed += blob.stat().st_size
+                    removed_blobs.append(blob.name)
+                    if not dry_run:
+                        blob.unlink()
+
+            if not dry_run:
+                self._save_index(index)
+
+            if removed_entries:
+                logger.info(f"Artifact GC removed {len(removed_entries)} entries, "
+                            f"{len(removed_blobs)} blobs ({freed / 1024 / 1024:.1f} MB)")
+            return {
+                "removed_versions": sorted(f"{k}/{v}" for k, v in doomed),
+                "removed_entries": removed_entries,
+                "removed_blobs": removed_blobs,
+                "freed_bytes": freed,
+                "dry_run": dry_run,
+            }
+
+    def verify(self, repair: bool = True) -> dict:
+        """Re-hash every blob and check that each named path still links to it.
+
+        Corrupt blobs are dropped together with their index entries so the
+        next download fetches a fresh copy.  Missing or replaced links are
+        restored from an intact blob when ``repair`` is set.
+        """
+        with self._lock:
+            index = self._load_index()
+            corrupt: List[str] = []
+            relinked: List[str] = []
+            checked = 0
+
+            digests = {e["sha256"] for e in index.values()}
+            for digest in digests:
+                blob = self.blob_path(digest)
+                checked += 1
+                if not blob.exists() or sha256_file(blob) != digest:
+                    corrupt.append(digest)
+
+            for key, entry in list(index.items()):
+                blob = self.blob_path(entry["sha256"])
+                p = Path(entry["path"])
+                if entry["sha256"] in corrupt:
+                    if repair:
+                        if p.exists() or p.is_symlink():
+                            try:
+                                p.unlink()
+                            except OSError:
+                                pass
+                        del index[key]
+                    continue
+                if not self._is_linked(blob, p):
+                    if repair:
+                        entry["link"] = self._link_into_place(blob, p)
+                    relinked.append(entry["path"])
+
+            if repair:
+                for digest in corrupt:
+                    blob = self.blob_path(digest)
+                    if blob.exists():
+                        blob.unlink()
+                self._save_index(index)
+
+            if corrupt:
+                logger.error(f"Artifact verification found {len(corrupt)} corrupt blob(s)")
+            return {
+                "checked": checked,
+                "corrupt": corrupt,
+                "relinked": relinked,
+                "repaired": repair,
+            }
+
+
+def get_referenced_versions(db) -> Dict[str, Set[str]]:
+    """Versions still in use according to NetworkSettings/ClusterSettings."""
+    from app.crud import network as network_crud, cluster as cluster_crud
+
+    referenced: Dict[str, Set[str]] = {KIND_TALOS: set(), KIND_KUBECTL: set()}
+    ns = network_crud.get_network_settings(db)
+    cs = cluster_crud.get_cluster_settings(db)
+    if ns and ns.talos_version:
+        referenced[KIND_TALOS].add(ensure_v_prefix(ns.talos_version))
+    if cs:
+        if cs.talos_version:
+            referenced[KIND_TALOS].add(ensure_v_prefix(cs.talos_version))
+        for v in (cs.kubectl_version, cs.kubernetes_version):
+            if v:
+                referenced[KIND_KUBECTL].add(strip_v_prefix(v))
+    return referenced
+
+
+TALOS_PATTERNS = {
+    "vmlinuz-amd64": "vmlinuz-amd64-{version}",
+    "initramfs-amd64.xz": "initramfs-amd64-{version}.xz",
+}
+KUBECTL_PATTERNS = {"kubectl": "kubectl-{version}"}
+
+
+artifact_store = ArtifactStore()
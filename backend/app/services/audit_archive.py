@@ -0,0 +1,231 @@
+"""Audit log retention and archival.
+
+Rows older than ``AUDIT_RETENTION_DAYS`` are moved out of SQLite into one
+gzip-compressed JSON-lines file per month (``audit-YYYY-MM.jsonl.gz``) in
+the archive directory next to the database.  Each pass appends a gzip
+member per month and fsyncs it before the archived rows are deleted, so a
+crash can at worst archive a chunk twice, never lose it.
+
+:func:`export_lines` streams archived and live entries in chronological
+order for the export endpoint.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))  # 0 keeps everything
+ARCHIVE_INTERVAL = 24 * 60 * 60
+CHUNK_SIZE = 1000
+
+_ARCHIVE_RE = re.compile(r"^audit-(\d{4}-\d{2})\.jsonl\.gz$")
+
+
+def default_archive_dir() -> Path:
+    from app.db.database import DB_DIR
+    return DB_DIR / "audit-archive"
+
+
+def _archive_path(archive_dir: Path, month: str) -> Path:
+    if not re.fullmatch(r"\d{4}-\d{2}", month):
+        raise ValueError(f"Invalid month: {month}")
+    return archive_dir / f"audit-{month}.jsonl.gz"
+
+
+def _row_dict(log) -> dict:
+    return {
+        "id": log.id,
+        "timestamp": log.timestamp.isoformat(),
+        "action": log.action,
+        "page": log.page,
+        "details": log.details,
+        "entity_type": log.entity_type,
+        "entity_id": log.entity_id,
+    }
+
+
+def _append_month(archive_dir: Path, month: str, rows: List[dict]):
+    path = _archive_path(archive_dir, month)
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+            for row in rows:
+                gz.write((json.dumps(row) + "\n").encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_older_than(cutoff: datetime, archive_dir: Optional[Path] = None) -> int:
+    """Move rows older than ``cutoff`` into monthly archives (blocking).
+
+    Returns the number of rows archived.
+    """
+    from app.crud.audit_log import invalidate_count_cache
+    from app.db.database import SessionLocal
+    from app.db.models import AuditLog
+
+    archive_dir = archive_dir or default_archive_dir()
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    cutoff = cutoff.replace(tzinfo=None)
+    total = 0
+
+    db = SessionLocal()
+    try:
+        while True:
+            logs = (db.query(AuditLog)
+                    .filter(AuditLog.timestamp < cutoff)
+                    .order_by(AuditLog.timestamp, AuditLog.id)
+                    .limit(CHUNK_SIZE).all())
+            if not logs:
+                break
+            by_month = {}
+            for log in logs:
+                by_month.setdefault(log.timestamp.strftime("%Y-%m"), []).append(_row_dict(log))
+            for month, rows in by_month.items():
+                _append_month(archive_dir, month, rows)
+
+            db.query(AuditLog).filter(AuditLog.id.in_([log.id for log in logs])) \
+                .delete(synchronize_session=False)
+            db.commit()
+            db.expunge_all()
+            total += len(logs)
+    finally:
+        db.close()
+
+    if total:
+        invalidate_count_cache()
+        logger.info(f"Archived {total} audit log entries older than {cutoff:%Y-%m-%d}")
+    return total
+
+
+def list_archives(archive_dir: Optional[Path] = None) -> List[dict]:
+    archive_dir = archive_dir or default_archive_dir()
+    if not archive_dir.exists():
+        return []
+    archives = []
+    for path in sorted(archive_dir.iterdir()):
+        match = _ARCHIVE_RE.match(path.name)
+        if match:
+            archives.append({"month": match.group(1), "file": path.name, "size": path.stat().st_size})
+    return archives
+
+
+def archive_file(month: str, archive_dir: Optional[Path] = None) -> Optional[Path]:
+    path = _archive_path(archive_dir or default_archive_dir(), month)
+    return path if path.exists() else None
+
+
+def _matches(row: dict, start: Optional[datetime], end: Optional[datetime],
+             page: Optional[str], action: Optional[str]) -> bool:
+    if page and row["page"] != page:
+        return False
+    if action and row["action"] != action:
+        return False
+    if start or end:
+        ts = datetime.fromisoformat(row["timestamp"]).replace(tzinfo=None)
+        if start and ts < start:
+            return False
+        if end and ts >= end:
+            return False
+    return True
+
+
+def export_lines(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 page: Optional[str] = None, action: Optional[str] = None,
+                 archive_dir: Optional[Path] = None) -> Iterator[str]:
+    """JSON lines for archived, then live, entries — oldest first (blocking)."""
+    from app.db.database import SessionLocal
+    from app.db.models import AuditLog
+
+    start = start.replace(tzinfo=None) if start else None
+    end = end.replace(tzinfo=None) if end else None
+
+    for archive in list_archives(archive_dir):
+        month = archive["month"]
+        if start and month < start.strftime("%Y-%m"):
+            continue
+        if end and month > end.strftime("%Y-%m"):
+            continue
+        with gzip.open(_archive_path(archive_dir or default_archive_dir(), month), "rt") as f:
+            for line in f:
+                if _matches(json.loads(line), start, end, page, action):
+                    yield line
+
+    db = SessionLocal()
+    try:
+        query = db.query(AuditLog)
+        if start:
+            query = query.filter(AuditLog.timestamp >= start)
+        if end:
+            query = query.filter(AuditLog.timestamp < end)
+        if page:
+            query = query.filter(AuditLog.page == page)
+        if action:
+            query = query.filter(AuditLog.action == action)
+        for log in query.order_by(AuditLog.timestamp, AuditLog.id).yield_per(CHUNK_SIZE):
+            yield json.dumps(_row_dict(log)) + "\n"
+    finally:
+        db.close()
+
+
+class AuditRetention:
+    """Runs :func:`archive_older_than` once a day."""
+
+    def __init__(self, retention_days: int = RETENTION_DAYS, interval: float = ARCHIVE_INTERVAL):
+        self.retention_days = retention_days
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[float] = None
+        self.last_archived = 0
+        self.last_error: Optional[str] = None
+
+    async def run_once(self) -> int:
+        if self.retention_days <= 0:
+            return 0
+        from app.services.audit_service import flush_audit_log
+        await flush_audit_log()
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        try:
+            self.last_archived = await asyncio.to_thread(archive_older_than, cutoff)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Audit log archival failed: {e}")
+        self.last_run = datetime.now(timezone.utc).timestamp()
+        return self.last_archived
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if self.retention_days <= 0:
+            logger.info("Audit log retention disabled (AUDIT_RETENTION_DAYS=0)")
+            return None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="audit-retention")
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "retention_days": self.retention_days,
+            "last_run": self.last_run,
+            "last_archived": self.last_archived,
+            "last_error": self.last_error,
+            "archives": list_archives(),
+        }
+
+
+audit_retention = AuditRetention()
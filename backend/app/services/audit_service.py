@@ -1,11 +1,278 @@
+"""Audit logging.
+
+``log_action`` no longer writes to SQLite on the caller's hot path: entries
+are queued in memory and written by :class:`AuditWriter` in batches (one
+transaction per ``AUDIT_BATCH_SIZE`` entries or per ``AUDIT_FLUSH_INTERVAL_MS``),
+and ``audit_log_created`` is broadcast once the batch has committed.
+
+Every queued entry is first appended to a small journal next to the
+database.  The journal is rewritten to hold only uncommitted entries after
+each flush and replayed on startup, so entries queued when the process
+dies are written on the next start instead of being lost.  Appends are not
+fsynced one by one; the journal is fsynced (off the event loop) when a
+batch is flushed, so on power loss only entries queued within the last
+flush interval can be lost.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
 from sqlalchemy.orm import Session
 from app.crud.audit_log import create_audit_log
+from app.db.models import AuditLog
 from app.services.websocket_manager import websocket_manager
-from typing import Optional
+from typing import List, Optional
+import asyncio
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "200")) / 1000
+RETRY_INTERVAL = 5          # seconds between attempts while the DB is failing
+JOURNAL_NAME = "audit.journal"
+
+
+def _log_event(log: dict) -> dict:
+    return {"type": "audit_log_created", "log": log}
+
+
+async def _broadcast_logs(logs: List[dict]):
+    for log in logs:
+        try:
+            await websocket_manager.broadcast_event(_log_event(log))
+        except Exception as e:
+            logger.warning(f"Failed to broadcast audit log event: {e}")
+
+
+class AuditWriter:
+    """Batches audit entries into few transactions, journaled until committed."""
+
+    def __init__(self, journal_path: Optional[Path] = None, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        if journal_path is None:
+            from app.db.database import DB_DIR
+            journal_path = DB_DIR / JOURNAL_NAME
+        self.journal_path = Path(journal_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending: List[dict] = []
+        self._journal_fd: Optional[int] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.replayed = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # -- journal ----------------------------------------------------------
+
+    def _open_journal(self):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal_fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    def _append_journal(self, entry: dict):
+        os.write(self._journal_fd, (json.dumps(entry) + "\n").encode())
+
+    def _write_snapshot(self, entries: List[dict]) -> Path:
+        """Write ``entries`` to a temporary journal and fsync it (blocking)."""
+        tmp = self.journal_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    async def _rewrite_journal(self):
+        """Replace the journal with the entries that are still pending."""
+        snapshot = list(self.pending)
+        tmp = await asyncio.to_thread(self._write_snapshot, snapshot)
+        # Entries queued while the snapshot was written; nothing awaits from
+        # here on, so none can slip in between this and reopening the journal
+        with open(tmp, "a") as f:
+            for entry in self.pending[len(snapshot):]:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp, self.journal_path)
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+        self._open_journal()
+
+    def _read_journal(self) -> List[dict]:
+        if not self.journal_path.exists():
+            return []
+        entries = []
+        for line in self.journal_path.read_text().splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Torn final line from a crash mid-append
+                logger.warning("Skipping unreadable audit journal line")
+        return entries
+
+    # -- database ---------------------------------------------------------
+
+    @staticmethod
+    def _insert(entries: List[dict], dedupe: bool = False) -> List[dict]:
+        """Write entries in one transaction (blocking). Returns the stored rows.
+
+        With ``dedupe``, entries already in the table (a crash after commit
+        but before the journal was rewritten) are skipped.
+        """
+        from app.crud.audit_log import note_inserted
+        from app.db.database import SessionLocal
+        from app.db.models import AuditLog
+
+        db = SessionLocal()
+        try:
+            rows = []
+            for entry in entries:
+                timestamp = datetime.fromisoformat(entry["timestamp"])
+                if dedupe and db.query(AuditLog.id).filter(
+                        AuditLog.timestamp == timestamp,
+                        AuditLog.action == entry["action"],
+                        AuditLog.page == entry["page"],
+                        AuditLog.entity_id == entry["entity_id"]).first():
+                    continue
+                rows.append(AuditLog(
+                    timestamp=timestamp,
+                    action=entry["action"],
+                    page=entry["page"],
+                    details=entry["details"],
+                    entity_type=entry["entity_type"],
+                    entity_id=entry["entity_id"],
+                ))
+            db.add_all(rows)
+            db.flush()
+            stored = [{
+                "id": row.id,
+                "timestamp": row.timestamp.isoformat(),
+                "action": row.action,
+                "page": row.page,
+                "details": row.details,
+                "entity_type": row.entity_type,
+                "entity_id": row.entity_id,
+            } for row in rows]
+            db.commit()
+            note_inserted(stored)
+            return stored
+        finally:
+            db.close()
+
+    # -- queue ------------------------------------------------------------
+
+    def enqueue(self, action: str, page: str, details: Optional[str] = None,
+                entity_type: Optional[str] = None, entity_id: Optional[str] = None) -> dict:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+            "action": action,
+            "page": page,
+            "details": details,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+        }
+        self._append_journal(entry)
+        self.pending.append(entry)
+        if len(self.pending) == 1:
+            self._wake.set()
+        if len(self.pending) >= self.batch_size:
+            self._full.set()
+        return entry
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns the number of entries written."""
+        async with self._flush_lock:
+            batch = self.pending[:]
+            if not batch:
+                return 0
+            try:
+                await asyncio.to_thread(os.fsync, self._journal_fd)
+                stored = await asyncio.to_thread(self._insert, batch)
+            except Exception as e:
+                # Entries stay queued (and journaled) for the next attempt
+                self.last_error = str(e)
+                logger.error(f"Audit log flush failed ({len(batch)} entries): {e}")
+                return 0
+            del self.pending[:len(batch)]
+            await self._rewrite_journal()
+            self.written += len(stored)
+            self.batches += 1
+            self.last_error = None
+        await _broadcast_logs(stored)
+        return len(stored)
+
+    async def _loop(self):
+        while True:
+            # Idle until the first entry of a batch, then give the batch
+            # FLUSH_INTERVAL to fill up (or flush as soon as it is full)
+            await self._wake.wait()
+            self._wake.clear()
+            if len(self.pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            await self.flush()
+            if self.pending:
+                if self.last_error:
+                    await asyncio.sleep(RETRY_INTERVAL)
+                self._wake.set()
+
+    async def start(self) -> asyncio.Task:
+        """Replay the journal left by a previous run, then start flushing."""
+        if self.running:
+            return self._task
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        leftover = self._read_journal()
+        if leftover:
+            stored = await asyncio.to_thread(self._insert, leftover, True)
+            self.replayed = len(stored)
+            logger.info(f"Replayed {len(stored)} journaled audit entries "
+                        f"({len(leftover) - len(stored)} already stored)")
+        await self._rewrite_journal()
+        self._task = asyncio.create_task(self._loop(), name="audit-writer")
+        return self._task
+
+    async def stop(self):
+        """Stop the loop and flush whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_lock is not None:
+            await self.flush()
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "pending": len(self.pending),
+            "written": self.written,
+            "batches": self.batches,
+            "replayed": self.replayed,
+            "last_error": self.last_error,
+        }
+
+
+audit_writer = AuditWriter()
+
+
+async def flush_audit_log():
+    """Make queued entries visible to readers (no-op when nothing is queued)."""
+    if audit_writer.running:
+        await audit_writer.flush()
+
 
 async def log_action(
     db: Session,
@@ -14,21 +281,25 @@ async def log_action(
     details: Optional[str] = None,
     entity_type: Optional[str] = None,
     entity_id: Optional[str] = None,
-):
+) -> AuditLog:
+    """Record an action. Returns its AuditLog row.
+
+    While the writer is running the row is only queued: it has no ``id``
+    until its batch is flushed.
+    """
+    if audit_writer.running:
+        entry = audit_writer.enqueue(action, page, details, entity_type, entity_id)
+        return AuditLog(**{**entry, "timestamp": datetime.fromisoformat(entry["timestamp"])})
+
+    # Writer not started (scripts, tests): write through on the caller's session
     log = create_audit_log(db, action, page, details, entity_type, entity_id)
-    try:
-        await websocket_manager.broadcast_event({
-            "type": "audit_log_created",
-            "log": {
-                "id": log.id,
-                "timestamp": log.timestamp.isoformat(),
-                "action": log.action,
-                "page": log.page,
-                "details": log.details,
-                "entity_type": log.entity_type,
-                "entity_id": log.entity_id,
-            },
-        })
-    except Exception as e:
-        logger.warning(f"Failed to broadcast audit log event: {e}")
+    await _broadcast_logs([{
+        "id": log.id,
+        "timestamp": log.timestamp.isoformat(),
+        "action": log.action,
+        "page": log.page,
+        "details": log.details,
+        "entity_type": log.entity_type,
+        "entity_id": log.entity_id,
+    }])
     return log
@@ -1,7 +1,6 @@
 """Service for generating static Talos configuration files"""
 from pathlib import Path
 import json
-import yaml
 import logging
 import os
 from typing import Optional, Tuple, List, Dict, Any
@@ -10,6 +9,7 @@ from app.crud import cluster as cluster_crud
 from app.crud import volume as volume_crud
 from app.db.database import SessionLocal
 from app.core.config import settings, ensure_v_prefix
+from app.services.config_store import MISSING, fingerprint, file_hash, get_manifest
 
 logger = logging.getLogger(__name__)
 
@@ -37,14 +37,18 @@ class ConfigGenerator:
         self.base_dir = base_path
         self.output_dir = output_path
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = get_manifest(self.output_dir)
 
-    def _generate_volume_configs(self, db, device=None) -> List[Dict[str, Any]]:
+    def _generate_volume_configs(self, volumes: List[Dict[str, Any]], device=None) -> List[Dict[str, Any]]:
         """
         Generate VolumeConfig documents for system volumes.
 
         If a device is provided and has per-device EPHEMERAL overrides, those are
         used instead of the global EPHEMERAL VolumeConfig from the database.
 
+        Args:
+            volumes: Volume settings rows, as in ``settings_snapshot()["volumes"]``
+
         Returns:
             List of VolumeConfig dictionaries ready to be serialized to YAML
         """
@@ -55,44 +59,41 @@ class ConfigGenerator:
             device.ephemeral_max_size or device.ephemeral_min_size or device.ephemeral_disk_selector
         )
 
-        # Get all configured volumes from database
-        volumes = volume_crud.get_volume_configs(db)
-
         for volume in volumes:
             # Skip global EPHEMERAL if device has per-device overrides
-            if device_has_ephemeral and volume.name.value == "EPHEMERAL":
+            if device_has_ephemeral and volume['name'] == "EPHEMERAL":
                 continue
 
             # Only generate VolumeConfig if size limits are configured
-            if volume.max_size or volume.min_size or volume.disk_selector_match:
+            if volume['max_size'] or volume['min_size'] or volume['disk_selector_match']:
                 vol_config = {
                     'apiVersion': 'v1alpha1',
                     'kind': 'VolumeConfig',
-                    'name': volume.name.value  # Convert enum to string (EPHEMERAL or IMAGE-CACHE)
+                    'name': volume['name']  # EPHEMERAL or IMAGE-CACHE
                 }
 
                 # Build provisioning section
                 provisioning = {}
 
                 # Add disk selector if configured
-                if volume.disk_selector_match:
+                if volume['disk_selector_match']:
                     provisioning['diskSelector'] = {
-                        'match': volume.disk_selector_match
+                        'match': volume['disk_selector_match']
                     }
 
                 # Add size constraints if configured
-                if volume.min_size:
-                    provisioning['minSize'] = volume.min_size
+                if volume['min_size']:
+                    provisioning['minSize'] = volume['min_size']
 
-                if volume.max_size:
-                    provisioning['maxSize'] = volume.max_size
+                if volume['max_size']:
+                    provisioning['maxSize'] = volume['max_size']
 
                 # Set grow behavior
                 # If maxSize is set, we typically don't want auto-grow
                 # But respect the database setting
-                if volume.max_size and not volume.grow:
+                if volume['max_size'] and not volume['grow']:
                     provisioning['grow'] = False
-                elif volume.grow and not volume.max_size:
+                elif volume['grow'] and not volume['max_size']:
                     # Only explicitly set grow if true and no maxSize
                     provisioning['grow'] = True
 
@@ -100,7 +101,7 @@ class ConfigGenerator:
                 if provisioning:
                     vol_config['provisioning'] = provisioning
                     volume_configs.append(vol_config)
-                    logger.info(f"Generated VolumeConfig for {volume.name.value}")
+                    logger.info(f"Generated VolumeConfig for {volume['name']}")
 
         # Add per-device EPHEMERAL VolumeConfig if device has overrides
         if device_has_ephemeral:
@@ -124,24 +125,58 @@ class ConfigGenerator:
 
         return volume_configs
 
-    def _get_kubernetes_version(self) -> Optional[str]:
-        """Get Kubernetes version from cluster settings"""
-        db = SessionLocal()
-        try:
-            settings = cluster_crud.get_cluster_settings(db)
-            return settings.kubernetes_version if settings else None
-        finally:
-            db.close()
+    def settings_snapshot(self) -> Dict[str, Any]:
+        """Read every setting a device config depends on, in one DB session.
+
+        The snapshot is plain JSON data: renders take it as input, and its
+        fingerprint (with the device's own fields) is what the manifest
+        records to tell stale configs from current ones.
+        """
+        from app.crud import network as network_crud
+        from app.db.models import HelmRelease
 
-    def _get_cni(self) -> Optional[str]:
-        """Get CNI plugin name from cluster settings"""
         db = SessionLocal()
         try:
-            settings = cluster_crud.get_cluster_settings(db)
-            return settings.cni if settings else None
+            cs = cluster_crud.get_cluster_settings(db)
+            ns = network_crud.get_network_settings(db)
+            volumes = [{
+                'name': v.name.value,  # Convert enum to string (EPHEMERAL or IMAGE-CACHE)
+                'min_size': v.min_size,
+                'max_size': v.max_size,
+                'disk_selector_match': v.disk_selector_match,
+                'grow': v.grow,
+            } for v in volume_crud.get_volume_configs(db)]
+            longhorn = db.query(HelmRelease).filter(
+                HelmRelease.chart_name.contains("longhorn"),
+                HelmRelease.status != "uninstalling",
+            ).first()
         finally:
             db.close()
 
+        kernel_modules = []
+        if cs and cs.kernel_modules:
+            try:
+                kernel_modules = json.loads(cs.kernel_modules)
+            except ValueError:
+                pass
+
+        return {
+            'network': {
+                'dns_server': ns.dns_server or ns.server_ip,
+                'dhcp_netmask': ns.dhcp_netmask or '255.255.0.0',
+                'server_ip': ns.server_ip,
+            } if ns else {},
+            'kubernetes_version': cs.kubernetes_version if cs else None,
+            'cni': cs.cni if cs else None,
+            'install_image': cs.install_image if cs else None,
+            'kernel_modules': kernel_modules,
+            'volumes': volumes,
+            'longhorn_installed': longhorn is not None,
+            'base_configs': {
+                role: file_hash(self.base_dir / f"{role}.yaml") for role in ("controlplane", "worker")
+            },
+        }
+
     def _get_system_extensions(self) -> List[str]:
         """Get system extension images from cluster settings"""
         import json
@@ -156,31 +191,7 @@ class ConfigGenerator:
         finally:
             db.close()
 
-    def _get_install_image(self) -> Optional[str]:
-        """Get the install image URL from cluster settings (set by factory service)."""
-        db = SessionLocal()
-        try:
-            cs = cluster_crud.get_cluster_settings(db)
-            return cs.install_image if cs else None
-        except Exception:
-            return None
-        finally:
-            db.close()
-
-    def _get_kernel_modules(self) -> List[str]:
-        """Get kernel module names from cluster settings"""
-        db = SessionLocal()
-        try:
-            cs = cluster_crud.get_cluster_settings(db)
-            if cs and cs.kernel_modules:
-                return json.loads(cs.kernel_modules)
-            return []
-        except Exception:
-            return []
-        finally:
-            db.close()
-
-    def _get_disk_partitions(self, device=None) -> List[dict]:
+    def _get_disk_partitions(self, snapshot: Dict[str, Any], device=None) -> List[dict]:
         """Get extra disk partition configs based on EPHEMERAL sizing.
 
         If EPHEMERAL has a maxSize cap AND Longhorn is installed, creates a
@@ -192,50 +203,19 @@ class ConfigGenerator:
         Returns list of dicts: [{"mountpoint": "/var/mnt/longhorn", "disk": ""}]
         """
         # Check if EPHEMERAL is capped (per-device overrides take priority)
-        ephemeral_capped = False
-        db = SessionLocal()
-        try:
-            if device and device.ephemeral_max_size:
-                ephemeral_capped = True
-            else:
-                volumes = volume_crud.get_volume_configs(db)
-                for v in volumes:
-                    if v.name.value == "EPHEMERAL" and v.max_size:
-                        ephemeral_capped = True
-                        break
-
-            if not ephemeral_capped:
-                # EPHEMERAL fills the disk — no separate partition needed
-                return []
-
-            # EPHEMERAL is capped — check if Longhorn is installed
-            from app.db.models import HelmRelease
-            longhorn = db.query(HelmRelease).filter(
-                HelmRelease.chart_name.contains("longhorn"),
-                HelmRelease.status != "uninstalling",
-            ).first()
+        if device and device.ephemeral_max_size:
+            ephemeral_capped = True
+        else:
+            ephemeral_capped = any(v['name'] == "EPHEMERAL" and v['max_size'] for v in snapshot['volumes'])
 
-            if longhorn:
-                return [{"mountpoint": "/var/mnt/longhorn", "disk": ""}]
+        if not ephemeral_capped:
+            # EPHEMERAL fills the disk — no separate partition needed
             return []
-        finally:
-            db.close()
 
-    def _get_network_settings(self) -> dict:
-        """Get network settings (nameservers, gateway, subnet) from database"""
-        from app.crud import network as network_crud
-        db = SessionLocal()
-        try:
-            ns = network_crud.get_network_settings(db)
-            if not ns:
-                return {}
-            return {
-                'dns_server': ns.dns_server or ns.server_ip,
-                'dhcp_netmask': ns.dhcp_netmask or '255.255.0.0',
-                'server_ip': ns.server_ip,
-            }
-        finally:
-            db.close()
+        # EPHEMERAL is capped — a separate partition only if Longhorn is installed
+        if snapshot['longhorn_installed']:
+            return [{"mountpoint": "/var/mnt/longhorn", "disk": ""}]
+        return []
 
     @staticmethod
     def _netmask_to_cidr(netmask: str) -> int:
@@ -266,7 +246,8 @@ class ConfigGenerator:
         install_disk: Optional[str] = None,
         ephemeral_min_size: Optional[str] = None,
         ephemeral_max_size: Optional[str] = None,
-        ephemeral_disk_selector: Optional[str] = None
+        ephemeral_disk_selector: Optional[str] = None,
+        snapshot: Optional[Dict[str, Any]] = None,
     ) -> Tuple[str, Optional[Path]]:
         """
         Generate Talos configuration from raw parameters.
@@ -277,11 +258,18 @@ class ConfigGenerator:
             hostname: Hostname to set in config (optional)
             ip_address: Static IP address to set (optional)
             save_to_disk: If True, saves to compiled/talos/configs/{mac}.yaml
+                (skipped when the file already holds the same config)
+            snapshot: Settings to render with (default: ``settings_snapshot()``)
 
         Returns:
             Tuple of (config_yaml_string, output_path or None)
         """
+        from app.utils.yaml_io import dump_documents, safe_load_all
+
         try:
+            if snapshot is None:
+                snapshot = self.settings_snapshot()
+
             # Determine which base config to use
             if node_type == "controlplane":
                 base_config_file = self.base_dir / "controlplane.yaml"
@@ -297,7 +285,7 @@ class ConfigGenerator:
             # Read base configuration (handle multi-document YAML)
             with open(base_config_file, 'r') as f:
                 # Load all documents and use the first one (machine config)
-                docs = list(yaml.safe_load_all(f))
+                docs = safe_load_all(f)
                 if not docs:
                     raise ValueError(f"No YAML documents found in {base_config_file}")
                 config = docs[0]  # Use the first document (machine config)
@@ -313,7 +301,7 @@ class ConfigGenerator:
                 config['machine']['network']['hostname'] = hostname
 
             # Get network settings for CIDR, gateway, nameservers
-            net_settings = self._get_network_settings()
+            net_settings = snapshot['network']
             netmask = net_settings.get('dhcp_netmask', '255.255.0.0')
             gateway = net_settings.get('dns_server', '')
             nameservers = [net_settings['dns_server']] if net_settings.get('dns_server') else []
@@ -348,13 +336,13 @@ class ConfigGenerator:
                 logger.info(f"Set machine.install.force=true for MAC {mac_address} (wipe on next boot)")
 
             # Update kubelet version to match Kubernetes version
-            k8s_version = self._get_kubernetes_version()
+            k8s_version = snapshot['kubernetes_version']
             if k8s_version and 'machine' in config and 'kubelet' in config['machine']:
                 config['machine']['kubelet']['image'] = f'ghcr.io/siderolabs/kubelet:{ensure_v_prefix(k8s_version)}'
                 logger.info(f"Set kubelet version to {ensure_v_prefix(k8s_version)} for MAC {mac_address}")
 
             # Patch CNI settings: disable built-in flannel for custom CNIs
-            cni = self._get_cni()
+            cni = snapshot['cni']
             if cni and cni.lower() != "flannel":
                 if 'cluster' not in config:
                     config['cluster'] = {}
@@ -376,7 +364,7 @@ class ConfigGenerator:
                 logger.info(f"Set per-device install disk to {install_disk} for MAC {mac_address}")
 
             # Override install image with factory URL (or vanilla installer)
-            install_image = self._get_install_image()
+            install_image = snapshot['install_image']
             if install_image:
                 if 'install' not in config['machine']:
                     config['machine']['install'] = {}
@@ -384,7 +372,7 @@ class ConfigGenerator:
                 logger.info(f"Set install image to {install_image} for MAC {mac_address}")
 
             # Inject kernel modules
-            kernel_modules = self._get_kernel_modules()
+            kernel_modules = snapshot['kernel_modules']
             if kernel_modules:
                 config['machine']['kernel'] = {'modules': [{'name': m} for m in kernel_modules]}
                 logger.info(f"Added {len(kernel_modules)} kernel modules for MAC {mac_address}")
@@ -404,20 +392,13 @@ class ConfigGenerator:
                 storage_overrides.mac_address = mac_address
 
             # Add VolumeConfig documents
-            db = SessionLocal()
-            try:
-                volume_configs = self._generate_volume_configs(db, device=storage_overrides)
-                if volume_configs:
-                    config_docs.extend(volume_configs)
-                    logger.info(f"Added {len(volume_configs)} VolumeConfig documents for MAC {mac_address}")
-            finally:
-                db.close()
+            volume_configs = self._generate_volume_configs(snapshot['volumes'], device=storage_overrides)
+            if volume_configs:
+                config_docs.extend(volume_configs)
+                logger.info(f"Added {len(volume_configs)} VolumeConfig documents for MAC {mac_address}")
 
             # Convert all documents to YAML string, separated by ---
-            config_yaml = '\n---\n'.join([
-                yaml.dump(doc, default_flow_style=False, sort_keys=False)
-                for doc in config_docs
-            ])
+            config_yaml = dump_documents(config_docs)
 
             output_path = None
             if save_to_disk:
@@ -425,11 +406,16 @@ class ConfigGenerator:
                 output_filename = f"{mac_address}.yaml"
                 output_path = self.output_dir / output_filename
 
-                # Write configuration to file
-                with open(output_path, 'w') as f:
-                    f.write(config_yaml)
-
-                logger.info(f"Generated config for MAC {mac_address} at {output_path}")
+                # Write configuration to file (atomically, and only if it changed)
+                params = {
+                    'mac_address': mac_address, 'role': node_type, 'hostname': hostname,
+                    'ip_address': ip_address, 'wipe_on_next_boot': wipe_on_next_boot,
+                    'install_disk': install_disk, 'ephemeral_min_size': ephemeral_min_size,
+                    'ephemeral_max_size': ephemeral_max_size, 'ephemeral_disk_selector': ephemeral_disk_selector,
+                }
+                if self.manifest.write(mac_address, output_path, config_yaml,
+                                       self.config_inputs(params, snapshot, renderer="params")):
+                    logger.info(f"Generated config for MAC {mac_address} at {output_path}")
 
             return config_yaml, output_path
 
@@ -437,172 +423,214 @@ class ConfigGenerator:
             logger.error(f"Failed to generate config for MAC {mac_address}: {e}")
             raise
 
-    def generate_device_config(self, device: Device) -> Optional[Path]:
+    @staticmethod
+    def device_params(device: Device) -> Dict[str, Any]:
+        """The device fields a generated config depends on."""
+        return {
+            'mac_address': device.mac_address,
+            'role': device.role.value if device.role else DeviceRole.WORKER.value,
+            'hostname': device.hostname,
+            'ip_address': device.ip_address,
+            'wipe_on_next_boot': bool(device.wipe_on_next_boot),
+            'install_disk': device.install_disk,
+            'ephemeral_min_size': device.ephemeral_min_size,
+            'ephemeral_max_size': device.ephemeral_max_size,
+            'ephemeral_disk_selector': device.ephemeral_disk_selector,
+        }
+
+    @staticmethod
+    def config_inputs(params: Dict[str, Any], snapshot: Dict[str, Any], renderer: str = "device") -> str:
+        """Fingerprint of everything a config is rendered from.
+
+        ``renderer`` tells the two code paths apart ("device" for
+        ``generate_device_config``, "params" for ``generate_config_from_params``,
+        which the PXE config endpoint uses): they render different configs
+        from the same inputs.
+        """
+        role = params.get('role') or DeviceRole.WORKER.value
+        settings = {k: v for k, v in snapshot.items() if k != 'base_configs'}
+        return fingerprint({
+            'renderer': renderer,
+            'device': params,
+            'settings': settings,
+            'base_config': snapshot['base_configs'].get(role),
+        })
+
+    def render_device_config(self, device: Device, snapshot: Dict[str, Any]) -> str:
+        """
+        Render the configuration for a device in memory, without writing it.
+
+        Raises:
+            FileNotFoundError: if the base config for the device's role is missing
+            ValueError: if the base config has no YAML documents
+        """
+        from app.utils.yaml_io import dump_documents, safe_load_all
+
+        # Determine which base config to use
+        if device.role == DeviceRole.CONTROLPLANE:
+            base_config_file = self.base_dir / "controlplane.yaml"
+        else:
+            base_config_file = self.base_dir / "worker.yaml"
+
+        if not base_config_file.exists():
+            raise FileNotFoundError(f"Base config file not found: {base_config_file}")
+
+        # Read base configuration (handle multi-document YAML)
+        with open(base_config_file, 'r') as f:
+            # Load all documents and use the first one (machine config)
+            docs = safe_load_all(f)
+            if not docs:
+                raise ValueError(f"No YAML documents found in {base_config_file}")
+            config = docs[0]  # Use the first document (machine config)
+
+        # Customize configuration with device-specific settings
+        if 'machine' not in config:
+            config['machine'] = {}
+        if 'network' not in config['machine']:
+            config['machine']['network'] = {}
+
+        # Set hostname if provided
+        if device.hostname:
+            config['machine']['network']['hostname'] = device.hostname
+
+        # Get network settings for CIDR, gateway, nameservers
+        net_settings = snapshot['network']
+        netmask = net_settings.get('dhcp_netmask', '255.255.0.0')
+        gateway = net_settings.get('dns_server', '')
+        nameservers = [net_settings['dns_server']] if net_settings.get('dns_server') else []
+
+        # Set static IP by MAC address if provided
+        if device.ip_address and device.mac_address:
+            # Configure interface with MAC address selector, static IP, and default route
+            interface_config = {
+                'deviceSelector': {
+                    'hardwareAddr': device.mac_address
+                },
+                'addresses': [self._ensure_cidr(device.ip_address, netmask)],
+            }
+
+            # Add default route via gateway
+            if gateway:
+                interface_config['routes'] = [
+                    {'network': '0.0.0.0/0', 'gateway': gateway}
+                ]
+
+            config['machine']['network']['interfaces'] = [interface_config]
+
+        # Set nameservers
+        if nameservers:
+            config['machine']['network']['nameservers'] = nameservers
+
+        # Set wipe/reinstall flag if requested
+        if device.wipe_on_next_boot:
+            if 'install' not in config['machine']:
+                config['machine']['install'] = {}
+            config['machine']['install']['wipe'] = True
+            logger.info(f"Set machine.install.wipe=true for MAC {device.mac_address} (wipe on next boot)")
+
+        # Update kubelet version to match Kubernetes version
+        k8s_version = snapshot['kubernetes_version']
+        if k8s_version and 'machine' in config and 'kubelet' in config['machine']:
+            config['machine']['kubelet']['image'] = f'ghcr.io/siderolabs/kubelet:{ensure_v_prefix(k8s_version)}'
+            logger.info(f"Set kubelet version to {ensure_v_prefix(k8s_version)} for device {device.mac_address}")
+
+        # Patch CNI settings: disable built-in flannel for custom CNIs
+        cni = snapshot['cni']
+        if cni and cni.lower() != "flannel":
+            if 'cluster' not in config:
+                config['cluster'] = {}
+            if 'network' not in config['cluster']:
+                config['cluster']['network'] = {}
+            config['cluster']['network']['cni'] = {'name': 'none'}
+            # Disable kube-proxy for Cilium (it provides its own replacement)
+            if cni.lower() == "cilium":
+                if 'proxy' not in config['cluster']:
+                    config['cluster']['proxy'] = {}
+                config['cluster']['proxy']['disabled'] = True
+            logger.info(f"Set CNI to none (custom CNI: {cni}) for device {device.mac_address}")
+
+        # Override install disk if device has per-device setting
+        if device.install_disk:
+            if 'install' not in config['machine']:
+                config['machine']['install'] = {}
+            config['machine']['install']['disk'] = device.install_disk
+            logger.info(f"Set per-device install disk to {device.install_disk} for {device.mac_address}")
+
+        # Override install image with factory URL (or vanilla installer)
+        install_image = snapshot['install_image']
+        if install_image:
+            if 'install' not in config['machine']:
+                config['machine']['install'] = {}
+            config['machine']['install']['image'] = install_image
+            logger.info(f"Set install image to {install_image} for device {device.mac_address}")
+
+        # Inject kernel modules
+        kernel_modules = snapshot['kernel_modules']
+        if kernel_modules:
+            config['machine']['kernel'] = {'modules': [{'name': m} for m in kernel_modules]}
+            logger.info(f"Added {len(kernel_modules)} kernel modules for device {device.mac_address}")
+
+        # Inject extra disk partitions (e.g., Longhorn storage)
+        disk_partitions = self._get_disk_partitions(snapshot, device=device)
+        if disk_partitions:
+            # Get the install disk for this device (per-device or global)
+            install_disk = device.install_disk
+            if not install_disk:
+                if 'install' in config.get('machine', {}) and 'disk' in config['machine']['install']:
+                    install_disk = config['machine']['install']['disk']
+                else:
+                    install_disk = '/dev/sda'
+
+            disks_config = {}  # keyed by device path
+            for part in disk_partitions:
+                disk = part.get('disk') or install_disk
+                if disk not in disks_config:
+                    disks_config[disk] = {'device': disk, 'partitions': []}
+                partition = {'mountpoint': part['mountpoint']}
+                disks_config[disk]['partitions'].append(partition)
+
+            if disks_config:
+                config['machine']['disks'] = list(disks_config.values())
+                logger.info(f"Added {len(disk_partitions)} extra disk partition(s) for device {device.mac_address}")
+
+        # Generate multi-document YAML with VolumeConfigs
+        config_docs = [config]
+
+        # Add VolumeConfig documents (with per-device overrides if set)
+        volume_configs = self._generate_volume_configs(snapshot['volumes'], device=device)
+        if volume_configs:
+            config_docs.extend(volume_configs)
+            logger.info(f"Added {len(volume_configs)} VolumeConfig documents for device {device.mac_address}")
+
+        return dump_documents(config_docs)
+
+    def generate_device_config(self, device: Device, snapshot: Optional[Dict[str, Any]] = None) -> Optional[Path]:
         """
         Generate a static configuration file for an approved device.
 
+        The file is written atomically and only if its content changed; the
+        manifest records its hash and input fingerprint either way.
+
         Args:
             device: Device model with role, hostname, ip_address, and mac_address
+            snapshot: Settings to render with (default: ``settings_snapshot()``)
 
         Returns:
             Path to the generated config file, or None if generation failed
         """
         try:
-            # Determine which base config to use
-            if device.role == DeviceRole.CONTROLPLANE:
-                base_config_file = self.base_dir / "controlplane.yaml"
-            else:
-                base_config_file = self.base_dir / "worker.yaml"
-
-            if not base_config_file.exists():
-                logger.error(f"Base config file not found: {base_config_file}")
-                return None
-
-            # Read base configuration (handle multi-document YAML)
-            with open(base_config_file, 'r') as f:
-                # Load all documents and use the first one (machine config)
-                docs = list(yaml.safe_load_all(f))
-                if not docs:
-                    logger.error(f"No YAML documents found in {base_config_file}")
-                    return None
-                config = docs[0]  # Use the first document (machine config)
-
-            # Customize configuration with device-specific settings
-            if 'machine' not in config:
-                config['machine'] = {}
-            if 'network' not in config['machine']:
-                config['machine']['network'] = {}
-
-            # Set hostname if provided
-            if device.hostname:
-                config['machine']['network']['hostname'] = device.hostname
-
-            # Get network settings for CIDR, gateway, nameservers
-            net_settings = self._get_network_settings()
-            netmask = net_settings.get('dhcp_netmask', '255.255.0.0')
-            gateway = net_settings.get('dns_server', '')
-            nameservers = [net_settings['dns_server']] if net_settings.get('dns_server') else []
-
-            # Set static IP by MAC address if provided
-            if device.ip_address and device.mac_address:
-                # Configure interface with MAC address selector, static IP, and default route
-                interface_config = {
-                    'deviceSelector': {
-                        'hardwareAddr': device.mac_address
-                    },
-                    'addresses': [self._ensure_cidr(device.ip_address, netmask)],
-                }
-
-                # Add default route via gateway
-                if gateway:
-                    interface_config['routes'] = [
-                        {'network': '0.0.0.0/0', 'gateway': gateway}
-                    ]
-
-                config['machine']['network']['interfaces'] = [interface_config]
-
-            # Set nameservers
-            if nameservers:
-                config['machine']['network']['nameservers'] = nameservers
-
-            # Set wipe/reinstall flag if requested
-            if device.wipe_on_next_boot:
-                if 'install' not in config['machine']:
-                    config['machine']['install'] = {}
-                config['machine']['install']['wipe'] = True
-                logger.info(f"Set machine.install.wipe=true for MAC {device.mac_address} (wipe on next boot)")
-
-            # Update kubelet version to match Kubernetes version
-            k8s_version = self._get_kubernetes_version()
-            if k8s_version and 'machine' in config and 'kubelet' in config['machine']:
-                config['machine']['kubelet']['image'] = f'ghcr.io/siderolabs/kubelet:{ensure_v_prefix(k8s_version)}'
-                logger.info(f"Set kubelet version to {ensure_v_prefix(k8s_version)} for device {device.mac_address}")
-
-            # Patch CNI settings: disable built-in flannel for custom CNIs
-            cni = self._get_cni()
-            if cni and cni.lower() != "flannel":
-                if 'cluster' not in config:
-                    config['cluster'] = {}
-                if 'network' not in config['cluster']:
-                    config['cluster']['network'] = {}
-                config['cluster']['network']['cni'] = {'name': 'none'}
-                # Disable kube-proxy for Cilium (it provides its own replacement)
-                if cni.lower() == "cilium":
-                    if 'proxy' not in config['cluster']:
-                        config['cluster']['proxy'] = {}
-                    config['cluster']['proxy']['disabled'] = True
-                logger.info(f"Set CNI to none (custom CNI: {cni}) for device {device.mac_address}")
-
-            # Override install disk if device has per-device setting
-            if device.install_disk:
-                if 'install' not in config['machine']:
-                    config['machine']['install'] = {}
-                config['machine']['install']['disk'] = device.install_disk
-                logger.info(f"Set per-device install disk to {device.install_disk} for {device.mac_address}")
-
-            # Override install image with factory URL (or vanilla installer)
-            install_image = self._get_install_image()
-            if install_image:
-                if 'install' not in config['machine']:
-                    config['machine']['install'] = {}
-                config['machine']['install']['image'] = install_image
-                logger.info(f"Set install image to {install_image} for device {device.mac_address}")
-
-            # Inject kernel modules
-            kernel_modules = self._get_kernel_modules()
-            if kernel_modules:
-                config['machine']['kernel'] = {'modules': [{'name': m} for m in kernel_modules]}
-                logger.info(f"Added {len(kernel_modules)} kernel modules for device {device.mac_address}")
-
-            # Inject extra disk partitions (e.g., Longhorn storage)
-            disk_partitions = self._get_disk_partitions(device=device)
-            if disk_partitions:
-                # Get the install disk for this device (per-device or global)
-                install_disk = device.install_disk
-                if not install_disk:
-                    if 'install' in config.get('machine', {}) and 'disk' in config['machine']['install']:
-                        install_disk = config['machine']['install']['disk']
-                    else:
-                        install_disk = '/dev/sda'
-
-                disks_config = {}  # keyed by device path
-                for part in disk_partitions:
-                    disk = part.get('disk') or install_disk
-                    if disk not in disks_config:
-                        disks_config[disk] = {'device': disk, 'partitions': []}
-                    partition = {'mountpoint': part['mountpoint']}
-                    disks_config[disk]['partitions'].append(partition)
-
-                if disks_config:
-                    config['machine']['disks'] = list(disks_config.values())
-                    logger.info(f"Added {len(disk_partitions)} extra disk partition(s) for device {device.mac_address}")
-
-            # Generate multi-document YAML with VolumeConfigs
-            config_docs = [config]
-
-            # Add VolumeConfig documents (with per-device overrides if set)
-            db = SessionLocal()
-            try:
-                volume_configs = self._generate_volume_configs(db, device=device)
-                if volume_configs:
-                    config_docs.extend(volume_configs)
-                    logger.info(f"Added {len(volume_configs)} VolumeConfig documents for device {device.mac_address}")
-            finally:
-                db.close()
+            if snapshot is None:
+                snapshot = self.settings_snapshot()
+            config_yaml = self.render_device_config(device, snapshot)
 
             # Generate output filename: {mac}.yaml
             output_filename = f"{device.mac_address}.yaml"
             output_path = self.output_dir / output_filename
 
             # Write customized configuration as multi-document YAML
-            with open(output_path, 'w') as f:
-                # Write each document separated by ---
-                for i, doc in enumerate(config_docs):
-                    if i > 0:
-                        f.write('\n---\n')
-                    yaml.dump(doc, f, default_flow_style=False, sort_keys=False)
-
-            logger.info(f"Generated config for device {device.mac_address} at {output_path} with {len(config_docs)} documents")
+            inputs = self.config_inputs(self.device_params(device), snapshot)
+            if self.manifest.write(device.mac_address, output_path, config_yaml, inputs):
+                logger.info(f"Generated config for device {device.mac_address} at {output_path}")
             return output_path
 
         except Exception as e:
@@ -622,6 +650,7 @@ class ConfigGenerator:
         try:
             output_filename = f"{device.mac_address}.yaml"
             output_path = self.output_dir / output_filename
+            self.manifest.remove(device.mac_address)
 
             if output_path.exists():
                 output_path.unlink()
@@ -646,9 +675,45 @@ class ConfigGenerator:
             Number of configs successfully generated
         """
         count = 0
-        for device in devices:
-            if self.generate_device_config(device):
-                count += 1
+        snapshot = self.settings_snapshot()
+        with self.manifest.batch():
+            for device in devices:
+                if self.generate_device_config(device, snapshot):
+                    count += 1
 
         logger.info(f"Regenerated {count}/{len(devices)} device configurations")
         return count
+
+    def config_states(self, devices: list[Device], snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Compare each device's config against the manifest, without rendering.
+
+        Args:
+            snapshot: Current settings (default: ``settings_snapshot()``)
+
+        Returns:
+            MAC -> "current", "stale" (settings or device changed since the
+            config was rendered), "drifted" (file edited or replaced on disk)
+            or "missing"
+        """
+        if snapshot is None:
+            snapshot = self.settings_snapshot()
+        entries = self.manifest.entries()
+        states = {}
+        for device in devices:
+            entry = entries.get(device.mac_address)
+            if entry is None:
+                states[device.mac_address] = MISSING
+                continue
+            inputs = self.config_inputs(self.device_params(device), snapshot)
+            if entry['inputs'] != inputs:
+                # The PXE config endpoint renders from these fields only
+                params = dict.fromkeys(self.device_params(device))
+                params.update(self.device_params(device), wipe_on_next_boot=False, install_disk=None,
+                              ephemeral_min_size=None, ephemeral_max_size=None, ephemeral_disk_selector=None)
+                pxe_inputs = self.config_inputs(params, snapshot, renderer="params")
+                if entry['inputs'] == pxe_inputs:
+                    inputs = pxe_inputs
+            states[device.mac_address] = self.manifest.state(
+                device.mac_address, self.output_dir / f"{device.mac_address}.yaml", inputs)
+        return states
@@ -0,0 +1,188 @@
+"""Dry-run preview of device config changes for a proposed settings change.
+
+Renders every device's config with the proposed settings in memory (no
+file or manifest writes) and diffs it, document by document and key by
+key, against the config the device gets today.  A device whose config
+inputs the proposal does not touch is reported unchanged without
+rendering, and a config the manifest marks current is read from disk
+instead of being re-rendered as the baseline.
+"""
+import copy
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.db.models import Device, VolumeType
+from app.services.config_store import CURRENT
+
+logger = logging.getLogger(__name__)
+
+# Settings a preview can override, as keyed in ConfigGenerator.settings_snapshot()
+PREVIEW_SETTINGS = ("kubernetes_version", "cni", "install_image", "kernel_modules", "volumes")
+VOLUME_FIELDS = ("min_size", "max_size", "disk_selector_match", "grow")
+
+# Longer strings (certs, tokens) are cut in diff output
+MAX_VALUE_LENGTH = 120
+
+
+def apply_overrides(snapshot: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of ``snapshot`` with the proposed settings applied.
+
+    ``volumes`` entries are merged by name: fields left out keep their
+    current value.
+
+    Raises:
+        ValueError: on an unknown setting or a malformed value
+    """
+    unknown = set(overrides) - set(PREVIEW_SETTINGS)
+    if unknown:
+        raise ValueError(f"Cannot preview settings: {', '.join(sorted(unknown))}")
+
+    proposed = copy.deepcopy(snapshot)
+    for key in ("kubernetes_version", "cni", "install_image"):
+        if key in overrides:
+            value = overrides[key]
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{key} must be a string")
+            proposed[key] = value or None
+
+    if "kernel_modules" in overrides:
+        modules = overrides["kernel_modules"] or []
+        if not isinstance(modules, list) or not all(isinstance(m, str) for m in modules):
+            raise ValueError("kernel_modules must be a list of module names")
+        proposed["kernel_modules"] = modules
+
+    if "volumes" in overrides:
+        volumes = {v["name"]: v for v in proposed["volumes"]}
+        valid_names = {t.value for t in VolumeType}
+        for change in overrides["volumes"] or []:
+            name = change.get("name") if isinstance(change, dict) else None
+            if name not in valid_names:
+                raise ValueError(f"Volume name must be one of: {', '.join(sorted(valid_names))}")
+            volume = volumes.setdefault(name, {"name": name, "min_size": None, "max_size": None,
+                                               "disk_selector_match": None, "grow": True})
+            volume.update({k: change[k] for k in VOLUME_FIELDS if k in change})
+        proposed["volumes"] = list(volumes.values())
+
+    return proposed
+
+
+def _compact(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH - 3] + "..."
+    return value
+
+
+def _document_key(doc: Any, index: int) -> str:
+    if isinstance(doc, dict) and doc.get("kind"):
+        return f"{doc['kind']}/{doc.get('name', index)}"
+    return "config" if index == 0 else f"document[{index}]"
+
+
+def _diff(old: Any, new: Any, path: str, changes: List[dict]):
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            child = f"{path}.{key}" if path else str(key)
+            if key not in old:
+                changes.append({"path": child, "op": "added", "new": _compact(value)})
+            else:
+                _diff(old[key], value, child, changes)
+        for key, value in old.items():
+            if key not in new:
+                child = f"{path}.{key}" if path else str(key)
+                changes.append({"path": child, "op": "removed", "old": _compact(value)})
+    elif old != new:
+        changes.append({"path": path, "op": "changed", "old": _compact(old), "new": _compact(new)})
+
+
+def diff_configs(old_text: str, new_text: str) -> List[dict]:
+    """Structured diff of two multi-document machine configs.
+
+    Returns ``{"path", "op", "old"/"new"}`` dicts, where ``op`` is
+    "added", "removed" or "changed" and ``path`` is ``document:key.path``
+    ("config" is the machine config, others are e.g. ``VolumeConfig/EPHEMERAL``).
+    Lists are compared as whole values.
+    """
+    from app.utils.yaml_io import safe_load_all
+
+    if old_text == new_text:
+        return []
+    old_docs = {_document_key(d, i): d for i, d in enumerate(safe_load_all(old_text))}
+    new_docs = {_document_key(d, i): d for i, d in enumerate(safe_load_all(new_text))}
+
+    changes = []
+    for key, doc in new_docs.items():
+        if key not in old_docs:
+            changes.append({"path": key, "op": "added", "new": doc})
+            continue
+        doc_changes = []
+        _diff(old_docs[key], doc, "", doc_changes)
+        for change in doc_changes:
+            change["path"] = f"{key}:{change['path']}"
+        changes.extend(doc_changes)
+    for key, doc in old_docs.items():
+        if key not in new_docs:
+            changes.append({"path": key, "op": "removed", "old": doc})
+    return changes
+
+
+def preview_configs(
+    generator,
+    devices: List[Device],
+    overrides: Dict[str, Any],
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Diff every device's config under ``overrides`` against its config today.
+
+    Args:
+        generator: ConfigGenerator whose output dir and manifest hold the current configs
+        overrides: Proposed settings, see :func:`apply_overrides`
+
+    Returns:
+        ``{"devices": [...], "summary": {...}}`` with, per device, its
+        manifest state, whether the config would change and the changes
+    """
+    current = generator.settings_snapshot()
+    proposed = apply_overrides(current, overrides)
+    states = generator.config_states(devices, current)
+    entries = generator.manifest.entries()
+
+    def preview(device: Device) -> dict:
+        mac = device.mac_address
+        row = {"id": device.id, "mac_address": mac, "hostname": device.hostname,
+               "state": states[mac], "changed": False, "changes": []}
+        params = generator.device_params(device)
+        current_inputs = generator.config_inputs(params, current)
+        if generator.config_inputs(params, proposed) == current_inputs:
+            return row
+        try:
+            entry = entries.get(mac)
+            if states[mac] == CURRENT and entry and entry["inputs"] == current_inputs:
+                baseline = (generator.output_dir / f"{mac}.yaml").read_text()
+            else:
+                baseline = generator.render_device_config(device, current)
+            changes = diff_configs(baseline, generator.render_device_config(device, proposed))
+        except Exception as e:
+            logger.warning(f"Config preview failed for device {mac}: {e}")
+            row["error"] = str(e)
+            return row
+        row["changed"] = bool(changes)
+        row["changes"] = changes
+        return row
+
+    workers = max_workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="config-preview") as pool:
+        rows = list(pool.map(preview, devices))
+
+    changed = sum(1 for r in rows if r["changed"])
+    errors = sum(1 for r in rows if "error" in r)
+    return {
+        "devices": rows,
+        "summary": {
+            "devices": len(rows),
+            "changed": changed,
+            "unchanged": len(rows) - changed - errors,
+            "errors": errors,
+        },
+    }
@@ -0,0 +1,203 @@
+"""Atomic, hash-compared writes for generated configs, plus a manifest.
+
+Device configs and boot.ipxe used to be rewritten with a plain
+``open(path, 'w')`` on every PXE request, regeneration and refresh step:
+unchanged content still hit the disk, and a concurrent reader (a booting
+node's TFTP/HTTP fetch) could see a truncated file.  :func:`write_if_changed`
+skips the write when the file already holds the same bytes and otherwise
+writes a temp file, fsyncs it and renames it over the target.
+
+Each output directory has a :class:`ConfigManifest` (``.manifest.json``)
+recording, per config, the content hash, a fingerprint of the inputs it
+was rendered from and when it was generated.  Comparing those against the
+file on disk and the current inputs reports stale or drifted configs
+without rendering anything.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".manifest.json"
+
+# Manifest states
+CURRENT = "current"   # file matches the manifest and was rendered from the current inputs
+STALE = "stale"       # inputs changed since the file was rendered
+DRIFTED = "drifted"   # file on disk no longer matches what was written
+MISSING = "missing"   # no file (or no manifest entry) for this config
+
+
+def content_hash(data: Union[str, bytes]) -> str:
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint(inputs: Any) -> str:
+    """Stable hash of JSON-serializable render inputs."""
+    return content_hash(json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str))
+
+
+def file_hash(path: Path) -> Optional[str]:
+    try:
+        return content_hash(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def atomic_write(path: Path, data: Union[str, bytes]) -> None:
+    """Write ``data`` to a temp file beside ``path``, fsync it and rename it into place."""
+    if isinstance(data, str):
+        data = data.encode()
+    # Dot-prefixed so directory listings (and dnsmasq's TFTP) never serve it
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def write_if_changed(path: Path, data: Union[str, bytes]) -> bool:
+    """Atomically write ``data`` unless ``path`` already holds it; True if written."""
+    if file_hash(path) == content_hash(data):
+        return False
+    atomic_write(path, data)
+    return True
+
+
+class ConfigManifest:
+    """``key -> {hash, inputs, generated_at}`` for the configs in one directory.
+
+    Shared per directory (see :func:`get_manifest`) and safe to use from
+    worker threads.  Every change is persisted immediately, except inside
+    :meth:`batch`, which saves once on exit.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, dict]] = None
+        self._batch_depth = 0
+        self._dirty = False
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text()).get("entries", {})
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable config manifest {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        if self._batch_depth:
+            self._dirty = True
+            return
+        self._dirty = False
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.path, json.dumps({"version": 1, "entries": self._entries}, indent=1, sort_keys=True))
+        except OSError as e:
+            logger.warning(f"Failed to write config manifest {self.path}: {e}")
+
+    @contextmanager
+    def batch(self) -> Iterator["ConfigManifest"]:
+        """Defer saving until the outermost batch exits (e.g. a fleet-wide regen)."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self._save()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._load().get(key)
+            return dict(entry) if entry else None
+
+    def entries(self) -> Dict[str, dict]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._load().items()}
+
+    def record(self, key: str, digest: str, inputs: str):
+        """Record that ``key`` now holds content ``digest`` rendered from ``inputs``."""
+        with self._lock:
+            entries = self._load()
+            current = entries.get(key)
+            if current and current["hash"] == digest and current["inputs"] == inputs:
+                return
+            entries[key] = {
+                "hash": digest,
+                "inputs": inputs,
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self._save()
+
+    def remove(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+    def write(self, key: str, path: Path, data: Union[str, bytes], inputs: str) -> bool:
+        """Write ``data`` to ``path`` if it changed and record it; True if written."""
+        written = write_if_changed(path, data)
+        self.record(key, content_hash(data), inputs)
+        return written
+
+    def state(self, key: str, path: Path, inputs: Optional[str] = None) -> str:
+        """Classify ``key`` as CURRENT, STALE, DRIFTED or MISSING.
+
+        ``inputs`` is the fingerprint of the current render inputs; omit it
+        to only check the file against the manifest.
+        """
+        entry = self.get(key)
+        on_disk = file_hash(path)
+        if entry is None or on_disk is None:
+            return MISSING
+        if on_disk != entry["hash"]:
+            return DRIFTED
+        if inputs is not None and inputs != entry["inputs"]:
+            return STALE
+        return CURRENT
+
+
+_manifests: Dict[str, ConfigManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(directory: Union[str, Path]) -> ConfigManifest:
+    """Return the process-wide manifest for ``directory``."""
+    key = str(Path(directory).resolve())
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = _manifests[key] = ConfigManifest(Path(key))
+        return manifest
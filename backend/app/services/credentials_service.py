@@ -0,0 +1,376 @@
+"""Background-maintained talosconfig, kubeconfig and terminal environment.
+
+Opening a terminal used to write ~/.talos/config, maybe run a blocking
+``talosctl kubeconfig`` and query the DB several times, all on the event
+loop.  This service does that work in the background instead:
+
+* a cheap fingerprint (control-plane IPs, cluster endpoint/versions,
+  source talosconfig mtime) is checked every ``CHECK_INTERVAL`` seconds,
+  or immediately after :meth:`CredentialsService.invalidate`;
+* when it changes, or the kubeconfig is missing/older than
+  ``KUBECONFIG_MAX_AGE``, both files are refreshed in a worker thread;
+* the terminal environment (PATH, KUBECONFIG, TALOSCONFIG) is computed
+  once per refresh and served from cache by :meth:`terminal_env`.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from app.services import instrumentation
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 30          # seconds between fingerprint checks
+KUBECONFIG_MAX_AGE = 3600    # re-fetch kubeconfig at least hourly
+RETRY_INTERVAL = 300         # back-off after a failed kubeconfig fetch
+
+
+def get_controlplane_ip() -> str | None:
+    """Get the first control plane node IP (without CIDR suffix)."""
+    from app.db.database import SessionLocal
+    from app.crud import device as device_crud
+    from app.db.models import DeviceStatus, DeviceRole
+
+    db = SessionLocal()
+    try:
+        all_devices = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, skip=0, limit=1000)
+        cp_nodes = [d for d in all_devices if d.role == DeviceRole.CONTROLPLANE and d.ip_address]
+        if not cp_nodes:
+            return None
+        ip = cp_nodes[0].ip_address
+        return ip.split('/')[0] if '/' in ip else ip
+    finally:
+        db.close()
+
+
+def ensure_talosconfig() -> bool:
+    """Write a ready-to-use talosconfig to ~/.talos/config with correct endpoints/nodes.
+
+    Copies the generated talosconfig from templates/base/talosconfig, fills in
+    the controlplane IP for endpoints and nodes, and writes it to the standard
+    talosctl default path so that ``talosctl`` works without extra flags.
+
+    Returns True if the file was written successfully.
+    """
+    from pathlib import Path
+    import yaml
+
+    home = Path.home()
+    dest = home / ".talos" / "config"
+
+    # Source talosconfig from templates/base
+    from app.api.cluster_router import get_templates_base_dir
+    src = get_templates_base_dir() / "talosconfig"
+    if not src.exists():
+        logger.warning(f"Source talosconfig not found at {src}")
+        return False
+
+    cp_ip = get_controlplane_ip()
+
+    try:
+        with open(src, 'r') as f:
+            tc = yaml.safe_load(f)
+
+        # Set endpoints and nodes to the controlplane IP
+        if cp_ip:
+            ctx_name = tc.get('context', '')
+            if ctx_name and ctx_name in tc.get('contexts', {}):
+                tc['contexts'][ctx_name]['endpoints'] = [cp_ip]
+                tc['contexts'][ctx_name]['nodes'] = [cp_ip]
+
+        dest.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
+        with open(dest, 'w') as f:
+            yaml.dump(tc, f, default_flow_style=False)
+        os.chmod(dest, 0o600)
+        logger.info(f"Wrote talosconfig to {dest} (endpoint: {cp_ip})")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to write talosconfig: {e}")
+        return False
+
+
+def ensure_kubeconfig() -> bool:
+    """Ensure kubeconfig exists at ~/.kube/config with the correct server endpoint.
+
+    Uses ``talosctl kubeconfig`` to fetch credentials from the controlplane,
+    then patches the server URL to ``https://<controlplane_ip>:6443``.
+
+    Returns True if kubeconfig is available.
+    """
+    from app.db.database import SessionLocal
+    from app.crud import cluster as cluster_crud
+    from pathlib import Path
+    import time
+    import yaml
+
+    home = Path.home()
+    kubeconfig_path = home / ".kube" / "config"
+    talosconfig_path = home / ".talos" / "config"
+
+    cp_ip = get_controlplane_ip()
+    if not cp_ip:
+        logger.warning("No control plane nodes found, skipping kubeconfig fetch")
+        return False
+
+    api_server_url = f"https://{cp_ip}:6443"
+
+    # If kubeconfig exists, is recent (<1h), and has the right endpoint, skip
+    if kubeconfig_path.exists():
+        file_age = time.time() - kubeconfig_path.stat().st_mtime
+        if file_age < 3600:
+            try:
+                with open(kubeconfig_path, 'r') as f:
+                    existing = yaml.safe_load(f)
+                server = existing['clusters'][0]['cluster'].get('server', '')
+                if server == api_server_url:
+                    logger.info(f"Kubeconfig up to date at {kubeconfig_path}")
+                    return True
+            except Exception:
+                pass  # Re-fetch on any parse error
+
+    # Need talosconfig to fetch kubeconfig — try to set it up if missing
+    if not talosconfig_path.exists():
+        ensure_talosconfig()
+    if not talosconfig_path.exists():
+        logger.warning(f"Talosconfig not found at {talosconfig_path}, skipping kubeconfig fetch")
+        return False
+
+    from app.api.cluster_router import find_talosctl
+    try:
+        talosctl = find_talosctl()
+    except FileNotFoundError:
+        logger.warning("talosctl not found, skipping kubeconfig fetch")
+        return False
+
+    db = SessionLocal()
+    try:
+        cluster_settings = cluster_crud.get_cluster_settings(db)
+        if not cluster_settings:
+            logger.warning("No cluster settings found, skipping kubeconfig fetch")
+            return False
+
+        # Determine API server endpoint from cluster settings or controlplane IP
+        endpoint = cluster_settings.cluster_endpoint or cp_ip
+        if ':' in endpoint and not endpoint.startswith('http'):
+            endpoint = endpoint.split(':')[0]
+        api_server_url = f"https://{endpoint}:6443"
+    finally:
+        db.close()
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_kubeconfig = Path(tmp_dir) / "kubeconfig"
+        cmd = [
+            talosctl, "kubeconfig",
+            "--talosconfig", str(talosconfig_path),
+            "--nodes", cp_ip,
+            "--endpoints", cp_ip,
+            str(tmp_kubeconfig),
+        ]
+        logger.info(f"Fetching kubeconfig: {' '.join(cmd)}")
+        result = instrumentation.run(cmd, capture_output=True, text=True, timeout=30)
+
+        if result.returncode != 0 or not tmp_kubeconfig.exists():
+            logger.warning(f"talosctl kubeconfig failed: {result.stderr or result.stdout}")
+            return False
+
+        # Parse fetched kubeconfig and patch server endpoint
+        with open(tmp_kubeconfig, 'r') as f:
+            kubeconfig = yaml.safe_load(f)
+
+        if 'clusters' in kubeconfig and len(kubeconfig['clusters']) > 0:
+            kubeconfig['clusters'][0]['cluster']['server'] = api_server_url
+            logger.info(f"Set kubeconfig server to {api_server_url}")
+
+        # Write to ~/.kube/config
+        kubeconfig_dir = home / ".kube"
+        kubeconfig_dir.mkdir(mode=0o700, exist_ok=True)
+        with open(kubeconfig_path, 'w') as f:
+            yaml.dump(kubeconfig, f, default_flow_style=False, sort_keys=False)
+        os.chmod(kubeconfig_path, 0o600)
+        logger.info(f"Wrote kubeconfig to {kubeconfig_path}")
+        return True
+
+
+def build_terminal_env() -> dict:
+    """Build environment variables for the terminal shell.
+
+    Sets up PATH (kubectl, talosctl), KUBECONFIG, and TALOSCONFIG so that
+    both ``kubectl`` and ``talosctl`` work out of the box.  Does not touch
+    the config files themselves.
+    """
+    from pathlib import Path
+    from app.services.kubectl_downloader import KubectlDownloader
+    from app.api.cluster_router import find_talosctl
+
+    env = os.environ.copy()
+    home = os.path.expanduser("~")
+
+    # --- PATH ---
+    extra_paths = []
+
+    # kubectl
+    kubectl_path = KubectlDownloader().get_kubectl_path()
+    if kubectl_path and kubectl_path.parent.exists():
+        extra_paths.append(str(kubectl_path.parent.resolve()))
+
+    # talosctl
+    try:
+        talosctl_dir = str(Path(find_talosctl()).parent.resolve())
+        if talosctl_dir not in extra_paths:
+            extra_paths.append(talosctl_dir)
+    except FileNotFoundError:
+        pass
+
+    extra_paths.extend(["/usr/local/bin", "/usr/bin", "/bin", "/usr/sbin", "/sbin"])
+    existing = env.get("PATH", "")
+    for p in extra_paths:
+        if p not in existing:
+            existing = f"{p}:{existing}"
+    env["PATH"] = existing
+
+    # --- Configs ---
+    env["TALOSCONFIG"] = os.path.join(home, ".talos", "config")
+    env["KUBECONFIG"] = os.path.join(home, ".kube", "config")
+    env["TERM"] = "xterm-256color"
+    return env
+
+
+def _fingerprint() -> tuple:
+    """Inputs that determine the contents of talosconfig/kubeconfig."""
+    from app.db.database import SessionLocal
+    from app.crud import cluster as cluster_crud
+    from app.db.models import Device, DeviceStatus, DeviceRole
+    from app.api.cluster_router import get_templates_base_dir
+
+    db = SessionLocal()
+    try:
+        cp_ips = sorted(
+            ip for (ip,) in db.query(Device.ip_address).filter(
+                Device.status == DeviceStatus.APPROVED,
+                Device.role == DeviceRole.CONTROLPLANE,
+                Device.ip_address.isnot(None),
+            )
+        )
+        cs = cluster_crud.get_cluster_settings(db)
+        cluster = (cs.cluster_endpoint, cs.kubectl_version, cs.talos_version) if cs else None
+    finally:
+        db.close()
+
+    src = get_templates_base_dir() / "talosconfig"
+    src_mtime = src.stat().st_mtime if src.exists() else None
+    return tuple(cp_ips), cluster, src_mtime
+
+
+class CredentialsService:
+    """Keeps local cluster credentials and the terminal env current."""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._env: Optional[dict] = None
+        self._fingerprint: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.talosconfig_ok: Optional[bool] = None
+        self.kubeconfig_ok: Optional[bool] = None
+        self.last_refresh: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._next_retry = 0.0
+
+    def _kubeconfig_stale(self) -> bool:
+        from pathlib import Path
+        path = Path.home() / ".kube" / "config"
+        if not path.exists():
+            return True
+        return time.time() - path.stat().st_mtime > KUBECONFIG_MAX_AGE
+
+    def refresh(self, force: bool = False) -> bool:
+        """Refresh files and cached env if inputs changed (blocking).
+
+        Returns True if a refresh ran.
+        """
+        with self._lock:
+            try:
+                fingerprint = _fingerprint()
+            except Exception as e:
+                self.last_error = f"fingerprint: {e}"
+                logger.warning(f"Credentials fingerprint failed: {e}")
+                return False
+
+            changed = force or fingerprint != self._fingerprint
+            if not changed:
+                # Same inputs: only re-fetch an expired kubeconfig, with back-off
+                if not fingerprint[0] or not self._kubeconfig_stale():
+                    return False
+                if time.time() < self._next_retry:
+                    return False
+
+            try:
+                self.talosconfig_ok = ensure_talosconfig()
+                self.kubeconfig_ok = ensure_kubeconfig()
+                self._env = build_terminal_env()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Credentials refresh failed: {e}")
+            self._fingerprint = fingerprint
+            self.last_refresh = time.time()
+            self._next_retry = 0.0 if self.kubeconfig_ok else self.last_refresh + RETRY_INTERVAL
+            logger.info(f"Credentials refreshed (talosconfig={self.talosconfig_ok}, "
+                        f"kubeconfig={self.kubeconfig_ok})")
+            return True
+
+    def terminal_env(self) -> dict:
+        """Cached terminal environment (a copy — callers may modify it).
+
+        Falls back to computing the env without touching config files if
+        the first refresh has not finished yet.
+        """
+        env = self._env
+        if env is None:
+            env = self._env = build_terminal_env()
+        return dict(env)
+
+    def invalidate(self):
+        """Re-check credentials now (control-plane set or cluster settings changed)."""
+        self._fingerprint = None
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Credentials refresh loop error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._loop(), name="credentials-refresh")
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "talosconfig": self.talosconfig_ok,
+            "kubeconfig": self.kubeconfig_ok,
+            "last_refresh": self.last_refresh,
+            "last_error": self.last_error,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+credentials_service = CredentialsService()
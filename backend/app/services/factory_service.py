@@ -1,5 +1,4 @@
 """Service for generating Talos Factory schematics."""
-import httpx
 import logging
 from typing import List, Optional, Tuple
 
@@ -42,6 +41,8 @@ async def generate_schematic(extension_uris: List[str]) -> Tuple[Optional[str],
     Returns:
         Tuple of (schematic_id, error_message). On success error is None.
     """
+    import httpx
+
     short_names = [uri_to_short_name(uri) for uri in extension_uris]
 
     payload = {
@@ -5,6 +5,9 @@ Runs every 10 seconds, performing:
   2. Talos API TCP connect on port 50000 (OS health)
 
 Results are stored in-memory (not persisted) and broadcast via WebSocket.
+
+wait_for_talos_api() probes a single node at a much shorter interval, for
+callers (rolling refresh) waiting on it to go down or come back up.
 """
 import asyncio
 import logging
@@ -20,6 +23,7 @@ CHECK_INTERVAL = 10  # seconds
 PING_TIMEOUT = 1     # seconds
 TCP_TIMEOUT = 2      # seconds
 TALOS_API_PORT = 50000
+FAST_PROBE_INTERVAL = 1  # seconds, for wait_for_talos_api()
 
 
 async def _check_ping(ip: str) -> bool:
@@ -63,6 +67,23 @@ async def _check_device(ip: str) -> dict:
     }
 
 
+async def wait_for_talos_api(ip: str, up: bool = True, timeout: float = 600,
+                             interval: float = FAST_PROBE_INTERVAL) -> bool:
+    """Wait until the Talos API on ``ip`` answers (or, with up=False, stops
+    answering). Returns False if that doesn't happen within ``timeout``.
+
+    Only the TCP connect is probed: it implies the node is reachable and,
+    unlike ping, doesn't fork a process per attempt.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while await _check_talos_api(ip) != up:
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
 def get_health_status() -> dict:
     """Return current health status dict (for on-demand WS queries)."""
     return dict(_health_status)
@@ -0,0 +1,363 @@
+"""Persistent queue for helm install/upgrade/uninstall jobs.
+
+Jobs are rows in ``helm_jobs``.  The scheduler runs at most
+``HELM_JOB_PARALLELISM`` of them at once, highest priority first (then
+oldest first), and never two in the same namespace: releases sharing a
+namespace share CRDs, hooks and the namespace cleanup done on uninstall.
+
+Cancelling a running job cancels its task, and HelmRunner terminates the
+helm process the task is waiting on.  Jobs left ``running`` by a previous
+process are reconciled against ``helm status`` on startup: rerun where
+that is safe, otherwise marked ``interrupted`` and their release failed.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from app.db import database
+from app.db.models import HelmJob, HelmRelease
+from app.services.websocket_manager import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+PARALLELISM = int(os.getenv("HELM_JOB_PARALLELISM", "2"))
+# A job interrupted this many times by restarts is not resumed again
+MAX_ATTEMPTS = 3
+
+OPERATIONS = ("install", "upgrade", "uninstall")
+ACTIVE = ("queued", "running")
+
+# Release states that mean an operation was in flight
+_IN_FLIGHT_RELEASE = ("pending", "deploying", "uninstalling")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def job_dict(job: HelmJob) -> dict:
+    return {
+        "id": job.id,
+        "release_id": job.release_id,
+        "release_name": job.release_name,
+        "namespace": job.namespace,
+        "operation": job.operation,
+        "priority": job.priority,
+        "status": job.status,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def _broadcast_job(job: HelmJob):
+    try:
+        await websocket_manager.broadcast_event({"type": "helm_job_updated", "data": job_dict(job)})
+    except Exception as e:
+        logger.warning(f"Failed to broadcast helm job event: {e}")
+
+
+async def _run_operation(operation: str, release_id: int, params: Optional[dict]):
+    from app.api.handlers import modules as handlers
+    if operation == "install":
+        await handlers._do_helm_install(release_id, params or {})
+    elif operation == "upgrade":
+        await handlers._do_helm_upgrade(release_id)
+    else:
+        await handlers._do_helm_uninstall(release_id)
+
+
+class HelmJobQueue:
+    def __init__(self, parallelism: int = PARALLELISM,
+                 runner: Callable[[str, int, Optional[dict]], Awaitable[None]] = _run_operation):
+        self.parallelism = max(1, parallelism)
+        self._runner = runner
+        self._running: Dict[int, asyncio.Task] = {}
+        self._namespaces: Dict[int, str] = {}
+        self._cancelled: Set[int] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.reconciled = 0
+
+    # -- submission / cancellation -------------------------------------------
+
+    async def submit(self, db, operation: str, release: HelmRelease,
+                     params: Optional[dict] = None, priority: int = 0) -> HelmJob:
+        """Queue ``operation`` for ``release``.
+
+        A queued job for the same operation absorbs the request (keeping the
+        higher priority); an uninstall supersedes queued installs/upgrades.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown helm operation: {operation}")
+        priority = int(priority or 0)
+
+        queued = db.query(HelmJob).filter(
+            HelmJob.release_id == release.id, HelmJob.status == "queued").all()
+        for job in queued:
+            if job.operation == operation:
+                if priority > job.priority:
+                    job.priority = priority
+                    db.commit()
+                self._notify()
+                return job
+        superseded = []
+        if operation == "uninstall":
+            for job in queued:
+                job.status, job.error, job.finished_at = "cancelled", "Superseded by uninstall", _now()
+                superseded.append(job)
+
+        job = HelmJob(
+            release_id=release.id,
+            release_name=release.release_name,
+            namespace=release.namespace,
+            operation=operation,
+            params_json=json.dumps(params) if params is not None else None,
+            priority=priority,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        for old in superseded:
+            await _broadcast_job(old)
+        await _broadcast_job(job)
+        self._notify()
+        return job
+
+    async def cancel(self, db, job_id: int) -> Optional[HelmJob]:
+        """Cancel a queued or running job; returns it, or None if not active."""
+        job = db.query(HelmJob).filter(HelmJob.id == job_id).first()
+        if not job or job.status not in ACTIVE:
+            return None
+        task = self._running.get(job.id)
+        if task is not None:
+            # _run records the outcome once helm has been terminated
+            self._cancelled.add(job.id)
+            task.cancel()
+        else:
+            job.status, job.error, job.finished_at = "cancelled", "Cancelled by user", _now()
+            db.commit()
+            await _broadcast_job(job)
+        return job
+
+    async def cancel_release(self, db, release_id: int) -> int:
+        jobs = db.query(HelmJob).filter(
+            HelmJob.release_id == release_id, HelmJob.status.in_(ACTIVE)).all()
+        cancelled = 0
+        for job in jobs:
+            if await self.cancel(db, job.id):
+                cancelled += 1
+        return cancelled
+
+    # -- scheduling ----------------------------------------------------------
+
+    def _notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def _schedule(self):
+        if len(self._running) >= self.parallelism:
+            return
+        db = database.SessionLocal()
+        try:
+            busy = set(self._namespaces.values())
+            queued = (db.query(HelmJob).filter(HelmJob.status == "queued")
+                      .order_by(HelmJob.priority.desc(), HelmJob.id).all())
+            for job in queued:
+                if len(self._running) >= self.parallelism:
+                    break
+                if job.namespace in busy:
+                    continue
+                busy.add(job.namespace)
+                job.status, job.started_at = "running", _now()
+                job.attempts = (job.attempts or 0) + 1
+                db.commit()
+                params = json.loads(job.params_json) if job.params_json else None
+                self._namespaces[job.id] = job.namespace
+                self._running[job.id] = asyncio.create_task(
+                    self._run(job.id, job.operation, job.release_id, job.release_name, job.namespace, params),
+                    name=f"helm-job-{job.id}")
+        finally:
+            db.close()
+
+    async def _run(self, job_id: int, operation: str, release_id: int,
+                   release_name: str, namespace: str, params: Optional[dict]):
+        await self._update(job_id)
+        try:
+            await self._runner(operation, release_id, params)
+            status, error = self._outcome(operation, release_id)
+        except asyncio.CancelledError:
+            if self._stopping and job_id not in self._cancelled:
+                raise  # left "running" for reconcile() on the next start
+            status, error = "cancelled", "Cancelled by user"
+        except Exception as e:
+            logger.error(f"Helm job {job_id} ({operation} {release_name}) failed: {e}")
+            status, error = "failed", str(e)
+        finally:
+            self._running.pop(job_id, None)
+            self._namespaces.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+        await self._update(job_id, status=status, error=error, finished_at=_now())
+        if status == "cancelled" and operation == "install":
+            # Same cleanup as a failed install: drop what helm created so far
+            from app.services.helm_runner import helm_runner
+            try:
+                await helm_runner.force_uninstall(release_name, namespace)
+            except Exception as e:
+                logger.warning(f"Cleanup after cancelled install of {release_name} failed: {e}")
+        self._notify()
+
+    @staticmethod
+    def _outcome(operation: str, release_id: int):
+        db = database.SessionLocal()
+        try:
+            release = db.query(HelmRelease).filter(HelmRelease.id == release_id).first()
+            if release is None:
+                return ("succeeded", None) if operation == "uninstall" else ("failed", "Release was removed")
+            if operation != "uninstall" and release.status == "deployed":
+                return "succeeded", None
+            return "failed", release.status_message
+        finally:
+            db.close()
+
+    async def _update(self, job_id: int, **fields):
+        db = database.SessionLocal()
+        try:
+            job = db.query(HelmJob).filter(HelmJob.id == job_id).first()
+            if job is None:
+                return
+            for key, value in fields.items():
+                setattr(job, key, value)
+            db.commit()
+            await _broadcast_job(job)
+        finally:
+            db.close()
+
+    async def _loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                self._schedule()
+            except Exception as e:
+                logger.error(f"Helm job scheduling failed: {e}")
+
+    # -- startup reconciliation ----------------------------------------------
+
+    async def reconcile(self) -> int:
+        """Settle jobs and releases a previous process left mid-operation."""
+        from app.crud import helm as crud
+        from app.services.helm_runner import helm_runner
+
+        settled = 0
+        db = database.SessionLocal()
+        try:
+            for job in db.query(HelmJob).filter(HelmJob.status == "running").all():
+                release = crud.get_helm_release(db, job.release_id)
+                try:
+                    helm_status = await helm_runner.get_status(job.release_name, job.namespace)
+                except Exception as e:
+                    # Can't tell how far helm got: don't rerun it blindly
+                    job.status, job.finished_at = "interrupted", _now()
+                    job.error = f"Interrupted by restart (helm status unavailable: {e})"
+                    if release:
+                        release.status, release.status_message = "failed", job.error
+                    db.commit()
+                    settled += 1
+                    logger.warning(f"Helm job {job.id} ({job.operation} {job.release_name}): {job.error}")
+                    continue
+                state = (helm_status or {}).get("info", {}).get("status")
+
+                if job.operation == "install" and state == "deployed" and release:
+                    release.status, release.status_message = "deployed", "Installed (completed before restart)"
+                    release.revision = helm_status.get("version")
+                    release.app_version = helm_status.get("info", {}).get("app_version")
+                    release.deployed_at = _now()
+                    job.status, job.finished_at = "succeeded", _now()
+                elif (job.attempts or 0) < MAX_ATTEMPTS and (
+                        job.operation == "uninstall"
+                        or (job.operation == "install" and state is None)
+                        or (job.operation == "upgrade" and state in ("deployed", "failed"))):
+                    # helm never started, or rerunning it is idempotent
+                    job.status, job.error = "queued", "Resumed after restart"
+                else:
+                    job.status, job.finished_at = "interrupted", _now()
+                    job.error = f"Interrupted by restart (helm status: {state or 'not installed'})"
+                    if release:
+                        release.status, release.status_message = "failed", job.error
+                db.commit()
+                settled += 1
+                logger.info(f"Helm job {job.id} ({job.operation} {job.release_name}): {job.status}")
+
+            # Releases stuck mid-operation without a job (queue was not running)
+            active = {rid for (rid,) in db.query(HelmJob.release_id).filter(HelmJob.status.in_(ACTIVE))}
+            stuck = db.query(HelmRelease).filter(HelmRelease.status.in_(_IN_FLIGHT_RELEASE)).all()
+            for release in stuck:
+                if release.id in active:
+                    continue
+                if release.status == "uninstalling":
+                    db.add(HelmJob(release_id=release.id, release_name=release.release_name,
+                                   namespace=release.namespace, operation="uninstall"))
+                else:
+                    release.status, release.status_message = "failed", "Interrupted by restart"
+                db.commit()
+                settled += 1
+        finally:
+            db.close()
+        return settled
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def start(self) -> asyncio.Task:
+        if self._task is not None and not self._task.done():
+            return self._task
+        self._stopping = False
+        self._wake = asyncio.Event()
+        try:
+            self.reconciled = await self.reconcile()
+        except Exception as e:
+            # Queued jobs must still run even if startup cleanup failed
+            logger.error(f"Helm job reconciliation failed: {e}")
+            self.reconciled = 0
+        self._task = asyncio.create_task(self._loop(), name="helm-jobs")
+        self._wake.set()
+        return self._task
+
+    async def stop(self):
+        """Stop scheduling and terminate running helm processes.
+
+        Their jobs stay ``running`` so the next start reconciles them.
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._wake = None
+
+    def status(self) -> dict:
+        db = database.SessionLocal()
+        try:
+            queued = db.query(HelmJob).filter(HelmJob.status == "queued").count()
+        finally:
+            db.close()
+        return {
+            "parallelism": self.parallelism,
+            "running": sorted(self._running),
+            "queued": queued,
+            "reconciled": self.reconciled,
+        }
+
+
+helm_jobs = HelmJobQueue()
@@ -0,0 +1,202 @@
+"""Helm repository index cache.
+
+Installs and upgrades used to run ``helm repo add --force-update`` and a
+full ``helm repo update`` every time, refetching every configured repo's
+index (several MB of YAML for the big ones).  :meth:`HelmRepoCache.ensure`
+instead brings only the repo a chart comes from up to date, and only when
+it is missing, points at a different URL or its index is older than
+``HELM_REPO_INDEX_TTL`` seconds.  Concurrent callers for the same repo
+share one in-flight helm call; a caller asking for another URL or a
+shorter age re-checks once that call is done.
+
+Freshness is read from helm's own files (``repositories.yaml`` and the
+``<name>-index.yaml`` mtimes), so it survives restarts and reflects
+``helm repo`` commands run outside the app.
+
+:meth:`HelmRepoCache.search_versions` answers from the parsed index
+(re-parsed only when the file changes) instead of ``helm search repo``,
+without refreshing it unless the index is missing.
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:  # PyYAML built without libyaml
+    _Loader = yaml.SafeLoader
+
+INDEX_TTL = int(os.getenv("HELM_REPO_INDEX_TTL", "600"))
+
+
+def repository_config() -> Path:
+    """helm's repositories.yaml (same lookup as helm: env, then XDG)."""
+    if os.getenv("HELM_REPOSITORY_CONFIG"):
+        return Path(os.environ["HELM_REPOSITORY_CONFIG"])
+    base = os.getenv("XDG_CONFIG_HOME") or str(Path.home() / ".config")
+    return Path(base) / "helm" / "repositories.yaml"
+
+
+def repository_cache() -> Path:
+    if os.getenv("HELM_REPOSITORY_CACHE"):
+        return Path(os.environ["HELM_REPOSITORY_CACHE"])
+    base = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "helm" / "repository"
+
+
+def _parse_index(path: Path) -> Dict[str, List[dict]]:
+    """Chart name -> versions (newest first, as helm writes them)."""
+    with open(path, "rb") as f:
+        index = yaml.load(f, Loader=_Loader) or {}
+    charts = {}
+    for chart, entries in (index.get("entries") or {}).items():
+        charts[chart] = [{
+            "version": str(e.get("version", "")),
+            "app_version": str(e.get("appVersion", "") or ""),
+            "description": e.get("description", "") or "",
+        } for e in entries or [] if not e.get("deprecated")]
+    return charts
+
+
+class HelmRepoCache:
+    def __init__(self, ttl: int = INDEX_TTL):
+        self.ttl = ttl
+        self._inflight: Dict[str, Tuple[tuple, asyncio.Task]] = {}
+        self._parsed: Dict[str, Tuple[float, Dict[str, List[dict]]]] = {}
+        self.updates = 0
+        self.skipped = 0
+
+    # -- helm's view of the repos --------------------------------------------
+
+    def configured_repos(self) -> Dict[str, str]:
+        try:
+            with open(repository_config()) as f:
+                data = yaml.load(f, Loader=_Loader) or {}
+        except FileNotFoundError:
+            return {}
+        except yaml.YAMLError as e:
+            logger.warning(f"Unreadable helm repositories file: {e}")
+            return {}
+        return {r["name"]: r.get("url", "") for r in data.get("repositories") or [] if r.get("name")}
+
+    def index_path(self, name: str) -> Path:
+        return repository_cache() / f"{name}-index.yaml"
+
+    def index_age(self, name: str) -> Optional[float]:
+        try:
+            return time.time() - self.index_path(name).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    # -- freshness -----------------------------------------------------------
+
+    async def ensure(self, name: str, url: Optional[str] = None,
+                     max_age: Optional[int] = None) -> Tuple[bool, str]:
+        """Make sure repo ``name`` (at ``url``, if given) has a fresh index.
+
+        Returns (ok, message) like the HelmRunner repo calls.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        key = (url.rstrip("/") if url else None, max_age)
+        while True:
+            running = self._inflight.get(name)
+            if running is None:
+                task = asyncio.create_task(self._refresh(name, url, max_age))
+                self._inflight[name] = (key, task)
+                task.add_done_callback(lambda t: self._inflight.pop(name, None)
+                                       if self._inflight.get(name, (None, None))[1] is t else None)
+                # A cancelled caller must not cancel the update others are waiting on
+                return await asyncio.shield(task)
+            running_key, task = running
+            result = await asyncio.shield(task)
+            if running_key == key:
+                return result
+            # Joined a call for another URL or age limit: check again against ours
+            # (cheap when that call already left the index fresh enough)
+
+    async def _refresh(self, name: str, url: Optional[str], max_age: int) -> Tuple[bool, str]:
+        from app.services.helm_runner import helm_runner
+
+        configured = self.configured_repos()
+        if url and configured.get(name, "").rstrip("/") != url.rstrip("/"):
+            # repo add downloads the index as well
+            ok, msg = await helm_runner.repo_add(name, url)
+            self.updates += ok
+            return ok, msg
+        if name not in configured:
+            return False, f"Repository '{name}' is not configured"
+
+        age = self.index_age(name)
+        if age is not None and age < max_age:
+            self.skipped += 1
+            return True, f"Index for {name} is up to date ({int(age)}s old)"
+        ok, msg = await helm_runner.repo_update(name)
+        self.updates += ok
+        return ok, msg
+
+    # -- chart versions ------------------------------------------------------
+
+    async def _charts(self, name: str) -> Dict[str, List[dict]]:
+        path = self.index_path(name)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        cached = self._parsed.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            charts = await asyncio.to_thread(_parse_index, path)
+        except (OSError, yaml.YAMLError) as e:
+            logger.warning(f"Failed to parse helm index {path}: {e}")
+            return {}
+        self._parsed[name] = (mtime, charts)
+        return charts
+
+    async def search_versions(self, chart: str) -> list:
+        """Versions of ``repo/chart`` (or of every chart whose name contains
+        ``chart``), in the shape of ``helm search repo --versions -o json``.
+
+        Like ``helm search repo`` this reads the local indexes as they are;
+        only a repo with no index yet is fetched.
+        """
+        repos = list(self.configured_repos())
+        if "/" in chart:
+            repo, _, name = chart.partition("/")
+            repos = [repo] if repo in repos else []
+        else:
+            name = chart
+        await asyncio.gather(*(self.ensure(r) for r in repos if self.index_age(r) is None))
+
+        results = []
+        for repo in repos:
+            charts = await self._charts(repo)
+            if "/" in chart and name in charts:
+                matches = [name]
+            else:
+                matches = sorted(c for c in charts if name.lower() in c.lower())
+            for match in matches:
+                results.extend({"name": f"{repo}/{match}", **v} for v in charts[match])
+        return results
+
+    def status(self) -> dict:
+        repos = self.configured_repos()
+        return {
+            "ttl": self.ttl,
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "repos": {
+                name: {"url": url, "index_age": self.index_age(name), "updating": name in self._inflight}
+                for name, url in repos.items()
+            },
+        }
+
+
+helm_repo_cache = HelmRepoCache()
@@ -7,9 +7,14 @@ import shutil
 import tempfile
 from pathlib import Path
 from typing import Optional, Tuple
+from app.services import instrumentation
 
 logger = logging.getLogger(__name__)
 
+# Seconds a cancelled helm gets to handle SIGTERM (and mark its release
+# failed) before it is killed.
+TERMINATE_GRACE = 10
+
 
 class HelmRunner:
     def __init__(self):
@@ -32,7 +37,7 @@ class HelmRunner:
         env = os.environ.copy()
         env["KUBECONFIG"] = self.kubeconfig
         logger.info(f"Running: helm {' '.join(args)}")
-        proc = await asyncio.create_subprocess_exec(
+        proc = await instrumentation.create_subprocess_exec(
             self.helm_bin, *args,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
@@ -43,16 +48,35 @@ class HelmRunner:
         except asyncio.TimeoutError:
             proc.kill()
             return -1, "", "Helm command timed out"
+        except asyncio.CancelledError:
+            # The caller was cancelled (e.g. a cancelled helm job): stop helm too
+            await self._terminate(proc)
+            raise
         return proc.returncode, stdout.decode(), stderr.decode()
 
+    @staticmethod
+    async def _terminate(proc):
+        if proc.returncode is not None:
+            return
+        logger.info(f"Terminating helm (pid {proc.pid})")
+        try:
+            proc.terminate()
+            await asyncio.wait_for(proc.wait(), timeout=TERMINATE_GRACE)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+        except ProcessLookupError:
+            pass
+
     async def repo_add(self, name: str, url: str) -> Tuple[bool, str]:
         rc, out, err = await self._run_helm(["repo", "add", name, url, "--force-update"])
         if rc != 0:
             return False, err.strip() or out.strip()
         return True, out.strip()
 
-    async def repo_update(self) -> Tuple[bool, str]:
-        rc, out, err = await self._run_helm(["repo", "update"])
+    async def repo_update(self, *names: str) -> Tuple[bool, str]:
+        """Refresh the named repos' indexes (all repos when none are given)."""
+        rc, out, err = await self._run_helm(["repo", "update", *names])
         if rc != 0:
             return False, err.strip() or out.strip()
         return True, out.strip()
@@ -158,13 +182,9 @@ class HelmRunner:
             return []
 
     async def search_versions(self, chart: str) -> list:
-        rc, out, err = await self._run_helm(["search", "repo", chart, "--versions", "-o", "json"])
-        if rc != 0:
-            return []
-        try:
-            return json.loads(out) or []
-        except json.JSONDecodeError:
-            return []
+        # Served from the parsed repo indexes rather than `helm search repo`
+        from app.services.helm_repo_cache import helm_repo_cache
+        return await helm_repo_cache.search_versions(chart)
 
 
 # Singleton
@@ -0,0 +1,401 @@
+"""Lightweight metrics registry and hot-path instrumentation.
+
+Exposes counters and histograms in Prometheus text format (served at
+``/metrics``) without pulling in an extra dependency.  Hooks cover:
+
+- HTTP request latency per route (:class:`MetricsMiddleware`)
+- WebSocket action latency and errors (``observe_ws_action``)
+- DB transactions and query time (SQLAlchemy engine/session events)
+- kubectl/helm/talosctl subprocess spawns and durations
+- broadcast fan-out time
+
+A sampling profiler (:class:`SamplingProfiler`) can be toggled at runtime
+and produces collapsed stacks for flamegraph tools.
+"""
+import asyncio
+import inspect
+import os
+import subprocess
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_TRACKED_BINARIES = ("kubectl", "helm", "talosctl")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_float(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[tuple(label_values)] += amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(tuple(label_values), 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for lv, v in sorted(items):
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {_fmt_float(v)}"
+
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[tuple(label_values)] = value
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> Iterable[str]:
+        lines = list(super().render())
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], list] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        key = tuple(label_values)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[idx] += 1
+            self._sums[key] += value
+
+    def count(self, *label_values: str) -> int:
+        return sum(self._counts.get(tuple(label_values), []))
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        for lv, counts, total in sorted(items):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_fmt_float(bound)}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, lv)} {_fmt_float(total)}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, lv)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "ktizo_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")))
+ws_action_duration = registry.register(Histogram(
+    "ktizo_ws_action_duration_seconds", "WebSocket action handler latency", ("action",)))
+ws_action_errors = registry.register(Counter(
+    "ktizo_ws_action_errors_total", "WebSocket actions that raised or were unknown", ("action",)))
+db_transactions = registry.register(Counter(
+    "ktizo_db_sessions_total", "DB session transactions started"))
+db_connections_in_use = registry.register(Gauge(
+    "ktizo_db_connections_in_use", "Pooled DB connections currently checked out"))
+db_query_duration = registry.register(Histogram(
+    "ktizo_db_query_duration_seconds", "SQL statement execution time", ("statement",)))
+subprocess_spawns = registry.register(Counter(
+    "ktizo_subprocess_spawns_total", "Subprocesses started", ("binary",)))
+subprocess_duration = registry.register(Histogram(
+    "ktizo_subprocess_duration_seconds", "Subprocess wall time until exit", ("binary",)))
+broadcast_duration = registry.register(Histogram(
+    "ktizo_broadcast_duration_seconds", "Time to fan a broadcast out to all WebSocket clients"))
+broadcast_recipients = registry.register(Counter(
+    "ktizo_broadcast_messages_total", "Broadcast messages delivered", ("event",)))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency.
+
+    Routes are labelled by their path template (``/pxe/register/{mac_address}``)
+    so per-MAC URLs don't explode label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict] = None
+
+    def _route_for(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            router_app = scope.get("app")
+            routes = getattr(router_app, "routes", []) if router_app else []
+            self._route_paths = {getattr(r, "endpoint", None): r.path for r in routes if hasattr(r, "path")}
+        return self._route_paths.get(endpoint, getattr(endpoint, "__name__", "unknown"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope.get("method", ""), self._route_for(scope), str(status["code"]),
+            )
+
+
+# ---------------------------------------------------------------------------
+# WebSocket actions / broadcasts
+# ---------------------------------------------------------------------------
+
+def observe_ws_action(action: str, seconds: float, failed: bool):
+    ws_action_duration.observe(seconds, action)
+    if failed:
+        ws_action_errors.inc(action)
+
+
+def observe_broadcast(event_type: str, seconds: float, recipients: int):
+    broadcast_duration.observe(seconds)
+    if recipients:
+        broadcast_recipients.inc(event_type or "unknown", amount=recipients)
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+def instrument_engine(engine, session_factory=None):
+    """Attach query timing and connection accounting to an engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_ktizo_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_ktizo_query_start")
+        if starts:
+            db_query_duration.observe(time.perf_counter() - starts.pop(), _statement_kind(statement))
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, conn_record, conn_proxy):
+        db_connections_in_use.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, conn_record):
+        db_connections_in_use.dec()
+
+    if session_factory is not None:
+        @event.listens_for(session_factory, "after_begin")
+        def _session_begin(session, transaction, connection):
+            db_transactions.inc()
+
+
+# ---------------------------------------------------------------------------
+# Subprocesses
+# ---------------------------------------------------------------------------
+
+def _binary_label(args) -> Optional[str]:
+    """Map a command line to kubectl/helm/talosctl, or None if untracked."""
+    if isinstance(args, (list, tuple)) and args:
+        exe = str(args[0])
+    elif isinstance(args, str):
+        exe = args.split(None, 1)[0] if args.strip() else ""
+    else:
+        return None
+    name = os.path.basename(exe)
+    for b in _TRACKED_BINARIES:
+        if name == b or name.startswith(b + "-"):
+            return b
+    return None
+
+
+def run(*popenargs, **kwargs) -> subprocess.CompletedProcess:
+    """``subprocess.run`` that counts and times kubectl/helm/talosctl runs.
+
+    Only the app's own call sites go through this (and
+    :func:`create_subprocess_exec`); subprocesses started by libraries are
+    left alone.
+    """
+    args = popenargs[0] if popenargs else kwargs.get("args")
+    label = _binary_label(args)
+    if label is None:
+        return subprocess.run(*popenargs, **kwargs)
+    subprocess_spawns.inc(label)
+    start = time.perf_counter()
+    try:
+        return subprocess.run(*popenargs, **kwargs)
+    finally:
+        subprocess_duration.observe(time.perf_counter() - start, label)
+
+
+async def create_subprocess_exec(program, *args, **kwargs) -> asyncio.subprocess.Process:
+    """``asyncio.create_subprocess_exec`` that counts and times kubectl/helm/talosctl runs."""
+    label = _binary_label([program])
+    proc = await asyncio.create_subprocess_exec(program, *args, **kwargs)
+    if label is not None:
+        subprocess_spawns.inc(label)
+        start = time.perf_counter()
+
+        def _done(_fut):
+            subprocess_duration.observe(time.perf_counter() - start, label)
+
+        waiter = proc.wait()
+        if inspect.isawaitable(waiter):  # test doubles may return a plain mock
+            asyncio.ensure_future(waiter).add_done_callback(_done)
+    return proc
+
+
+# ---------------------------------------------------------------------------
+# Sampling profiler
+# ---------------------------------------------------------------------------
+
+class SamplingProfiler:
+    """Periodically samples every thread's stack into collapsed-stack counts.
+
+    Output is the ``frame;frame;frame count`` format understood by
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0) -> bool:
+        if self.running:
+            return False
+        self.interval = max(0.001, interval_ms / 1000.0)
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._loop, name="ktizo-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> str:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2)
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            items = sorted(self._stacks.items(), key=lambda kv: -kv[1])
+        return "\n".join(f"{stack} {count}" for stack, count in items) + ("\n" if items else "")
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "samples": self.samples,
+        }
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            batch = []
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    batch.append(";".join(reversed(stack)))
+            with self._lock:
+                for s in batch:
+                    self._stacks[s] += 1
+                self.samples += 1
+
+
+profiler = SamplingProfiler()
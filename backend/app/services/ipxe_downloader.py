@@ -1,5 +1,4 @@
 """Service for downloading iPXE bootloader files"""
-import requests
 import logging
 import os
 import stat
@@ -72,6 +71,8 @@ class IPXEDownloader:
         Returns:
             True if successful, False otherwise
         """
+        import requests
+
         try:
             output_path = self.tftp_root / filename
 
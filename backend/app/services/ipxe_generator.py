@@ -1,11 +1,12 @@
 """Service for generating iPXE boot script with approved devices"""
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
 import logging
 import os
 from typing import List
 from app.db.models import Device, DeviceStatus
 from app.core.config import settings, ensure_v_prefix
+from app.services.config_store import file_hash, fingerprint, get_manifest
+from app.services.template_env import get_environment
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +53,9 @@ class IPXEGenerator:
             self.output_dir = fallback_path
             logger.info(f"Using fallback directory: {self.output_dir}")
 
-        # Set up Jinja2 environment
-        self.env = Environment(loader=FileSystemLoader(str(self.templates_dir)))
+        # Shared Jinja2 environment: boot.ipxe.j2 is compiled once per process
+        self.env = get_environment(self.templates_dir)
+        self.manifest = get_manifest(self.output_dir)
 
     def get_talos_version_from_settings(self, db) -> str:
         """Get Talos version from network settings in database."""
@@ -98,6 +100,14 @@ class IPXEGenerator:
                 finally:
                     db.close()
 
+            # Don't switch boot.ipxe to a version whose artifacts are still prefetching
+            try:
+                from app.services.prefetch_service import prefetch_service
+                talos_version = prefetch_service.resolve_boot_version(
+                    talos_version, boot_script=self.output_dir / "boot.ipxe")
+            except Exception as e:
+                logger.warning(f"Could not check prefetch readiness (non-fatal): {e}")
+
             # Filter only approved devices
             approved_devices = [d for d in devices if d.status == DeviceStatus.APPROVED]
 
@@ -123,26 +133,30 @@ class IPXEGenerator:
                 ) from e
 
             # Render template — version needs v prefix for filenames
+            context = {
+                'server': server_ip,
+                'version': ensure_v_prefix(talos_version),
+                'devices': device_mappings,
+                'strict_mode': strict_mode,
+                'install_disk': install_disk,
+            }
             try:
-                rendered = template.render(
-                    server=server_ip,
-                    version=ensure_v_prefix(talos_version),
-                    devices=device_mappings,
-                    strict_mode=strict_mode,
-                    install_disk=install_disk
-                )
+                rendered = template.render(**context)
             except Exception as e:
                 raise Exception(
                     f"Failed to render iPXE template: {str(e)}. "
                     f"Check that template variables are correct and template syntax is valid."
                 ) from e
 
-            # Write to output
+            # Write to output (atomically, and only if it changed)
             output_path = self.output_dir / "boot.ipxe"
+            inputs = fingerprint({
+                'context': context,
+                'template': file_hash(self.templates_dir / 'boot.ipxe.j2'),
+            })
             try:
-                with open(output_path, 'w') as f:
-                    f.write(rendered)
-                
+                written = self.manifest.write("boot.ipxe", output_path, rendered, inputs)
+
                 # Set proper permissions for dnsmasq/TFTP
                 if os.getuid() == 0:
                     try:
@@ -174,7 +188,10 @@ class IPXEGenerator:
                     f"Check disk space and directory permissions."
                 ) from e
 
-            logger.info(f"Generated boot.ipxe with {len(device_mappings)} approved devices at {output_path}")
+            if written:
+                logger.info(f"Generated boot.ipxe with {len(device_mappings)} approved devices at {output_path}")
+            else:
+                logger.debug(f"boot.ipxe unchanged ({len(device_mappings)} approved devices)")
             return True
 
         except Exception as e:
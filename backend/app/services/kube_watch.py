@@ -0,0 +1,74 @@
+"""Event-driven waits on Kubernetes objects via ``kubectl get --watch``.
+
+One long-lived kubectl process streams a line for every change to the
+watched objects, so a waiter wakes the moment a condition flips instead of
+forking ``kubectl get`` on a fixed poll interval.  A watch the API server
+closes (or a kubectl that exits early) is re-established until the timeout,
+unless kubectl reports the resource type does not exist (e.g. a CRD whose
+operator is not installed): that cannot change by retrying.
+"""
+import asyncio
+import logging
+from typing import Callable, List
+from app.services import instrumentation
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 2  # seconds before re-establishing a watch that ended
+
+# kubectl errors that re-establishing the watch will not fix
+_TERMINAL_ERRORS = ("the server doesn't have a resource type",)
+
+
+class _WatchUnavailable(Exception):
+    pass
+
+
+async def _watch_once(kubectl: str, kubeconfig: str, args: List[str], template: str,
+                      predicate: Callable[[str], bool]) -> bool:
+    proc = await instrumentation.create_subprocess_exec(
+        kubectl, "get", *args, "--watch", "-o", f"jsonpath={template}",
+        "--kubeconfig", kubeconfig,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        async for raw in proc.stdout:
+            if predicate(raw.decode().strip()):
+                return True
+        err = (await proc.stderr.read()).decode().strip()
+        await proc.wait()
+        if proc.returncode:
+            if any(marker in err for marker in _TERMINAL_ERRORS):
+                raise _WatchUnavailable(err)
+            logger.debug(f"kubectl watch {' '.join(args)} exited {proc.returncode}: {err}")
+        return False
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def watch_until(kubectl: str, kubeconfig: str, args: List[str], template: str,
+                      predicate: Callable[[str], bool], timeout: float) -> bool:
+    """Watch ``kubectl get <args>`` until a printed line satisfies ``predicate``.
+
+    ``template`` is a jsonpath template printed for every object and every
+    change to it; end it with ``{"\\n"}``.  Returns False if no line matches
+    within ``timeout`` seconds, or at once if the resource type does not exist.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        try:
+            if await asyncio.wait_for(_watch_once(kubectl, kubeconfig, args, template, predicate),
+                                      timeout=remaining):
+                return True
+        except asyncio.TimeoutError:
+            return False
+        except _WatchUnavailable as e:
+            logger.info(f"Not watching {args[0]}: {e}")
+            return False
+        await asyncio.sleep(min(RESTART_DELAY, max(0.0, deadline - loop.time())))
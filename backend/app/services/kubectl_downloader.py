@@ -93,6 +93,7 @@ class KubectlDownloader:
             kubectl_path = self.versions_dir / f"kubectl-{normalized_version}"
             if kubectl_path.exists():
                 logger.info(f"kubectl {version} already exists at {kubectl_path}")
+                self._register_artifact(kubectl_path, normalized_version, existing=True)
                 return True, None
             
             # Download kubectl
@@ -106,6 +107,7 @@ class KubectlDownloader:
             os.chmod(kubectl_path, 0o755)
             
             logger.info(f"Successfully downloaded kubectl {version} to {kubectl_path}")
+            self._register_artifact(kubectl_path, normalized_version)
             return True, None
             
         except Exception as e:
@@ -113,6 +115,17 @@ class KubectlDownloader:
             logger.error(error_msg)
             return False, error_msg
     
+    def _register_artifact(self, path: Path, version: str, existing: bool = False):
+        """Hand the binary to the artifact store for dedup/GC tracking (non-fatal)"""
+        try:
+            from app.services.artifact_store import artifact_store, KIND_KUBECTL
+            if existing and artifact_store.get(KIND_KUBECTL, "kubectl", version):
+                artifact_store.touch(KIND_KUBECTL, "kubectl", version)
+            else:
+                artifact_store.ingest(path, KIND_KUBECTL, "kubectl", version)
+        except Exception as e:
+            logger.warning(f"Could not register kubectl {version} in artifact store (non-fatal): {e}")
+    
     def set_kubectl_version(self, version: str) -> Tuple[bool, Optional[str]]:
         """
         Set the active kubectl version by creating/updating symlink.
@@ -0,0 +1,386 @@
+"""Background prefetch of everything a new Talos/Kubernetes version needs.
+
+When a version (or the factory schematic) changes, nodes would otherwise
+pull boot files and the installer image on first boot, all at once.  The
+prefetcher downloads the Talos kernel/initramfs, the matching talosctl and
+kubectl, and checks the factory installer manifest concurrently as soon as
+the change is saved.  A version is marked ``ready`` once its boot files are
+present; until then boot.ipxe keeps booting the last ready version (see
+:meth:`PrefetchService.resolve_boot_version`).  The other components are
+reported per version but don't hold back booting.
+
+Failed components are retried with exponential backoff, and a prefetch a
+restart interrupted is picked up again at startup (see
+:func:`resume_for_settings`).  State is kept in
+``DATA_DIR/prefetch_state.json`` so readiness survives a restart.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings, ensure_v_prefix, strip_v_prefix
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_FETCHING = "fetching"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+# Components that gate booting a version; the rest are only reported
+BOOT_FILES = ("vmlinuz-amd64", "initramfs-amd64.xz")
+
+RETRY_DELAY = float(os.getenv("PREFETCH_RETRY_DELAY", "60"))
+RETRY_MAX_DELAY = float(os.getenv("PREFETCH_RETRY_MAX_DELAY", str(60 * 60)))
+
+_FACTORY_REGISTRY = "factory.talos.dev"
+_MANIFEST_ACCEPT = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+
+def _installer_manifest_url(install_image: str) -> Optional[str]:
+    """Registry v2 manifest URL for a factory installer image reference.
+
+    Only factory.talos.dev images are checked; other registries need auth
+    tokens and are skipped (treated as present).
+    """
+    if not install_image or not install_image.startswith(_FACTORY_REGISTRY + "/"):
+        return None
+    ref = install_image[len(_FACTORY_REGISTRY) + 1:]
+    if ":" not in ref:
+        return None
+    repo, tag = ref.rsplit(":", 1)
+    return f"https://{_FACTORY_REGISTRY}/v2/{repo}/manifests/{tag}"
+
+
+def _booted_version(boot_script: Optional[Path]) -> Optional[str]:
+    """Talos version an existing boot.ipxe boots (``set version ...``)."""
+    if boot_script is None:
+        return None
+    try:
+        match = re.search(r"^set version (\S+)", boot_script.read_text(), re.MULTILINE)
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
+class PrefetchService:
+    """Tracks per-version prefetch jobs and their readiness."""
+
+    def __init__(self, state_file: str = None):
+        data_dir = os.getenv("DATA_DIR", settings.DATA_DIR)
+        self.state_file = Path(state_file) if state_file else Path(data_dir) / "prefetch_state.json"
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._retries: Dict[str, asyncio.TimerHandle] = {}
+
+    # ------------------------------------------------------------------
+    # State persistence
+    # ------------------------------------------------------------------
+
+    def _load(self) -> dict:
+        try:
+            if self.state_file.exists():
+                return json.loads(self.state_file.read_text())
+        except Exception as e:
+            logger.warning(f"Prefetch state unreadable, starting empty: {e}")
+        return {"versions": {}, "active_boot_version": None}
+
+    def _save(self, state: dict):
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, self.state_file)
+
+    def _update_version(self, version: str, **fields) -> dict:
+        with self._lock:
+            state = self._load()
+            entry = state["versions"].setdefault(version, {"components": {}})
+            components = fields.pop("components", None)
+            if components:
+                entry["components"].update(components)
+            entry.update(fields)
+            entry["updated_at"] = time.time()
+            self._save(state)
+            return dict(entry)
+
+    def get_status(self, talos_version: str = None) -> dict:
+        state = self._load()
+        if talos_version:
+            return state["versions"].get(ensure_v_prefix(talos_version), {})
+        return state
+
+    # ------------------------------------------------------------------
+    # Readiness / boot gating
+    # ------------------------------------------------------------------
+
+    def is_ready(self, talos_version: str) -> bool:
+        """True if the version may be booted.
+
+        Versions the prefetcher has never seen (e.g. installs that predate
+        it) are considered ready when their boot files are on disk.
+        """
+        version = ensure_v_prefix(talos_version)
+        entry = self._load()["versions"].get(version)
+        if entry is not None:
+            return entry.get("status") == STATUS_READY
+        from app.services.talos_downloader import talos_downloader
+        return all(
+            talos_downloader.file_exists(version, f)
+            for f in ("vmlinuz-amd64", "initramfs-amd64.xz")
+        )
+
+    def resolve_boot_version(self, requested: str, boot_script: Path = None) -> str:
+        """Version boot.ipxe should actually reference.
+
+        Returns ``requested`` once it is ready, otherwise the last version
+        that was booted.  Installs that predate the prefetcher have no
+        record of that yet; it is taken from the existing ``boot_script``.
+        Falls back to ``requested`` if nothing was ever booted, so
+        first-time setups still get a boot script.
+        """
+        requested = ensure_v_prefix(requested)
+        if self.is_ready(requested):
+            self._set_active(requested)
+            return requested
+
+        active = self._load().get("active_boot_version")
+        if not active:
+            active = _booted_version(boot_script)
+            if active:
+                self._set_active(active)
+        if active and active != requested:
+            logger.warning(f"Talos {requested} not prefetched yet — boot.ipxe stays on {active}")
+            return active
+        return requested
+
+    def _set_active(self, version: str):
+        with self._lock:
+            state = self._load()
+            if state.get("active_boot_version") != version:
+                state["active_boot_version"] = version
+                self._save(state)
+
+    def mark_pending(self, talos_version: str):
+        """Flag a version as not-yet-bootable before its prefetch is scheduled."""
+        version = ensure_v_prefix(talos_version)
+        entry = self._load()["versions"].get(version, {})
+        if entry.get("status") != STATUS_READY:
+            self._update_version(version, status=STATUS_PENDING)
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def schedule(self, talos_version: str, kubectl_version: str = None,
+                 install_image: str = None) -> Optional[asyncio.Task]:
+        """Start (or join) a background prefetch for a version combination.
+
+        A combination waiting to retry failed components is retried now.
+        """
+        if not talos_version:
+            return None
+        version = ensure_v_prefix(talos_version)
+        key = f"{version}|{strip_v_prefix(kubectl_version or '')}|{install_image or ''}"
+
+        existing = self._tasks.get(key)
+        if existing and not existing.done():
+            return existing
+        retry = self._retries.pop(key, None)
+        if retry:
+            retry.cancel()
+
+        fields = {"kubectl_version": strip_v_prefix(kubectl_version) if kubectl_version else None,
+                  "install_image": install_image}
+        if self.get_status(version).get("status") != STATUS_READY:
+            fields["status"] = STATUS_PENDING
+        self._update_version(version, **fields)
+        return self._start(key, version, kubectl_version, install_image)
+
+    def _start(self, key: str, version: str, kubectl_version: Optional[str],
+               install_image: Optional[str], attempt: int = 0,
+               only: Iterable[str] = None) -> asyncio.Task:
+        self._retries.pop(key, None)
+        task = asyncio.create_task(self._run(key, version, kubectl_version, install_image, attempt, only))
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+        return task
+
+    def stop(self):
+        """Cancel running prefetches and pending retries; startup resumes them."""
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks.values():
+            task.cancel()
+
+    async def _run(self, key: str, version: str, kubectl_version: Optional[str],
+                   install_image: Optional[str], attempt: int = 0, only: Iterable[str] = None):
+        from app.services.talos_downloader import talos_downloader
+        from app.services.talosctl_downloader import TalosctlDownloader
+        from app.services.kubectl_downloader import KubectlDownloader
+
+        was_ready = self.get_status(version).get("status") == STATUS_READY
+        fields = {"started_at": time.time(), "error": None, "retry_at": None}
+        if not was_ready:
+            fields["status"] = STATUS_FETCHING
+        self._update_version(version, **fields)
+        logger.info(f"Prefetching artifacts for Talos {version}"
+                    + (f" (retry {attempt})" if attempt else ""))
+
+        async def _boot_file(filename: str):
+            path = await asyncio.to_thread(talos_downloader.download_file, version, filename)
+            return path is not None, None if path else f"download of {filename} failed"
+
+        async def _talosctl():
+            return await asyncio.to_thread(TalosctlDownloader().fetch_talosctl, version)
+
+        async def _kubectl():
+            return await asyncio.to_thread(KubectlDownloader().download_kubectl, kubectl_version)
+
+        jobs = {
+            "vmlinuz-amd64": lambda: _boot_file("vmlinuz-amd64"),
+            "initramfs-amd64.xz": lambda: _boot_file("initramfs-amd64.xz"),
+            "talosctl": _talosctl,
+        }
+        if kubectl_version:
+            jobs["kubectl"] = _kubectl
+        if install_image:
+            jobs["installer"] = lambda: self._check_installer(install_image)
+        # A retry only fetches what failed last time
+        names = [n for n in jobs if only is None or n in only]
+
+        results = await asyncio.gather(*(jobs[n]() for n in names), return_exceptions=True)
+
+        components = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                ok, err = False, str(result)
+            else:
+                ok, err = result
+            components[name] = {"ok": bool(ok), "error": err or None}
+
+        entry = self._update_version(version, components=components)
+        current = {n: entry["components"].get(n, {}) for n in jobs}
+        failed = [n for n, c in current.items() if not c.get("ok")]
+        errors = [f"{n}: {current[n].get('error')}" for n in failed]
+        boot_ok = all(current[n].get("ok") for n in BOOT_FILES)
+
+        status = STATUS_READY if boot_ok else STATUS_FAILED
+        fields = {"status": status, "finished_at": time.time(),
+                  "error": "; ".join(errors) if errors else None}
+        if failed:
+            delay = min(RETRY_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+            fields.update(attempts=attempt + 1, retry_at=time.time() + delay)
+            self._retries[key] = asyncio.get_running_loop().call_later(
+                delay, self._start, key, version, kubectl_version, install_image, attempt + 1, failed)
+        else:
+            fields["attempts"] = 0
+        self._update_version(version, **fields)
+
+        if failed:
+            logger.error(f"Prefetch for Talos {version} incomplete, retrying {', '.join(failed)} "
+                         f"in {int(delay)}s: {'; '.join(errors)}")
+        if status == STATUS_READY and not was_ready:
+            logger.info(f"Talos {version} boot files ready")
+            await asyncio.to_thread(_regenerate_boot_script)
+
+        try:
+            from app.services.websocket_manager import websocket_manager
+            await websocket_manager.broadcast_event({
+                "type": "prefetch_status",
+                "data": {"talos_version": version, "status": status, "components": current},
+            })
+        except Exception as e:
+            logger.debug(f"Prefetch broadcast failed: {e}")
+
+    async def _check_installer(self, install_image: str):
+        """Resolve the installer manifest so registry-side builds are warm."""
+        url = _installer_manifest_url(install_image)
+        if not url:
+            return True, None
+        import httpx
+        try:
+            async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
+                resp = await client.get(url, headers={"Accept": _MANIFEST_ACCEPT})
+                resp.raise_for_status()
+                digest = resp.headers.get("docker-content-digest")
+                logger.info(f"Installer {install_image} resolved ({digest or 'no digest'})")
+                return True, None
+        except Exception as e:
+            return False, f"installer manifest unavailable: {e}"
+
+
+def _regenerate_boot_script():
+    """Rewrite boot.ipxe after a version became ready so nodes switch over."""
+    from app.db.database import SessionLocal
+    from app.crud import network as network_crud, device as device_crud
+    from app.db.models import DeviceStatus
+    from app.services.ipxe_generator import IPXEGenerator
+
+    db = SessionLocal()
+    try:
+        ns = network_crud.get_network_settings(db)
+        if not ns:
+            return
+        ig = IPXEGenerator(tftp_root=ns.tftp_root)
+        approved = device_crud.get_devices_by_status(db, DeviceStatus.APPROVED, 0, 1000)
+        ig.generate_boot_script(approved, ns.server_ip,
+                                talos_version=ns.talos_version,
+                                strict_mode=ns.strict_boot_mode)
+    except Exception as e:
+        logger.warning(f"Could not regenerate boot.ipxe after prefetch: {e}")
+    finally:
+        db.close()
+
+
+def _settings_versions(db):
+    """(talos_version, kubectl_version, install_image) currently saved in settings."""
+    from app.crud import network as network_crud, cluster as cluster_crud
+
+    ns = network_crud.get_network_settings(db)
+    cs = cluster_crud.get_cluster_settings(db)
+    talos_version = (ns.talos_version if ns else None) or (cs.talos_version if cs else None)
+    kubectl_version = (cs.kubectl_version or cs.kubernetes_version) if cs else None
+    return talos_version, kubectl_version, cs.install_image if cs else None
+
+
+def schedule_for_settings(db, install_image: str = None) -> Optional[asyncio.Task]:
+    """Schedule a prefetch for the versions currently saved in settings."""
+    talos_version, kubectl_version, saved_image = _settings_versions(db)
+    if install_image is None:
+        install_image = saved_image
+    return prefetch_service.schedule(talos_version, kubectl_version, install_image)
+
+
+def resume_for_settings(db) -> Optional[asyncio.Task]:
+    """Restart the prefetch of the configured version if it never finished.
+
+    Covers a restart mid-prefetch and components still failing; the
+    combination last scheduled for the version is reused.
+    """
+    talos_version, kubectl_version, install_image = _settings_versions(db)
+    if not talos_version:
+        return None
+    entry = prefetch_service.get_status(talos_version)
+    if not entry:
+        return None
+    complete = entry.get("status") == STATUS_READY and all(
+        c.get("ok") for c in entry.get("components", {}).values())
+    if complete:
+        return None
+    return prefetch_service.schedule(talos_version,
+                                     entry.get("kubectl_version") or kubectl_version,
+                                     entry.get("install_image") or install_image)
+
+
+prefetch_service = PrefetchService()
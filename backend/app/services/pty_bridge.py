@@ -0,0 +1,117 @@
+"""Event-driven PTY output pump.
+
+Reads a PTY master fd with ``loop.add_reader`` instead of polling, batches
+output over a short coalescing window and hands it to an async ``send``
+callable as raw bytes (one binary WebSocket frame per batch).
+
+Backpressure: when more than ``high_water`` bytes are waiting to be sent
+(the browser is slower than e.g. ``kubectl logs -f``), the reader is
+removed from the loop.  The kernel PTY buffer then fills up and the child
+blocks on write until the sender drains below ``low_water``.
+"""
+import asyncio
+import errno
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 0.005     # seconds to wait for more output before sending
+MAX_FRAME = 64 * 1024       # bytes per WebSocket frame
+READ_SIZE = 64 * 1024
+HIGH_WATER = 1024 * 1024    # pause reading above this many pending bytes
+LOW_WATER = 256 * 1024      # resume reading below this
+
+
+class PtyOutputPump:
+    """Forward output from ``fd`` to ``send`` until EOF or cancellation."""
+
+    def __init__(self, fd: int, send: Callable[[bytes], Awaitable[None]],
+                 coalesce: float = COALESCE_WINDOW, max_frame: int = MAX_FRAME,
+                 high_water: int = HIGH_WATER, low_water: int = LOW_WATER):
+        self.fd = fd
+        self.send = send
+        self.coalesce = coalesce
+        self.max_frame = max_frame
+        self.high_water = high_water
+        self.low_water = low_water
+
+        self.buffer = bytearray()
+        self.eof = False
+        self.paused = False
+        # Stats, used by tests and session accounting
+        self.bytes_read = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.reads = 0
+        self.pauses = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake = asyncio.Event()
+        self._reading = False
+
+    # -- reader side ---------------------------------------------------------
+
+    def _add_reader(self):
+        if not self._reading and not self.eof:
+            self._loop.add_reader(self.fd, self._on_readable)
+            self._reading = True
+
+    def _remove_reader(self):
+        if self._reading:
+            self._loop.remove_reader(self.fd)
+            self._reading = False
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # EIO: the slave side was closed (shell exited)
+            if e.errno != errno.EIO:
+                logger.debug(f"PTY read error on fd {self.fd}: {e}")
+            data = b""
+
+        self.reads += 1
+        if not data:
+            self.eof = True
+            self._remove_reader()
+        else:
+            self.buffer += data
+            self.bytes_read += len(data)
+            if len(self.buffer) >= self.high_water:
+                self._remove_reader()
+                self.paused = True
+                self.pauses += 1
+        self._wake.set()
+
+    # -- sender side ---------------------------------------------------------
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._add_reader()
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+
+                # Coalesce bursts of small writes (shell echo, prompt redraws)
+                if self.coalesce and not self.eof and len(self.buffer) < self.max_frame:
+                    await asyncio.sleep(self.coalesce)
+
+                while self.buffer:
+                    chunk = bytes(self.buffer[:self.max_frame])
+                    del self.buffer[:self.max_frame]
+                    await self.send(chunk)
+                    self.bytes_sent += len(chunk)
+                    self.frames_sent += 1
+                    if self.paused and len(self.buffer) < self.low_water:
+                        self.paused = False
+                        self._add_reader()
+
+                if self.eof:
+                    break
+        finally:
+            self._remove_reader()
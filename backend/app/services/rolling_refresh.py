@@ -0,0 +1,427 @@
+"""Durable rolling refresh of worker nodes.
+
+A refresh is a plan row in ``rolling_refreshes`` plus one row per node in
+``rolling_refresh_nodes``, holding the node's current step and a journal of
+every step it went through.  A refresh interrupted by a backend restart is
+resumed on the next start: nodes that were mid-pipeline re-enter it at their
+last journaled step (every step is safe to repeat), so none is left cordoned
+or with its wipe flag set, and the pending ones follow.
+
+Concurrency is bounded by a disruption budget, ``max_unavailable``: given
+directly, as a percentage of the worker fleet, or defaulted from the mode.
+Workers that are NotReady or cordoned for other reasons count against it,
+including nodes of this refresh that failed and were left that way.
+In parallel mode the batch size adapts to node turnaround within that budget:
+it grows by one while nodes finish about as fast as the median so far, and
+halves when a node fails or takes more than twice the median.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import statistics
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.db import database
+from app.db.models import RollingRefresh, RollingRefreshNode
+
+logger = logging.getLogger(__name__)
+
+# Seconds between disruption-budget checks while no node can start
+BUDGET_POLL = int(os.getenv("ROLLING_REFRESH_BUDGET_POLL", "30"))
+# Turnaround relative to the median that grows / shrinks the batch
+GROW_RATIO = 1.25
+SHRINK_RATIO = 2.0
+
+MODES = ("sequential", "parallel", "all_at_once")
+FINISHED = ("completed", "failed", "cancelled")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def resolve_budget(mode: str, count: int, parallelism: int, fleet_size: int,
+                   max_unavailable: Optional[int] = None,
+                   max_unavailable_percent: Optional[float] = None) -> Tuple[int, int]:
+    """(max_unavailable, initial batch size) for refreshing ``count`` nodes.
+
+    An explicit ``max_unavailable`` wins over ``max_unavailable_percent`` (of
+    ``fleet_size``, rounded down, at least 1); without either the budget is
+    what the mode used to allow: 1, ``parallelism`` or every node.
+    """
+    if max_unavailable:
+        budget = int(max_unavailable)
+    elif max_unavailable_percent:
+        budget = math.floor(fleet_size * float(max_unavailable_percent) / 100)
+    elif mode == "sequential":
+        budget = 1
+    elif mode == "parallel":
+        budget = parallelism
+    else:
+        budget = count
+    budget = max(1, min(budget, count))
+
+    if mode == "sequential":
+        batch = 1
+    elif mode == "parallel":
+        batch = max(1, min(parallelism, budget))
+    else:
+        batch = budget
+    return budget, batch
+
+
+def _device(node: RollingRefreshNode) -> dict:
+    return {
+        "id": node.device_id,
+        "hostname": node.hostname,
+        "mac_address": node.mac_address,
+        "ip_address": node.ip_address,
+    }
+
+
+def _duration(node: RollingRefreshNode) -> Optional[float]:
+    if node.started_at is None or node.finished_at is None:
+        return None
+    return (node.finished_at - node.started_at).total_seconds()
+
+
+async def _broadcast(event_type: str, data: dict):
+    import app.api.ws_handler as _ws
+    await _ws._broadcast(event_type, data)
+
+
+async def _run_node(device: dict, start_step: str, skip_drain: bool,
+                    progress: Callable[[str, str], Awaitable[None]]) -> bool:
+    from app.api.handlers.devices import _refresh_single_node, _refresh_tools
+    kubectl, kubeconfig, talosctl, talosconfig = _refresh_tools()
+    return await _refresh_single_node(device, kubectl, kubeconfig, talosctl, talosconfig, progress,
+                                      skip_drain=skip_drain, start_step=start_step)
+
+
+async def _unavailable_workers(exclude: set) -> int:
+    from app.api.handlers.devices import _count_unavailable_workers, _refresh_tools
+    kubectl, kubeconfig, _, _ = _refresh_tools()
+    return await _count_unavailable_workers(kubectl, kubeconfig, exclude)
+
+
+class RollingRefreshOrchestrator:
+    def __init__(self,
+                 node_runner: Callable[..., Awaitable[bool]] = _run_node,
+                 unavailable_probe: Callable[[set], Awaitable[int]] = _unavailable_workers,
+                 budget_poll: float = BUDGET_POLL):
+        self._node_runner = node_runner
+        self._unavailable_probe = unavailable_probe
+        self.budget_poll = budget_poll
+        self.refresh_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # -- control -------------------------------------------------------------
+
+    async def start(self, devices: List[dict], mode: str, parallelism: int = 2,
+                    max_unavailable: Optional[int] = None,
+                    max_unavailable_percent: Optional[float] = None,
+                    fleet_size: Optional[int] = None) -> dict:
+        """Persist a plan for ``devices`` and start working through it."""
+        if self.active:
+            raise RuntimeError("A rolling refresh is already in progress")
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode: {mode}")
+        budget, batch = resolve_budget(mode, len(devices), parallelism, fleet_size or len(devices),
+                                       max_unavailable, max_unavailable_percent)
+
+        db = database.SessionLocal()
+        try:
+            plan = RollingRefresh(mode=mode, skip_drain=(mode == "all_at_once"),
+                                  max_unavailable=budget, batch_size=batch)
+            db.add(plan)
+            db.flush()
+            for position, dev in enumerate(devices):
+                db.add(RollingRefreshNode(
+                    refresh_id=plan.id, position=position, device_id=dev["id"],
+                    hostname=dev["hostname"], mac_address=dev["mac_address"],
+                    ip_address=dev["ip_address"], message="Waiting...",
+                ))
+            db.commit()
+            refresh_id = plan.id
+        finally:
+            db.close()
+
+        logger.info(f"Rolling refresh {refresh_id}: {len(devices)} node(s), {mode}, "
+                    f"max unavailable {budget}, batch {batch}")
+        self._launch(refresh_id)
+        return self.status()
+
+    def cancel(self) -> bool:
+        """Stop starting nodes; those in flight finish. False if none is running."""
+        if not self.active:
+            return False
+        db = database.SessionLocal()
+        try:
+            plan = db.get(RollingRefresh, self.refresh_id)
+            plan.cancel_requested = True
+            db.commit()
+        finally:
+            db.close()
+        self._wake.set()
+        return True
+
+    def _launch(self, refresh_id: int):
+        self.refresh_id = refresh_id
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(refresh_id), name=f"rolling-refresh-{refresh_id}")
+
+    # -- scheduling ----------------------------------------------------------
+
+    async def _run(self, refresh_id: int):
+        in_flight: Dict[asyncio.Task, int] = {}
+        stop_reason = None
+        try:
+            plan, nodes = self._load(refresh_id)
+            total = len(nodes)
+
+            # Nodes a previous process left mid-pipeline go first, from their last step
+            for node in nodes:
+                if node.step not in FINISHED and node.step != "pending":
+                    logger.info(f"Rolling refresh {refresh_id}: resuming {node.hostname} at {node.step}")
+                    in_flight[self._start_node(node, node.step, plan.skip_drain, total)] = node.id
+
+            while True:
+                plan, nodes = self._load(refresh_id)
+                pending = [n for n in nodes if n.step == "pending"]
+                if pending and (plan.cancel_requested or stop_reason):
+                    self._skip(pending, "Cancelled" if plan.cancel_requested else stop_reason)
+                    pending = []
+                if not pending and not in_flight:
+                    break
+
+                slots = min(plan.batch_size, plan.max_unavailable) - len(in_flight)
+                if pending and slots > 0:
+                    # In-flight nodes are already counted; failed ones must count as unavailable
+                    running = set(in_flight.values())
+                    exclude = {n.hostname for n in nodes if n.id in running}
+                    external = await self._unavailable_probe(exclude)
+                    slots = min(slots, plan.max_unavailable - external - len(in_flight))
+                    if slots <= 0 and not in_flight:
+                        logger.info(f"Rolling refresh {refresh_id}: {external} worker(s) already "
+                                    f"unavailable, waiting for the disruption budget")
+                    for node in pending[:max(0, slots)]:
+                        in_flight[self._start_node(node, "draining", plan.skip_drain, total)] = node.id
+
+                done = await self._wait(list(in_flight))
+                for task in done:
+                    node_id = in_flight.pop(task)
+                    ok = not task.cancelled() and task.exception() is None and task.result()
+                    if self._finish_node(refresh_id, node_id, ok) and plan.mode == "sequential":
+                        stop_reason = "Stopped after a failed node"
+
+            await self._complete(refresh_id)
+        except asyncio.CancelledError:
+            # Backend shutdown: rows keep their steps for resume()
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+        except Exception as e:
+            logger.error(f"Rolling refresh {refresh_id} failed: {e}")
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            self._set_plan(refresh_id, status="failed", finished_at=_now())
+            await _broadcast("rolling_refresh_error", {"device": None, "error": str(e)})
+
+    async def _wait(self, tasks: List[asyncio.Task]) -> set:
+        """Wait for a node to finish, a cancel request or the budget poll."""
+        waker = asyncio.create_task(self._wake.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [waker], timeout=self.budget_poll,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waker.cancel()
+        self._wake.clear()
+        done.discard(waker)
+        return done
+
+    def _start_node(self, node: RollingRefreshNode, start_step: str, skip_drain: bool,
+                    total: int) -> asyncio.Task:
+        return asyncio.create_task(
+            self._node(node.id, node.position, total, _device(node), start_step, skip_drain),
+            name=f"rolling-refresh-node-{node.hostname}")
+
+    async def _node(self, node_id: int, position: int, total: int, device: dict,
+                    start_step: str, skip_drain: bool) -> bool:
+        async def progress(step: str, message: str):
+            self._journal(node_id, step, message)
+            await _broadcast("rolling_refresh_progress", {
+                "node_index": position, "total": total, "device": device,
+                "step": step, "message": message,
+            })
+
+        try:
+            return await self._node_runner(device, start_step, skip_drain, progress)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Rolling refresh of {device['hostname']} failed: {e}")
+            await progress("failed", str(e))
+            await _broadcast("rolling_refresh_error", {"device": device, "error": str(e)})
+            return False
+
+    # -- persistence ---------------------------------------------------------
+
+    def _load(self, refresh_id: int) -> Tuple[RollingRefresh, List[RollingRefreshNode]]:
+        db = database.SessionLocal()
+        try:
+            plan = db.get(RollingRefresh, refresh_id)
+            nodes = (db.query(RollingRefreshNode).filter(RollingRefreshNode.refresh_id == refresh_id)
+                     .order_by(RollingRefreshNode.position).all())
+            db.expunge_all()
+            return plan, nodes
+        finally:
+            db.close()
+
+    def _set_plan(self, refresh_id: int, **fields):
+        db = database.SessionLocal()
+        try:
+            plan = db.get(RollingRefresh, refresh_id)
+            for key, value in fields.items():
+                setattr(plan, key, value)
+            db.commit()
+        finally:
+            db.close()
+
+    def _journal(self, node_id: int, step: str, message: str):
+        db = database.SessionLocal()
+        try:
+            node = db.get(RollingRefreshNode, node_id)
+            journal = json.loads(node.journal) if node.journal else []
+            journal.append([_now().isoformat(), step, message])
+            node.journal = json.dumps(journal)
+            node.step, node.message = step, message
+            if node.started_at is None:
+                node.started_at = _now()
+            if step in FINISHED:
+                node.finished_at = _now()
+            db.commit()
+        finally:
+            db.close()
+
+    def _skip(self, nodes: List[RollingRefreshNode], reason: str):
+        for node in nodes:
+            self._journal(node.id, "cancelled", reason)
+
+    def _finish_node(self, refresh_id: int, node_id: int, ok: bool) -> bool:
+        """Settle a finished node and adapt the batch size. Returns True if it failed."""
+        db = database.SessionLocal()
+        try:
+            node = db.get(RollingRefreshNode, node_id)
+            if not ok and node.step != "failed":
+                node.step, node.message, node.finished_at = "failed", "Refresh did not complete", _now()
+            plan = db.get(RollingRefresh, refresh_id)
+            if plan.mode == "parallel":
+                self._adapt(db, plan, node, ok)
+            db.commit()
+        finally:
+            db.close()
+        return not ok
+
+    @staticmethod
+    def _adapt(db, plan: RollingRefresh, node: RollingRefreshNode, ok: bool):
+        batch = plan.batch_size
+        if not ok:
+            batch = max(1, batch // 2)
+        else:
+            earlier = [d for d in (
+                _duration(n) for n in db.query(RollingRefreshNode).filter(
+                    RollingRefreshNode.refresh_id == plan.id,
+                    RollingRefreshNode.step == "completed",
+                    RollingRefreshNode.id != node.id)) if d is not None]
+            took = _duration(node)
+            if not earlier or took is None:
+                return
+            median = statistics.median(earlier)
+            if took <= median * GROW_RATIO:
+                batch = min(plan.max_unavailable, batch + 1)
+            elif took > median * SHRINK_RATIO:
+                batch = max(1, batch // 2)
+        if batch != plan.batch_size:
+            logger.info(f"Rolling refresh {plan.id}: batch size {plan.batch_size} -> {batch}")
+            plan.batch_size = batch
+
+    async def _complete(self, refresh_id: int):
+        plan, nodes = self._load(refresh_id)
+        succeeded = sum(1 for n in nodes if n.step == "completed")
+        failed = sum(1 for n in nodes if n.step == "failed")
+        status = "cancelled" if plan.cancel_requested else ("failed" if failed else "completed")
+        self._set_plan(refresh_id, status=status, finished_at=_now())
+        logger.info(f"Rolling refresh {refresh_id} {status}: {succeeded}/{len(nodes)} succeeded")
+        await _broadcast("rolling_refresh_complete", {
+            "total": len(nodes), "succeeded": succeeded, "failed": failed,
+            "cancelled": plan.cancel_requested,
+        })
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def resume(self) -> Optional[int]:
+        """Continue the refresh a previous process left running, if any."""
+        if self.active:
+            return self.refresh_id
+        db = database.SessionLocal()
+        try:
+            plan = (db.query(RollingRefresh).filter(RollingRefresh.status == "running")
+                    .order_by(RollingRefresh.id.desc()).first())
+            refresh_id = plan.id if plan else None
+        finally:
+            db.close()
+        if refresh_id is not None:
+            logger.info(f"Resuming rolling refresh {refresh_id}")
+            self._launch(refresh_id)
+        return refresh_id
+
+    async def stop(self):
+        """Stop working; the plan stays ``running`` so the next start resumes it."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> dict:
+        refresh_id = self.refresh_id
+        if refresh_id is None:
+            db = database.SessionLocal()
+            try:
+                latest = db.query(RollingRefresh).order_by(RollingRefresh.id.desc()).first()
+                refresh_id = latest.id if latest else None
+            finally:
+                db.close()
+        if refresh_id is None:
+            return {"active": False}
+
+        plan, nodes = self._load(refresh_id)
+        durations = [d for d in (_duration(n) for n in nodes if n.step == "completed") if d is not None]
+        return {
+            "active": self.active,
+            "id": plan.id,
+            "mode": plan.mode,
+            "status": plan.status,
+            "total": len(nodes),
+            "parallelism": plan.batch_size,
+            "max_unavailable": plan.max_unavailable,
+            "cancel_requested": plan.cancel_requested,
+            "devices": [_device(n) for n in nodes],
+            "node_states": {n.position: {"device": _device(n), "step": n.step, "message": n.message}
+                            for n in nodes},
+            "succeeded": sum(1 for n in nodes if n.step == "completed"),
+            "failed": sum(1 for n in nodes if n.step == "failed"),
+            "median_node_seconds": round(statistics.median(durations), 1) if durations else None,
+        }
+
+
+rolling_refresh = RollingRefreshOrchestrator()
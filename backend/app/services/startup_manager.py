@@ -0,0 +1,181 @@
+"""Staged, non-blocking application startup.
+
+Only the database is initialised before the app starts serving; everything
+else (bootloader downloads, custom iPXE builds, Talos boot files, kubectl)
+runs as tracked background stages so PXE clients are answered immediately
+after a restart.
+
+Each stage declares the stages it depends on.  A stage starts as soon as
+all of its dependencies finished successfully; if a dependency failed the
+stage is skipped.  Stages marked ``required`` gate ``/health/ready``.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGE_PENDING = "pending"
+STAGE_RUNNING = "running"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+STAGE_SKIPPED = "skipped"
+
+_FINISHED = (STAGE_DONE, STAGE_FAILED, STAGE_SKIPPED)
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable, depends_on: Iterable[str] = (),
+                 required: bool = True, description: str = ""):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.required = required
+        self.description = description
+        self.status = STAGE_PENDING
+        self.error: Optional[str] = None
+        self.message: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        duration = None
+        if self.started_at:
+            duration = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "name": self.name,
+            "description": self.description,
+            "status": self.status,
+            "required": self.required,
+            "depends_on": list(self.depends_on),
+            "message": self.message,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": duration,
+        }
+
+
+class StartupManager:
+    """Registry and runner for startup stages."""
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.started_at: Optional[float] = None
+
+    def stage(self, name: str, depends_on: Iterable[str] = (), required: bool = True,
+              description: str = ""):
+        """Decorator form of :meth:`register`."""
+        def decorator(func):
+            self.register(name, func, depends_on, required, description)
+            return func
+        return decorator
+
+    def register(self, name: str, func: Callable, depends_on: Iterable[str] = (),
+                 required: bool = True, description: str = ""):
+        if name in self.stages:
+            raise ValueError(f"Startup stage '{name}' already registered")
+        self.stages[name] = Stage(name, func, depends_on, required, description)
+
+    def mark_done(self, name: str, message: str = None):
+        """Record a stage that ran inline (e.g. database init)."""
+        stage = self.stages[name]
+        now = time.time()
+        stage.started_at = stage.started_at or now
+        stage.finished_at = now
+        stage.status = STAGE_DONE
+        stage.message = message
+        stage.done.set()
+
+    def set_message(self, name: str, message: str):
+        """Progress text for a running stage (shown by /health/ready)."""
+        if name in self.stages:
+            self.stages[name].message = message
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        # Cycle check (DFS)
+        visiting, visited = set(), set()
+
+        def visit(n):
+            if n in visited:
+                return
+            if n in visiting:
+                raise ValueError(f"Startup stage dependency cycle involving '{n}'")
+            visiting.add(n)
+            for d in self.stages[n].depends_on:
+                visit(d)
+            visiting.discard(n)
+            visited.add(n)
+
+        for n in self.stages:
+            visit(n)
+
+    def start(self) -> List[asyncio.Task]:
+        """Launch every pending stage as a background task."""
+        self._validate()
+        self.started_at = time.time()
+        for stage in self.stages.values():
+            if stage.status == STAGE_PENDING:
+                self._tasks.append(asyncio.create_task(self._run(stage), name=f"startup:{stage.name}"))
+        return self._tasks
+
+    async def wait(self, timeout: float = None):
+        if self._tasks:
+            await asyncio.wait_for(asyncio.gather(*self._tasks, return_exceptions=True), timeout)
+
+    async def _run(self, stage: Stage):
+        for dep_name in stage.depends_on:
+            dep = self.stages[dep_name]
+            await dep.done.wait()
+            if dep.status != STAGE_DONE:
+                stage.status = STAGE_SKIPPED
+                stage.error = f"dependency '{dep_name}' {dep.status}"
+                stage.finished_at = time.time()
+                stage.done.set()
+                logger.warning(f"Startup stage {stage.name} skipped: {stage.error}")
+                return
+
+        stage.status = STAGE_RUNNING
+        stage.started_at = time.time()
+        logger.info(f"Startup stage {stage.name} started")
+        try:
+            if inspect.iscoroutinefunction(stage.func):
+                result = await stage.func()
+            else:
+                result = await asyncio.to_thread(stage.func)
+            if isinstance(result, str):
+                stage.message = result
+            stage.status = STAGE_DONE
+        except Exception as e:
+            stage.status = STAGE_FAILED
+            stage.error = str(e) or type(e).__name__
+            logger.error(f"Startup stage {stage.name} failed: {stage.error}")
+        finally:
+            stage.finished_at = time.time()
+            stage.done.set()
+            logger.info(f"Startup stage {stage.name} {stage.status} "
+                        f"in {stage.finished_at - stage.started_at:.1f}s")
+
+    @property
+    def ready(self) -> bool:
+        return all(s.status == STAGE_DONE for s in self.stages.values() if s.required)
+
+    def status(self) -> dict:
+        stages = [s.to_dict() for s in self.stages.values()]
+        return {
+            "ready": self.ready,
+            "complete": all(s.status in _FINISHED for s in self.stages.values()),
+            "started_at": self.started_at,
+            "stages": stages,
+        }
+
+
+startup_manager = StartupManager()
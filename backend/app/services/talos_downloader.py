@@ -1,5 +1,4 @@
 """Service for downloading Talos boot files"""
-import requests
 import logging
 import os
 from pathlib import Path
@@ -66,12 +65,15 @@ class TalosDownloader:
         Returns:
             Path to downloaded file, or None if download failed
         """
+        import requests
+
         try:
             output_path = self.get_file_path(version, filename)
 
             # Skip if already exists
             if output_path.exists():
                 logger.info(f"File already exists: {output_path}")
+                self._register_artifact(output_path, version, filename, existing=True)
                 return output_path
 
             # Download URL — GitHub releases use v-prefixed tags
@@ -124,6 +126,7 @@ class TalosDownloader:
                     logger.warning(f"Could not set file permissions (non-fatal): {perm_err}")
 
             logger.info(f"Successfully downloaded {filename} to {output_path}")
+            self._register_artifact(output_path, version, filename)
             return output_path
 
         except requests.RequestException as e:
@@ -133,6 +136,17 @@ class TalosDownloader:
             logger.error(f"Unexpected error downloading {filename}: {e}")
             return None
 
+    def _register_artifact(self, path: Path, version: str, filename: str, existing: bool = False):
+        """Hand the file to the artifact store for dedup/GC tracking (non-fatal)."""
+        try:
+            from app.services.artifact_store import artifact_store, KIND_TALOS
+            if existing and artifact_store.get(KIND_TALOS, filename, version):
+                artifact_store.touch(KIND_TALOS, filename, version)
+            else:
+                artifact_store.ingest(path, KIND_TALOS, filename, version)
+        except Exception as e:
+            logger.warning(f"Could not register {path.name} in artifact store (non-fatal): {e}")
+
     def download_talos_files(self, version: str) -> tuple[bool, list[str]]:
         """
         Download both vmlinuz and initramfs for a specific Talos version.
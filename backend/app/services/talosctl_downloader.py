@@ -3,11 +3,10 @@ Service for downloading and managing talosctl binary versions
 """
 import os
 import platform
-import subprocess
 import logging
 from pathlib import Path
 import shutil
-import requests
+from app.services import instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +19,8 @@ class TalosctlDownloader:
         self.backend_dir = Path(__file__).parent.parent.parent
         self.talosctl_dir = self.backend_dir
         self.talosctl_path = self.talosctl_dir / "talosctl"
+        # Downloaded-but-not-active binaries (filled by the prefetch pipeline)
+        self.versions_dir = self.backend_dir / "talosctl-versions"
     
     def _get_os_arch(self) -> tuple[str, str]:
         """Get OS and architecture for talosctl download"""
@@ -58,6 +59,8 @@ class TalosctlDownloader:
         Returns:
             Tuple of (success: bool, error_message: str)
         """
+        import requests
+
         try:
             version = self._ensure_v_prefix(version)
             os_type, arch = self._get_os_arch()
@@ -70,21 +73,27 @@ class TalosctlDownloader:
             # Ensure directory exists
             self.talosctl_dir.mkdir(parents=True, exist_ok=True)
             
-            # Download to temp file first
+            # Download to temp file first (or copy a prefetched binary)
             import tempfile
+            cached_path = self.get_cached_path(version)
             with tempfile.NamedTemporaryFile(delete=False, mode='wb') as tmp_file:
                 tmp_path = Path(tmp_file.name)
-                response = requests.get(url, stream=True, timeout=30)
-                response.raise_for_status()
-                
-                for chunk in response.iter_content(chunk_size=8192):
-                    tmp_file.write(chunk)
+                if cached_path.exists():
+                    logger.info(f"Using prefetched talosctl {version} from {cached_path}")
+                    with open(cached_path, 'rb') as src:
+                        shutil.copyfileobj(src, tmp_file)
+                else:
+                    response = requests.get(url, stream=True, timeout=30)
+                    response.raise_for_status()
+
+                    for chunk in response.iter_content(chunk_size=8192):
+                        tmp_file.write(chunk)
             
             # Make temp file executable
             os.chmod(tmp_path, 0o755)
             
             # Verify it works before installing
-            result = subprocess.run(
+            result = instrumentation.run(
                 [str(tmp_path), "version", "--client"],
                 capture_output=True,
                 text=True,
@@ -107,7 +116,7 @@ class TalosctlDownloader:
             os.chmod(self.talosctl_path, 0o755)
             
             # Verify it works (already verified before moving, but double-check)
-            result = subprocess.run(
+            result = instrumentation.run(
                 [str(self.talosctl_path), "version", "--client"],
                 capture_output=True,
                 text=True,
@@ -131,6 +140,51 @@ class TalosctlDownloader:
             logger.error(error_msg, exc_info=True)
             return False, error_msg
     
+    def get_cached_path(self, version: str) -> Path:
+        """Path of a prefetched talosctl binary for a version (may not exist)"""
+        return self.versions_dir / f"talosctl-{self._ensure_v_prefix(version)}"
+
+    def fetch_talosctl(self, version: str) -> tuple[bool, str]:
+        """
+        Download talosctl into the version cache without activating it.
+
+        Args:
+            version: Talos version (e.g., "1.12.2" or "v1.12.2")
+
+        Returns:
+            Tuple of (success: bool, error_message: str)
+        """
+        version = self._ensure_v_prefix(version)
+        cached_path = self.get_cached_path(version)
+        if cached_path.exists():
+            return True, ""
+
+        import requests
+
+        try:
+            os_type, arch = self._get_os_arch()
+            url = f"https://github.com/siderolabs/talos/releases/download/{version}/talosctl-{os_type}-{arch}"
+            logger.info(f"Prefetching talosctl {version} from {url}")
+
+            self.versions_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cached_path.with_name(f".{cached_path.name}.tmp")
+            response = requests.get(url, stream=True, timeout=30)
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+            os.chmod(tmp_path, 0o755)
+            os.replace(tmp_path, cached_path)
+            return True, ""
+        except requests.RequestException as e:
+            error_msg = f"Failed to prefetch talosctl: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+        except Exception as e:
+            error_msg = f"Error prefetching talosctl: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+
     def set_talosctl_version(self, version: str) -> tuple[bool, str]:
         """
         Download and set a specific talosctl version
@@ -158,7 +212,7 @@ class TalosctlDownloader:
             return None
         
         try:
-            result = subprocess.run(
+            result = instrumentation.run(
                 [str(self.talosctl_path), "version", "--client"],
                 capture_output=True,
                 text=True,
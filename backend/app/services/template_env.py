@@ -0,0 +1,61 @@
+"""Process-wide Jinja2 environments for the iPXE and dnsmasq templates.
+
+``IPXEGenerator`` is built on nearly every device mutation and used to
+create a fresh ``Environment`` each time, so boot.ipxe.j2 was loaded,
+parsed and compiled on every approve/update/delete.  Environments are now
+shared per templates directory: a compiled template stays in memory and is
+only reloaded when its file's mtime changes (``auto_reload``).  Compiled
+bytecode is also kept in a ``FileSystemBytecodeCache`` so a restarted
+process skips the parse/compile step; entries are keyed by the template
+source checksum, so an edited template never loads stale bytecode.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+# Bytecode cache directory; unset uses a per-user directory under the system temp dir
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
+_environments: Dict[str, Environment] = {}
+_lock = threading.Lock()
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    try:
+        if TEMPLATE_CACHE_DIR:
+            Path(TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+            return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+        return FileSystemBytecodeCache()
+    except (OSError, RuntimeError) as e:
+        # An unusable cache dir only costs compile time
+        logger.warning(f"Jinja2 bytecode cache disabled: {e}")
+        return None
+
+
+def get_environment(templates_dir: Union[str, Path]) -> Environment:
+    """Return the shared environment loading templates from ``templates_dir``."""
+    key = str(Path(templates_dir).resolve())
+    env = _environments.get(key)
+    if env is None:
+        with _lock:
+            env = _environments.get(key)
+            if env is None:
+                env = Environment(
+                    loader=FileSystemLoader(key),
+                    bytecode_cache=_bytecode_cache(),
+                    auto_reload=True,
+                )
+                _environments[key] = env
+    return env
+
+
+def clear_environments() -> None:
+    """Drop the shared environments (and their in-memory template caches)."""
+    with _lock:
+        _environments.clear()
@@ -1,13 +1,25 @@
-from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
+from typing import Optional
+import asyncio
 import os
-import shutil
-import subprocess
+import signal
 import logging
+import threading
 from app.core.config import settings
+from app.services.template_env import get_environment
 
 logger = logging.getLogger(__name__)
 
+# Where dnsmasq reads its main config, and the directory holding the runtime
+# files it re-reads on SIGHUP (``options`` and the ``hosts/`` directory)
+DNSMASQ_CONF = os.getenv("DNSMASQ_CONF", "/etc/dnsmasq.conf")
+DNSMASQ_DYNAMIC_DIR = os.getenv("DNSMASQ_DYNAMIC_DIR", "/etc/dnsmasq.ktizo")
+DNSMASQ_PID_FILES = ("/run/dnsmasq/dnsmasq.pid", "/var/run/dnsmasq.pid", "/run/dnsmasq.pid")
+PROC_DIR = Path("/proc")
+SERVICE_TIMEOUT = 15  # seconds for rc-service/systemctl
+# File in hosts/ with one dhcp-host line per approved device
+DNSMASQ_HOSTS_FILE = "devices"
+
 class TemplateService:
     """Service for rendering Jinja2 templates (dnsmasq config only)
 
@@ -36,10 +48,16 @@ class TemplateService:
         if not self.compiled_path.exists() and not os.getenv("COMPILED_DIR"):
             self.compiled_path = Path("/compiled")
         
-        self.env = Environment(loader=FileSystemLoader(str(template_path)))
+        self.env = get_environment(template_path)
+
+        self.dnsmasq_conf = Path(DNSMASQ_CONF)
+        self.dnsmasq_dynamic_dir = Path(DNSMASQ_DYNAMIC_DIR)
+        self._deploy_lock = asyncio.Lock()
+        # Guards the hosts files, which device CRUD updates from worker threads
+        self._hosts_lock = threading.Lock()
 
         # Ensure compiled directories exist
-        (self.compiled_path / "dnsmasq").mkdir(parents=True, exist_ok=True)
+        (self.compiled_path / "dnsmasq" / "hosts").mkdir(parents=True, exist_ok=True)
 
     def render_dnsmasq_config(self, **kwargs) -> str:
         """Render DNSMASQ configuration"""
@@ -47,9 +65,16 @@ class TemplateService:
         return template.render(**kwargs)
 
     def compile_dnsmasq_config(self, **kwargs) -> tuple[str, str]:
-        """Render and save DNSMASQ configuration to compiled directory"""
+        """Render and save DNSMASQ configuration to compiled directory
+
+        Writes the main config (``dnsmasq.conf``) and the SIGHUP-reloadable
+        options file (``options``) side by side; returns the main config.
+        """
+        kwargs.setdefault("hosts_dir", str(self.dnsmasq_dynamic_dir / "hosts"))
+        kwargs.setdefault("options_file", str(self.dnsmasq_dynamic_dir / "options"))
         try:
             rendered = self.render_dnsmasq_config(**kwargs)
+            options = self.env.get_template("network/dnsmasq-options.j2").render(**kwargs)
         except Exception as e:
             template_path = self.env.loader.searchpath[0] if hasattr(self.env.loader, 'searchpath') else "unknown"
             raise Exception(
@@ -61,8 +86,9 @@ class TemplateService:
         
         try:
             # Ensure parent directory exists
-            output_path.parent.mkdir(parents=True, exist_ok=True)
+            (output_path.parent / "hosts").mkdir(parents=True, exist_ok=True)
             output_path.write_text(rendered)
+            (output_path.parent / "options").write_text(options)
         except PermissionError as e:
             raise Exception(
                 f"Permission denied writing to {output_path}. "
@@ -77,64 +103,250 @@ class TemplateService:
         
         return rendered, str(output_path)
 
-    def deploy_dnsmasq_config(self) -> bool:
-        """Copy compiled dnsmasq.conf to /etc/dnsmasq.conf and restart the service.
+    async def deploy_dnsmasq_config(self) -> Optional[str]:
+        """Install the compiled dnsmasq config and apply it with the least disruption.
+
+        The main config is copied to ``DNSMASQ_CONF`` and the runtime files (the
+        options file and the hosts directory) to ``DNSMASQ_DYNAMIC_DIR``.  A
+        change to the main config needs a restart; a change confined to the
+        runtime files is picked up with SIGHUP, which leaves DHCP leases and
+        in-flight TFTP transfers alone.
 
         Returns:
-            True if config was deployed and service restarted successfully.
+            "unchanged", "reloaded" or "restarted", or None if the files could
+            not be installed or dnsmasq could not be signalled.
         """
-        compiled = self.compiled_path / "dnsmasq" / "dnsmasq.conf"
-        system_conf = Path("/etc/dnsmasq.conf")
+        compiled_dir = self.compiled_path / "dnsmasq"
+        if not (compiled_dir / "dnsmasq.conf").exists():
+            logger.warning(f"Compiled dnsmasq config not found at {compiled_dir / 'dnsmasq.conf'}, skipping deploy")
+            return None
 
-        if not compiled.exists():
-            logger.warning(f"Compiled dnsmasq config not found at {compiled}, skipping deploy")
-            return False
+        async with self._deploy_lock:
+            try:
+                change = await asyncio.to_thread(self._install_dnsmasq_files)
+            except Exception as e:
+                logger.error(f"Failed to install dnsmasq config: {e}")
+                return None
 
-        # Only deploy if the compiled config differs from the system config
-        try:
-            if system_conf.exists() and system_conf.read_text() == compiled.read_text():
-                logger.info("System dnsmasq.conf already up to date, skipping deploy")
+            if change == "none":
+                logger.info("System dnsmasq config already up to date, skipping reload")
+                return "unchanged"
+            if change == "reload":
+                if _signal_dnsmasq():
+                    return "reloaded"
+                logger.warning("dnsmasq pid not found, restarting instead of reloading")
+            return "restarted" if await self.restart_dnsmasq() else None
+
+    def _deployed_files(self, compiled: bool) -> dict[str, Path]:
+        """Map each dnsmasq file's key to its compiled or installed path."""
+        if compiled:
+            base = self.compiled_path / "dnsmasq"
+            files = {"dnsmasq.conf": base / "dnsmasq.conf", "options": base / "options"}
+        else:
+            base = self.dnsmasq_dynamic_dir
+            files = {"dnsmasq.conf": self.dnsmasq_conf, "options": base / "options"}
+        hosts_dir = base / "hosts"
+        if hosts_dir.is_dir():
+            for path in sorted(hosts_dir.iterdir()):
+                if path.is_file() and not path.name.startswith("."):
+                    files[f"hosts/{path.name}"] = path
+        return files
+
+    def _install_dnsmasq_files(self) -> str:
+        """Copy changed compiled files into place; return the change class."""
+        with self._hosts_lock:
+            return self._install_dnsmasq_files_locked()
+
+    def _install_dnsmasq_files_locked(self) -> str:
+        compiled = {k: p.read_text() for k, p in self._deployed_files(compiled=True).items() if p.exists()}
+        installed_paths = self._deployed_files(compiled=False)
+        installed = {k: p.read_text() for k, p in installed_paths.items() if p.exists()}
+
+        (self.dnsmasq_dynamic_dir / "hosts").mkdir(parents=True, exist_ok=True)
+        for key, text in compiled.items():
+            if installed.get(key) != text:
+                target = self.dnsmasq_conf if key == "dnsmasq.conf" else self.dnsmasq_dynamic_dir / key
+                _replace_file(target, text)
+                logger.info(f"Installed dnsmasq {key} -> {target}")
+        for key in installed.keys() - compiled.keys():
+            if key.startswith("hosts/"):
+                installed_paths[key].unlink()
+                logger.info(f"Removed stale dnsmasq {key}")
+
+        return classify_dnsmasq_change(installed, compiled)
+
+    def write_dnsmasq_hosts(self, entries: list[str]) -> None:
+        """Replace the compiled hosts file with ``entries`` (dhcp-host lines).
+
+        The next deploy installs it and reloads dnsmasq if it changed.
+        """
+        with self._hosts_lock:
+            _write_hosts_file(self.compiled_path / "dnsmasq" / "hosts" / DNSMASQ_HOSTS_FILE, entries)
+
+    def update_dnsmasq_host(self, mac_address: str, entry: Optional[str]) -> bool:
+        """Set (or with ``entry=None`` remove) one device's dhcp-host line.
+
+        Only that line is rewritten; the compiled and installed hosts files
+        are updated in place and dnsmasq is sent SIGHUP.  The main config is
+        not rendered.  Safe to call from worker threads.
+
+        Returns:
+            True if the hosts file changed.
+        """
+        key = mac_address.lower()
+        with self._hosts_lock:
+            compiled = self.compiled_path / "dnsmasq" / "hosts" / DNSMASQ_HOSTS_FILE
+            entries = _read_hosts_file(compiled)
+            if entries.get(key) == entry:
+                return False
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+            _write_hosts_file(compiled, list(entries.values()))
+
+            installed_dir = self.dnsmasq_dynamic_dir / "hosts"
+            if not installed_dir.is_dir():
+                # Not deployed on this host (dev machine, Docker): the next deploy installs it
+                return True
+            try:
+                _write_hosts_file(installed_dir / DNSMASQ_HOSTS_FILE, list(entries.values()))
+            except OSError as e:
+                logger.warning(f"Failed to update dnsmasq hosts file in {installed_dir}: {e}")
                 return True
-        except Exception:
-            pass  # If we can't compare, just deploy
 
+        if not _signal_dnsmasq():
+            # New files and lines are picked up via inotify; changed or removed ones wait for a reload
+            logger.warning("dnsmasq pid not found, DHCP reservation change applies on next reload")
+        return True
+
+    async def reload_dnsmasq(self) -> bool:
+        """Send SIGHUP so dnsmasq re-reads its hosts and options files."""
+        if _signal_dnsmasq():
+            return True
+        # No pid file naming a running dnsmasq: restarting is the only safe way to apply it
+        logger.warning("dnsmasq pid not found, restarting instead of reloading")
+        return await self.restart_dnsmasq()
+
+    async def restart_dnsmasq(self) -> bool:
+        """Restart dnsmasq so it re-reads its main config file."""
+        return await _service_command("restart")
+
+
+def dhcp_host_entry(mac_address: str, ip_address: Optional[str], hostname: Optional[str] = None) -> Optional[str]:
+    """Format a dhcp-host reservation (``mac,ip[,hostname]``); None without an IP."""
+    if not ip_address:
+        return None
+    parts = [mac_address.lower(), ip_address.split("/")[0]]
+    if hostname:
+        parts.append(hostname)
+    return ",".join(parts)
+
+
+def _read_hosts_file(path: Path) -> dict[str, str]:
+    """Parse a hosts file into {mac: line}, keeping file order."""
+    try:
+        text = path.read_text()
+    except FileNotFoundError:
+        return {}
+    entries = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            entries[line.split(",", 1)[0].lower()] = line
+    return entries
+
+
+def _write_hosts_file(path: Path, entries: list[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _replace_file(path, "".join(f"{entry}\n" for entry in entries))
+
+
+def _replace_file(path: Path, text: str) -> None:
+    # Write a dotfile then rename it into place: dnsmasq's inotify watch on
+    # the hosts dir skips dotfiles, so it never reads a half-written file
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def _is_dnsmasq(pid: int) -> bool:
+    try:
+        return (PROC_DIR / str(pid) / "comm").read_text().strip() == "dnsmasq"
+    except OSError:
+        return False
+
+
+def _signal_dnsmasq() -> bool:
+    """SIGHUP the dnsmasq found via its pid file; False if there is none.
+
+    A stale pid file can name an unrelated process (which SIGHUP would
+    terminate), so the pid is only signalled if it is running dnsmasq.
+    """
+    for pid_file in DNSMASQ_PID_FILES:
         try:
-            shutil.copy2(str(compiled), str(system_conf))
-            logger.info(f"Copied {compiled} -> {system_conf}")
-        except Exception as e:
-            logger.error(f"Failed to copy dnsmasq config to {system_conf}: {e}")
-            return False
+            pid = int(Path(pid_file).read_text().strip())
+            if not _is_dnsmasq(pid):
+                logger.warning(f"Ignoring stale dnsmasq pid file {pid_file} (pid {pid} is not dnsmasq)")
+                continue
+            os.kill(pid, signal.SIGHUP)
+            logger.info(f"Sent SIGHUP to dnsmasq (pid {pid})")
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
 
-        # Restart dnsmasq using OpenRC
+def _significant_lines(text: Optional[str]) -> list[str]:
+    if text is None:
+        return []
+    lines = (line.strip() for line in text.splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def classify_dnsmasq_change(old: dict[str, str], new: dict[str, str]) -> str:
+    """Decide how dnsmasq must pick up a config change.
+
+    ``old`` and ``new`` map file keys ("dnsmasq.conf", "options",
+    "hosts/<name>") to file contents.  Blank lines and comments are ignored.
+
+    Returns:
+        "none" if nothing dnsmasq reads changed, "reload" if only the
+        SIGHUP-reloadable runtime files changed, "restart" if the main
+        config changed.
+    """
+    if _significant_lines(old.get("dnsmasq.conf")) != _significant_lines(new.get("dnsmasq.conf")):
+        return "restart"
+    for key in (old.keys() | new.keys()) - {"dnsmasq.conf"}:
+        if _significant_lines(old.get(key)) != _significant_lines(new.get(key)):
+            return "reload"
+    return "none"
+
+
+async def _service_command(action: str) -> bool:
+    """Run ``<action>`` on the dnsmasq service via OpenRC, falling back to systemd."""
+    for cmd in (["rc-service", "dnsmasq", action], ["systemctl", action, "dnsmasq"]):
         try:
-            result = subprocess.run(
-                ["rc-service", "dnsmasq", "restart"],
-                capture_output=True, text=True, timeout=15,
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
             )
-            if result.returncode == 0:
-                logger.info("dnsmasq restarted successfully")
-                return True
-            else:
-                logger.error(f"dnsmasq restart failed: {result.stderr.strip()}")
-                return False
         except FileNotFoundError:
             # rc-service not available (dev machine, Docker, etc.) — try systemctl
-            try:
-                result = subprocess.run(
-                    ["systemctl", "restart", "dnsmasq"],
-                    capture_output=True, text=True, timeout=15,
-                )
-                if result.returncode == 0:
-                    logger.info("dnsmasq restarted successfully (systemctl)")
-                    return True
-                else:
-                    logger.error(f"dnsmasq restart failed (systemctl): {result.stderr.strip()}")
-                    return False
-            except FileNotFoundError:
-                logger.warning("Neither rc-service nor systemctl found, cannot restart dnsmasq")
-                return False
-        except Exception as e:
-            logger.error(f"Failed to restart dnsmasq: {e}")
+            continue
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=SERVICE_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            logger.error(f"dnsmasq {action} timed out ({cmd[0]})")
             return False
+        if proc.returncode == 0:
+            logger.info(f"dnsmasq {action} succeeded ({cmd[0]})")
+            return True
+        logger.error(f"dnsmasq {action} failed ({cmd[0]}): {stderr.decode().strip()}")
+        return False
+    logger.warning(f"Neither rc-service nor systemctl found, cannot {action} dnsmasq")
+    return False
+
 
 template_service = TemplateService()
@@ -0,0 +1,389 @@
+"""Persistent, multiplexed terminal sessions.
+
+A session owns one login shell on a PTY and outlives the WebSockets that
+view it: a dropped connection only detaches its viewer, and reconnecting
+with the session id replays the scrollback and resumes the live stream.
+
+* Output is pumped once per session (see :mod:`app.services.pty_bridge`),
+  appended to a fixed-size scrollback ring and fanned out to all viewers.
+* Sessions without viewers are reaped after ``TERMINAL_IDLE_TIMEOUT``.
+* At most ``TERMINAL_MAX_SESSIONS`` PTYs exist at once.
+* CPU time and RSS are accounted per session by summing every process in
+  the shell's session (the shell calls ``setsid``, so its pid is the SID).
+"""
+import asyncio
+import fcntl
+import itertools
+import logging
+import os
+import signal
+import struct
+import termios
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.pty_bridge import PtyOutputPump
+
+logger = logging.getLogger(__name__)
+
+MAX_SESSIONS = int(os.getenv("TERMINAL_MAX_SESSIONS", "16"))
+IDLE_TIMEOUT = float(os.getenv("TERMINAL_IDLE_TIMEOUT", str(30 * 60)))
+SCROLLBACK_BYTES = int(os.getenv("TERMINAL_SCROLLBACK_BYTES", str(256 * 1024)))
+REAP_INTERVAL = 60
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+VIEWER_QUEUE = 8            # frames buffered per viewer before the pump waits
+
+
+class SessionLimitError(Exception):
+    """Raised when the global PTY cap is reached."""
+
+
+class RingBuffer:
+    """Fixed-capacity byte ring; keeps the most recent ``capacity`` bytes."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._pos = 0
+        self._size = 0
+
+    def write(self, data: bytes):
+        if not data or not self.capacity:
+            return
+        if len(data) >= self.capacity:
+            data = data[-self.capacity:]
+        n = len(data)
+        end = self._pos + n
+        if end <= self.capacity:
+            self._buf[self._pos:end] = data
+        else:
+            first = self.capacity - self._pos
+            self._buf[self._pos:] = data[:first]
+            self._buf[:n - first] = data[first:]
+        self._pos = end % self.capacity
+        self._size = min(self.capacity, self._size + n)
+
+    def getvalue(self) -> bytes:
+        if self._size < self.capacity:
+            return bytes(self._buf[:self._size])
+        return bytes(self._buf[self._pos:] + self._buf[:self._pos])
+
+    def __len__(self):
+        return self._size
+
+
+class _Viewer:
+    """One attached client; frames are delivered in order by a writer task.
+
+    The scrollback snapshot is queued before any live output, so a viewer
+    never sees output twice or out of order.  A full queue makes the
+    session's pump wait, which keeps PTY backpressure end to end.
+    """
+
+    def __init__(self, send: Callable[[bytes], Awaitable[None]], backlog: bytes):
+        self.queue: asyncio.Queue = asyncio.Queue(VIEWER_QUEUE)
+        if backlog:
+            self.queue.put_nowait(backlog)
+        self.task = asyncio.create_task(self._run(send))
+
+    async def _run(self, send):
+        while True:
+            chunk = await self.queue.get()
+            try:
+                await send(chunk)
+            finally:
+                self.queue.task_done()
+
+    @property
+    def failed(self) -> bool:
+        return self.task.done()
+
+    async def put(self, chunk: bytes):
+        """Queue a frame, waiting while the queue is full.
+
+        The wait is raced against the writer task, so a viewer whose send
+        failed or that was closed while full never blocks the pump.
+        """
+        if self.failed:
+            return
+        try:
+            self.queue.put_nowait(chunk)
+            return
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(self.queue.put(chunk))
+        try:
+            await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            put.cancel()
+
+    async def drain(self, timeout: float):
+        if not self.failed:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        self.task.cancel()
+
+
+def _spawn_shell(env: dict, cols: int, rows: int):
+    """Fork a login shell on a new PTY. Returns (pid, master_fd)."""
+    import pty
+
+    master_fd, slave_fd = pty.openpty()
+    fcntl.ioctl(master_fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    pid = os.fork()
+    if pid == 0:
+        # Child process — become the shell
+        try:
+            os.close(master_fd)
+            os.setsid()
+
+            # Set slave as controlling terminal
+            fcntl.ioctl(slave_fd, termios.TIOCSCTTY, 0)
+
+            # Redirect stdio to slave PTY
+            os.dup2(slave_fd, 0)
+            os.dup2(slave_fd, 1)
+            os.dup2(slave_fd, 2)
+            if slave_fd > 2:
+                os.close(slave_fd)
+
+            shell = os.environ.get("SHELL", "/bin/sh")
+            os.execvpe(shell, [shell, "-l"], env)
+        finally:
+            os._exit(127)
+
+    # Parent process
+    os.close(slave_fd)
+    os.set_blocking(master_fd, False)
+    return pid, master_fd
+
+
+def _session_usage(sid: int) -> dict:
+    """CPU seconds and RSS of every process whose session id is ``sid``."""
+    cpu_ticks = 0
+    rss_pages = 0
+    processes = 0
+    for stat_file in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            raw = stat_file.read_text()
+        except OSError:
+            continue
+        # Fields after the parenthesised comm; comm may contain spaces
+        fields = raw[raw.rfind(")") + 2:].split()
+        try:
+            if int(fields[3]) != sid:
+                continue
+            cpu_ticks += int(fields[11]) + int(fields[12])
+            rss_pages += int(fields[21])
+        except (IndexError, ValueError):
+            continue
+        processes += 1
+    return {
+        "processes": processes,
+        "cpu_seconds": round(cpu_ticks / _CLK_TCK, 2),
+        "rss_bytes": rss_pages * _PAGE_SIZE,
+    }
+
+
+class TerminalSession:
+    """One shell on a PTY plus its scrollback and attached viewers."""
+
+    def __init__(self, pid: int, master_fd: int, scrollback: int = SCROLLBACK_BYTES):
+        self.id = uuid.uuid4().hex
+        self.pid = pid
+        self.master_fd = master_fd
+        self.scrollback = RingBuffer(scrollback)
+        self.viewers: Dict[int, _Viewer] = {}
+        self._viewer_ids = itertools.count(1)
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.detached_at: Optional[float] = self.created_at
+        self.closed = asyncio.Event()
+        self.exit_status: Optional[int] = None
+        self.pump = PtyOutputPump(master_fd, self._fan_out)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fan_out(self, chunk: bytes):
+        self.scrollback.write(chunk)
+        self.last_activity = time.time()
+        for key, viewer in list(self.viewers.items()):
+            if viewer.failed:
+                self.detach(key)
+        if self.viewers:
+            await asyncio.gather(*(v.put(chunk) for v in self.viewers.values()))
+
+    def start(self, on_exit: Callable[["TerminalSession"], None]):
+        async def run():
+            try:
+                await self.pump.run()
+            finally:
+                self._close_fd()
+                await asyncio.to_thread(self._wait_child)
+                # Let viewers receive the final output, then drop them
+                await asyncio.gather(*(v.drain(1.0) for v in self.viewers.values()))
+                for key in list(self.viewers):
+                    self.detach(key)
+                self.closed.set()
+                on_exit(self)
+        self._task = asyncio.create_task(run(), name=f"terminal:{self.id}")
+
+    def attach(self, send: Callable[[bytes], Awaitable[None]]) -> int:
+        """Add a viewer; it first receives the scrollback, then live output."""
+        key = next(self._viewer_ids)
+        self.viewers[key] = _Viewer(send, self.scrollback.getvalue())
+        self.detached_at = None
+        return key
+
+    async def flush(self, key: int, timeout: float = 1.0):
+        """Wait until a viewer has been sent everything queued for it."""
+        viewer = self.viewers.get(key)
+        if viewer:
+            await viewer.drain(timeout)
+
+    def detach(self, key: int):
+        viewer = self.viewers.pop(key, None)
+        if viewer:
+            viewer.close()
+        if not self.viewers and self.detached_at is None:
+            self.detached_at = time.time()
+
+    def write(self, data: bytes):
+        self.last_activity = time.time()
+        os.write(self.master_fd, data)
+
+    def resize(self, cols: int, rows: int):
+        fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def _signal(self, sig: int):
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            # Child may not have called setsid() yet
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self, grace: float = 5.0):
+        """Hang up the shell's whole session; the pump sees EOF and cleans up.
+
+        Anything still running after ``grace`` seconds is killed.
+        """
+        self._signal(signal.SIGHUP)
+        self._signal(signal.SIGCONT)
+        asyncio.get_running_loop().call_later(
+            grace, lambda: None if self.closed.is_set() else self._signal(signal.SIGKILL))
+
+    def _close_fd(self):
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+
+    def _wait_child(self):
+        deadline = time.time() + 5
+        while True:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid:
+                self.exit_status = os.waitstatus_to_exitcode(status)
+                return
+            if time.time() > deadline:
+                try:
+                    os.killpg(self.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                deadline = float("inf")
+            time.sleep(0.05)
+
+    def to_dict(self, usage: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "pid": self.pid,
+            "viewers": len(self.viewers),
+            "created_at": self.created_at,
+            "last_activity": self.last_activity,
+            "detached_at": self.detached_at,
+            "scrollback_bytes": len(self.scrollback),
+            "bytes_out": self.pump.bytes_read,
+        }
+        if usage:
+            data.update(_session_usage(self.pid))
+        return data
+
+
+class TerminalSessionManager:
+    """Registry of live sessions with a global cap and idle reaping."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = IDLE_TIMEOUT,
+                 scrollback: int = SCROLLBACK_BYTES):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.scrollback = scrollback
+        self.sessions: Dict[str, TerminalSession] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def create(self, env: dict, cols: int = 80, rows: int = 24) -> TerminalSession:
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitError(
+                f"Terminal session limit reached ({self.max_sessions}); close an existing session")
+        pid, master_fd = _spawn_shell(env, cols, rows)
+        session = TerminalSession(pid, master_fd, self.scrollback)
+        self.sessions[session.id] = session
+        session.start(self._on_exit)
+        self._ensure_reaper()
+        logger.info(f"Terminal session {session.id} started (pid {pid}, "
+                    f"{len(self.sessions)}/{self.max_sessions})")
+        return session
+
+    def get(self, session_id: str) -> Optional[TerminalSession]:
+        return self.sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        session = self.sessions.get(session_id)
+        if not session:
+            return False
+        session.terminate()
+        return True
+
+    def _on_exit(self, session: TerminalSession):
+        self.sessions.pop(session.id, None)
+        logger.info(f"Terminal session {session.id} ended (exit {session.exit_status})")
+
+    def reap_idle(self, now: float = None) -> List[str]:
+        """Terminate sessions that have had no viewers for ``idle_timeout``."""
+        now = now or time.time()
+        reaped = []
+        for session in list(self.sessions.values()):
+            if session.detached_at is not None and now - session.detached_at > self.idle_timeout:
+                logger.info(f"Reaping idle terminal session {session.id}")
+                session.terminate()
+                reaped.append(session.id)
+        return reaped
+
+    async def _reap_loop(self):
+        while self.sessions:
+            await asyncio.sleep(REAP_INTERVAL)
+            self.reap_idle()
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop(), name="terminal-reaper")
+
+    def list(self) -> List[dict]:
+        return [s.to_dict() for s in self.sessions.values()]
+
+
+terminal_sessions = TerminalSessionManager()
@@ -5,8 +5,6 @@ import re
 import time
 from typing import List, Optional, Tuple
 
-import httpx
-
 logger = logging.getLogger(__name__)
 
 CACHE_TTL = 900  # 15 minutes
@@ -21,6 +19,8 @@ def _semver_key(version: str) -> Tuple[int, ...]:
 
 
 async def _fetch_github_releases(repo: str, per_page: int = 50) -> list[dict]:
+    import httpx
+
     url = f"https://api.github.com/repos/{repo}/releases"
     try:
         async with httpx.AsyncClient(timeout=15) as client:
@@ -2,6 +2,9 @@
 from typing import List, Dict, Any
 from fastapi import WebSocket
 import logging
+import time
+
+from app.services.instrumentation import observe_broadcast
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +40,7 @@ class WebSocketManager:
             logger.warning("No active WebSocket connections to broadcast to")
             return
 
+        start = time.perf_counter()
         disconnected = []
         for connection in self.active_connections:
             try:
@@ -45,6 +49,8 @@ class WebSocketManager:
             except Exception as e:
                 logger.error(f"Error sending to WebSocket: {e}")
                 disconnected.append(connection)
+        observe_broadcast(event.get("type"), time.perf_counter() - start,
+                          len(self.active_connections) - len(disconnected))
 
         # Clean up disconnected clients
         for connection in disconnected:
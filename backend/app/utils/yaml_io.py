@@ -0,0 +1,61 @@
+"""YAML (de)serialization for generated Talos machine configs.
+
+Machine configs carry large base64 cert blobs, and the pure-Python PyYAML
+parser/emitter dominated config render time.  These helpers use libyaml's
+``CSafeLoader``/``CSafeDumper`` when PyYAML was built with it and fall back
+to the pure-Python classes otherwise; both emit identical bytes for the
+options pinned in :func:`dump_documents` (tests/test_yaml_io.py checks
+both against a golden file).
+
+:func:`dump_documents` is the canonical serializer: the same documents
+always produce the same bytes, so :func:`config_digest` of the output can
+tell an unchanged config from a changed one.
+"""
+import hashlib
+from typing import Any, IO, List, Union
+
+import yaml
+
+try:
+    SafeLoader = yaml.CSafeLoader
+    SafeDumper = yaml.CSafeDumper
+except AttributeError:  # PyYAML built without libyaml
+    SafeLoader = yaml.SafeLoader
+    SafeDumper = yaml.SafeDumper
+
+DOCUMENT_SEPARATOR = "\n---\n"
+
+# Every emitter option that affects output, pinned so the bytes do not
+# depend on PyYAML defaults or on which emitter is in use
+_DUMP_OPTIONS = {
+    "default_flow_style": False,
+    "sort_keys": False,
+    "allow_unicode": False,
+    "indent": 2,
+    "width": 80,
+    "line_break": "\n",
+    "explicit_start": False,
+    "explicit_end": False,
+}
+
+
+def safe_load(stream: Union[str, bytes, IO]) -> Any:
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_load_all(stream: Union[str, bytes, IO]) -> List[Any]:
+    return list(yaml.load_all(stream, Loader=SafeLoader))
+
+
+def dump_document(doc: Any, dumper=None) -> str:
+    return yaml.dump(doc, Dumper=dumper or SafeDumper, **_DUMP_OPTIONS)
+
+
+def dump_documents(docs: List[Any], dumper=None) -> str:
+    """Serialize ``docs`` as a multi-document YAML string, byte-for-byte stable."""
+    return DOCUMENT_SEPARATOR.join(dump_document(doc, dumper) for doc in docs)
+
+
+def config_digest(text: str) -> str:
+    """sha256 hex digest of serialized config text."""
+    return hashlib.sha256(text.encode()).hexdigest()
@@ -53,7 +53,7 @@ def test_volume_config_generation():
         print("=" * 70)
 
         generator = ConfigGenerator()
-        volume_configs = generator._generate_volume_configs(db)
+        volume_configs = generator._generate_volume_configs(generator.settings_snapshot()["volumes"])
 
         if volume_configs:
             print(f"\n[SUCCESS] Generated {len(volume_configs)} VolumeConfig document(s):")
@@ -0,0 +1,261 @@
+"""Boot-storm benchmark for the PXE hot paths.
+
+Simulates N machines PXE-booting at once against the real ASGI app, backed
+by the same in-memory SQLite setup the test fixtures use.  Each machine
+walks the path a real node takes during boot:
+
+    /pxe/register/{mac} -> /pxe/boot.ipxe -> [/pxe/wipe-started/{mac}] -> /talos/configs/{mac}.yaml
+
+and the harness reports p50/p99/max latency per route, overall throughput
+and the number of SQLite lock errors.
+
+Run from backend/:
+
+    python -m tests.benchmarks.pxe_boot_storm --nodes 10 100 1000 --output bench.json
+
+The JSON output is stable so results can be diffed across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+# Match tests/conftest.py: keep generated files out of system paths
+os.environ.setdefault("COMPILED_DIR", tempfile.mkdtemp(prefix="ktizo_bench_"))
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+import app.db.models  # noqa: F401 — register tables on Base.metadata
+
+ROUTES = ("register", "boot_ipxe", "wipe_started", "config")
+_REPO_TEMPLATES = Path(__file__).resolve().parents[3] / "templates"
+
+
+def make_engine():
+    """In-memory SQLite engine, configured like the ``db_engine`` fixture."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def _mac(i: int) -> str:
+    return "52:54:00:%02x:%02x:%02x" % ((i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF)
+
+
+def _prepare_templates(workdir: Path) -> Path:
+    """Copy pxe templates and provide controlplane/worker base configs."""
+    templates = workdir / "templates"
+    shutil.copytree(_REPO_TEMPLATES / "pxe", templates / "pxe")
+    base = templates / "base"
+    base.mkdir(parents=True)
+    controlplane = _REPO_TEMPLATES / "base" / "controlplane.yaml"
+    shutil.copy(controlplane, base / "controlplane.yaml")
+    worker = _REPO_TEMPLATES / "base" / "worker.yaml"
+    shutil.copy(worker if worker.exists() else controlplane, base / "worker.yaml")
+    return templates
+
+
+def seed(session, nodes: int, tftp_root: Path, wipe_ratio: float):
+    """Network/cluster settings plus ``nodes`` approved devices."""
+    from app.db.models import NetworkSettings, ClusterSettings, Device, DeviceRole, DeviceStatus
+
+    session.add(NetworkSettings(
+        server_ip="10.0.0.1", tftp_root=str(tftp_root),
+        strict_boot_mode=True, talos_version="v1.12.2",
+    ))
+    session.add(ClusterSettings(cluster_name="bench", install_disk="/dev/sda"))
+    wipe_every = int(1 / wipe_ratio) if wipe_ratio > 0 else 0
+    for i in range(nodes):
+        session.add(Device(
+            mac_address=_mac(i),
+            hostname=f"bench-{i:04d}",
+            ip_address=f"10.0.{128 + i // 250}.{i % 250 + 1}",
+            role=DeviceRole.CONTROLPLANE if i < 3 else DeviceRole.WORKER,
+            status=DeviceStatus.APPROVED,
+            wipe_on_next_boot=bool(wipe_every and i % wipe_every == 0),
+        ))
+    session.commit()
+
+
+@contextmanager
+def _bench_environment(engine, workdir: Path):
+    """Point the app at the benchmark DB, templates and output dirs."""
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    templates = _prepare_templates(workdir)
+    env = {"TEMPLATES_DIR": str(templates), "COMPILED_DIR": str(workdir / "compiled")}
+    old_env = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        with patch("app.db.database.SessionLocal", Session), \
+             patch("app.main.SessionLocal", Session), \
+             patch("app.services.config_generator.SessionLocal", Session), \
+             patch("app.services.kubectl_runner.kubectl_delete_node", return_value=(True, "skipped")):
+            yield Session
+    finally:
+        for k, v in old_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+async def _boot_one(client: httpx.AsyncClient, mac: str, wipe: bool, timings: Dict[str, List[float]],
+                    failures: Dict[str, int]):
+    steps = [
+        ("register", f"/pxe/register/{mac}"),
+        ("boot_ipxe", "/pxe/boot.ipxe"),
+    ]
+    if wipe:
+        steps.append(("wipe_started", f"/pxe/wipe-started/{mac}"))
+    steps.append(("config", f"/talos/configs/{mac}.yaml"))
+
+    for route, url in steps:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get(url)
+            ok = resp.status_code == 200
+        except Exception:
+            ok = False
+        timings[route].append((time.perf_counter() - t0) * 1000)
+        if not ok:
+            failures[route] += 1
+
+
+async def run_storm(engine, nodes: int, wipe_ratio: float = 0.1,
+                    concurrency: Optional[int] = None) -> dict:
+    """Boot ``nodes`` simulated machines concurrently and collect latency stats."""
+    from app.main import app
+    from app.services.ipxe_generator import IPXEGenerator
+    from app.crud import device as device_crud
+
+    lock_errors = 0
+
+    def _on_error(ctx):
+        nonlocal lock_errors
+        if "database is locked" in str(ctx.original_exception):
+            lock_errors += 1
+
+    Base.metadata.create_all(bind=engine)
+    event.listen(engine, "handle_error", _on_error)
+    workdir = Path(tempfile.mkdtemp(prefix="ktizo_storm_"))
+    try:
+        with _bench_environment(engine, workdir) as Session:
+            session = Session()
+            try:
+                seed(session, nodes, workdir / "tftp", wipe_ratio)
+                devices = device_crud.get_devices(session, skip=0, limit=nodes)
+                IPXEGenerator(tftp_root=str(workdir / "tftp")).generate_boot_script(
+                    devices, "10.0.0.1", talos_version="v1.12.2", strict_mode=True)
+                wipe_macs = {d.mac_address for d in devices if d.wipe_on_next_boot}
+            finally:
+                session.close()
+
+            timings: Dict[str, List[float]] = {r: [] for r in ROUTES}
+            failures: Dict[str, int] = {r: 0 for r in ROUTES}
+            sem = asyncio.Semaphore(concurrency or nodes)
+
+            async def _machine(mac):
+                async with sem:
+                    await _boot_one(client, mac, mac in wipe_macs, timings, failures)
+
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                t0 = time.perf_counter()
+                await asyncio.gather(*(_machine(_mac(i)) for i in range(nodes)))
+                elapsed = time.perf_counter() - t0
+    finally:
+        event.remove(engine, "handle_error", _on_error)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    all_samples = [s for samples in timings.values() for s in samples]
+    return {
+        "nodes": nodes,
+        "requests": len(all_samples),
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(all_samples) / elapsed, 2) if elapsed else 0.0,
+        "boots_per_s": round(nodes / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(all_samples, 50), 3),
+            "p99": round(_percentile(all_samples, 99), 3),
+            "max": round(max(all_samples, default=0.0), 3),
+        },
+        "routes": {
+            route: {
+                "count": len(samples),
+                "p50_ms": round(_percentile(samples, 50), 3),
+                "p99_ms": round(_percentile(samples, 99), 3),
+                "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+                "errors": failures[route],
+            }
+            for route, samples in timings.items()
+        },
+        "errors": sum(failures.values()),
+        "db_lock_errors": lock_errors,
+    }
+
+
+def run_suite(node_counts: List[int], wipe_ratio: float = 0.1, concurrency: Optional[int] = None) -> dict:
+    results = []
+    for n in node_counts:
+        engine = make_engine()
+        try:
+            results.append(asyncio.run(run_storm(engine, n, wipe_ratio, concurrency)))
+        finally:
+            engine.dispose()
+    return {
+        "benchmark": "pxe_boot_storm",
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "wipe_ratio": wipe_ratio,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a PXE boot storm against the Ktizo API")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--wipe-ratio", type=float, default=0.1,
+                        help="Fraction of nodes booting with wipe_on_next_boot set")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Max machines in flight (default: all at once)")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    report = run_suite(args.nodes, args.wipe_ratio, args.concurrency)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+    return 0 if all(r["errors"] == 0 for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Template rendering benchmark for boot.ipxe and the dnsmasq config.
+
+Renders the repo templates for N approved devices three ways and reports
+p50/mean latency per render:
+
+    per_instance  a new Environment per render (what every IPXEGenerator did)
+    shared        the process-wide environment from app.services.template_env
+    bytecode      a fresh shared environment backed by a warm bytecode cache
+                  (the first render after a process restart)
+
+plus the dnsmasq main config and the DHCP reservations file at the same size.
+
+Run from backend/:
+
+    python -m tests.benchmarks.template_render --devices 10 100 1000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+from unittest.mock import patch
+
+# Match tests/conftest.py: keep generated files out of system paths
+os.environ.setdefault("COMPILED_DIR", tempfile.mkdtemp(prefix="ktizo_bench_"))
+
+from jinja2 import Environment, FileSystemLoader
+
+from tests.benchmarks.pxe_boot_storm import _mac, _percentile
+
+MODES = ("per_instance", "shared", "bytecode")
+_REPO_TEMPLATES = Path(__file__).resolve().parents[3] / "templates"
+
+NETWORK = {
+    "interface": "eth0", "server_ip": "10.0.0.1", "dhcp_mode": "server",
+    "dhcp_range_start": "10.0.200.1", "dhcp_range_end": "10.0.250.254",
+    "dhcp_netmask": "255.255.0.0", "tftp_root": "/var/lib/tftpboot",
+}
+
+
+def _device_mappings(devices: int) -> List[dict]:
+    """Template context rows, shaped like IPXEGenerator.generate_boot_script builds them."""
+    return [{
+        "mac_address": _mac(i),
+        "role": "controlplane" if i < 3 else "worker",
+        "ip_address": f"10.0.{128 + i // 250}.{i % 250 + 1}",
+        "hostname": f"bench-{i:04d}",
+        "wipe_on_next_boot": i % 10 == 0,
+    } for i in range(devices)]
+
+
+def _time(fn: Callable[[], object], iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def run_render(devices: int, iterations: int = 20) -> dict:
+    """Render boot.ipxe and the dnsmasq files for ``devices`` devices."""
+    from app.services import template_env
+    from app.services.template_service import TemplateService, dhcp_host_entry
+
+    workdir = Path(tempfile.mkdtemp(prefix="ktizo_render_"))
+    try:
+        templates = workdir / "templates"
+        for sub in ("pxe", "network"):
+            shutil.copytree(_REPO_TEMPLATES / sub, templates / sub)
+        pxe_dir = templates / "pxe"
+        context = {
+            "server": "10.0.0.1", "version": "v1.12.2", "install_disk": "/dev/sda",
+            "strict_mode": True, "devices": _device_mappings(devices),
+        }
+
+        def per_instance():
+            env = Environment(loader=FileSystemLoader(str(pxe_dir)))
+            return env.get_template("boot.ipxe.j2").render(**context)
+
+        def shared():
+            return template_env.get_environment(pxe_dir).get_template("boot.ipxe.j2").render(**context)
+
+        def bytecode():
+            template_env.clear_environments()
+            return shared()
+
+        with patch.object(template_env, "TEMPLATE_CACHE_DIR", str(workdir / "cache")), \
+             patch.dict(os.environ, {"TEMPLATES_DIR": str(templates), "COMPILED_DIR": str(workdir / "compiled")}):
+            template_env.clear_environments()
+            rendered = shared()
+            results = {mode: _time(fn, iterations) for mode, fn in
+                       (("per_instance", per_instance), ("shared", shared), ("bytecode", bytecode))}
+
+            service = TemplateService()
+            service.dnsmasq_dynamic_dir = workdir / "etc"
+            results["dnsmasq_conf"] = _time(lambda: service.compile_dnsmasq_config(**NETWORK), iterations)
+            entries = [dhcp_host_entry(d["mac_address"], d["ip_address"], d["hostname"])
+                       for d in context["devices"]]
+            results["dhcp_hosts"] = _time(lambda: service.write_dnsmasq_hosts(entries), iterations)
+            template_env.clear_environments()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "devices": devices,
+        "iterations": iterations,
+        "boot_ipxe_bytes": len(rendered),
+        "boot_ipxe_matches": rendered.count("MATCH:"),
+        "render": results,
+    }
+
+
+def run_suite(device_counts: List[int], iterations: int = 20) -> dict:
+    return {
+        "benchmark": "template_render",
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [run_render(n, iterations) for n in device_counts],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark boot.ipxe and dnsmasq template rendering")
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    report = run_suite(args.devices, args.iterations)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
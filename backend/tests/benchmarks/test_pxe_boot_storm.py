@@ -0,0 +1,35 @@
+"""Smoke run of the PXE boot-storm benchmark.
+
+Runs a small storm on every test run so the harness can't rot; set
+``KTIZO_BENCH_NODES=10,100,1000`` to run the full sizes and
+``KTIZO_BENCH_OUTPUT=path.json`` to keep the results.
+"""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from tests.benchmarks.pxe_boot_storm import run_storm, ROUTES
+
+_NODES = [int(n) for n in os.getenv("KTIZO_BENCH_NODES", "10").split(",") if n.strip()]
+
+
+@pytest.mark.parametrize("nodes", _NODES)
+async def test_boot_storm(db_engine, nodes):
+    result = await run_storm(db_engine, nodes)
+
+    assert result["nodes"] == nodes
+    assert result["errors"] == 0, result["routes"]
+    assert result["db_lock_errors"] == 0
+    assert set(result["routes"]) == set(ROUTES)
+    assert result["routes"]["register"]["count"] == nodes
+    assert result["routes"]["config"]["count"] == nodes
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+
+    output = os.getenv("KTIZO_BENCH_OUTPUT")
+    if output:
+        path = Path(output)
+        existing = json.loads(path.read_text()) if path.exists() else {"results": []}
+        existing["results"].append(result)
+        path.write_text(json.dumps(existing, indent=2))
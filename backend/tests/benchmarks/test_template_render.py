@@ -0,0 +1,32 @@
+"""Run of the template rendering benchmark at 1000 devices.
+
+Set ``KTIZO_BENCH_DEVICES=10,100,1000`` to change the sizes and
+``KTIZO_BENCH_OUTPUT=path.json`` to keep the results.
+"""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from tests.benchmarks.template_render import MODES, run_render
+
+_DEVICES = [int(n) for n in os.getenv("KTIZO_BENCH_DEVICES", "1000").split(",") if n.strip()]
+
+
+@pytest.mark.parametrize("devices", _DEVICES)
+def test_template_render(devices):
+    result = run_render(devices, iterations=5)
+
+    assert result["devices"] == devices
+    assert result["boot_ipxe_matches"] == devices
+    assert set(MODES) <= set(result["render"])
+    for stats in result["render"].values():
+        assert 0 < stats["p50_ms"] <= stats["p99_ms"]
+
+    output = os.getenv("KTIZO_BENCH_OUTPUT")
+    if output:
+        path = Path(output)
+        existing = json.loads(path.read_text()) if path.exists() else {"results": []}
+        existing["results"].append(result)
+        path.write_text(json.dumps(existing, indent=2))
@@ -1,7 +1,9 @@
 """Shared fixtures for all test modules."""
+import asyncio
 import json
 import os
 import tempfile
+from contextlib import asynccontextmanager
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from sqlalchemy import create_engine
@@ -11,6 +13,9 @@ from sqlalchemy.orm import sessionmaker
 # from trying to mkdir on read-only system paths.
 _test_compiled_dir = tempfile.mkdtemp(prefix="ktizo_test_")
 os.environ["COMPILED_DIR"] = _test_compiled_dir
+# Keep the developer's helm repo config out of the repo-index cache
+os.environ["HELM_REPOSITORY_CONFIG"] = os.path.join(_test_compiled_dir, "helm", "repositories.yaml")
+os.environ["HELM_REPOSITORY_CACHE"] = os.path.join(_test_compiled_dir, "helm", "repository")
 
 from app.db.database import Base
 
@@ -36,6 +41,17 @@ def db_session(db_engine):
     session.close()
 
 
+@pytest.fixture
+def session_local(db_engine):
+    """Session factory on the test engine, patched in as ``SessionLocal``.
+
+    For code that opens its own sessions (background tasks, services).
+    """
+    Session = sessionmaker(bind=db_engine)
+    with patch("app.db.database.SessionLocal", Session):
+        yield Session
+
+
 @pytest.fixture
 def mock_db(db_session):
     """Patch _db() at the ws_handler module level to return the test session."""
@@ -162,3 +178,50 @@ def get_ws_response(mock_ws, index=-1):
     """Get the response from mock WebSocket. Returns (data, error) tuple."""
     msg = mock_ws.sent_messages[index]
     return msg.get("data"), msg.get("error")
+
+
+# ---------------------------------------------------------------------------
+# Async helpers
+# ---------------------------------------------------------------------------
+
+async def wait_until(predicate, timeout=5.0):
+    """Yield to the event loop until ``predicate()`` is true; fail after ``timeout`` seconds."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+class GatedRunner:
+    """Stand-in for a job runner that blocks each call until released.
+
+    Subclasses implement ``__call__`` with the runner signature under test
+    and wrap the work in :meth:`gate`.  Records start order, concurrency
+    and whether two calls of the same group ran at once.
+    """
+
+    def __init__(self, fail=()):
+        self.started = []
+        self.running = set()
+        self.max_parallel = 0
+        self.gates = {}
+        self.fail = set(fail)
+        self.overlap = False
+        self._groups = []
+
+    @asynccontextmanager
+    async def gate(self, name, group=None):
+        """Mark ``name`` running for the block; yields the Event that releases it."""
+        self.overlap |= group is not None and group in self._groups
+        self._groups.append(group)
+        self.started.append(name)
+        self.running.add(name)
+        self.max_parallel = max(self.max_parallel, len(self.running))
+        try:
+            yield self.gates.setdefault(name, asyncio.Event())
+        finally:
+            self.running.discard(name)
+            self._groups.remove(group)
+
+    def release(self, name):
+        self.gates.setdefault(name, asyncio.Event()).set()
@@ -0,0 +1,173 @@
+"""Tests for the content-addressed artifact store."""
+import os
+import time
+
+import pytest
+
+from app.services.artifact_store import (
+    ArtifactStore,
+    KIND_TALOS,
+    KIND_KUBECTL,
+    TALOS_PATTERNS,
+    sha256_file,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def tftp_dir(tmp_path):
+    d = tmp_path / "tftp" / "pxe" / "talos"
+    d.mkdir(parents=True)
+    return d
+
+
+def _write(path, data: bytes):
+    path.write_bytes(data)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# ingest / dedup
+# ---------------------------------------------------------------------------
+
+class TestIngest:
+
+    def test_ingest_links_file_to_blob(self, store, tftp_dir):
+        f = _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"kernel-a")
+        entry = store.ingest(f, KIND_TALOS, "vmlinuz-amd64", "1.12.0")
+
+        assert entry["version"] == "v1.12.0"
+        assert entry["sha256"] == sha256_file(f)
+        blob = store.blob_path(entry["sha256"])
+        assert blob.exists()
+        assert os.path.samefile(blob, f)
+        assert f.read_bytes() == b"kernel-a"
+
+    def test_identical_content_is_deduplicated(self, store, tftp_dir):
+        a = _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"same-kernel")
+        b = _write(tftp_dir / "vmlinuz-amd64-v1.12.1", b"same-kernel")
+        store.ingest(a, KIND_TALOS, "vmlinuz-amd64", "v1.12.0")
+        store.ingest(b, KIND_TALOS, "vmlinuz-amd64", "v1.12.1")
+
+        usage = store.usage()
+        assert usage["blob_count"] == 1
+        assert usage["logical_bytes"] == 2 * len(b"same-kernel")
+        assert usage["physical_bytes"] == len(b"same-kernel")
+        assert usage["dedup_saved_bytes"] == len(b"same-kernel")
+        assert os.path.samefile(a, b)
+
+    def test_ingest_missing_file_returns_none(self, store, tftp_dir):
+        assert store.ingest(tftp_dir / "nope", KIND_TALOS, "vmlinuz-amd64", "v1") is None
+
+    def test_kubectl_versions_are_stored_without_prefix(self, store, tmp_path):
+        f = _write(tmp_path / "kubectl-1.31.0", b"kubectl")
+        entry = store.ingest(f, KIND_KUBECTL, "kubectl", "v1.31.0")
+        assert entry["version"] == "1.31.0"
+        assert store.get(KIND_KUBECTL, "kubectl", "1.31.0") is not None
+
+
+# ---------------------------------------------------------------------------
+# gc
+# ---------------------------------------------------------------------------
+
+class TestGC:
+
+    def _seed(self, store, tftp_dir, versions):
+        for i, v in enumerate(versions):
+            f = _write(tftp_dir / f"vmlinuz-amd64-{v}", f"kernel-{v}".encode())
+            store.ingest(f, KIND_TALOS, "vmlinuz-amd64", v)
+            # Spread last_used so LRU ordering is deterministic
+            index = store._load_index()
+            index[f"talos/vmlinuz-amd64/{v}"]["last_used"] = time.time() - (len(versions) - i) * 60
+            store._save_index(index)
+
+    def test_referenced_versions_are_kept(self, store, tftp_dir):
+        self._seed(store, tftp_dir, ["v1.10.0", "v1.11.0", "v1.12.0"])
+        result = store.gc({KIND_TALOS: {"1.10.0"}}, retain=0)
+
+        assert sorted(result["removed_versions"]) == ["talos/v1.11.0", "talos/v1.12.0"]
+        assert (tftp_dir / "vmlinuz-amd64-v1.10.0").exists()
+        assert not (tftp_dir / "vmlinuz-amd64-v1.11.0").exists()
+        assert store.usage()["blob_count"] == 1
+
+    def test_retain_keeps_most_recently_used(self, store, tftp_dir):
+        self._seed(store, tftp_dir, ["v1.10.0", "v1.11.0", "v1.12.0"])
+        result = store.gc({KIND_TALOS: {"v1.12.0"}}, retain=1)
+
+        # v1.11.0 is the most recently used unreferenced version
+        assert result["removed_versions"] == ["talos/v1.10.0"]
+        assert (tftp_dir / "vmlinuz-amd64-v1.11.0").exists()
+
+    def test_dry_run_removes_nothing(self, store, tftp_dir):
+        self._seed(store, tftp_dir, ["v1.10.0", "v1.11.0"])
+        result = store.gc({KIND_TALOS: set()}, retain=0, dry_run=True)
+
+        assert len(result["removed_versions"]) == 2
+        assert result["freed_bytes"] > 0
+        assert (tftp_dir / "vmlinuz-amd64-v1.10.0").exists()
+        assert store.usage()["blob_count"] == 2
+
+    def test_shared_blob_survives_while_referenced(self, store, tftp_dir):
+        a = _write(tftp_dir / "vmlinuz-amd64-v1.10.0", b"shared")
+        b = _write(tftp_dir / "vmlinuz-amd64-v1.11.0", b"shared")
+        store.ingest(a, KIND_TALOS, "vmlinuz-amd64", "v1.10.0")
+        store.ingest(b, KIND_TALOS, "vmlinuz-amd64", "v1.11.0")
+
+        result = store.gc({KIND_TALOS: {"v1.11.0"}}, retain=0)
+        assert result["removed_blobs"] == []
+        assert b.read_bytes() == b"shared"
+
+
+# ---------------------------------------------------------------------------
+# verify / adopt
+# ---------------------------------------------------------------------------
+
+class TestVerify:
+
+    def test_missing_link_is_restored(self, store, tftp_dir):
+        f = _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"kernel")
+        store.ingest(f, KIND_TALOS, "vmlinuz-amd64", "v1.12.0")
+        f.unlink()
+
+        result = store.verify()
+        assert result["relinked"] == [str(f)]
+        assert f.read_bytes() == b"kernel"
+
+    def test_corrupt_blob_is_dropped(self, store, tftp_dir):
+        f = _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"kernel")
+        entry = store.ingest(f, KIND_TALOS, "vmlinuz-amd64", "v1.12.0")
+        # Break the hardlink first so corrupting the blob doesn't touch f's inode
+        blob = store.blob_path(entry["sha256"])
+        blob.unlink()
+        blob.write_bytes(b"tampered")
+
+        result = store.verify()
+        assert result["corrupt"] == [entry["sha256"]]
+        assert store.get(KIND_TALOS, "vmlinuz-amd64", "v1.12.0") is None
+        assert not blob.exists()
+
+    def test_verify_without_repair_reports_only(self, store, tftp_dir):
+        f = _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"kernel")
+        store.ingest(f, KIND_TALOS, "vmlinuz-amd64", "v1.12.0")
+        f.unlink()
+
+        result = store.verify(repair=False)
+        assert result["relinked"] == [str(f)]
+        assert not f.exists()
+
+
+class TestAdopt:
+
+    def test_adopt_picks_up_unmanaged_files(self, store, tftp_dir):
+        _write(tftp_dir / "vmlinuz-amd64-v1.12.0", b"k")
+        _write(tftp_dir / "initramfs-amd64-v1.12.0.xz", b"i")
+        _write(tftp_dir / "unrelated.txt", b"x")
+
+        assert store.adopt(tftp_dir, KIND_TALOS, TALOS_PATTERNS) == 2
+        assert store.get(KIND_TALOS, "initramfs-amd64.xz", "v1.12.0") is not None
+        # Second pass is a no-op
+        assert store.adopt(tftp_dir, KIND_TALOS, TALOS_PATTERNS) == 0
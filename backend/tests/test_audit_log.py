@@ -0,0 +1,140 @@
+"""Tests for keyset-paginated audit queries, cached counts and archival."""
+import gzip
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+
+import app.db.models  # noqa: F401 — register tables before db_engine creates them
+from app.crud import audit_log as crud
+from app.db.models import AuditLog
+from app.services.audit_archive import archive_older_than, export_lines, list_archives
+
+
+@pytest.fixture(autouse=True)
+def fresh_count_cache():
+    crud.invalidate_count_cache()
+    yield
+    crud.invalidate_count_cache()
+
+
+def _seed(db, n, start=datetime(2026, 1, 1), step=timedelta(minutes=1), page="Device Management"):
+    for i in range(n):
+        db.add(AuditLog(timestamp=start + i * step, action="approved_device" if i % 2 else "updated_device",
+                        page=page, entity_id=str(i)))
+    db.commit()
+
+
+class TestKeysetPagination:
+
+    def test_walks_all_pages_newest_first(self, db_session):
+        _seed(db_session, 23)
+        seen, cursor = [], None
+        while True:
+            logs, cursor = crud.get_audit_logs(db_session, limit=5, cursor=cursor)
+            seen.extend(int(log.entity_id) for log in logs)
+            if not cursor:
+                break
+        assert seen == list(range(22, -1, -1))
+
+    def test_ties_on_timestamp_break_on_id(self, db_session):
+        _seed(db_session, 7, step=timedelta(0))
+        first, cursor = crud.get_audit_logs(db_session, limit=4)
+        second, cursor2 = crud.get_audit_logs(db_session, limit=4, cursor=cursor)
+        ids = [log.id for log in first + second]
+        assert ids == sorted(ids, reverse=True) and len(set(ids)) == 7
+        assert cursor2 is None
+
+    def test_mixed_timestamp_formats(self, db_session):
+        # Server-default rows are stored without fractional seconds
+        db_session.execute(text(
+            "INSERT INTO audit_logs (timestamp, action, page) VALUES "
+            "('2026-01-01 00:00:00', 'a', 'P'), ('2026-01-01 00:00:00', 'b', 'P')"))
+        db_session.add(AuditLog(timestamp=datetime(2026, 1, 1, 0, 0, 0, 500000), action="c", page="P"))
+        db_session.commit()
+        actions, cursor = [], None
+        while True:
+            logs, cursor = crud.get_audit_logs(db_session, limit=1, cursor=cursor)
+            actions.extend(log.action for log in logs)
+            if not cursor:
+                break
+        assert actions == ["c", "b", "a"]
+
+    def test_filters(self, db_session):
+        _seed(db_session, 10)
+        _seed(db_session, 3, page="Network Settings")
+        logs, _ = crud.get_audit_logs(db_session, page_filter="Network Settings")
+        assert len(logs) == 3
+        logs, _ = crud.get_audit_logs(db_session, page_filter="Device Management",
+                                      action_filter="approved_device")
+        assert len(logs) == 5
+
+    def test_invalid_cursor(self, db_session):
+        with pytest.raises(ValueError):
+            crud.get_audit_logs(db_session, cursor="not-a-cursor")
+
+    def test_filtered_page_uses_composite_index(self, db_session):
+        plan = db_session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM audit_logs WHERE action = 'x' "
+            "ORDER BY timestamp DESC, id DESC LIMIT 26")).fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        assert "ix_audit_logs_action_timestamp" in detail
+        assert "TEMP B-TREE" not in detail
+
+
+class TestCountCache:
+
+    def test_cached_and_adjusted_on_insert(self, db_session):
+        _seed(db_session, 4)
+        assert crud.get_audit_log_count(db_session) == 4
+        assert crud.get_audit_log_count(db_session, action_filter="approved_device") == 2
+
+        with patch.object(db_session, "query", side_effect=AssertionError("recounted")):
+            assert crud.get_audit_log_count(db_session) == 4
+
+        crud.create_audit_log(db_session, "approved_device", "Device Management")
+        with patch.object(db_session, "query", side_effect=AssertionError("recounted")):
+            assert crud.get_audit_log_count(db_session) == 5
+            assert crud.get_audit_log_count(db_session, action_filter="approved_device") == 3
+
+    def test_clear_drops_cache(self, db_session):
+        _seed(db_session, 3)
+        assert crud.get_audit_log_count(db_session) == 3
+        crud.clear_audit_logs(db_session)
+        assert crud.get_audit_log_count(db_session) == 0
+
+
+class TestArchival:
+
+    def test_moves_old_rows_to_monthly_archives(self, db_session, session_local, tmp_path):
+        _seed(db_session, 6, start=datetime(2026, 1, 30), step=timedelta(days=1))
+        assert crud.get_audit_log_count(db_session) == 6
+
+        archived = archive_older_than(datetime(2026, 2, 3), archive_dir=tmp_path)
+        assert archived == 4
+        assert [a["month"] for a in list_archives(tmp_path)] == ["2026-01", "2026-02"]
+        with gzip.open(tmp_path / "audit-2026-01.jsonl.gz", "rt") as f:
+            assert [json.loads(line)["entity_id"] for line in f] == ["0", "1"]
+
+        db_session.expire_all()
+        assert db_session.query(AuditLog).count() == 2
+        assert crud.get_audit_log_count(db_session) == 2
+
+        # A second pass appends another gzip member to the same month
+        archive_older_than(datetime(2026, 2, 4), archive_dir=tmp_path)
+        with gzip.open(tmp_path / "audit-2026-02.jsonl.gz", "rt") as f:
+            assert [json.loads(line)["entity_id"] for line in f] == ["2", "3", "4"]
+
+    def test_export_streams_archived_then_live(self, db_session, session_local, tmp_path):
+        _seed(db_session, 6, start=datetime(2026, 1, 30), step=timedelta(days=1))
+        archive_older_than(datetime(2026, 2, 3), archive_dir=tmp_path)
+
+        rows = [json.loads(line) for line in export_lines(archive_dir=tmp_path)]
+        assert [r["entity_id"] for r in rows] == ["0", "1", "2", "3", "4", "5"]
+
+        rows = [json.loads(line) for line in export_lines(
+            start=datetime(2026, 2, 1), end=datetime(2026, 2, 4),
+            action="approved_device", archive_dir=tmp_path)]
+        assert [r["entity_id"] for r in rows] == ["3"]
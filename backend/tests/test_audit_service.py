@@ -0,0 +1,188 @@
+"""Tests for batched, journaled audit log writes."""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.db.models  # noqa: F401 — register tables before db_engine creates them
+from app.db.database import Base
+from app.db.models import AuditLog
+from app.services.audit_service import AuditWriter, log_action
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """File-backed SQLite: the writer inserts from a worker thread, and each
+    thread would see its own ``:memory:`` database."""
+    engine = create_engine(f"sqlite:///{tmp_path}/ktizo.db",
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(file_engine):
+    Session = sessionmaker(bind=file_engine)
+    with patch("app.db.database.SessionLocal", Session):
+        yield Session
+
+
+@pytest.fixture
+def broadcasts():
+    with patch("app.services.audit_service.websocket_manager.broadcast_event",
+               new_callable=AsyncMock) as mock:
+        yield mock
+
+
+@pytest.fixture
+async def writer(tmp_path, session_factory, broadcasts):
+    w = AuditWriter(journal_path=tmp_path / "audit.journal", batch_size=10, flush_interval=0.05)
+    yield w
+    await w.stop()
+
+
+def _count(Session):
+    db = Session()
+    try:
+        return db.query(AuditLog).count()
+    finally:
+        db.close()
+
+
+class TestAuditWriter:
+
+    async def test_batches_into_one_transaction(self, writer, session_factory, file_engine, broadcasts):
+        await writer.start()
+        commits = []
+        event.listen(file_engine, "commit", lambda conn: commits.append(1))
+
+        for i in range(25):
+            writer.enqueue("rolled_node", "Device Management", entity_id=str(i))
+        assert _count(session_factory) == 0  # nothing written on the caller's path
+
+        await writer.flush()
+        assert _count(session_factory) == 25
+        assert len(commits) == 1
+        assert writer.status()["pending"] == 0
+
+        # Broadcast after commit, with real row ids
+        logs = [c.args[0]["log"] for c in broadcasts.await_args_list]
+        assert [log["entity_id"] for log in logs] == [str(i) for i in range(25)]
+        assert all(log["id"] for log in logs)
+
+    async def test_flushes_on_interval_and_when_full(self, writer, session_factory):
+        await writer.start()
+        writer.enqueue("a", "Page")
+        for _ in range(100):
+            if _count(session_factory) == 1:
+                break
+            await asyncio.sleep(0.01)
+        assert _count(session_factory) == 1
+
+        writer.flush_interval = 60
+        for i in range(10):
+            writer.enqueue("b", "Page", entity_id=str(i))
+        for _ in range(100):
+            if _count(session_factory) == 11:
+                break
+            await asyncio.sleep(0.01)
+        assert _count(session_factory) == 11
+
+    async def test_journal_holds_only_pending_entries(self, writer, tmp_path):
+        await writer.start()
+        writer.enqueue("a", "Page")
+        writer.enqueue("b", "Page")
+        lines = (tmp_path / "audit.journal").read_text().splitlines()
+        assert [json.loads(line)["action"] for line in lines] == ["a", "b"]
+
+        await writer.flush()
+        assert (tmp_path / "audit.journal").read_text() == ""
+
+    async def test_journal_fsynced_off_the_event_loop(self, writer):
+        await writer.start()
+        writer.enqueue("a", "Page")
+        threads = []
+
+        def fsync(fd):
+            threads.append(threading.current_thread())
+
+        with patch("app.services.audit_service.os.fsync", side_effect=fsync):
+            await writer.flush()
+        # The journal before the insert, then the rewritten journal
+        assert len(threads) == 2
+        assert threading.main_thread() not in threads
+
+    async def test_entries_queued_during_rewrite_stay_journaled(self, writer, tmp_path):
+        await writer.start()
+        writer.enqueue("a", "Page")
+        write_snapshot = writer._write_snapshot
+
+        def slow_snapshot(entries):
+            time.sleep(0.05)
+            return write_snapshot(entries)
+
+        with patch.object(writer, "_write_snapshot", side_effect=slow_snapshot):
+            flush = asyncio.create_task(writer.flush())
+            await asyncio.sleep(0.02)
+            writer.enqueue("b", "Page")
+            await flush
+            writer.enqueue("c", "Page")
+        lines = (tmp_path / "audit.journal").read_text().splitlines()
+        assert [json.loads(line)["action"] for line in lines] == ["b", "c"]
+
+    async def test_replays_journal_after_crash(self, tmp_path, session_factory, broadcasts):
+        crashed = AuditWriter(journal_path=tmp_path / "audit.journal")
+        await crashed.start()
+        crashed.enqueue("lost_without_journal", "Page", details="x")
+        crashed.enqueue("second", "Page")
+        crashed._task.cancel()  # process dies before the flush
+        await asyncio.gather(crashed._task, return_exceptions=True)
+
+        # Simulate a crash after the first entry was committed but before
+        # the journal was rewritten, plus a torn final line
+        AuditWriter._insert(crashed.pending[:1])
+        with open(tmp_path / "audit.journal", "a") as f:
+            f.write('{"timestamp": "2026-')
+
+        restarted = AuditWriter(journal_path=tmp_path / "audit.journal")
+        await restarted.start()
+        try:
+            assert restarted.replayed == 1
+            db = session_factory()
+            actions = sorted(a for (a,) in db.query(AuditLog.action).all())
+            db.close()
+            assert actions == ["lost_without_journal", "second"]
+            assert (tmp_path / "audit.journal").read_text() == ""
+        finally:
+            await restarted.stop()
+
+    async def test_stop_flushes_pending(self, tmp_path, session_factory, broadcasts):
+        w = AuditWriter(journal_path=tmp_path / "audit.journal", flush_interval=60)
+        await w.start()
+        w.enqueue("a", "Page")
+        await w.stop()
+        assert _count(session_factory) == 1
+
+
+class TestLogAction:
+
+    async def test_writes_through_when_writer_not_running(self, db_session, broadcasts):
+        log = await log_action(db_session, "approved_device", "Device Management", entity_id="7")
+        assert log.id
+        assert db_session.query(AuditLog).count() == 1
+        broadcasts.assert_awaited_once()
+
+    async def test_enqueues_when_writer_running(self, writer, session_factory, db_session):
+        await writer.start()
+        with patch("app.services.audit_service.audit_writer", writer):
+            entry = await log_action(db_session, "approved_device", "Device Management")
+        assert isinstance(entry, AuditLog)
+        assert entry.action == "approved_device" and entry.id is None
+        assert writer.status()["pending"] == 1
+        assert db_session.query(AuditLog).count() == 0
@@ -0,0 +1,125 @@
+"""Tests for HTTP serving of Talos boot assets."""
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.api import boot_asset_router
+from app.api.boot_asset_router import BootAssetResponse
+from app.main import app
+
+ASSET = "vmlinuz-amd64-v1.12.0"
+CONTENT = bytes(range(256)) * 64  # 16 KiB
+
+
+@pytest.fixture
+def asset_dir(tmp_path):
+    (tmp_path / ASSET).write_bytes(CONTENT)
+    with patch("app.services.talos_downloader.talos_downloader.output_dir", tmp_path):
+        yield tmp_path
+
+
+@pytest.fixture
+def client():
+    # No context manager: skip the startup event (downloads, kubectl setup)
+    return TestClient(app)
+
+
+class TestBootAssetServing:
+
+    def test_full_download(self, client, asset_dir):
+        resp = client.get(f"/pxe/talos/{ASSET}")
+        assert resp.status_code == 200
+        assert resp.content == CONTENT
+        assert resp.headers["accept-ranges"] == "bytes"
+        assert resp.headers["content-length"] == str(len(CONTENT))
+        assert "etag" in resp.headers
+        assert "last-modified" in resp.headers
+        # CORS middleware still applies to streamed responses
+        assert resp.headers["access-control-allow-origin"] == "*"
+
+    def test_range_request(self, client, asset_dir):
+        resp = client.get(f"/pxe/talos/{ASSET}", headers={"Range": "bytes=100-199"})
+        assert resp.status_code == 206
+        assert resp.content == CONTENT[100:200]
+        assert resp.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    def test_suffix_range(self, client, asset_dir):
+        resp = client.get(f"/pxe/talos/{ASSET}", headers={"Range": "bytes=-10"})
+        assert resp.status_code == 206
+        assert resp.content == CONTENT[-10:]
+
+    def test_unsatisfiable_range(self, client, asset_dir):
+        resp = client.get(f"/pxe/talos/{ASSET}", headers={"Range": f"bytes={len(CONTENT)}-"})
+        assert resp.status_code == 416
+        assert resp.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    def test_if_none_match_returns_304(self, client, asset_dir):
+        etag = client.get(f"/pxe/talos/{ASSET}").headers["etag"]
+        resp = client.get(f"/pxe/talos/{ASSET}", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+
+    def test_stale_if_range_serves_full_body(self, client, asset_dir):
+        resp = client.get(f"/pxe/talos/{ASSET}",
+                          headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert resp.status_code == 200
+        assert resp.content == CONTENT
+
+    def test_head_has_no_body(self, client, asset_dir):
+        resp = client.head(f"/pxe/talos/{ASSET}")
+        assert resp.status_code == 200
+        assert resp.content == b""
+        assert resp.headers["content-length"] == str(len(CONTENT))
+
+    def test_rejects_non_asset_names(self, client, asset_dir):
+        assert client.get("/pxe/talos/..%2F..%2Fetc%2Fpasswd").status_code != 200
+        assert client.get("/pxe/talos/boot.ipxe").status_code == 404
+
+    def test_client_slot_released_after_transfer(self, client, asset_dir):
+        for _ in range(boot_asset_router.MAX_PER_CLIENT + 2):
+            assert client.get(f"/pxe/talos/{ASSET}").status_code == 200
+        assert boot_asset_router._client_slots == {}
+
+
+class TestClientSlots:
+
+    SCOPE = {"type": "http"}
+
+    def _response(self, asset_dir):
+        return BootAssetResponse(asset_dir / ASSET, 0, 16, 200, {}, client_ip="10.0.0.5")
+
+    async def test_busy_client_gets_503(self, asset_dir, monkeypatch):
+        monkeypatch.setattr(boot_asset_router, "_SLOT_WAIT_SECONDS", 0.05)
+        gate = asyncio.Event()
+
+        async def blocked(message):
+            await gate.wait()
+
+        holders = [asyncio.create_task(self._response(asset_dir)(self.SCOPE, None, blocked))
+                   for _ in range(boot_asset_router.MAX_PER_CLIENT)]
+        await asyncio.sleep(0)
+
+        sent = []
+
+        async def record(message):
+            sent.append(message)
+
+        await self._response(asset_dir)(self.SCOPE, None, record)
+        assert sent[0]["status"] == 503
+
+        gate.set()
+        await asyncio.gather(*holders)
+        assert boot_asset_router._client_slots == {}
+        assert boot_asset_router._client_users == {}
+
+    async def test_slot_released_when_client_goes_away(self, asset_dir):
+        async def gone(message):
+            raise OSError("client disconnected")
+
+        with pytest.raises(OSError):
+            await self._response(asset_dir)(self.SCOPE, None, gone)
+        assert boot_asset_router._client_slots == {}
+        assert boot_asset_router._client_users == {}
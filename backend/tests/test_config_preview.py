@@ -0,0 +1,130 @@
+"""Tests for the dry-run config preview (configs.preview)."""
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api.handlers.configs import _configs_preview
+from app.db.models import ClusterSettings, NetworkSettings, VolumeConfig, VolumeType
+from app.services.config_generator import ConfigGenerator
+from app.services.config_preview import apply_overrides, diff_configs, preview_configs
+from tests.conftest import get_ws_response, seed_device
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch, db_engine, db_session):
+    monkeypatch.setenv("COMPILED_DIR", str(tmp_path / "compiled"))
+    db_session.add(NetworkSettings(server_ip="10.0.0.1", dhcp_netmask="255.255.0.0"))
+    db_session.add(ClusterSettings(cluster_name="test", kubernetes_version="1.31.2",
+                                   system_extensions='["ghcr.io/siderolabs/iscsi-tools:v0.1.6"]',
+                                   factory_schematic_id="abc", talos_version="1.12.2"))
+    db_session.add(VolumeConfig(name=VolumeType.EPHEMERAL, max_size="100GB", grow=False))
+    db_session.commit()
+    with patch("app.services.config_generator.SessionLocal", sessionmaker(bind=db_engine)):
+        yield ConfigGenerator()
+
+
+def _seed_fleet(db_session, count=3):
+    return [seed_device(db_session, mac_address=f"AA:BB:CC:DD:EE:0{i}", hostname=f"node-0{i}",
+                        ip_address=f"10.0.128.{i}") for i in range(1, count + 1)]
+
+
+class TestOverrides:
+
+    def test_volumes_merge_by_name(self):
+        snapshot = {"volumes": [{"name": "EPHEMERAL", "min_size": None, "max_size": "100GB",
+                                 "disk_selector_match": None, "grow": False}]}
+        proposed = apply_overrides(snapshot, {"volumes": [{"name": "EPHEMERAL", "max_size": "200GB"},
+                                                          {"name": "IMAGE-CACHE", "max_size": "10GB"}]})
+        assert [(v["name"], v["max_size"], v["grow"]) for v in proposed["volumes"]] == [
+            ("EPHEMERAL", "200GB", False), ("IMAGE-CACHE", "10GB", True)]
+        assert snapshot["volumes"][0]["max_size"] == "100GB"
+
+    @pytest.mark.parametrize("overrides", [
+        {"cluster_name": "x"},
+        {"kernel_modules": "drbd"},
+        {"volumes": [{"name": "DATA"}]},
+    ])
+    def test_invalid_overrides(self, overrides):
+        with pytest.raises(ValueError):
+            apply_overrides({"volumes": []}, overrides)
+
+
+def test_diff_configs():
+    old = "machine:\n  kubelet:\n    image: k:v1\n  kernel: {}\n"
+    new = ("machine:\n  kubelet:\n    image: k:v2\n  sysctls:\n    a: 1\n"
+           "---\nkind: VolumeConfig\nname: EPHEMERAL\n")
+    assert diff_configs(old, new) == [
+        {"path": "config:machine.kubelet.image", "op": "changed", "old": "k:v1", "new": "k:v2"},
+        {"path": "config:machine.sysctls", "op": "added", "new": {"a": 1}},
+        {"path": "config:machine.kernel", "op": "removed", "old": {}},
+        {"path": "VolumeConfig/EPHEMERAL", "op": "added", "new": {"kind": "VolumeConfig", "name": "EPHEMERAL"}},
+    ]
+    assert diff_configs(new, new) == []
+
+
+class TestPreview:
+
+    def test_diff_per_device_without_writing(self, generator, db_session):
+        devices = _seed_fleet(db_session)
+        paths = [generator.generate_device_config(d) for d in devices]
+        for path in paths:
+            os.utime(path, (1, 1))
+        manifest = generator.manifest.path.read_text()
+
+        result = preview_configs(generator, devices, {"kubernetes_version": "1.32.0",
+                                                      "volumes": [{"name": "EPHEMERAL", "max_size": "200GB"}]})
+
+        assert result["summary"] == {"devices": 3, "changed": 3, "unchanged": 0, "errors": 0}
+        for row in result["devices"]:
+            assert row["state"] == "current"
+            assert {(c["path"], c.get("new")) for c in row["changes"]} == {
+                ("config:machine.kubelet.image", "ghcr.io/siderolabs/kubelet:v1.32.0"),
+                ("VolumeConfig/EPHEMERAL:provisioning.maxSize", "200GB"),
+            }
+        assert all(os.path.getmtime(p) == 1 for p in paths)
+        assert generator.manifest.path.read_text() == manifest
+
+    def test_unaffected_devices_are_not_rendered(self, generator, db_session):
+        devices = _seed_fleet(db_session)
+        with patch.object(generator, "render_device_config") as render:
+            result = preview_configs(generator, devices, {"kubernetes_version": "1.31.2"})
+        render.assert_not_called()
+        assert result["summary"]["unchanged"] == 3
+
+    def test_stale_config_is_diffed_against_current_settings(self, generator, db_session):
+        device = seed_device(db_session)
+        path = generator.generate_device_config(device)
+        path.write_text("# edited\n")
+
+        result = preview_configs(generator, [device], {"cni": "cilium"})
+        row = result["devices"][0]
+        assert row["state"] == "drifted"
+        assert {c["path"] for c in row["changes"]} == {"config:cluster.network.cni", "config:cluster.proxy"}
+
+
+async def test_configs_preview_handler(generator, mock_db, mock_ws):
+    devices = _seed_fleet(mock_db)
+
+    async def inline(func, *args):
+        # In-memory SQLite is per-connection: keep the DB reads on this thread
+        return func(*args)
+
+    resolve = AsyncMock(return_value=("factory.talos.dev/installer/def:v1.12.2", None))
+    with patch("app.services.config_generator.ConfigGenerator", return_value=generator), \
+         patch("app.services.factory_service.resolve_install_image", resolve), \
+         patch("asyncio.to_thread", inline):
+        await _configs_preview({"system_extensions": ["ghcr.io/siderolabs/drbd:9.2.0"],
+                                "device_ids": [devices[0].id]}, mock_ws, "1")
+        await _configs_preview({"cluster_name": "x"}, mock_ws, "2")
+
+    data, error = get_ws_response(mock_ws, 0)
+    assert error is None
+    resolve.assert_awaited_once_with(["ghcr.io/siderolabs/drbd:9.2.0"], "1.12.2")
+    assert data["settings"] == {"install_image": "factory.talos.dev/installer/def:v1.12.2"}
+    assert [row["mac_address"] for row in data["devices"]] == [devices[0].mac_address]
+    assert data["devices"][0]["changes"][0]["path"] == "config:machine.install.image"
+
+    _, error = get_ws_response(mock_ws, 1)
+    assert error == "Cannot preview settings: cluster_name"
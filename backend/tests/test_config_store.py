@@ -0,0 +1,150 @@
+"""Tests for atomic config writes, the config manifest and configs.status."""
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api.handlers.configs import _configs_status
+from app.db.models import ClusterSettings, NetworkSettings
+from app.services import config_store
+from app.services.config_generator import ConfigGenerator
+from app.services.config_store import CURRENT, DRIFTED, MISSING, STALE, ConfigManifest
+from tests.conftest import get_ws_response, seed_device
+
+
+class TestWrites:
+
+    def test_atomic_write_leaves_no_temp_files(self, tmp_path):
+        path = tmp_path / "a.yaml"
+        config_store.atomic_write(path, "one")
+        config_store.atomic_write(path, b"two")
+        assert path.read_text() == "two"
+        assert [p.name for p in tmp_path.iterdir()] == ["a.yaml"]
+
+    def test_failed_write_keeps_old_file(self, tmp_path):
+        path = tmp_path / "a.yaml"
+        path.write_text("old")
+        with patch.object(config_store.os, "replace", side_effect=OSError("boom")):
+            with pytest.raises(OSError):
+                config_store.atomic_write(path, "new")
+        assert path.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["a.yaml"]
+
+    def test_unchanged_content_is_not_rewritten(self, tmp_path):
+        path = tmp_path / "a.yaml"
+        assert config_store.write_if_changed(path, "same")
+        os.utime(path, (1, 1))
+        assert not config_store.write_if_changed(path, "same")
+        assert os.path.getmtime(path) == 1
+        assert config_store.write_if_changed(path, "different")
+
+
+class TestManifest:
+
+    def test_states(self, tmp_path):
+        manifest = ConfigManifest(tmp_path)
+        path = tmp_path / "mac.yaml"
+        assert manifest.state("mac", path) == MISSING
+
+        manifest.write("mac", path, "config", "inputs-1")
+        assert manifest.state("mac", path, "inputs-1") == CURRENT
+        assert manifest.state("mac", path, "inputs-2") == STALE
+
+        path.write_text("edited by hand")
+        assert manifest.state("mac", path, "inputs-1") == DRIFTED
+
+        manifest.remove("mac")
+        assert manifest.state("mac", path) == MISSING
+
+    def test_persisted_and_reloaded(self, tmp_path):
+        ConfigManifest(tmp_path).write("mac", tmp_path / "mac.yaml", "config", "inputs")
+        entry = ConfigManifest(tmp_path).get("mac")
+        assert entry["hash"] == config_store.content_hash("config")
+        assert entry["inputs"] == "inputs"
+        assert entry["generated_at"]
+
+    def test_batch_saves_once(self, tmp_path):
+        manifest = ConfigManifest(tmp_path)
+        with patch.object(config_store, "atomic_write", wraps=config_store.atomic_write) as write:
+            with manifest.batch():
+                for i in range(5):
+                    manifest.record(f"mac-{i}", "hash", "inputs")
+                assert not manifest.path.exists()
+        assert [c.args[0] for c in write.call_args_list] == [manifest.path]
+        assert len(ConfigManifest(tmp_path).entries()) == 5
+
+    def test_corrupt_manifest_is_ignored(self, tmp_path):
+        (tmp_path / config_store.MANIFEST_NAME).write_text("{not json")
+        assert ConfigManifest(tmp_path).entries() == {}
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch, db_engine, db_session):
+    monkeypatch.setenv("COMPILED_DIR", str(tmp_path / "compiled"))
+    db_session.add(NetworkSettings(server_ip="10.0.0.1", dhcp_netmask="255.255.0.0"))
+    db_session.add(ClusterSettings(cluster_name="test", kubernetes_version="1.31.2"))
+    db_session.commit()
+    with patch("app.services.config_generator.SessionLocal", sessionmaker(bind=db_engine)):
+        yield ConfigGenerator()
+
+
+class TestConfigGenerator:
+
+    def test_unchanged_config_is_not_rewritten(self, generator, db_session):
+        device = seed_device(db_session)
+        path = generator.generate_device_config(device)
+        os.utime(path, (1, 1))
+
+        generator.generate_device_config(device)
+        assert os.path.getmtime(path) == 1
+        assert generator.config_states([device]) == {device.mac_address: CURRENT}
+
+    def test_settings_change_marks_config_stale(self, generator, db_session):
+        device = seed_device(db_session)
+        generator.generate_device_config(device)
+
+        db_session.query(ClusterSettings).one().kubernetes_version = "1.32.0"
+        db_session.commit()
+        assert generator.config_states([device]) == {device.mac_address: STALE}
+
+        generator.regenerate_all_configs([device])
+        assert generator.config_states([device]) == {device.mac_address: CURRENT}
+
+    def test_pxe_rendered_config_is_current(self, generator, db_session):
+        device = seed_device(db_session, install_disk="/dev/nvme0n1")
+        generator.generate_config_from_params(
+            mac_address=device.mac_address, node_type=device.role.value,
+            hostname=device.hostname, ip_address=device.ip_address, save_to_disk=True)
+        assert generator.config_states([device]) == {device.mac_address: CURRENT}
+
+    def test_missing_and_deleted(self, generator, db_session):
+        device = seed_device(db_session)
+        assert generator.config_states([device]) == {device.mac_address: MISSING}
+        generator.generate_device_config(device)
+        generator.delete_device_config(device)
+        assert generator.manifest.get(device.mac_address) is None
+
+
+async def test_configs_status_handler(generator, mock_db, mock_ws, tmp_path, monkeypatch):
+    monkeypatch.setenv("TFTP_ROOT", str(tmp_path / "tftp"))
+    current = seed_device(mock_db)
+    drifted = seed_device(mock_db, mac_address="AA:BB:CC:DD:EE:02", hostname="node-02", ip_address="10.0.128.2")
+    missing = seed_device(mock_db, mac_address="AA:BB:CC:DD:EE:03", hostname="node-03", ip_address="10.0.128.3")
+    generator.generate_device_config(current)
+    generator.generate_device_config(drifted).write_text("# edited\n")
+
+    async def inline(func, *args):
+        # In-memory SQLite is per-connection: keep the DB reads on this thread
+        return func(*args)
+
+    with patch("app.services.config_generator.ConfigGenerator", return_value=generator), \
+         patch("asyncio.to_thread", inline):
+        await _configs_status({}, mock_ws, "1")
+
+    data, error = get_ws_response(mock_ws)
+    assert error is None
+    states = {row["mac_address"]: row["state"] for row in data["devices"]}
+    assert states == {current.mac_address: CURRENT, drifted.mac_address: DRIFTED, missing.mac_address: MISSING}
+    assert data["summary"] == {CURRENT: 1, DRIFTED: 1, MISSING: 1}
+    assert data["boot_ipxe"] == MISSING
@@ -0,0 +1,116 @@
+"""Tests for the background credentials/terminal-env service."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import app.db.models  # noqa: F401 — register tables before db_engine creates them
+from app.services.credentials_service import CredentialsService, _fingerprint
+
+
+@pytest.fixture
+def patched():
+    """Patch the blocking pieces and record how often they ran."""
+    calls = {"talos": 0, "kube": 0, "env": 0}
+    state = {"fingerprint": (("10.0.128.1",), ("10.0.128.1", "1.31.0", "1.12.2"), 1.0)}
+
+    def talos():
+        calls["talos"] += 1
+        return True
+
+    def kube():
+        calls["kube"] += 1
+        return True
+
+    def env():
+        calls["env"] += 1
+        return {"PATH": "/bin", "KUBECONFIG": "/root/.kube/config"}
+
+    with patch("app.services.credentials_service.ensure_talosconfig", side_effect=talos), \
+         patch("app.services.credentials_service.ensure_kubeconfig", side_effect=kube), \
+         patch("app.services.credentials_service.build_terminal_env", side_effect=env), \
+         patch("app.services.credentials_service._fingerprint", side_effect=lambda: state["fingerprint"]), \
+         patch.object(CredentialsService, "_kubeconfig_stale", return_value=False):
+        yield calls, state
+
+
+class TestRefresh:
+
+    def test_refresh_only_when_inputs_change(self, patched):
+        calls, state = patched
+        svc = CredentialsService()
+
+        assert svc.refresh() is True
+        assert svc.refresh() is False
+        assert calls == {"talos": 1, "kube": 1, "env": 1}
+
+        state["fingerprint"] = (("10.0.128.1", "10.0.128.2"),) + state["fingerprint"][1:]
+        assert svc.refresh() is True
+        assert calls["kube"] == 2
+
+    def test_terminal_env_is_cached_copy(self, patched):
+        calls, _ = patched
+        svc = CredentialsService()
+        svc.refresh()
+
+        env = svc.terminal_env()
+        env["PATH"] = "mutated"
+        assert svc.terminal_env()["PATH"] == "/bin"
+        assert calls["env"] == 1
+        assert calls["kube"] == 1  # opening a terminal never fetches
+
+    def test_failed_fetch_backs_off(self, patched):
+        calls, _ = patched
+        svc = CredentialsService()
+        with patch("app.services.credentials_service.ensure_kubeconfig", return_value=False):
+            svc.refresh()
+        assert svc.kubeconfig_ok is False
+
+        with patch.object(CredentialsService, "_kubeconfig_stale", return_value=True):
+            assert svc.refresh() is False  # inside RETRY_INTERVAL
+            svc._next_retry = 0
+            assert svc.refresh() is True
+
+    async def test_invalidate_wakes_loop(self, patched):
+        calls, _ = patched
+        svc = CredentialsService(check_interval=60)
+        svc.start()
+        try:
+            for _ in range(100):
+                if calls["kube"]:
+                    break
+                await asyncio.sleep(0.01)
+            assert calls["kube"] == 1
+
+            svc.invalidate()
+            for _ in range(100):
+                if calls["kube"] == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert calls["kube"] == 2
+            assert svc.status()["running"]
+        finally:
+            task = svc._task
+            svc.stop()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+class TestFingerprint:
+
+    def test_tracks_controlplane_set(self, db_engine, db_session, tmp_path):
+        from app.db.models import DeviceRole, DeviceStatus
+        from tests.conftest import seed_device
+
+        Session = sessionmaker(bind=db_engine)
+        with patch("app.db.database.SessionLocal", Session), \
+             patch("app.api.cluster_router.get_templates_base_dir", return_value=tmp_path):
+            before = _fingerprint()
+            seed_device(db_session, mac_address="aa:bb:cc:00:00:01", ip_address="10.0.128.1",
+                        role=DeviceRole.CONTROLPLANE, status=DeviceStatus.APPROVED)
+            seed_device(db_session, mac_address="aa:bb:cc:00:00:02", ip_address="10.0.128.9",
+                        role=DeviceRole.WORKER, status=DeviceStatus.APPROVED)
+            after = _fingerprint()
+
+        assert before[0] == ()
+        assert after[0] == ("10.0.128.1",)
@@ -0,0 +1,144 @@
+"""Tests for the devices.power_bulk WebSocket action."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.api.handlers import devices as devices_mod
+from app.db.models import DeviceRole, DeviceStatus
+from tests.conftest import get_ws_response, seed_device
+
+
+@pytest.fixture
+def fleet(mock_db):
+    devices = [seed_device(mock_db, mac_address=f"AA:BB:CC:00:00:{i:02X}", hostname=f"worker-{i}",
+                           ip_address=f"10.0.128.{i + 10}/24") for i in range(5)]
+    devices.append(seed_device(mock_db, mac_address="AA:BB:CC:00:01:00", hostname="cp-0",
+                               ip_address="10.0.128.2", role=DeviceRole.CONTROLPLANE))
+    devices.append(seed_device(mock_db, mac_address="AA:BB:CC:00:02:00", hostname="worker-new",
+                               ip_address=None, status=DeviceStatus.PENDING))
+    return devices
+
+
+@pytest.fixture
+def audit():
+    with patch("app.api.ws_handler.log_action", new_callable=AsyncMock) as log_action:
+        yield log_action
+
+
+async def _run(params, mock_ws):
+    await devices_mod._devices_power_bulk(params, mock_ws, "req-1")
+    await asyncio.gather(*devices_mod._power_bulk_tasks)
+    return get_ws_response(mock_ws, 0)
+
+
+def _events(mock_broadcast, event_type):
+    return [e["data"] for e in mock_broadcast if e["type"] == event_type]
+
+
+class TestSelection:
+
+    async def test_requires_a_selector(self, fleet, mock_ws):
+        await devices_mod._devices_power_bulk({"action": "reboot"}, mock_ws, "req-1")
+        assert get_ws_response(mock_ws)[1] == "At least one selector is required"
+
+    async def test_invalid_action(self, fleet, mock_ws):
+        await devices_mod._devices_power_bulk({"action": "explode", "role": "worker"}, mock_ws, "req-1")
+        assert "Invalid action" in get_ws_response(mock_ws)[1]
+
+    @pytest.mark.parametrize("selector, expected", [
+        ({"role": "worker", "status": "approved"}, [f"worker-{i}" for i in range(5)]),
+        ({"hostname": "worker-[13]"}, ["worker-1", "worker-3"]),
+        ({"hostname": "worker-*", "status": "pending"}, ["worker-new"]),
+        ({"role": "controlplane"}, ["cp-0"]),
+    ])
+    def test_selectors(self, fleet, selector, expected):
+        assert [d.hostname for d in devices_mod._select_devices(fleet, selector)] == expected
+
+    def test_device_ids(self, fleet):
+        ids = [fleet[0].id, fleet[5].id]
+        assert [d.hostname for d in devices_mod._select_devices(fleet, {"device_ids": ids})] == ["worker-0", "cp-0"]
+
+
+class TestWake:
+
+    async def test_one_socket_for_all_packets(self, fleet, mock_ws, mock_broadcast, audit):
+        sock = MagicMock()
+        with patch.object(devices_mod, "_wol_socket", return_value=sock) as make_socket:
+            data, error = await _run({"action": "wake", "hostname": "worker-*", "stagger": 0}, mock_ws)
+
+        assert error is None and len(data["devices"]) == 6
+        make_socket.assert_called_once()
+        sock.close.assert_called_once()
+        packets = [c.args[0] for c in sock.sendto.call_args_list]
+        assert len(packets) == 6
+        assert packets[0] == b"\xff" * 6 + bytes.fromhex("AABBCC000000") * 16
+
+        assert len(_events(mock_broadcast, "device_power_result")) == 6
+        [complete] = _events(mock_broadcast, "device_power_complete")
+        assert complete["succeeded"] == 6 and complete["operation_id"] == data["operation_id"]
+        audit.assert_awaited_once()
+        assert audit.await_args.args[1] == "power_bulk_wake"
+
+
+class TestReboot:
+
+    async def test_concurrency_stagger_and_results(self, fleet, mock_ws, mock_broadcast, audit):
+        running, starts, max_running = set(), [], [0]
+
+        async def talosctl_power(talosctl, talosconfig, ip, action):
+            starts.append(asyncio.get_running_loop().time())
+            running.add(ip)
+            max_running[0] = max(max_running[0], len(running))
+            await asyncio.sleep(0.05)
+            running.discard(ip)
+            if ip == "10.0.128.13":
+                return 1, "", "connection refused"
+            return 0, "", ""
+
+        with patch.object(devices_mod, "_talosctl_power", side_effect=talosctl_power) as power, \
+             patch("app.api.cluster_router.find_talosctl", return_value="/usr/bin/talosctl"):
+            data, error = await _run({"action": "reboot", "hostname": "worker-*",
+                                      "concurrency": 2, "stagger": 0.02}, mock_ws)
+
+        assert error is None
+        # The pending device without an IP is reported, not sent a command
+        assert power.await_count == 5
+        assert all(c.args[2].count("/") == 0 for c in power.await_args_list)
+        assert max_running[0] <= 2
+        gaps = [b - a for a, b in zip(starts, starts[1:])]
+        assert min(gaps) >= 0.015
+
+        results = {r["hostname"]: r for r in _events(mock_broadcast, "device_power_result")}
+        assert results["worker-3"]["error"] == "Reboot failed: connection refused"
+        assert results["worker-new"]["skipped"] and not results["worker-new"]["ok"]
+        [complete] = _events(mock_broadcast, "device_power_complete")
+        assert (complete["succeeded"], complete["failed"], complete["skipped"]) == (4, 1, 1)
+        audit.assert_awaited_once()
+
+    async def test_rejects_bad_options(self, fleet, mock_ws):
+        await devices_mod._devices_power_bulk({"action": "shutdown", "role": "worker", "concurrency": 0},
+                                              mock_ws, "req-1")
+        assert "concurrency" in get_ws_response(mock_ws)[1]
+        await devices_mod._devices_power_bulk({"action": "shutdown", "role": "worker", "stagger": -1},
+                                              mock_ws, "req-2")
+        assert "stagger" in get_ws_response(mock_ws)[1]
+
+    async def test_missing_talosctl_fails_every_target(self, fleet, mock_ws, mock_broadcast, audit, tmp_path):
+        # find_talosctl itself runs: no project binary and nothing on PATH
+        import app.api.cluster_router as cluster_router
+        with patch.object(cluster_router, "__file__", str(tmp_path / "app" / "api" / "cluster_router.py")), \
+             patch("app.api.cluster_router.shutil.which", return_value=None), \
+             patch.object(devices_mod, "_talosctl_power") as power, \
+             patch("asyncio.sleep", AsyncMock()) as sleep:
+            data, error = await _run({"action": "reboot", "hostname": "worker-*"}, mock_ws)
+
+        assert error is None and len(data["devices"]) == 6
+        power.assert_not_called()
+        sleep.assert_not_called()
+        results = {r["hostname"]: r for r in _events(mock_broadcast, "device_power_result")}
+        assert results["worker-0"]["error"] == "talosctl not found on server"
+        assert results["worker-new"]["error"] == "Can only reboot approved devices"
+        [complete] = _events(mock_broadcast, "device_power_complete")
+        assert (complete["succeeded"], complete["failed"], complete["skipped"]) == (0, 5, 1)
+        audit.assert_awaited_once()
@@ -0,0 +1,113 @@
+"""Tests for the per-device DHCP reservations in the dnsmasq hosts file."""
+from unittest.mock import patch
+
+import pytest
+
+from app.crud import device as device_crud
+from app.db.models import DeviceStatus, NetworkSettings
+from app.schemas.device import DeviceUpdate
+from app.services import template_service as ts_mod
+from app.services.template_service import DNSMASQ_HOSTS_FILE, TemplateService, dhcp_host_entry
+from tests.conftest import seed_device
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMPILED_DIR", str(tmp_path / "compiled"))
+    svc = TemplateService()
+    svc.dnsmasq_dynamic_dir = tmp_path / "etc" / "dnsmasq.ktizo"
+    with patch.object(ts_mod, "template_service", svc), \
+         patch.object(ts_mod, "_signal_dnsmasq", return_value=True) as signal_dnsmasq:
+        svc.signal = signal_dnsmasq
+        yield svc
+
+
+def _compiled(svc):
+    return (svc.compiled_path / "dnsmasq" / "hosts" / DNSMASQ_HOSTS_FILE).read_text().splitlines()
+
+
+class TestHostsFile:
+
+    def test_entry_format(self):
+        assert dhcp_host_entry("AA:BB:CC:00:00:01", "10.0.128.5/24", "worker-1") == "aa:bb:cc:00:00:01,10.0.128.5,worker-1"
+        assert dhcp_host_entry("AA:BB:CC:00:00:01", "10.0.128.5") == "aa:bb:cc:00:00:01,10.0.128.5"
+        assert dhcp_host_entry("AA:BB:CC:00:00:01", None, "worker-1") is None
+
+    def test_updates_one_line_in_place(self, service):
+        for i in range(3):
+            service.update_dnsmasq_host(f"AA:BB:CC:00:00:0{i}", f"aa:bb:cc:00:00:0{i},10.0.0.{i + 10},w{i}")
+        assert service.update_dnsmasq_host("aa:bb:cc:00:00:01", "aa:bb:cc:00:00:01,10.0.0.99,w1")
+        assert _compiled(service) == ["aa:bb:cc:00:00:00,10.0.0.10,w0", "aa:bb:cc:00:00:01,10.0.0.99,w1",
+                                      "aa:bb:cc:00:00:02,10.0.0.12,w2"]
+
+        assert service.update_dnsmasq_host("AA:BB:CC:00:00:00", None)
+        assert not service.update_dnsmasq_host("AA:BB:CC:00:00:00", None)
+        assert [line.split(",")[2] for line in _compiled(service)] == ["w1", "w2"]
+
+    def test_installed_file_is_updated_and_reloaded(self, service):
+        # Not deployed yet: only the compiled copy changes, nothing to signal
+        service.update_dnsmasq_host("AA:BB:CC:00:00:01", "aa:bb:cc:00:00:01,10.0.0.5")
+        service.signal.assert_not_called()
+
+        installed = service.dnsmasq_dynamic_dir / "hosts"
+        installed.mkdir(parents=True)
+        service.update_dnsmasq_host("AA:BB:CC:00:00:02", "aa:bb:cc:00:00:02,10.0.0.6")
+        assert (installed / DNSMASQ_HOSTS_FILE).read_text().splitlines() == _compiled(service)
+        service.signal.assert_called_once()
+        assert not list(installed.glob(".*"))
+
+
+class TestCrudHooks:
+
+    @pytest.fixture(autouse=True)
+    def no_side_effects(self):
+        with patch.object(device_crud, "config_generator"), \
+             patch.object(device_crud, "_regenerate_boot_script"):
+            yield
+
+    @pytest.fixture
+    def network(self, db_session):
+        ns = NetworkSettings(server_ip="10.0.0.1", dhcp_mode="server")
+        db_session.add(ns)
+        db_session.commit()
+        return ns
+
+    def test_approve_update_delete(self, db_session, network, service):
+        dev = seed_device(db_session, status=DeviceStatus.PENDING, hostname="worker-1", ip_address="10.0.128.5/24")
+        device_crud.approve_device(db_session, dev.id)
+        assert _compiled(service) == ["aa:bb:cc:dd:ee:01,10.0.128.5,worker-1"]
+
+        device_crud.update_device(db_session, dev.id, DeviceUpdate(ip_address="10.0.128.6"))
+        assert _compiled(service) == ["aa:bb:cc:dd:ee:01,10.0.128.6,worker-1"]
+
+        device_crud.update_device(db_session, dev.id, DeviceUpdate(mac_address="AA:BB:CC:DD:EE:00"))
+        assert _compiled(service) == ["aa:bb:cc:dd:ee:00,10.0.128.6,worker-1"]
+
+        device_crud.delete_device(db_session, dev.id)
+        assert _compiled(service) == []
+
+    def test_reject_removes_reservation(self, db_session, network, service):
+        dev = seed_device(db_session, hostname="worker-1", ip_address="10.0.128.5")
+        device_crud.update_device(db_session, dev.id, DeviceUpdate(notes="x"))
+        assert len(_compiled(service)) == 1
+        device_crud.reject_device(db_session, dev.id)
+        assert _compiled(service) == []
+
+    def test_proxy_mode_has_no_reservations(self, db_session, network, service):
+        network.dhcp_mode = "proxy"
+        db_session.commit()
+        dev = seed_device(db_session, status=DeviceStatus.PENDING, hostname="worker-1", ip_address="10.0.128.5")
+        device_crud.approve_device(db_session, dev.id)
+        assert not (service.compiled_path / "dnsmasq" / "hosts" / DNSMASQ_HOSTS_FILE).exists()
+
+    def test_sync_rebuilds_from_table(self, db_session, network, service):
+        for i in range(3):
+            seed_device(db_session, mac_address=f"AA:BB:CC:00:00:0{i}", hostname=f"w{i}", ip_address=f"10.0.128.{i + 10}")
+        seed_device(db_session, mac_address="AA:BB:CC:00:00:09", status=DeviceStatus.PENDING)
+        service.update_dnsmasq_host("AA:BB:CC:00:00:99", "aa:bb:cc:00:00:99,10.0.128.99")
+
+        from app.crud import network as network_crud
+        with patch.object(network_crud, "get_network_settings", wraps=network_crud.get_network_settings) as get:
+            device_crud.sync_dhcp_reservations(db_session)
+        assert [line.split(",")[2] for line in _compiled(service)] == ["w0", "w1", "w2"]
+        get.assert_called_once()
@@ -0,0 +1,156 @@
+"""Tests for splitting the dnsmasq config and applying changes with SIGHUP or restart."""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import template_service as ts_mod
+from app.services.template_service import TemplateService, classify_dnsmasq_change
+
+NETWORK = {
+    "interface": "eth0", "server_ip": "10.0.0.1", "dhcp_mode": "proxy",
+    "dhcp_network": "10.0.0.0", "dhcp_netmask": "255.255.0.0",
+    "tftp_root": "/var/lib/tftpboot", "dns_port": 0,
+}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMPILED_DIR", str(tmp_path / "compiled"))
+    svc = TemplateService()
+    svc.dnsmasq_conf = tmp_path / "etc" / "dnsmasq.conf"
+    svc.dnsmasq_dynamic_dir = tmp_path / "etc" / "dnsmasq.ktizo"
+    svc.dnsmasq_conf.parent.mkdir()
+    with patch.object(ts_mod, "_signal_dnsmasq", return_value=True) as signal_dnsmasq, \
+         patch.object(svc, "restart_dnsmasq", new_callable=AsyncMock, return_value=True):
+        svc.signal = signal_dnsmasq
+        yield svc
+
+
+class TestClassify:
+
+    @pytest.mark.parametrize("old, new, expected", [
+        ({"dnsmasq.conf": "a\n"}, {"dnsmasq.conf": "# header\n\na\n"}, "none"),
+        ({"dnsmasq.conf": "a", "options": "66,10.0.0.1"}, {"dnsmasq.conf": "a", "options": "66,10.0.0.2"}, "reload"),
+        ({"dnsmasq.conf": "a"}, {"dnsmasq.conf": "a", "hosts/approved": "aa:bb,10.0.0.5"}, "reload"),
+        ({"dnsmasq.conf": "a", "hosts/approved": "x"}, {"dnsmasq.conf": "a"}, "reload"),
+        ({"dnsmasq.conf": "a", "options": "x"}, {"dnsmasq.conf": "b", "options": "y"}, "restart"),
+        ({}, {"dnsmasq.conf": "a"}, "restart"),
+    ])
+    def test_change_classes(self, old, new, expected):
+        assert classify_dnsmasq_change(old, new) == expected
+
+
+class TestCompile:
+
+    def test_splits_static_and_dynamic(self, service):
+        rendered, path = service.compile_dnsmasq_config(**NETWORK)
+        hosts_dir = service.dnsmasq_dynamic_dir / "hosts"
+        assert f"dhcp-hostsdir={hosts_dir}" in rendered
+        assert f"dhcp-optsfile={service.dnsmasq_dynamic_dir / 'options'}" in rendered
+        # Settings that change on a network save stay out of the main config
+        assert "10.0.0.1" not in rendered
+
+        options = (service.compiled_path / "dnsmasq" / "options").read_text()
+        assert "option:tftp-server,10.0.0.1" in options
+        assert "option:dns-server,10.0.0.1" in options
+        assert "tag:ipxe,option:bootfile-name,http://10.0.0.1:8000/pxe/boot.ipxe" in options
+        assert (service.compiled_path / "dnsmasq" / "hosts").is_dir()
+
+
+class TestDeploy:
+
+    async def test_first_deploy_restarts(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        assert await service.deploy_dnsmasq_config() == "restarted"
+        service.restart_dnsmasq.assert_awaited_once()
+        assert service.dnsmasq_conf.read_text() == (service.compiled_path / "dnsmasq" / "dnsmasq.conf").read_text()
+        assert (service.dnsmasq_dynamic_dir / "options").exists()
+        assert (service.dnsmasq_dynamic_dir / "hosts").is_dir()
+
+    async def test_unchanged_does_nothing(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        await service.deploy_dnsmasq_config()
+        service.compile_dnsmasq_config(**NETWORK)
+        assert await service.deploy_dnsmasq_config() == "unchanged"
+        service.restart_dnsmasq.assert_awaited_once()
+        service.signal.assert_not_called()
+
+    async def test_dynamic_only_change_reloads(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        await service.deploy_dnsmasq_config()
+        hosts = service.compiled_path / "dnsmasq" / "hosts" / "approved"
+        hosts.write_text("aa:bb:cc:dd:ee:ff,10.0.0.50,worker-1\n")
+
+        assert await service.deploy_dnsmasq_config() == "reloaded"
+        assert (service.dnsmasq_dynamic_dir / "hosts" / "approved").read_text() == hosts.read_text()
+        service.restart_dnsmasq.assert_awaited_once()
+
+        hosts.unlink()
+        assert await service.deploy_dnsmasq_config() == "reloaded"
+        assert not (service.dnsmasq_dynamic_dir / "hosts" / "approved").exists()
+
+    @pytest.mark.parametrize("change", [{"server_ip": "10.0.0.2"}, {"dns_server": "10.0.0.53"},
+                                        {"ipxe_boot_script": "pxe/custom.ipxe"}])
+    async def test_settings_in_options_file_reload(self, service, change):
+        service.compile_dnsmasq_config(**NETWORK)
+        await service.deploy_dnsmasq_config()
+        service.compile_dnsmasq_config(**{**NETWORK, **change})
+        assert await service.deploy_dnsmasq_config() == "reloaded"
+        service.restart_dnsmasq.assert_awaited_once()
+
+    async def test_reload_without_dnsmasq_pid_restarts(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        await service.deploy_dnsmasq_config()
+        service.compile_dnsmasq_config(**{**NETWORK, "dns_server": "10.0.0.53"})
+        service.signal.return_value = False
+        assert await service.deploy_dnsmasq_config() == "restarted"
+        assert service.restart_dnsmasq.await_count == 2
+
+    async def test_static_change_restarts(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        await service.deploy_dnsmasq_config()
+        service.compile_dnsmasq_config(**{**NETWORK, "interface": "eth1"})
+        assert await service.deploy_dnsmasq_config() == "restarted"
+        assert service.restart_dnsmasq.await_count == 2
+        assert "interface=eth1" in service.dnsmasq_conf.read_text()
+
+    async def test_failed_signal_reports_none(self, service):
+        service.compile_dnsmasq_config(**NETWORK)
+        service.restart_dnsmasq.return_value = False
+        assert await service.deploy_dnsmasq_config() is None
+
+
+@pytest.fixture
+def pid_file(tmp_path):
+    """A pid file for pid 4242 and a fake /proc naming that pid's command."""
+    path = tmp_path / "dnsmasq.pid"
+    path.write_text("4242\n")
+    (tmp_path / "proc" / "4242").mkdir(parents=True)
+    with patch.object(ts_mod, "DNSMASQ_PID_FILES", (str(tmp_path / "missing.pid"), str(path))), \
+         patch.object(ts_mod, "PROC_DIR", tmp_path / "proc"):
+        yield tmp_path / "proc" / "4242" / "comm"
+
+
+class TestSignals:
+
+    async def test_reload_signals_pid_from_pid_file(self, pid_file):
+        pid_file.write_text("dnsmasq\n")
+        with patch.object(ts_mod.os, "kill") as kill, \
+             patch.object(ts_mod, "_service_command", new_callable=AsyncMock) as service_command:
+            assert await ts_mod.template_service.reload_dnsmasq()
+        kill.assert_called_once_with(4242, ts_mod.signal.SIGHUP)
+        service_command.assert_not_awaited()
+
+    async def test_stale_pid_is_not_signalled(self, pid_file):
+        pid_file.write_text("postgres\n")
+        with patch.object(ts_mod.os, "kill") as kill, \
+             patch.object(ts_mod, "_service_command", new_callable=AsyncMock, return_value=True) as service_command:
+            assert await ts_mod.template_service.reload_dnsmasq()
+        kill.assert_not_called()
+        service_command.assert_awaited_once_with("restart")
+
+    async def test_reload_falls_back_to_restart(self, tmp_path):
+        with patch.object(ts_mod, "DNSMASQ_PID_FILES", (str(tmp_path / "missing.pid"),)), \
+             patch.object(ts_mod, "_service_command", new_callable=AsyncMock, return_value=True) as service_command:
+            assert await ts_mod.template_service.reload_dnsmasq()
+        service_command.assert_awaited_once_with("restart")
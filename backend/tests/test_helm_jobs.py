@@ -0,0 +1,237 @@
+"""Tests for the persistent helm job queue."""
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import app.db.models  # noqa: F401 — register tables before db_engine creates them
+from app.db.models import HelmJob, HelmRelease
+from app.services.helm_jobs import HelmJobQueue
+from app.services.helm_runner import HelmRunner
+from tests.conftest import GatedRunner, get_ws_response, seed_helm_release, wait_until
+
+
+def _jobs(Session):
+    db = Session()
+    try:
+        return {job.id: (job.status, job.error) for job in db.query(HelmJob)}
+    finally:
+        db.close()
+
+
+class GatedJobRunner(GatedRunner):
+    """Helm job runner stand-in; jobs in one namespace must never overlap."""
+
+    async def __call__(self, operation, release_id, params):
+        async with self.gate(params["name"], group=params["namespace"]) as gate:
+            await gate.wait()
+
+
+class TestScheduling:
+
+    async def _submit_all(self, queue, db, specs):
+        for name, namespace, priority in specs:
+            release = seed_helm_release(db, release_name=name, namespace=namespace)
+            await queue.submit(db, "upgrade", release, {"name": name, "namespace": namespace},
+                               priority=priority)
+
+    async def test_parallelism_and_namespace_serialization(self, db_session, session_local):
+        runner = GatedJobRunner()
+        queue = HelmJobQueue(parallelism=2, runner=runner)
+        await self._submit_all(queue, db_session, [
+            ("a1", "ns-a", 0), ("a2", "ns-a", 0), ("b1", "ns-b", 0), ("c1", "ns-c", 0)])
+        await queue.start()
+        try:
+            await wait_until(lambda: len(runner.started) == 2)
+            assert runner.started == ["a1", "b1"]  # a2 waits for a1's namespace
+
+            for name in ("a1", "b1", "a2", "c1"):
+                await wait_until(lambda: name in runner.started)
+                runner.gates[name].set()
+            await wait_until(lambda: all(s in ("succeeded", "failed")
+                                     for s, _ in _jobs(session_local).values()))
+        finally:
+            await queue.stop()
+        assert runner.max_parallel == 2
+        assert not runner.overlap
+
+    async def test_priority_order(self, db_session, session_local):
+        runner = GatedJobRunner()
+        queue = HelmJobQueue(parallelism=1, runner=runner)
+        await self._submit_all(queue, db_session, [
+            ("low", "ns-1", 0), ("high", "ns-2", 10), ("mid", "ns-3", 5)])
+        await queue.start()
+        try:
+            for name in ("high", "mid", "low"):
+                await wait_until(lambda: name in runner.started)
+                runner.gates[name].set()
+        finally:
+            await queue.stop()
+        assert runner.started == ["high", "mid", "low"]
+
+    async def test_outcome_follows_release_status(self, db_session, session_local):
+        async def runner(operation, release_id, params):
+            db = session_local()
+            db.get(HelmRelease, release_id).status = params["result"]
+            db.commit()
+            db.close()
+
+        queue = HelmJobQueue(runner=runner)
+        ok = await queue.submit(db_session, "install", seed_helm_release(db_session, release_name="ok"),
+                                {"result": "deployed"})
+        bad = await queue.submit(db_session, "install", seed_helm_release(db_session, release_name="bad"),
+                                 {"result": "failed"})
+        ok_id, bad_id = ok.id, bad.id
+        await queue.start()
+        try:
+            await wait_until(lambda: not {"queued", "running"} & {s for s, _ in _jobs(session_local).values()})
+        finally:
+            await queue.stop()
+        jobs = _jobs(session_local)
+        assert jobs[ok_id][0] == "succeeded"
+        assert jobs[bad_id][0] == "failed"
+
+
+class TestSubmit:
+
+    async def test_coalesces_and_uninstall_supersedes(self, db_session, session_local):
+        queue = HelmJobQueue()
+        release = seed_helm_release(db_session)
+        first = await queue.submit(db_session, "upgrade", release)
+        again = await queue.submit(db_session, "upgrade", release, priority=3)
+        assert again.id == first.id and again.priority == 3
+
+        uninstall = await queue.submit(db_session, "uninstall", release)
+        jobs = _jobs(session_local)
+        assert jobs[first.id] == ("cancelled", "Superseded by uninstall")
+        assert jobs[uninstall.id][0] == "queued"
+
+    async def test_unknown_operation(self, db_session):
+        with pytest.raises(ValueError):
+            await HelmJobQueue().submit(db_session, "rollback", seed_helm_release(db_session))
+
+
+class TestCancel:
+
+    async def test_cancel_queued(self, db_session, session_local):
+        queue = HelmJobQueue()
+        job = await queue.submit(db_session, "upgrade", seed_helm_release(db_session))
+        assert await queue.cancel(db_session, job.id) is not None
+        assert _jobs(session_local)[job.id] == ("cancelled", "Cancelled by user")
+        assert await queue.cancel(db_session, job.id) is None
+
+    async def test_cancel_terminates_helm(self, db_session, session_local, tmp_path):
+        pid_file = tmp_path / "helm.pid"
+        fake_helm = tmp_path / "helm"
+        fake_helm.write_text(f"#!/bin/sh\necho $$ > {pid_file}\nexec sleep 60\n")
+        fake_helm.chmod(0o755)
+        runner = HelmRunner()
+        runner.helm_bin = str(fake_helm)
+
+        async def run(operation, release_id, params):
+            await runner._run_helm(["upgrade"])
+
+        queue = HelmJobQueue(runner=run)
+        job = await queue.submit(db_session, "upgrade", seed_helm_release(db_session))
+        job_id = job.id
+        await queue.start()
+        try:
+            await wait_until(lambda: pid_file.exists() and pid_file.read_text().strip())
+            pid = int(pid_file.read_text())
+            await queue.cancel(db_session, job_id)
+            await wait_until(lambda: _jobs(session_local)[job_id][0] == "cancelled")
+        finally:
+            await queue.stop()
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+    async def test_ws_job_cancel_fails_release(self, mock_db, mock_ws, mock_broadcast, session_local):
+        from app.api.handlers.modules import _modules_job_cancel, _modules_jobs
+        from app.services.helm_jobs import helm_jobs
+        release = seed_helm_release(mock_db, status="pending")
+        job = await helm_jobs.submit(mock_db, "install", release, {})
+        job_id, release_id = job.id, release.id
+
+        await _modules_jobs({"release_id": release_id}, mock_ws, "req-1")
+        data, error = get_ws_response(mock_ws)
+        assert [j["id"] for j in data["jobs"]] == [job_id]
+
+        mock_ws.sent_messages.clear()
+        await _modules_job_cancel({"job_id": job_id}, mock_ws, "req-2")
+        data, error = get_ws_response(mock_ws)
+        assert error is None and data["status"] == "cancelled"
+        assert mock_db.get(HelmRelease, release_id).status == "failed"
+
+
+class TestReconcile:
+
+    async def test_settles_interrupted_jobs(self, db_session, session_local):
+        def release(name, status="deploying"):
+            return seed_helm_release(db_session, release_name=name, namespace=name, status=status)
+
+        def running(rel, operation):
+            job = HelmJob(release_id=rel.id, release_name=rel.release_name, namespace=rel.namespace,
+                          operation=operation, status="running", attempts=1)
+            db_session.add(job)
+            db_session.commit()
+            return job.id
+
+        done = running(release("done"), "install")
+        fresh = running(release("fresh"), "install")
+        midway = running(release("midway"), "upgrade")
+        removing = running(release("removing", "uninstalling"), "uninstall")
+        release("orphan")
+        orphan_uninstall = release("orphan-uninstall", "uninstalling")
+
+        helm_states = {
+            "done": {"version": 1, "info": {"status": "deployed", "app_version": "1.2"}},
+            "midway": {"version": 2, "info": {"status": "pending-upgrade"}},
+            "removing": {"version": 1, "info": {"status": "uninstalling"}},
+        }
+
+        async def get_status(name, namespace):
+            return helm_states.get(name)
+
+        with patch("app.services.helm_runner.helm_runner.get_status", AsyncMock(side_effect=get_status)):
+            assert await HelmJobQueue().reconcile() == 6
+
+        jobs = _jobs(session_local)
+        assert jobs[done][0] == "succeeded"
+        assert jobs[fresh] == ("queued", "Resumed after restart")
+        assert jobs[midway][0] == "interrupted"
+        assert jobs[removing][0] == "queued"
+
+        db = session_local()
+        statuses = {r.release_name: r.status for r in db.query(HelmRelease)}
+        assert statuses["done"] == "deployed"
+        assert statuses["midway"] == "failed"
+        assert statuses["orphan"] == "failed"
+        assert db.query(HelmJob).filter_by(release_id=orphan_uninstall.id, operation="uninstall",
+                                           status="queued").count() == 1
+        db.close()
+
+    async def test_helm_failure_interrupts_job(self, db_session, session_local):
+        release = seed_helm_release(db_session, release_name="app", status="deploying")
+        job = HelmJob(release_id=release.id, release_name="app", namespace="default",
+                      operation="install", status="running", attempts=1)
+        db_session.add(job)
+        db_session.commit()
+
+        with patch("app.services.helm_runner.helm_runner.get_status",
+                   AsyncMock(side_effect=FileNotFoundError("helm"))):
+            assert await HelmJobQueue().reconcile() == 1
+
+        status, error = _jobs(session_local)[job.id]
+        assert status == "interrupted" and "helm status unavailable" in error
+        db = session_local()
+        assert db.query(HelmRelease).one().status == "failed"
+        db.close()
+
+    async def test_worker_starts_when_reconcile_fails(self, session_local):
+        queue = HelmJobQueue()
+        with patch.object(queue, "reconcile", AsyncMock(side_effect=RuntimeError("db locked"))):
+            task = await queue.start()
+        try:
+            assert not task.done() and queue.reconciled == 0
+        finally:
+            await queue.stop()
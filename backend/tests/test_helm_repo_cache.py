@@ -0,0 +1,169 @@
+"""Tests for the helm repository index cache."""
+import asyncio
+import os
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import yaml
+
+from app.services import helm_repo_cache as cache_mod
+from app.services.helm_repo_cache import HelmRepoCache
+
+
+@pytest.fixture
+def helm_home(tmp_path, monkeypatch):
+    config = tmp_path / "repositories.yaml"
+    cache = tmp_path / "repository"
+    cache.mkdir()
+    monkeypatch.setenv("HELM_REPOSITORY_CONFIG", str(config))
+    monkeypatch.setenv("HELM_REPOSITORY_CACHE", str(cache))
+
+    def configure(repos, index_age=None, entries=None):
+        config.write_text(yaml.safe_dump({"repositories": [
+            {"name": name, "url": url} for name, url in repos.items()]}))
+        for name in repos:
+            index = cache / f"{name}-index.yaml"
+            index.write_text(yaml.safe_dump({"apiVersion": "v1", "entries": entries or {}}))
+            if index_age is not None:
+                then = time.time() - index_age
+                os.utime(index, (then, then))
+    return configure
+
+
+@pytest.fixture
+def runner():
+    mock = AsyncMock()
+    mock.repo_add = AsyncMock(return_value=(True, "added"))
+    mock.repo_update = AsyncMock(return_value=(True, "updated"))
+    with patch("app.services.helm_runner.helm_runner", mock):
+        yield mock
+
+
+class TestEnsure:
+
+    async def test_unknown_repo_is_added(self, helm_home, runner):
+        ok, _ = await HelmRepoCache().ensure("traefik", "https://traefik.github.io/charts")
+        assert ok
+        runner.repo_add.assert_awaited_once_with("traefik", "https://traefik.github.io/charts")
+        runner.repo_update.assert_not_awaited()
+
+    async def test_fresh_index_skips_helm(self, helm_home, runner):
+        helm_home({"traefik": "https://traefik.github.io/charts"}, index_age=30)
+        ok, msg = await HelmRepoCache(ttl=600).ensure("traefik", "https://traefik.github.io/charts/")
+        assert ok and "up to date" in msg
+        runner.repo_add.assert_not_awaited()
+        runner.repo_update.assert_not_awaited()
+
+    async def test_stale_index_updates_only_that_repo(self, helm_home, runner):
+        helm_home({"traefik": "https://traefik.github.io/charts",
+                   "bitnami": "https://charts.bitnami.com/bitnami"}, index_age=3600)
+        await HelmRepoCache(ttl=600).ensure("traefik", "https://traefik.github.io/charts")
+        runner.repo_update.assert_awaited_once_with("traefik")
+
+    async def test_changed_url_re_adds(self, helm_home, runner):
+        helm_home({"traefik": "https://old.example.com/charts"}, index_age=30)
+        await HelmRepoCache().ensure("traefik", "https://traefik.github.io/charts")
+        runner.repo_add.assert_awaited_once()
+
+    async def test_concurrent_callers_share_one_update(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, index_age=3600)
+
+        async def slow_update(*names):
+            await asyncio.sleep(0.05)
+            return True, "updated"
+        runner.repo_update.side_effect = slow_update
+
+        cache = HelmRepoCache(ttl=600)
+        results = await asyncio.gather(*(
+            cache.ensure("bitnami", "https://charts.bitnami.com/bitnami") for _ in range(5)))
+        assert all(ok for ok, _ in results)
+        assert runner.repo_update.await_count == 1
+
+    async def test_joined_call_for_other_url_re_checks(self, helm_home, runner):
+        async def slow_add(name, url):
+            await asyncio.sleep(0.05)
+            helm_home({name: url}, index_age=0)
+            return True, "added"
+        runner.repo_add.side_effect = slow_add
+
+        cache = HelmRepoCache(ttl=600)
+        await asyncio.gather(cache.ensure("traefik", "https://old.example.com/charts"),
+                             cache.ensure("traefik", "https://traefik.github.io/charts"))
+        assert [c.args[1] for c in runner.repo_add.await_args_list] == [
+            "https://old.example.com/charts", "https://traefik.github.io/charts"]
+        assert cache.configured_repos() == {"traefik": "https://traefik.github.io/charts"}
+
+    async def test_stricter_max_age_re_checks_after_joining(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, index_age=300)
+
+        async def slow_update(*names):
+            await asyncio.sleep(0.05)
+            return True, "updated"
+        runner.repo_update.side_effect = slow_update
+
+        cache = HelmRepoCache(ttl=600)
+        (_, lenient), (ok, _) = await asyncio.gather(cache.ensure("bitnami"), cache.ensure("bitnami", max_age=0))
+        assert "up to date" in lenient
+        assert ok
+        runner.repo_update.assert_awaited_once_with("bitnami")
+
+    async def test_unconfigured_without_url(self, helm_home, runner):
+        ok, msg = await HelmRepoCache().ensure("nope")
+        assert not ok and "not configured" in msg
+
+
+class TestSearchVersions:
+
+    ENTRIES = {
+        "nginx": [
+            {"version": "15.1.0", "appVersion": "1.25.3", "description": "NGINX"},
+            {"version": "15.0.0", "appVersion": "1.25.2", "description": "NGINX"},
+            {"version": "14.0.0", "appVersion": "1.24.0", "deprecated": True},
+        ],
+        "nginx-ingress-controller": [{"version": "9.9.0", "appVersion": "1.9.0"}],
+        "redis": [{"version": "18.0.0", "appVersion": "7.2.0"}],
+    }
+
+    async def test_from_cached_index_without_forking_helm(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, index_age=30, entries=self.ENTRIES)
+        cache = HelmRepoCache(ttl=600)
+        with patch.object(cache_mod, "_parse_index", wraps=cache_mod._parse_index) as parse, \
+             patch("asyncio.create_subprocess_exec", side_effect=AssertionError("forked helm")):
+            versions = await cache.search_versions("bitnami/nginx")
+            assert versions == [
+                {"name": "bitnami/nginx", "version": "15.1.0", "app_version": "1.25.3", "description": "NGINX"},
+                {"name": "bitnami/nginx", "version": "15.0.0", "app_version": "1.25.2", "description": "NGINX"},
+            ]
+            await cache.search_versions("bitnami/nginx")
+            assert parse.call_count == 1
+
+            by_keyword = await cache.search_versions("nginx")
+            assert {v["name"] for v in by_keyword} == {"bitnami/nginx", "bitnami/nginx-ingress-controller"}
+        runner.repo_update.assert_not_awaited()
+
+    async def test_reparses_after_update(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, index_age=30, entries=self.ENTRIES)
+        cache = HelmRepoCache(ttl=600)
+        assert len(await cache.search_versions("bitnami/redis")) == 1
+
+        entries = {"redis": self.ENTRIES["redis"] + [{"version": "17.0.0", "appVersion": "7.0.0"}]}
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, entries=entries)
+        assert [v["version"] for v in await cache.search_versions("bitnami/redis")] == ["18.0.0", "17.0.0"]
+
+    async def test_stale_indexes_are_not_refreshed(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami",
+                   "traefik": "https://traefik.github.io/charts"}, index_age=3600, entries=self.ENTRIES)
+        versions = await HelmRepoCache(ttl=600).search_versions("redis")
+        assert {v["name"] for v in versions} == {"bitnami/redis", "traefik/redis"}
+        runner.repo_update.assert_not_awaited()
+
+    async def test_missing_index_is_fetched(self, helm_home, runner):
+        helm_home({"bitnami": "https://charts.bitnami.com/bitnami"}, index_age=3600, entries=self.ENTRIES)
+        cache = HelmRepoCache(ttl=600)
+        cache.index_path("bitnami").unlink()
+        await cache.search_versions("redis")
+        runner.repo_update.assert_awaited_once_with("bitnami")
+
+    async def test_unknown_repo(self, helm_home, runner):
+        assert await HelmRepoCache().search_versions("missing/chart") == []
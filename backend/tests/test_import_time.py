@@ -0,0 +1,74 @@
+"""Import-time guard for the backend entry point.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter
+and checks that optional handler modules and heavy client libraries are
+not pulled in at startup.  Set KTIZO_IMPORT_BUDGET_MS to also enforce a
+wall-clock budget for ``app.main`` (off by default: CI machines vary).
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Must stay out of the startup import graph
+LAZY_MODULES = [
+    "kubernetes",
+    "yaml",
+    "httpx",
+    "requests",
+    "app.api.handlers.rbac",
+    "app.api.handlers.cicd",
+    "app.api.handlers.modules",
+    "app.api.handlers.longhorn",
+    "app.api.handlers.workloads",
+    "app.services.module_catalog",
+]
+
+
+def _importtime(module: str) -> dict:
+    """Return {module: cumulative_us} as reported by -X importtime."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        cumulative = cumulative.strip()
+        if cumulative.isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+@pytest.fixture(scope="module")
+def main_imports():
+    return _importtime("app.main")
+
+
+def test_heavy_modules_not_imported_at_startup(main_imports):
+    assert "app.main" in main_imports
+    loaded = [m for m in LAZY_MODULES if m in main_imports]
+    assert loaded == [], f"Imported eagerly by app.main: {loaded}"
+
+
+def test_ws_handler_imports_no_handler_modules():
+    timings = _importtime("app.api.ws_handler")
+    handlers = sorted(m for m in timings
+                      if m.startswith("app.api.handlers.") and m not in
+                      ("app.api.handlers._base", "app.api.handlers._infra"))
+    assert handlers == []
+
+
+def test_import_budget(main_imports):
+    budget_ms = os.environ.get("KTIZO_IMPORT_BUDGET_MS")
+    if not budget_ms:
+        pytest.skip("KTIZO_IMPORT_BUDGET_MS not set")
+    assert main_imports["app.main"] / 1000 <= float(budget_ms)
@@ -0,0 +1,154 @@
+"""Tests for the metrics registry, /metrics endpoint and profiler."""
+import asyncio
+import json
+import subprocess
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import instrumentation
+from app.services.instrumentation import (
+    Counter,
+    Histogram,
+    SamplingProfiler,
+    _binary_label,
+    http_request_duration,
+    subprocess_duration,
+    subprocess_spawns,
+    ws_action_duration,
+    ws_action_errors,
+)
+from tests.conftest import wait_until
+
+
+class TestRegistryFormat:
+
+    def test_histogram_renders_cumulative_buckets(self):
+        h = Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+        h.observe(0.05, "/a")
+        h.observe(0.5, "/a")
+        h.observe(5.0, "/a")
+        lines = list(h.render())
+
+        assert "# TYPE t_seconds histogram" in lines
+        assert 't_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{route="/a",le="1.0"} 2' in lines
+        assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+        assert 't_seconds_count{route="/a"} 3' in lines
+
+    def test_counter_escapes_labels(self):
+        c = Counter("t_total", "test", ("action",))
+        c.inc('we"ird')
+        assert 't_total{action="we\\"ird"} 1.0' in list(c.render())
+
+
+class TestMetricsEndpoint:
+
+    def test_routes_are_labelled_by_template(self):
+        from app.main import app
+        client = TestClient(app)
+        before = http_request_duration.count("GET", "/health", "200")
+        client.get("/health")
+        assert http_request_duration.count("GET", "/health", "200") == before + 1
+
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        assert 'ktizo_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in resp.text
+        assert "# TYPE ktizo_db_query_duration_seconds histogram" in resp.text
+
+    def test_profiler_endpoints_disabled_by_default(self):
+        from app.main import app
+        client = TestClient(app)
+        assert client.post("/debug/profiler/start").status_code == 404
+        assert client.post("/debug/profiler/stop").status_code == 404
+        assert client.get("/debug/profiler").status_code == 404
+
+    def test_profiler_endpoints_when_enabled(self, monkeypatch):
+        from app.core.config import settings
+        from app.main import app
+        monkeypatch.setattr(settings, "ENABLE_PROFILER", True)
+        client = TestClient(app)
+        assert client.post("/debug/profiler/start", params={"interval_ms": 1}).json()["running"]
+        assert client.post("/debug/profiler/stop").status_code == 200
+        assert not client.get("/debug/profiler").json()["running"]
+
+
+class TestWsInstrumentation:
+
+    @pytest.mark.asyncio
+    async def test_action_latency_and_errors(self, mock_ws):
+        from app.api.ws_handler import handle_ws_message, ACTION_MAP
+
+        async def boom(params, ws, req_id):
+            raise RuntimeError("nope")
+
+        ACTION_MAP["test.boom"] = boom
+        try:
+            before = ws_action_errors.value("test.boom")
+            await handle_ws_message(mock_ws, json.dumps({"id": "1", "action": "test.boom"}))
+            assert ws_action_errors.value("test.boom") == before + 1
+            assert ws_action_duration.count("test.boom") >= 1
+        finally:
+            del ACTION_MAP["test.boom"]
+
+
+class TestSubprocessLabels:
+
+    @pytest.mark.parametrize("args,label", [
+        (["kubectl", "get", "nodes"], "kubectl"),
+        (["/opt/ktizo/backend/talosctl", "version"], "talosctl"),
+        ("helm repo update", "helm"),
+        (["kubectl-1.31.0", "version"], "kubectl"),
+        (["rc-service", "dnsmasq", "restart"], None),
+    ])
+    def test_binary_label(self, args, label):
+        assert _binary_label(args) == label
+
+
+class TestSubprocessWrappers:
+
+    @pytest.fixture
+    def kubectl(self, tmp_path):
+        path = tmp_path / "kubectl"
+        path.write_text("#!/bin/sh\nexit 0\n")
+        path.chmod(0o755)
+        return str(path)
+
+    def test_run_counts_tracked_binaries_only(self, kubectl):
+        spawns, timed = subprocess_spawns.value("kubectl"), subprocess_duration.count("kubectl")
+        assert instrumentation.run([kubectl, "version"]).returncode == 0
+        instrumentation.run(["true"])
+        assert subprocess_spawns.value("kubectl") == spawns + 1
+        assert subprocess_duration.count("kubectl") == timed + 1
+
+    async def test_exec_times_until_exit(self, kubectl):
+        spawns, timed = subprocess_spawns.value("kubectl"), subprocess_duration.count("kubectl")
+        proc = await instrumentation.create_subprocess_exec(kubectl, "version")
+        await proc.wait()
+        assert subprocess_spawns.value("kubectl") == spawns + 1
+        await wait_until(lambda: subprocess_duration.count("kubectl") == timed + 1)
+
+    def test_library_subprocesses_are_not_hooked(self):
+        assert subprocess.run.__module__ == "subprocess"
+        assert asyncio.create_subprocess_exec.__module__ == "asyncio.subprocess"
+
+
+class TestSamplingProfiler:
+
+    def test_collects_collapsed_stacks(self):
+        p = SamplingProfiler()
+        assert p.start(interval_ms=1)
+        assert not p.start()  # already running
+        deadline = time.time() + 0.2
+        while time.time() < deadline:
+            sum(range(1000))
+        out = p.stop()
+
+        assert not p.running
+        assert p.samples > 0
+        first = out.splitlines()[0]
+        stack, count = first.rsplit(" ", 1)
+        assert int(count) >= 1
+        assert ";" in stack or "(" in stack
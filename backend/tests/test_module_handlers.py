@@ -100,7 +100,7 @@ async def test_modules_get_not_found(mock_db, mock_ws):
 
 @pytest.mark.asyncio
 async def test_modules_install_creates_release(mock_db, mock_ws, mock_broadcast, mock_log_action):
-    """_modules_install creates a DB record, responds with it, and broadcasts."""
+    """_modules_install creates a DB record, responds with it, broadcasts and queues a job."""
     params = {
         "release_name": "new-release",
         "namespace": "default",
@@ -108,7 +108,9 @@ async def test_modules_install_creates_release(mock_db, mock_ws, mock_broadcast,
         "chart_version": "1.0.0",
     }
 
-    with patch("asyncio.create_task") as mock_task:
+    from app.services.helm_jobs import helm_jobs
+    with patch("app.services.helm_runner.helm_runner.get_status", AsyncMock(return_value=None)), \
+         patch.object(helm_jobs, "_notify") as notify:
         await _modules_install(params, mock_ws, "req-6")
 
     # Response contains the created release
@@ -123,15 +125,18 @@ async def test_modules_install_creates_release(mock_db, mock_ws, mock_broadcast,
     assert mock_broadcast[0]["type"] == "module_installing"
     assert mock_broadcast[0]["data"]["release_name"] == "new-release"
 
-    # Background task was created (but not actually run)
-    mock_task.assert_called_once()
-
     # DB record exists
-    from app.db.models import HelmRelease
+    from app.db.models import HelmJob, HelmRelease
     record = mock_db.query(HelmRelease).filter_by(release_name="new-release").first()
     assert record is not None
     assert record.namespace == "default"
 
+    # Install job was queued (but not run)
+    job = mock_db.query(HelmJob).filter_by(release_id=record.id).one()
+    assert (job.operation, job.status) == ("install", "queued")
+    assert json.loads(job.params_json)["chart_version"] == "1.0.0"
+    notify.assert_called_once()
+
 
 @pytest.mark.asyncio
 async def test_modules_install_duplicate_error(mock_db, mock_ws, mock_broadcast, mock_log_action):
@@ -144,8 +149,7 @@ async def test_modules_install_duplicate_error(mock_db, mock_ws, mock_broadcast,
         "chart_name": "bitnami/nginx",
     }
 
-    with patch("asyncio.create_task"):
-        await _modules_install(params, mock_ws, "req-7")
+    await _modules_install(params, mock_ws, "req-7")
 
     data, error = get_ws_response(mock_ws)
     assert error is not None
@@ -158,7 +162,7 @@ async def test_modules_install_duplicate_error(mock_db, mock_ws, mock_broadcast,
 
 @pytest.mark.asyncio
 async def test_modules_upgrade_success(mock_db, mock_ws, mock_log_action):
-    """_modules_upgrade updates values and launches background task."""
+    """_modules_upgrade updates values and queues an upgrade job."""
     release = seed_helm_release(mock_db, release_name="upgrade-me")
 
     params = {
@@ -167,8 +171,7 @@ async def test_modules_upgrade_success(mock_db, mock_ws, mock_log_action):
         "chart_version": "2.0.0",
     }
 
-    with patch("asyncio.create_task") as mock_task:
-        await _modules_upgrade(params, mock_ws, "req-8")
+    await _modules_upgrade(params, mock_ws, "req-8")
 
     data, error = get_ws_response(mock_ws)
     assert error is None
@@ -180,7 +183,9 @@ async def test_modules_upgrade_success(mock_db, mock_ws, mock_log_action):
     assert updated.values_yaml == "replicas: 3"
     assert updated.chart_version == "2.0.0"
 
-    mock_task.assert_called_once()
+    from app.db.models import HelmJob
+    job = mock_db.query(HelmJob).filter_by(release_id=release.id).one()
+    assert (job.operation, job.status) == ("upgrade", "queued")
 
 
 @pytest.mark.asyncio
@@ -279,11 +284,10 @@ async def test_modules_force_delete_not_found(mock_db, mock_ws, mock_broadcast,
 
 @pytest.mark.asyncio
 async def test_modules_uninstall_success(mock_db, mock_ws, mock_broadcast, mock_log_action):
-    """_modules_uninstall sets status to 'uninstalling' and launches background task."""
+    """_modules_uninstall sets status to 'uninstalling' and queues an uninstall job."""
     release = seed_helm_release(mock_db, release_name="uninstall-me", status="deployed")
 
-    with patch("asyncio.create_task") as mock_task:
-        await _modules_uninstall({"release_id": release.id}, mock_ws, "req-14")
+    await _modules_uninstall({"release_id": release.id}, mock_ws, "req-14")
 
     data, error = get_ws_response(mock_ws)
     assert error is None
@@ -298,7 +302,9 @@ async def test_modules_uninstall_success(mock_db, mock_ws, mock_broadcast, mock_
     bc = next(e for e in mock_broadcast if e["type"] == "module_status_changed")
     assert bc["data"]["status"] == "uninstalling"
 
-    mock_task.assert_called_once()
+    from app.db.models import HelmJob
+    job = mock_db.query(HelmJob).filter_by(release_id=release.id).one()
+    assert (job.operation, job.status) == ("uninstall", "queued")
 
 
 @pytest.mark.asyncio
@@ -473,3 +479,25 @@ async def test_modules_repos_delete_not_found(mock_db, mock_ws):
 
     data, error = get_ws_response(mock_ws)
     assert error == "Repository not found"
+
+
+# ---------------------------------------------------------------------------
+# modules.chart_versions
+# ---------------------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_modules_chart_versions_refresh_updates_every_repo(mock_ws):
+    """A refresh for a bare chart name updates each configured repo, then searches."""
+    from app.api.handlers.modules import _modules_chart_versions
+    from app.services.helm_repo_cache import helm_repo_cache
+
+    with patch.object(helm_repo_cache, "configured_repos", return_value={"a": "https://a", "b": "https://b"}), \
+         patch.object(helm_repo_cache, "ensure", AsyncMock(return_value=(True, "updated"))) as ensure, \
+         patch.object(helm_repo_cache, "search_versions", AsyncMock(return_value=[])) as search:
+        await _modules_chart_versions({"chart": "nginx", "refresh": True}, mock_ws, "req-26")
+
+    data, error = get_ws_response(mock_ws)
+    assert error is None and data == []
+    assert sorted(c.args for c in ensure.await_args_list) == [("a",), ("b",)]
+    assert all(c.kwargs == {"max_age": 0} for c in ensure.await_args_list)
+    search.assert_awaited_once_with("nginx")
@@ -0,0 +1,107 @@
+"""Tests for the event-driven waits used by the rolling refresh."""
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.services import health_checker, kube_watch
+from app.services.kube_watch import watch_until
+
+
+@pytest.fixture
+def fake_kubectl(tmp_path):
+    """Write a kubectl stand-in; it records its PID and argv, then runs ``body``."""
+    def make(body):
+        script = tmp_path / "kubectl"
+        script.write_text(f"#!/bin/sh\necho $$ >> {tmp_path}/pids\necho \"$@\" > {tmp_path}/argv\n{body}\n")
+        script.chmod(0o755)
+        return str(script)
+    return make
+
+
+def _pids(tmp_path):
+    return [int(p) for p in (tmp_path / "pids").read_text().split()]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class TestWatchUntil:
+
+    async def test_returns_when_condition_flips(self, fake_kubectl, tmp_path):
+        kubectl = fake_kubectl("echo False\nsleep 0.3\necho True\nexec sleep 60")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await watch_until(kubectl, "kc", ["nodes", "--field-selector", "metadata.name=w1"],
+                                 '{.status}{"\\n"}', lambda s: s == "True", timeout=10)
+        # Woken by the event, not by a poll interval
+        assert loop.time() - started < 2
+        argv = (tmp_path / "argv").read_text()
+        assert "--watch" in argv and "metadata.name=w1" in argv
+        [pid] = _pids(tmp_path)
+        await asyncio.sleep(0.05)
+        assert not _alive(pid)
+
+    async def test_timeout_kills_watch(self, fake_kubectl, tmp_path):
+        kubectl = fake_kubectl("echo False\nexec sleep 60")
+        assert not await watch_until(kubectl, "kc", ["nodes"], "{}", lambda s: s == "True", timeout=0.3)
+        [pid] = _pids(tmp_path)
+        await asyncio.sleep(0.05)
+        assert not _alive(pid)
+
+    async def test_reestablishes_ended_watch(self, fake_kubectl, tmp_path):
+        # First run exits without a match (watch closed); the second matches
+        kubectl = fake_kubectl(f"if [ -e {tmp_path}/seen ]; then echo True; exec sleep 60; fi\n"
+                               f"touch {tmp_path}/seen\necho False")
+        with patch.object(kube_watch, "RESTART_DELAY", 0):
+            assert await watch_until(kubectl, "kc", ["nodes"], "{}", lambda s: s == "True", timeout=5)
+        assert len(_pids(tmp_path)) == 2
+
+    async def test_unknown_resource_type_is_not_retried(self, fake_kubectl, tmp_path):
+        kubectl = fake_kubectl("echo 'error: the server doesn'\\''t have a resource type \"nodes\"' >&2\nexit 1")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert not await watch_until(kubectl, "kc", ["nodes.longhorn.io"], "{}", lambda s: True, timeout=10)
+        assert loop.time() - started < 1
+        assert len(_pids(tmp_path)) == 1
+
+
+class TestWaitForTalosApi:
+
+    async def _listen(self):
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        return server, server.sockets[0].getsockname()[1]
+
+    async def test_up_and_down_transitions(self):
+        server, port = await self._listen()
+        server.close()
+        await server.wait_closed()
+
+        with patch.object(health_checker, "TALOS_API_PORT", port):
+            waiter = asyncio.create_task(health_checker.wait_for_talos_api(
+                "127.0.0.1", up=True, timeout=5, interval=0.05))
+            await asyncio.sleep(0.2)
+            assert not waiter.done()
+
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", port)
+            loop = asyncio.get_running_loop()
+            came_up = loop.time()
+            assert await waiter
+            assert loop.time() - came_up < 1
+
+            server.close()
+            await server.wait_closed()
+            assert await health_checker.wait_for_talos_api("127.0.0.1", up=False, timeout=5, interval=0.05)
+
+    async def test_times_out(self):
+        server, port = await self._listen()
+        with patch.object(health_checker, "TALOS_API_PORT", port):
+            assert not await health_checker.wait_for_talos_api("127.0.0.1", up=False, timeout=0.2, interval=0.05)
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,174 @@
+"""Tests for the version prefetch pipeline and boot.ipxe gating."""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.db.models import NetworkSettings
+from app.services import prefetch_service as prefetch_mod
+from app.services.prefetch_service import (
+    PrefetchService,
+    STATUS_READY,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    _installer_manifest_url,
+    resume_for_settings,
+)
+from tests.conftest import wait_until
+
+
+@pytest.fixture
+def service(tmp_path):
+    svc = PrefetchService(state_file=str(tmp_path / "prefetch_state.json"))
+    yield svc
+    svc.stop()
+
+
+@pytest.fixture
+def mock_downloads():
+    """Patch every downloader the prefetcher touches; all succeed by default."""
+    talos = MagicMock()
+    talos.download_file.return_value = "/tmp/file"
+    talos.file_exists.return_value = False
+    talosctl = MagicMock()
+    talosctl.return_value.fetch_talosctl.return_value = (True, "")
+    kubectl = MagicMock()
+    kubectl.return_value.download_kubectl.return_value = (True, None)
+    with patch("app.services.talos_downloader.talos_downloader", talos), \
+         patch("app.services.talosctl_downloader.TalosctlDownloader", talosctl), \
+         patch("app.services.kubectl_downloader.KubectlDownloader", kubectl), \
+         patch("app.services.prefetch_service._regenerate_boot_script") as regen:
+        yield {"talos": talos, "talosctl": talosctl, "kubectl": kubectl, "regen": regen}
+
+
+@pytest.fixture
+def mock_events():
+    """Capture events sent through the websocket manager."""
+    events = []
+
+    async def capture(event):
+        events.append(event)
+
+    with patch("app.services.websocket_manager.websocket_manager.broadcast_event",
+               AsyncMock(side_effect=capture)):
+        yield events
+
+
+class TestPrefetchRun:
+
+    @pytest.mark.asyncio
+    async def test_all_components_ready(self, service, mock_downloads, mock_events):
+        task = service.schedule("1.12.0", kubectl_version="v1.31.0")
+        await task
+
+        status = service.get_status("v1.12.0")
+        assert status["status"] == STATUS_READY
+        assert set(status["components"]) == {
+            "vmlinuz-amd64", "initramfs-amd64.xz", "talosctl", "kubectl",
+        }
+        mock_downloads["kubectl"].return_value.download_kubectl.assert_called_once_with("v1.31.0")
+        mock_downloads["regen"].assert_called_once()
+        assert any(m["type"] == "prefetch_status" for m in mock_events)
+
+    @pytest.mark.asyncio
+    async def test_tool_failure_does_not_block_boot(self, service, mock_downloads, mock_events):
+        mock_downloads["talosctl"].return_value.fetch_talosctl.return_value = (False, "boom")
+        await service.schedule("v1.12.0")
+
+        status = service.get_status("v1.12.0")
+        assert status["status"] == STATUS_READY
+        assert status["components"]["talosctl"] == {"ok": False, "error": "boom"}
+        assert "talosctl: boom" in status["error"]
+        assert status["retry_at"]
+        assert service.is_ready("v1.12.0")
+        mock_downloads["regen"].assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_boot_file_blocks_ready_and_is_retried(self, service, mock_downloads, mock_events):
+        mock_downloads["talos"].download_file.side_effect = [None, "/tmp/file", "/tmp/file"]
+        with patch.object(prefetch_mod, "RETRY_DELAY", 0):
+            await service.schedule("v1.12.0")
+            status = service.get_status("v1.12.0")
+            assert status["status"] == STATUS_FAILED
+            assert "vmlinuz-amd64: download of vmlinuz-amd64 failed" in status["error"]
+            assert not service.is_ready("v1.12.0")
+            mock_downloads["regen"].assert_not_called()
+
+            await wait_until(lambda: service.is_ready("v1.12.0"))
+        await wait_until(lambda: mock_downloads["regen"].called)
+        status = service.get_status("v1.12.0")
+        assert status["error"] is None and status["attempts"] == 0
+        # Only the failed component was fetched again
+        assert mock_downloads["talos"].download_file.call_count == 3
+        assert mock_downloads["talosctl"].return_value.fetch_talosctl.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_schedules_share_one_task(self, service, mock_downloads, mock_events):
+        t1 = service.schedule("v1.12.0")
+        t2 = service.schedule("1.12.0")
+        assert t1 is t2
+        await t1
+
+
+class TestBootGating:
+
+    def test_pending_version_keeps_previous(self, service, mock_downloads):
+        mock_downloads["talos"].file_exists.return_value = True
+        assert service.resolve_boot_version("v1.11.0") == "v1.11.0"
+
+        service.mark_pending("v1.12.0")
+        assert service.get_status("v1.12.0")["status"] == STATUS_PENDING
+        assert service.resolve_boot_version("v1.12.0") == "v1.11.0"
+
+    def test_untracked_version_without_files_falls_back_to_requested(self, service, mock_downloads):
+        assert service.resolve_boot_version("1.12.0") == "v1.12.0"
+
+    def test_existing_boot_script_seeds_active_version(self, service, mock_downloads, tmp_path):
+        boot_script = tmp_path / "boot.ipxe"
+        boot_script.write_text("#!ipxe\nset server 10.0.0.1\nset version v1.11.0\n")
+        service.mark_pending("v1.12.0")
+
+        assert service.resolve_boot_version("v1.12.0", boot_script=boot_script) == "v1.11.0"
+        assert service.get_status()["active_boot_version"] == "v1.11.0"
+
+    @pytest.mark.asyncio
+    async def test_switches_once_ready(self, service, mock_downloads, mock_events):
+        mock_downloads["talos"].file_exists.return_value = True
+        service.resolve_boot_version("v1.11.0")
+        service.mark_pending("v1.12.0")
+
+        await service.schedule("v1.12.0")
+        assert service.resolve_boot_version("v1.12.0") == "v1.12.0"
+        assert service.get_status()["active_boot_version"] == "v1.12.0"
+
+
+class TestResume:
+
+    @pytest.fixture
+    def settings(self, mock_db):
+        mock_db.add(NetworkSettings(server_ip="10.0.0.1", talos_version="v1.12.0"))
+        mock_db.commit()
+        return mock_db
+
+    @pytest.mark.asyncio
+    async def test_unfinished_prefetch_is_resumed(self, service, settings, mock_downloads, mock_events):
+        service._update_version("v1.12.0", status="fetching", install_image="factory.talos.dev/installer/abc:v1.12.0")
+        with patch.object(prefetch_mod, "prefetch_service", service), \
+             patch.object(service, "_check_installer", AsyncMock(return_value=(True, None))) as check:
+            await resume_for_settings(settings)
+            assert service.get_status("v1.12.0")["status"] == STATUS_READY
+            check.assert_awaited_once_with("factory.talos.dev/installer/abc:v1.12.0")
+
+            assert resume_for_settings(settings) is None
+
+    def test_untracked_version_is_left_alone(self, service, settings):
+        with patch.object(prefetch_mod, "prefetch_service", service):
+            assert resume_for_settings(settings) is None
+
+
+class TestInstallerManifestUrl:
+
+    def test_factory_image(self):
+        assert _installer_manifest_url("factory.talos.dev/installer/abc123:v1.12.0") == \
+            "https://factory.talos.dev/v2/installer/abc123/manifests/v1.12.0"
+
+    def test_other_registry_is_skipped(self):
+        assert _installer_manifest_url("ghcr.io/siderolabs/installer:v1.12.0") is None
@@ -0,0 +1,145 @@
+"""Tests for the event-driven PTY output pump."""
+import asyncio
+import os
+import pty
+import threading
+import time
+import tty
+
+import pytest
+
+from app.services.pty_bridge import PtyOutputPump
+
+
+@pytest.fixture
+def pty_pair():
+    master, slave = pty.openpty()
+    tty.setraw(slave)  # no ONLCR translation, so bytes arrive unchanged
+    os.set_blocking(master, False)
+    yield master, slave
+    for fd in (master, slave):
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def _writer(fd, payload, chunk=512):
+    def run():
+        view = memoryview(payload)
+        while view:
+            n = os.write(fd, view[:chunk])
+            view = view[n:]
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t
+
+
+class TestPtyOutputPump:
+
+    async def test_idle_terminal_uses_no_cpu(self, pty_pair):
+        master, _ = pty_pair
+        pump = PtyOutputPump(master, lambda chunk: asyncio.sleep(0))
+        task = asyncio.create_task(pump.run())
+
+        cpu0 = time.process_time()
+        await asyncio.sleep(0.5)
+        cpu = time.process_time() - cpu0
+
+        task.cancel()
+        assert pump.reads == 0
+        assert pump.frames_sent == 0
+        # A 10 ms poll loop would wake ~50 times here; an idle reader never does
+        assert cpu < 0.05
+
+    async def test_throughput_and_coalescing(self, pty_pair):
+        master, slave = pty_pair
+        payload = os.urandom(4 * 1024 * 1024)
+        received = bytearray()
+
+        async def send(chunk):
+            assert len(chunk) <= 64 * 1024
+            received.extend(chunk)
+
+        pump = PtyOutputPump(master, send)
+        task = asyncio.create_task(pump.run())
+
+        t0 = time.perf_counter()
+        writer = _writer(slave, payload, chunk=512)
+        while len(received) < len(payload):
+            await asyncio.sleep(0.01)
+            assert time.perf_counter() - t0 < 20, "pump stalled"
+        elapsed = time.perf_counter() - t0
+        task.cancel()
+        writer.join(timeout=5)
+
+        assert bytes(received) == payload
+        # 512-byte writes are batched: far fewer frames than writes
+        assert pump.frames_sent < len(payload) // 512 // 4
+        assert len(payload) / elapsed > 1024 * 1024  # > 1 MiB/s
+
+    async def test_backpressure_pauses_reader(self, pty_pair):
+        master, slave = pty_pair
+        payload = os.urandom(2 * 1024 * 1024)
+        received = bytearray()
+        max_buffered = 0
+
+        async def slow_send(chunk):
+            nonlocal max_buffered
+            max_buffered = max(max_buffered, len(pump.buffer))
+            await asyncio.sleep(0.002)
+            received.extend(chunk)
+
+        pump = PtyOutputPump(master, slow_send, max_frame=16 * 1024,
+                             high_water=128 * 1024, low_water=32 * 1024)
+        task = asyncio.create_task(pump.run())
+        writer = _writer(slave, payload, chunk=8192)
+
+        deadline = time.perf_counter() + 30
+        while len(received) < len(payload):
+            await asyncio.sleep(0.01)
+            assert time.perf_counter() < deadline, "pump stalled"
+        task.cancel()
+        writer.join(timeout=5)
+
+        assert bytes(received) == payload
+        assert pump.pauses > 0
+        assert max_buffered < 128 * 1024 + 64 * 1024
+
+    async def test_eof_ends_pump(self, pty_pair):
+        master, slave = pty_pair
+        frames = []
+
+        async def send(chunk):
+            frames.append(chunk)
+
+        pump = PtyOutputPump(master, send)
+        task = asyncio.create_task(pump.run())
+        os.write(slave, b"bye\n")
+        await asyncio.sleep(0.05)
+        os.close(slave)
+
+        await asyncio.wait_for(task, timeout=2)
+        assert pump.eof
+        assert b"".join(frames) == b"bye\n"
+
+
+class TestTerminalWebSocket:
+
+    def test_output_arrives_as_binary_frames(self, monkeypatch):
+        from unittest.mock import patch
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        monkeypatch.setenv("SHELL", "/bin/sh")
+        with patch("app.api.terminal_router._build_env", return_value=dict(os.environ)):
+            client = TestClient(app)
+            with client.websocket_connect("/ws/terminal") as ws:
+                assert ws.receive_json()["type"] == "session"
+                ws.send_json({"type": "input", "data": "echo ktizo-$((6*7))\n"})
+                out = b""
+                deadline = time.time() + 10
+                while b"ktizo-42" not in out and time.time() < deadline:
+                    out += ws.receive_bytes()
+                assert b"ktizo-42" in out
+                ws.send_json({"type": "close"})
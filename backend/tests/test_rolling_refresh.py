@@ -0,0 +1,370 @@
+"""Tests for the rolling refresh orchestrator and per-node pipeline."""
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.db.models  # noqa: F401 — register tables before create_all
+from app.db.database import Base
+from app.db.models import Device, DeviceRole, DeviceStatus, RollingRefresh, RollingRefreshNode
+from app.services.rolling_refresh import RollingRefreshOrchestrator, resolve_budget
+from tests.conftest import GatedRunner, wait_until
+
+N_WORKERS = 25
+
+
+@pytest.fixture
+def file_sessions(tmp_path):
+    """File-backed DB: node updates run in worker threads, which would each
+    see their own empty in-memory database."""
+    engine = create_engine(f"sqlite:///{tmp_path}/refresh.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with patch("app.api.ws_handler._db", side_effect=Session), \
+         patch("app.db.database.SessionLocal", Session):
+        yield Session
+    engine.dispose()
+
+
+@pytest.fixture
+def workers(file_sessions):
+    db = file_sessions()
+    for i in range(N_WORKERS):
+        db.add(Device(mac_address=f"aa:bb:cc:00:00:{i:02x}", hostname=f"worker-{i}",
+                      ip_address=f"10.0.0.{i + 10}", role=DeviceRole.WORKER,
+                      status=DeviceStatus.APPROVED))
+    db.commit()
+    devices = [{"id": d.id, "hostname": d.hostname, "mac_address": d.mac_address,
+                "ip_address": d.ip_address} for d in db.query(Device)]
+    db.close()
+    return devices
+
+
+@pytest.fixture
+def renders():
+    """Count config renders per MAC and boot.ipxe rewrites; stub the node I/O."""
+    counts = {"configs": Counter(), "boot_scripts": 0}
+
+    def render_config(self, device):
+        counts["configs"][device.mac_address] += 1
+
+    def render_boot_script(self, devices, server_ip, **kwargs):
+        counts["boot_scripts"] += 1
+        return True
+
+    proc = MagicMock(returncode=0)
+    proc.communicate = AsyncMock(return_value=(b"", b""))
+    import app.api.handlers.devices as devices_mod
+    with patch("app.services.config_generator.ConfigGenerator.generate_device_config", render_config), \
+         patch("app.services.ipxe_generator.IPXEGenerator.generate_boot_script", render_boot_script), \
+         patch("app.services.ipxe_generator.IPXEGenerator.get_server_ip_from_settings", return_value="10.0.0.1"), \
+         patch.object(devices_mod, "_kubectl_drain", AsyncMock(return_value=(True, ""))), \
+         patch.object(devices_mod, "_kubectl_uncordon", AsyncMock()), \
+         patch.object(devices_mod, "_wait_for_node_boot", AsyncMock(return_value=True)), \
+         patch.object(devices_mod, "_wait_for_node_ready", AsyncMock(return_value=True)), \
+         patch("app.services.health_checker.wait_for_talos_api", AsyncMock(return_value=True)), \
+         patch("app.services.kube_watch.watch_until", AsyncMock(return_value=True)), \
+         patch("app.api.handlers.longhorn._longhorn_reset_disks_after_wipe", AsyncMock()), \
+         patch("app.api.handlers.longhorn._load_longhorn_auto_config", return_value={}), \
+         patch("app.api.ws_handler._find_kubectl", return_value="/usr/bin/kubectl"), \
+         patch("asyncio.create_subprocess_exec", AsyncMock(return_value=proc)), \
+         patch("asyncio.sleep", AsyncMock()), \
+         patch("app.api.cluster_router.find_talosctl", return_value="/usr/bin/talosctl"):
+        yield counts
+
+
+def _nodes(Session, refresh_id):
+    db = Session()
+    try:
+        return [(n.hostname, n.step) for n in db.query(RollingRefreshNode)
+                .filter_by(refresh_id=refresh_id).order_by(RollingRefreshNode.position)]
+    finally:
+        db.close()
+
+
+def _plan(Session, refresh_id):
+    db = Session()
+    try:
+        return db.get(RollingRefresh, refresh_id).status
+    finally:
+        db.close()
+
+
+class GatedNodeRunner(GatedRunner):
+    """Per-node pipeline stand-in; records (hostname, start_step) per call."""
+
+    def __init__(self, fail=()):
+        super().__init__(fail)
+        self.calls = []
+
+    async def __call__(self, device, start_step, skip_drain, progress):
+        name = device["hostname"]
+        self.calls.append((name, start_step))
+        async with self.gate(name) as gate:
+            await progress(start_step, "working")
+            await gate.wait()
+            if name in self.fail:
+                await progress("failed", "boom")
+                return False
+            await progress("completed", "done")
+            return True
+
+
+def _devices(n):
+    return [{"id": i + 1, "hostname": f"worker-{i}", "mac_address": f"aa:bb:cc:00:01:{i:02x}",
+             "ip_address": f"10.0.1.{i + 10}"} for i in range(n)]
+
+
+# ---------------------------------------------------------------------------
+# Full pipeline
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel"])
+async def test_render_count_is_linear(mode, workers, renders, mock_broadcast):
+    orchestrator = RollingRefreshOrchestrator()
+    await orchestrator.start(workers, mode, parallelism=5)
+    await orchestrator._task
+
+    complete = [e for e in mock_broadcast if e["type"] == "rolling_refresh_complete"]
+    assert complete[-1]["data"]["succeeded"] == N_WORKERS
+
+    # Each node's own config is rendered for wipe-set and wipe-clear only,
+    # plus one boot.ipxe rewrite each time: 2N renders, not 2N².
+    assert renders["configs"] == Counter({d["mac_address"]: 2 for d in workers})
+    assert renders["boot_scripts"] == 2 * N_WORKERS
+
+
+async def test_wipe_flag_cleared_after_refresh(workers, renders, mock_broadcast, file_sessions):
+    orchestrator = RollingRefreshOrchestrator()
+    state = await orchestrator.start(workers[:3], "parallel", parallelism=3)
+    await orchestrator._task
+
+    db = file_sessions()
+    assert not any(d.wipe_on_next_boot for d in db.query(Device).filter(
+        Device.id.in_([w["id"] for w in workers[:3]])))
+    node = db.query(RollingRefreshNode).filter_by(refresh_id=state["id"]).first()
+    journal = [step for _, step, _ in json.loads(node.journal)]
+    assert journal[0] == "draining" and "finalizing" in journal and journal[-1] == "completed"
+    db.close()
+
+
+class TestDrain:
+
+    async def test_waits_for_pod_disruption_budget(self, workers, renders, mock_broadcast):
+        import app.api.handlers.devices as devices_mod
+        blocked = (False, "Drain failed: Cannot evict pod as it would violate the pod's disruption budget.")
+        steps = []
+
+        async def progress(step, message):
+            steps.append((step, message))
+
+        with patch.object(devices_mod, "_kubectl_drain", AsyncMock(side_effect=[blocked, blocked, (True, "")])) as drain:
+            ok = await devices_mod._refresh_single_node(workers[0], "kubectl", "kc", "talosctl", "tc", progress)
+        assert ok and drain.await_count == 3
+        assert sum("PodDisruptionBudget" in m for _, m in steps) == 2
+
+    async def test_gives_up_and_uncordons_after_timeout(self, workers, renders, mock_broadcast):
+        import app.api.handlers.devices as devices_mod
+        blocked = (False, "Cannot evict pod as it would violate the pod's disruption budget.")
+        steps = []
+
+        async def progress(step, message):
+            steps.append(step)
+
+        with patch.object(devices_mod, "_kubectl_drain", AsyncMock(return_value=blocked)), \
+             patch.object(devices_mod, "DRAIN_TIMEOUT", 0):
+            ok = await devices_mod._refresh_single_node(workers[0], "kubectl", "kc", "talosctl", "tc", progress)
+        assert not ok and steps[-1] == "failed"
+        assert "setting_wipe" not in steps  # node was never wiped
+        devices_mod._kubectl_uncordon.assert_awaited_once()
+
+
+# ---------------------------------------------------------------------------
+# Orchestrator
+# ---------------------------------------------------------------------------
+
+class TestBudget:
+
+    @pytest.mark.parametrize("mode, kwargs, expected", [
+        ("sequential", {}, (1, 1)),
+        ("parallel", {}, (3, 3)),
+        ("all_at_once", {}, (10, 10)),
+        ("parallel", {"max_unavailable": 5}, (5, 3)),
+        ("parallel", {"max_unavailable": 2}, (2, 2)),
+        ("parallel", {"max_unavailable_percent": 25}, (5, 3)),
+        ("all_at_once", {"max_unavailable_percent": 1}, (1, 1)),
+        ("sequential", {"max_unavailable": 4}, (4, 1)),
+    ])
+    def test_resolve(self, mode, kwargs, expected):
+        assert resolve_budget(mode, 10, 3, 20, **kwargs) == expected
+
+    async def test_external_unavailability_counts(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner()
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=AsyncMock(return_value=1))
+        await orchestrator.start(_devices(4), "parallel", parallelism=3)
+        await wait_until(lambda: len(runner.running) == 2)
+        await asyncio.sleep(0.05)
+        assert len(runner.running) == 2  # 3 allowed, one worker already down
+
+        for i in range(4):
+            await wait_until(lambda: f"worker-{i}" in runner.gates)
+            runner.release(f"worker-{i}")
+        await orchestrator._task
+        assert runner.max_parallel == 2
+
+    async def test_failed_nodes_count_against_budget(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner(fail={"worker-0"})
+
+        async def probe(exclude):
+            # A failed node stays cordoned and only drops out if excluded
+            failed = {name for name in runner.started if name in runner.fail and name not in runner.running}
+            return len(failed - exclude)
+
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=probe, budget_poll=0.01)
+        await orchestrator.start(_devices(5), "all_at_once", max_unavailable=2)
+        await wait_until(lambda: len(runner.running) == 2)
+        runner.release("worker-0")
+        await wait_until(lambda: runner.running == {"worker-1"})
+        await asyncio.sleep(0.05)
+        assert runner.started == ["worker-0", "worker-1"]
+
+        # One down, so one more at a time
+        runner.release("worker-1")
+        await wait_until(lambda: runner.running == {"worker-2"})
+        await asyncio.sleep(0.05)
+        assert runner.running == {"worker-2"}
+
+        orchestrator._task.cancel()
+        await asyncio.gather(orchestrator._task, return_exceptions=True)
+
+    async def test_waits_while_budget_exhausted(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner()
+        probe = AsyncMock(side_effect=[1, 1, 0, 0, 0])
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=probe, budget_poll=0.01)
+        runner.release("worker-0")
+        await orchestrator.start(_devices(1), "sequential")
+        await orchestrator._task
+        assert probe.await_count >= 3
+        assert runner.calls == [("worker-0", "draining")]
+
+
+class TestAdaptiveBatch:
+
+    def _seed(self, Session, durations, batch=2, budget=4):
+        db = Session()
+        plan = RollingRefresh(mode="parallel", max_unavailable=budget, batch_size=batch)
+        db.add(plan)
+        db.flush()
+        start = datetime(2026, 1, 1)
+        for i, minutes in enumerate(durations):
+            db.add(RollingRefreshNode(refresh_id=plan.id, position=i, device_id=i, hostname=f"w{i}",
+                                      mac_address=f"m{i}", ip_address=f"ip{i}", step="completed",
+                                      started_at=start, finished_at=start + timedelta(minutes=minutes)))
+        db.commit()
+        return db, plan
+
+    def _last(self, db, plan):
+        return db.query(RollingRefreshNode).filter_by(refresh_id=plan.id).order_by(
+            RollingRefreshNode.position.desc()).first()
+
+    @pytest.mark.parametrize("durations, ok, batch, expected", [
+        ([10, 10, 11], True, 2, 3),   # on par with the median: grow
+        ([10, 10, 11], True, 4, 4),   # capped at the budget
+        ([10, 10, 30], True, 4, 2),   # much slower: halve
+        ([10, 10, 15], True, 2, 2),   # a bit slower: hold
+        ([10, 10, 10], False, 3, 1),  # failure: halve
+        ([10], True, 2, 2),           # no baseline yet
+    ])
+    def test_adapt(self, file_sessions, durations, ok, batch, expected):
+        db, plan = self._seed(file_sessions, durations, batch=batch)
+        RollingRefreshOrchestrator._adapt(db, plan, self._last(db, plan), ok)
+        assert plan.batch_size == expected
+        db.close()
+
+
+class TestLifecycle:
+
+    async def test_sequential_stops_after_failure(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner(fail={"worker-1"})
+        for i in range(3):
+            runner.release(f"worker-{i}")
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=AsyncMock(return_value=0))
+        state = await orchestrator.start(_devices(3), "sequential")
+        await orchestrator._task
+
+        assert _nodes(file_sessions, state["id"]) == [
+            ("worker-0", "completed"), ("worker-1", "failed"), ("worker-2", "cancelled")]
+        assert _plan(file_sessions, state["id"]) == "failed"
+
+    async def test_cancel_lets_in_flight_finish(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner()
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=AsyncMock(return_value=0))
+        state = await orchestrator.start(_devices(3), "sequential")
+        await wait_until(lambda: runner.running)
+        assert orchestrator.cancel()
+        runner.release("worker-0")
+        await orchestrator._task
+
+        assert [s for _, s in _nodes(file_sessions, state["id"])] == ["completed", "cancelled", "cancelled"]
+        assert _plan(file_sessions, state["id"]) == "cancelled"
+        assert mock_broadcast[-1]["data"]["cancelled"] is True
+        assert not orchestrator.cancel()
+
+    async def test_resumes_after_restart_at_journaled_step(self, file_sessions, mock_broadcast):
+        runner = GatedNodeRunner()
+        before = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=AsyncMock(return_value=0))
+        state = await before.start(_devices(3), "parallel", parallelism=2)
+        await wait_until(lambda: len(runner.running) == 2)
+        runner.release("worker-0")
+        await wait_until(lambda: ("worker-0", "completed") in _nodes(file_sessions, state["id"]))
+
+        # worker-1 reaches the reboot, then the backend goes down
+        await wait_until(lambda: ("worker-2", "draining") in runner.calls)
+        db = file_sessions()
+        node = db.query(RollingRefreshNode).filter_by(hostname="worker-1").one()
+        node.step = "waiting_for_boot"
+        db.commit()
+        db.close()
+        await before.stop()
+        assert _plan(file_sessions, state["id"]) == "running"
+
+        after_runner = GatedNodeRunner()
+        for i in range(3):
+            after_runner.release(f"worker-{i}")
+        after = RollingRefreshOrchestrator(node_runner=after_runner, unavailable_probe=AsyncMock(return_value=0))
+        assert await after.resume() == state["id"]
+        await after._task
+
+        assert sorted(after_runner.calls) == [("worker-1", "waiting_for_boot"), ("worker-2", "draining")]
+        assert _plan(file_sessions, state["id"]) == "completed"
+        status = after.status()
+        assert status["succeeded"] == 3 and status["median_node_seconds"] is not None
+        assert await RollingRefreshOrchestrator().resume() is None
+
+    async def test_ws_status_and_cancel(self, file_sessions, mock_ws, mock_broadcast):
+        from app.api.handlers import devices as devices_mod
+        from app.services import rolling_refresh as rr_mod
+        from tests.conftest import get_ws_response
+
+        runner = GatedNodeRunner()
+        orchestrator = RollingRefreshOrchestrator(node_runner=runner, unavailable_probe=AsyncMock(return_value=0))
+        with patch.object(rr_mod, "rolling_refresh", orchestrator):
+            await orchestrator.start(_devices(2), "sequential")
+            await wait_until(lambda: runner.running)
+
+            await devices_mod._devices_rolling_refresh_status({}, mock_ws, "req-1")
+            data, error = get_ws_response(mock_ws)
+            assert data["active"] and data["total"] == 2 and data["max_unavailable"] == 1
+            assert [d["hostname"] for d in data["devices"]] == ["worker-0", "worker-1"]
+
+            mock_ws.sent_messages.clear()
+            await devices_mod._devices_rolling_refresh_cancel({}, mock_ws, "req-2")
+            data, error = get_ws_response(mock_ws)
+            assert error is None
+            runner.release("worker-0")
+            await orchestrator._task
@@ -0,0 +1,161 @@
+"""Tests for FTS5-backed audit and helm log search."""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import app.db.models  # noqa: F401 — register tables before db_engine creates them
+from app.crud import audit_log as audit_crud
+from app.crud import helm as helm_crud
+from app.db.fts import build_match_query, ensure_fts_indexes
+from app.db.models import AuditLog, HelmRelease
+from tests.conftest import get_ws_response
+
+_SEARCH_ROWS = int(os.getenv("KTIZO_SEARCH_ROWS", "50000"))
+
+
+def _audit(db, action, details, page="Device Management", **kw):
+    log = AuditLog(action=action, page=page, details=json.dumps(details), **kw)
+    db.add(log)
+    db.commit()
+    return log
+
+
+class TestMatchQuery:
+
+    def test_terms_are_quoted_and_last_is_prefix(self):
+        assert build_match_query("worker node") == '"worker" "node"*'
+        assert build_match_query('"exact phrase" mac') == '"exact phrase" "mac"*'
+        assert build_match_query('a"b OR (') == '"a""b" "OR" "("*'
+
+    def test_empty(self):
+        with pytest.raises(ValueError):
+            build_match_query("   ")
+
+
+class TestAuditSearch:
+
+    def test_triggers_keep_index_in_sync(self, db_session):
+        log = _audit(db_session, "approved_device", {"hostname": "worker-7", "mac": "aa:bb:cc:dd:ee:07"})
+        results, meta = audit_crud.search_audit_logs(db_session, "worker-7")
+        assert meta["total"] == 1 and results[0]["id"] == log.id
+
+        log.details = json.dumps({"hostname": "renamed"})
+        db_session.commit()
+        assert audit_crud.search_audit_logs(db_session, "worker-7")[1]["total"] == 0
+        assert audit_crud.search_audit_logs(db_session, "renamed")[1]["total"] == 1
+
+        audit_crud.clear_audit_logs(db_session)
+        assert audit_crud.search_audit_logs(db_session, "renamed")[1]["total"] == 0
+
+    def test_ranked_highlighted_and_escaped(self, db_session):
+        _audit(db_session, "updated_device", {"note": "<b>longhorn</b> disk added", "other": "x " * 50})
+        _audit(db_session, "updated_device", {"note": "longhorn longhorn longhorn"})
+        results, meta = audit_crud.search_audit_logs(db_session, "longhorn")
+        assert meta == {"total": 2, "total_exact": True, "ranked": True}
+        assert "longhorn longhorn" in results[0]["details"]  # denser match ranks first
+        hl = results[1]["details_hl"]
+        assert "<mark>longhorn</mark>" in hl
+        assert "&lt;b&gt;" in hl and "<b>" not in hl
+
+    def test_prefix_filters_and_paging(self, db_session):
+        for i in range(5):
+            _audit(db_session, "approved_device", {"hostname": f"cp-{i}"})
+        _audit(db_session, "approved_device", {"hostname": "cp-x"}, page="Cluster Settings")
+        results, meta = audit_crud.search_audit_logs(db_session, "cp", limit=2,
+                                                     page_filter="Device Management")
+        assert meta["total"] == 5 and len(results) == 2
+        more, _ = audit_crud.search_audit_logs(db_session, "cp", skip=2, limit=10,
+                                               page_filter="Device Management")
+        assert len(more) == 3
+        assert {r["id"] for r in results}.isdisjoint(r["id"] for r in more)
+
+    async def test_ws_action(self, mock_db, mock_ws):
+        from app.api.handlers.audit import _audit_search
+        _audit(mock_db, "bootstrapped_cluster", {"endpoint": "10.0.128.1"})
+        await _audit_search({"query": "10.0.128.1"}, mock_ws, "req-1")
+        data, error = get_ws_response(mock_ws)
+        assert error is None
+        assert data["total"] == 1
+        assert data["results"][0]["action"] == "bootstrapped_cluster"
+
+    def test_fast_over_large_table(self, db_session):
+        start = datetime(2026, 1, 1)
+        db_session.execute(AuditLog.__table__.insert(), [{
+            "timestamp": start + timedelta(seconds=i),
+            "action": "updated_device",
+            "page": "Device Management",
+            "details": json.dumps({"hostname": f"node-{i}", "field": "ip_address",
+                                   "value": f"10.0.{i // 250 % 256}.{i % 250}"}),
+            "entity_id": str(i),
+        } for i in range(_SEARCH_ROWS)])
+        db_session.commit()
+
+        t0 = time.perf_counter()
+        results, meta = audit_crud.search_audit_logs(db_session, f"node-{_SEARCH_ROWS - 1}", limit=25)
+        elapsed = time.perf_counter() - t0
+        assert results[0]["entity_id"] == str(_SEARCH_ROWS - 1)
+        assert elapsed < 0.25, f"search took {elapsed * 1000:.0f} ms"
+
+        # A term in every row: counted up to the cap and returned newest first
+        t0 = time.perf_counter()
+        results, meta = audit_crud.search_audit_logs(db_session, "ip_address", limit=25,
+                                                     action_filter="updated_device")
+        elapsed = time.perf_counter() - t0
+        assert meta["ranked"] is False
+        assert meta["total_exact"] is (_SEARCH_ROWS <= 10000)
+        assert results[0]["entity_id"] == str(_SEARCH_ROWS - 1)
+        assert elapsed < 0.25, f"broad search took {elapsed * 1000:.0f} ms"
+
+
+class TestReleaseLogSearch:
+
+    def test_search_logs(self, db_session):
+        db_session.add(HelmRelease(release_name="longhorn", namespace="longhorn-system",
+                                   chart_name="longhorn", status="failed",
+                                   status_message="timed out waiting for the condition",
+                                   log_output="Release \"longhorn\" failed: context deadline exceeded"))
+        db_session.add(HelmRelease(release_name="traefik", namespace="traefik", chart_name="traefik",
+                                   status="deployed", log_output="STATUS: deployed"))
+        db_session.commit()
+
+        results, meta = helm_crud.search_release_logs(db_session, "deadline")
+        assert meta["total"] == 1
+        assert results[0]["release_name"] == "longhorn"
+        assert "<mark>deadline</mark>" in results[0]["log_snippet"]
+
+        release = db_session.query(HelmRelease).filter_by(release_name="traefik").one()
+        helm_crud.update_helm_release_status(db_session, release.id, "failed",
+                                             log_output="Error: deadline exceeded")
+        assert helm_crud.search_release_logs(db_session, "deadline")[1]["total"] == 2
+        assert helm_crud.search_release_logs(db_session, "deadline", namespace="traefik")[1]["total"] == 1
+
+    async def test_ws_action_rejects_empty_query(self, mock_db, mock_ws):
+        from app.api.handlers.modules import _modules_log_search
+        await _modules_log_search({"query": ""}, mock_ws, "req-1")
+        _, error = get_ws_response(mock_ws)
+        assert error == "Search query is empty"
+
+
+class TestMigration:
+
+    def test_backfills_existing_database(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE audit_logs (id INTEGER PRIMARY KEY, timestamp DATETIME, action VARCHAR, "
+                "page VARCHAR, details TEXT, entity_type VARCHAR, entity_id VARCHAR)"))
+            conn.execute(text("INSERT INTO audit_logs (action, page, details) "
+                              "VALUES ('deleted_device', 'Device Management', 'old-host')"))
+
+        ensure_fts_indexes(engine)
+        ensure_fts_indexes(engine)  # idempotent
+        assert "audit_logs_fts" in inspect(engine).get_table_names()
+        with engine.connect() as conn:
+            hits = conn.execute(text(
+                "SELECT rowid FROM audit_logs_fts WHERE audit_logs_fts MATCH 'old'")).fetchall()
+        assert len(hits) == 1
+        engine.dispose()
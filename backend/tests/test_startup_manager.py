@@ -0,0 +1,121 @@
+"""Tests for staged background startup."""
+import asyncio
+import json
+
+import pytest
+
+from app.services.startup_manager import (
+    StartupManager,
+    STAGE_DONE,
+    STAGE_FAILED,
+    STAGE_SKIPPED,
+)
+from tests.conftest import get_ws_response
+
+
+@pytest.fixture
+def manager():
+    m = StartupManager()
+    m.register("database", lambda: None)
+    return m
+
+
+class TestStartupManager:
+
+    async def test_dependencies_run_in_order(self, manager):
+        order = []
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            order.append("fetch")
+
+        def build():
+            order.append("build")
+
+        manager.register("build", build, depends_on=["fetch"])
+        manager.register("fetch", fetch, depends_on=["database"])
+        manager.mark_done("database")
+        manager.start()
+        await manager.wait(timeout=5)
+
+        assert order == ["fetch", "build"]
+        assert manager.ready
+        assert manager.status()["complete"]
+
+    async def test_failed_dependency_skips_dependents(self, manager):
+        def broken():
+            raise RuntimeError("download failed")
+
+        manager.register("download", broken, depends_on=["database"])
+        manager.register("build", lambda: None, depends_on=["download"], required=False)
+        manager.mark_done("database")
+        manager.start()
+        await manager.wait(timeout=5)
+
+        stages = {s["name"]: s for s in manager.status()["stages"]}
+        assert stages["download"]["status"] == STAGE_FAILED
+        assert stages["download"]["error"] == "download failed"
+        assert stages["build"]["status"] == STAGE_SKIPPED
+        assert not manager.ready
+
+    async def test_optional_failure_keeps_ready(self, manager):
+        def broken():
+            raise RuntimeError("makebin unavailable")
+
+        manager.register("custom", broken, depends_on=["database"], required=False)
+        manager.mark_done("database")
+        manager.start()
+        await manager.wait(timeout=5)
+
+        assert manager.ready
+        assert manager.stages["custom"].status == STAGE_FAILED
+
+    async def test_not_ready_while_running(self, manager):
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "finished"
+
+        manager.register("slow", slow, depends_on=["database"])
+        manager.mark_done("database")
+        manager.start()
+        await asyncio.sleep(0)
+        assert not manager.ready
+
+        gate.set()
+        await manager.wait(timeout=5)
+        assert manager.ready
+        assert manager.stages["slow"].message == "finished"
+        assert manager.stages["slow"].status == STAGE_DONE
+
+    def test_unknown_dependency_rejected(self, manager):
+        manager.register("a", lambda: None, depends_on=["missing"])
+        with pytest.raises(ValueError, match="unknown stage"):
+            manager._validate()
+
+    def test_cycle_rejected(self, manager):
+        manager.register("a", lambda: None, depends_on=["b"])
+        manager.register("b", lambda: None, depends_on=["a"])
+        with pytest.raises(ValueError, match="cycle"):
+            manager._validate()
+
+
+class TestStartupStatusEndpoints:
+
+    async def test_ws_startup_status(self, mock_ws):
+        from app.api.ws_handler import handle_ws_message
+        await handle_ws_message(mock_ws, json.dumps({"id": "1", "action": "system.startup_status"}))
+        data, error = get_ws_response(mock_ws)
+        assert error is None
+        names = {s["name"] for s in data["stages"]}
+        assert {"database", "ipxe_bootloaders", "talos_boot_files", "kubectl"} <= names
+
+    def test_health_ready_reports_503_before_startup(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        # No context manager: startup stages never ran
+        resp = TestClient(app).get("/health/ready")
+        assert resp.status_code == 503
+        assert resp.json()["ready"] is False
@@ -0,0 +1,55 @@
+"""Tests for the shared Jinja2 template environments."""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.services import template_env
+from app.services.ipxe_generator import IPXEGenerator
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "templates").mkdir()
+    path = tmp_path / "templates" / "t.j2"
+    path.write_text("hello {{ name }}")
+    with patch.object(template_env, "TEMPLATE_CACHE_DIR", str(tmp_path / "cache")):
+        template_env.clear_environments()
+        yield path
+        template_env.clear_environments()
+
+
+def test_one_environment_per_directory(templates, tmp_path):
+    env = template_env.get_environment(templates.parent)
+    assert template_env.get_environment(str(templates.parent) + "/") is env
+    assert template_env.get_environment(tmp_path) is not env
+
+
+def test_template_compiled_once_until_mtime_changes(templates):
+    env = template_env.get_environment(templates.parent)
+    first = env.get_template("t.j2")
+    assert env.get_template("t.j2") is first
+
+    templates.write_text("bye {{ name }}")
+    mtime = os.path.getmtime(templates) + 5
+    os.utime(templates, (mtime, mtime))
+    reloaded = env.get_template("t.j2")
+    assert reloaded is not first
+    assert reloaded.render(name="x") == "bye x"
+
+
+def test_fresh_environment_loads_bytecode(templates, tmp_path):
+    template_env.get_environment(templates.parent).get_template("t.j2")
+    assert list((tmp_path / "cache").iterdir())
+
+    template_env.clear_environments()
+    env = template_env.get_environment(templates.parent)
+    with patch.object(env, "compile", wraps=env.compile) as compile_:
+        assert env.get_template("t.j2").render(name="x") == "hello x"
+    compile_.assert_not_called()
+
+
+def test_ipxe_generators_share_environment(tmp_path):
+    a = IPXEGenerator(tftp_root=str(tmp_path / "a"))
+    b = IPXEGenerator(tftp_root=str(tmp_path / "b"))
+    assert a.env is b.env
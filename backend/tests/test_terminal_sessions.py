@@ -0,0 +1,187 @@
+"""Tests for persistent, multiplexed terminal sessions."""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services.terminal_sessions import (
+    RingBuffer,
+    SessionLimitError,
+    TerminalSessionManager,
+)
+
+
+class Collector:
+    """Viewer that records every frame it is sent."""
+
+    def __init__(self):
+        self.data = b""
+
+    async def __call__(self, chunk: bytes):
+        self.data += chunk
+
+    async def wait_for(self, needle: bytes, timeout: float = 5):
+        deadline = time.monotonic() + timeout
+        while needle not in self.data:
+            assert time.monotonic() < deadline, f"{needle!r} not seen in {self.data[-200:]!r}"
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def manager(monkeypatch):
+    monkeypatch.setenv("SHELL", "/bin/sh")
+    m = TerminalSessionManager(max_sessions=2, idle_timeout=60, scrollback=4096)
+    yield m
+    for session in list(m.sessions.values()):
+        session.terminate()
+        await asyncio.wait_for(session.closed.wait(), timeout=10)
+    if m._reaper:
+        m._reaper.cancel()
+
+
+def _env():
+    return {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "TERM": "dumb", "PS1": "$ "}
+
+
+class TestRingBuffer:
+
+    def test_keeps_most_recent_bytes(self):
+        ring = RingBuffer(8)
+        ring.write(b"abc")
+        assert ring.getvalue() == b"abc"
+        ring.write(b"defgh")
+        assert ring.getvalue() == b"abcdefgh"
+        ring.write(b"ijk")
+        assert ring.getvalue() == b"defghijk"
+        ring.write(b"0123456789")
+        assert ring.getvalue() == b"23456789"
+        assert len(ring) == 8
+
+
+class TestTerminalSessions:
+
+    async def test_session_outlives_viewer_and_replays_scrollback(self, manager):
+        session = manager.create(_env())
+        first = Collector()
+        key = session.attach(first)
+        session.write(b"echo one-$((1+1))\n")
+        await first.wait_for(b"one-2")
+        session.detach(key)
+        assert session.detached_at is not None
+
+        # Output produced while nobody watches still lands in scrollback
+        session.write(b"echo two-$((2+2))\n")
+        deadline = time.monotonic() + 5
+        while b"two-4" not in session.scrollback.getvalue():
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+
+        second = Collector()
+        session.attach(second)
+        await second.wait_for(b"two-4")
+        assert b"one-2" in second.data
+        assert manager.get(session.id) is session
+
+    async def test_multiple_viewers_see_same_output(self, manager):
+        session = manager.create(_env())
+        a, b = Collector(), Collector()
+        session.attach(a)
+        session.attach(b)
+        session.write(b"echo shared-$((3*3))\n")
+        await a.wait_for(b"shared-9")
+        await b.wait_for(b"shared-9")
+
+    async def test_failed_viewer_is_detached(self, manager):
+        session = manager.create(_env())
+
+        async def broken(chunk):
+            raise ConnectionError("gone")
+
+        good = Collector()
+        session.attach(broken)
+        session.attach(good)
+        session.write(b"echo ok-$((5+5))\n")
+        await good.wait_for(b"ok-10")
+        session.write(b"echo again\n")
+        await good.wait_for(b"again\r\n")
+        assert len(session.viewers) == 1
+
+    async def test_viewer_failing_with_full_queue_does_not_stall_pump(self, manager):
+        session = manager.create(_env())
+        release = asyncio.Event()
+
+        async def stuck(chunk):
+            await release.wait()
+            raise ConnectionError("gone")
+
+        good = Collector()
+        key = session.attach(stuck)
+        session.attach(good)
+        stuck_viewer = session.viewers[key]
+        session.write(b"for i in $(seq 1 40); do echo line-$i; sleep 0.01; done\n")
+        deadline = time.monotonic() + 5
+        while not stuck_viewer.queue.full():
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+        # Let the pump block on the next frame for the full queue
+        await asyncio.sleep(0.2)
+
+        release.set()
+        await good.wait_for(b"line-40\r\n")
+        session.write(b"exit\n")
+        await asyncio.wait_for(session.closed.wait(), timeout=10)
+        assert manager.get(session.id) is None
+
+    async def test_global_cap(self, manager):
+        manager.create(_env())
+        manager.create(_env())
+        with pytest.raises(SessionLimitError):
+            manager.create(_env())
+
+    async def test_idle_sessions_are_reaped(self, manager):
+        session = manager.create(_env())
+        assert manager.reap_idle(now=time.time()) == []
+
+        reaped = manager.reap_idle(now=time.time() + 61)
+        assert reaped == [session.id]
+        await asyncio.wait_for(session.closed.wait(), timeout=10)
+        assert manager.get(session.id) is None
+
+    async def test_accounting(self, manager):
+        session = manager.create(_env())
+        # The shell only shows up under its own session id once it has run setsid()
+        deadline = time.monotonic() + 5
+        while True:
+            info = await asyncio.to_thread(session.to_dict)
+            if info["processes"] or time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.01)
+        assert info["processes"] >= 1
+        assert info["rss_bytes"] > 0
+        assert info["cpu_seconds"] >= 0
+        assert info["viewers"] == 0
+
+    async def test_exit_closes_session(self, manager):
+        session = manager.create(_env())
+        viewer = Collector()
+        key = session.attach(viewer)
+        session.write(b"echo bye; exit 3\n")
+        await asyncio.wait_for(session.closed.wait(), timeout=10)
+        await session.flush(key)
+        assert b"bye" in viewer.data
+        assert session.exit_status == 3
+        assert manager.get(session.id) is None
+
+
+class TestSessionEndpoints:
+
+    def test_list_and_close_unknown(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        resp = client.get("/terminal/sessions")
+        assert resp.status_code == 200
+        assert resp.json()["max_sessions"] >= 1
+        assert client.delete("/terminal/sessions/nope").status_code == 404
@@ -94,5 +94,25 @@ def test_action_map_has_all_expected_keys():
 
 def test_all_action_map_values_are_callable():
     """Every value in ACTION_MAP must be a callable (async function)."""
-    for action, handler in ACTION_MAP.items():
+    for action, handler in ACTION_MAP.load_all().items():
         assert callable(handler), f"ACTION_MAP[{action!r}] is not callable: {handler!r}"
+
+
+def test_every_action_prefix_is_registered():
+    """Each handler module's actions must be reachable through HANDLER_MODULES."""
+    from app.api.handlers import HANDLER_MODULES
+
+    for action in ACTION_MAP.load_all():
+        assert action.split(".", 1)[0] in HANDLER_MODULES, action
+
+
+def test_patched_entry_wins_over_lazy_load():
+    """patch.dict entries must not be overwritten when the module loads."""
+    import sys
+    spy = AsyncMock()
+    with patch.dict(ACTION_MAP, clear=True):
+        ACTION_MAP["rbac.namespaces"] = spy
+        assert "rbac.roles.list" in ACTION_MAP
+        assert ACTION_MAP["rbac.namespaces"] is spy
+        assert ACTION_MAP.get("rbac.namespaces") is spy
+    assert "app.api.handlers.rbac" in sys.modules
@@ -0,0 +1,66 @@
+"""Golden-file tests for the machine config YAML serializer.
+
+Regenerate the golden file after an intended output change with
+``KTIZO_UPDATE_GOLDEN=1 python -m pytest tests/test_yaml_io.py``.
+"""
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import yaml
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import ClusterSettings, NetworkSettings
+from app.services.config_generator import ConfigGenerator
+from app.utils import yaml_io
+
+GOLDEN = Path(__file__).parent / "golden" / "controlplane-52-54-00-00-00-01.yaml"
+_REPO_BASE = Path(__file__).resolve().parents[2] / "templates" / "base"
+
+_DUMPERS = [pytest.param(yaml.SafeDumper, id="python")]
+if hasattr(yaml, "CSafeDumper"):
+    _DUMPERS.append(pytest.param(yaml.CSafeDumper, id="libyaml"))
+
+
+@pytest.fixture
+def generator(db_engine, db_session):
+    db_session.add(NetworkSettings(server_ip="10.0.0.1", dhcp_netmask="255.255.255.0", dns_server="10.0.128.254"))
+    db_session.add(ClusterSettings(cluster_name="golden", kubernetes_version="1.31.2", cni="cilium",
+                                   install_image="factory.talos.dev/installer/abc:v1.12.2",
+                                   kernel_modules='["drbd"]'))
+    db_session.commit()
+    with patch("app.services.config_generator.SessionLocal", sessionmaker(bind=db_engine)):
+        gen = ConfigGenerator()
+        gen.base_dir = _REPO_BASE
+        yield gen
+
+
+def _render(generator):
+    text, _ = generator.generate_config_from_params(
+        mac_address="52:54:00:00:00:01", node_type="controlplane", hostname="cp-1",
+        ip_address="10.0.128.10", save_to_disk=False, install_disk="/dev/nvme0n1")
+    return text
+
+
+@pytest.mark.parametrize("dumper", _DUMPERS)
+def test_matches_golden_file(generator, dumper):
+    with patch.object(yaml_io, "SafeDumper", dumper):
+        text = _render(generator)
+    if os.getenv("KTIZO_UPDATE_GOLDEN"):
+        GOLDEN.parent.mkdir(exist_ok=True)
+        GOLDEN.write_text(text)
+    assert text == GOLDEN.read_text()
+
+
+def test_loaders_agree():
+    text = (_REPO_BASE / "controlplane.yaml").read_text()
+    assert yaml_io.safe_load_all(text) == list(yaml.load_all(text, Loader=yaml.SafeLoader))
+
+
+def test_stable_output_and_digest(generator):
+    first, second = _render(generator), _render(generator)
+    assert first == second
+    assert yaml_io.config_digest(first) == yaml_io.config_digest(second)
+    # Round trip: re-serializing the parsed output reproduces it exactly
+    assert yaml_io.dump_documents(yaml_io.safe_load_all(first)) == first
@@ -88,6 +88,8 @@ export default {
 
   // --- Devices (extra) ---
   rebootDevice: (id) => ws.request('devices.reboot', { device_id: id }),
+  // selector: { device_ids, role, status, hostname }; opts: { concurrency, stagger }
+  powerBulk: (action, selector, opts = {}) => ws.request('devices.power_bulk', { action, ...selector, ...opts }),
   rollingRefreshWorkers: (deviceIds, opts = {}) => ws.request('devices.rolling_refresh', {
     ...(deviceIds ? { device_ids: deviceIds } : {}),
     ...opts,
@@ -103,12 +105,16 @@ export default {
   importModule: (params) => ws.request('modules.import', params),
   upgradeModule: (id, params) => ws.request('modules.upgrade', { release_id: id, ...params }),
   cancelModule: (id) => ws.request('modules.cancel', { release_id: id }),
+  getHelmJobs: (params = {}) => ws.request('modules.jobs', params),
+  cancelHelmJob: (id) => ws.request('modules.job_cancel', { job_id: id }),
   forceDeleteModule: (id) => ws.request('modules.force_delete', { release_id: id }),
   uninstallModule: (id) => ws.request('modules.uninstall', { release_id: id }),
   getModuleLog: (id) => ws.request('modules.log', { release_id: id }),
+  searchModuleLogs: (params) => ws.request('modules.log_search', params),
   getHelmRepos: () => ws.request('modules.repos.list'),
   addHelmRepo: (params) => ws.request('modules.repos.add', params),
   deleteHelmRepo: (id) => ws.request('modules.repos.delete', { repo_id: id }),
+  getChartVersions: (chart, refresh = false) => ws.request('modules.chart_versions', { chart, refresh }),
 
   // --- Longhorn ---
   longhornNodes: () => ws.request('longhorn.nodes'),
@@ -129,6 +135,7 @@ export default {
 
   // --- Audit ---
   getAuditLogs: (params) => ws.request('audit.list', params || {}),
+  searchAuditLogs: (params) => ws.request('audit.search', params),
   clearAuditLogs: () => ws.request('audit.clear'),
 
   // --- RBAC ---
@@ -156,6 +163,10 @@ export default {
   // --- Workloads ---
   workloadsList: (params) => ws.request('workloads.list', params || {}),
 
+  // --- Generated configs ---
+  configsStatus: () => ws.request('configs.status'),
+  configsPreview: (settings) => ws.request('configs.preview', settings),
+
   // --- Troubleshooting ---
   troubleshootStatus: () => ws.request('troubleshoot.status'),
   troubleshootFixKubeconfig: () => ws.request('troubleshoot.fix_kubeconfig'),